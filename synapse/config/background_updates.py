@@ -35,3 +35,13 @@ class BackgroundUpdateConfig(Config):
         self.min_batch_size = bg_update_config.get("min_batch_size", 1)
 
         self.default_batch_size = bg_update_config.get("default_batch_size", 100)
+
+        self.max_concurrent_updates = bg_update_config.get("max_concurrent_updates", 1)
+
+        self.adapt_to_database_load = bg_update_config.get(
+            "adapt_to_database_load", False
+        )
+
+        self.max_replication_lag_ms = bg_update_config.get(
+            "max_replication_lag_ms", 10000
+        )
@@ -38,6 +38,9 @@ _CACHES_LOCK = threading.Lock()
 
 _DEFAULT_FACTOR_SIZE = 0.5
 _DEFAULT_EVENT_CACHE_SIZE = "10K"
+_DEFAULT_EVENT_DISK_CACHE_MAX_ENTRIES = 500000
+_DEFAULT_HOST_CACHE_MAX_ENTRIES = 500000
+_DEFAULT_COMPACT_STATE_GROUP_THRESHOLD = 10000
 
 
 @attr.s(slots=True, auto_attribs=True)
@@ -102,6 +105,12 @@ class CacheConfig(Config):
     track_memory_usage: bool
     expiry_time_msec: Optional[int]
     sync_response_cache_duration: int
+    event_disk_cache_path: Optional[str]
+    event_disk_cache_max_entries: int
+    host_cache_path: Optional[str]
+    host_cache_max_entries: int
+    external_event_cache: bool
+    compact_state_group_threshold: int
 
     @staticmethod
     def reset() -> None:
@@ -204,6 +213,42 @@ class CacheConfig(Config):
             cache_config.get("sync_response_cache_duration", "2m")
         )
 
+        event_disk_cache_config = cache_config.get("event_disk_cache") or {}
+        if not isinstance(event_disk_cache_config, dict):
+            raise ConfigError("caches.event_disk_cache must be a dictionary")
+
+        self.event_disk_cache_path = event_disk_cache_config.get("path")
+        if self.event_disk_cache_path is not None:
+            self.event_disk_cache_path = self.abspath(self.event_disk_cache_path)
+
+        self.event_disk_cache_max_entries = event_disk_cache_config.get(
+            "max_entries", _DEFAULT_EVENT_DISK_CACHE_MAX_ENTRIES
+        )
+        if not isinstance(self.event_disk_cache_max_entries, int):
+            raise ConfigError("caches.event_disk_cache.max_entries must be an integer")
+
+        host_cache_config = cache_config.get("host_cache") or {}
+        if not isinstance(host_cache_config, dict):
+            raise ConfigError("caches.host_cache must be a dictionary")
+
+        self.host_cache_path = host_cache_config.get("path")
+        if self.host_cache_path is not None:
+            self.host_cache_path = self.abspath(self.host_cache_path)
+
+        self.host_cache_max_entries = host_cache_config.get(
+            "max_entries", _DEFAULT_HOST_CACHE_MAX_ENTRIES
+        )
+        if not isinstance(self.host_cache_max_entries, int):
+            raise ConfigError("caches.host_cache.max_entries must be an integer")
+
+        self.external_event_cache = cache_config.get("external_event_cache", False)
+
+        self.compact_state_group_threshold = cache_config.get(
+            "compact_state_group_threshold", _DEFAULT_COMPACT_STATE_GROUP_THRESHOLD
+        )
+        if not isinstance(self.compact_state_group_threshold, int):
+            raise ConfigError("caches.compact_state_group_threshold must be an integer")
+
     def resize_all_caches(self) -> None:
         """Ensure all cache sizes are up-to-date.
 
@@ -16,6 +16,7 @@ from typing import Any, Optional
 from synapse.config._base import Config
 from synapse.config._util import validate_config
 from synapse.types import JsonDict
+from synapse.util.check_dependencies import check_requirements
 
 
 class FederationConfig(Config):
@@ -65,6 +66,42 @@ class FederationConfig(Config):
         self.max_long_retries = federation_config.get("max_long_retries", 10)
         self.max_short_retries = federation_config.get("max_short_retries", 3)
 
+        # Whether to send requests over HTTP/2 to the servers which support it,
+        # multiplexing them over a single connection to each server.
+        self.client_http2 = federation_config.get("client_http2", False)
+        if self.client_http2:
+            check_requirements("http2")
+
+        # The number of requests which may be in flight to each destination at
+        # once, or None for no limit.
+        self.client_max_concurrent_requests_per_destination: Optional[
+            int
+        ] = federation_config.get("client_max_concurrent_requests_per_destination")
+        if not self.client_max_concurrent_requests_per_destination:
+            self.client_max_concurrent_requests_per_destination = None
+
+        # The maximum number of transactions to other servers which may be in
+        # flight at once, or None for no limit.
+        self.max_concurrent_transactions: Optional[int] = federation_config.get(
+            "max_concurrent_transactions"
+        )
+        if not self.max_concurrent_transactions:
+            self.max_concurrent_transactions = None
+
+        # The maximum number of rooms in which events received over federation
+        # may be handled at once, or None for no limit.
+        self.max_concurrent_inbound_rooms: Optional[int] = federation_config.get(
+            "max_concurrent_inbound_rooms", 100
+        )
+        if not self.max_concurrent_inbound_rooms:
+            self.max_concurrent_inbound_rooms = None
+
+        # The number of destinations with outstanding catch-up to wake up at a
+        # time, after an outage.
+        self.catch_up_destinations_per_wakeup: int = max(
+            1, federation_config.get("catch_up_destinations_per_wakeup", 1)
+        )
+
         # Allow for the configuration of the backoff algorithm used
         # when trying to reach an unavailable destination.
         # Unlike previous configuration those values applies across
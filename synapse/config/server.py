@@ -774,6 +774,24 @@ class ServerConfig(Config):
         else:
             self.delete_stale_devices_after = None
 
+        # How long the notifier waits to batch up notifications for a user before
+        # waking up their streams. 0 means that streams are woken up immediately.
+        self.notifier_coalescing_window_ms = self.parse_duration(
+            config.get("notifier_coalescing_window", 0)
+        )
+
+        # The number of worker processes to use for state resolution. 0 means
+        # that state resolution is done in the main process.
+        self.state_res_process_pool_size = config.get("state_res_process_pool_size", 0)
+        if (
+            not isinstance(self.state_res_process_pool_size, int)
+            or self.state_res_process_pool_size < 0
+        ):
+            raise ConfigError(
+                "state_res_process_pool_size must be a non-negative integer",
+                ("state_res_process_pool_size",),
+            )
+
     def has_tls_listener(self) -> bool:
         return any(listener.is_tls() for listener in self.listeners)
 
@@ -234,6 +234,21 @@ class WorkerConfig(Config):
         self.worker_name = config.get("worker_name", self.worker_app)
         self.instance_name = self.worker_name or MAIN_PROCESS_INSTANCE_NAME
 
+        # The replication streams this worker should receive updates to, or None
+        # for all of them.
+        worker_replication_streams = config.get("worker_replication_streams")
+        if worker_replication_streams is not None and (
+            not isinstance(worker_replication_streams, list)
+            or not all(isinstance(s, str) for s in worker_replication_streams)
+        ):
+            raise ConfigError(
+                "worker_replication_streams must be a list of stream names",
+                ("worker_replication_streams",),
+            )
+        self.worker_replication_streams: Optional[
+            List[str]
+        ] = worker_replication_streams
+
         # FIXME: Remove this check after a suitable amount of time.
         self.worker_main_http_uri = config.get("worker_main_http_uri", None)
         if self.worker_main_http_uri is not None:
@@ -434,6 +449,11 @@ class WorkerConfig(Config):
                     self.instance_map[instance]
                 )
 
+        # Whether to send the rows of each update to a replication stream in a
+        # single `RDATA_BATCH` command, rather than an `RDATA` command per row.
+        # Every instance must understand `RDATA_BATCH` before this is enabled.
+        self.batch_replication_rows = bool(config.get("batch_replication_rows", False))
+
     def _should_this_worker_perform_duty(
         self,
         config: Dict[str, Any],
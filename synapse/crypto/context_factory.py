@@ -14,6 +14,7 @@
 # limitations under the License.
 
 import logging
+from typing import List, Optional
 
 from service_identity import VerificationError
 from service_identity.pyopenssl import verify_hostname, verify_ip_address
@@ -135,7 +136,16 @@ class FederationPolicyForHTTPS:
             self._config.tls.federation_certificate_verification_whitelist
         )
 
-    def get_options(self, host: bytes) -> IOpenSSLClientConnectionCreator:
+    def get_options(
+        self, host: bytes, alpn_protocols: Optional[List[bytes]] = None
+    ) -> IOpenSSLClientConnectionCreator:
+        """Get the options to connect to the given host with.
+
+        Args:
+            host: the host to connect to.
+            alpn_protocols: the protocols to offer with ALPN, in order of
+                preference, or None to not use ALPN.
+        """
         # IPolicyForHTTPS.get_options takes bytes, but we want to compare
         # against the str whitelist. The hostnames in the whitelist are already
         # IDNA-encoded like the hosts will be here.
@@ -155,7 +165,9 @@ class FederationPolicyForHTTPS:
             self._verify_ssl_context if should_verify else self._no_verify_ssl_context
         )
 
-        return SSLClientConnectionCreator(host, ssl_context, should_verify)
+        return SSLClientConnectionCreator(
+            host, ssl_context, should_verify, alpn_protocols
+        )
 
     def creatorForNetloc(
         self, hostname: bytes, port: int
@@ -212,9 +224,16 @@ class SSLClientConnectionCreator:
     Replaces twisted.internet.ssl.ClientTLSOptions
     """
 
-    def __init__(self, hostname: bytes, ctx: SSL.Context, verify_certs: bool):
+    def __init__(
+        self,
+        hostname: bytes,
+        ctx: SSL.Context,
+        verify_certs: bool,
+        alpn_protocols: Optional[List[bytes]] = None,
+    ):
         self._ctx = ctx
         self._verifier = ConnectionVerifier(hostname, verify_certs)
+        self._alpn_protocols = alpn_protocols
 
     def clientConnectionForTLS(
         self, tls_protocol: TLSMemoryBIOProtocol
@@ -226,6 +245,11 @@ class SSLClientConnectionCreator:
         # data to our TLSMemoryBIOProtocol...
         connection.set_app_data(tls_protocol)
 
+        # The context is shared between connections, so we set the protocols to
+        # offer on the connection rather than the context.
+        if self._alpn_protocols:
+            connection.set_alpn_protos(self._alpn_protocols)
+
         # ... and we also gut-wrench a '_synapse_tls_verifier' attribute into the
         # tls_protocol so that the SSL context's info callback has something to
         # call to do the cert verification.
@@ -27,7 +27,7 @@ from unpaddedbase64 import decode_base64, encode_base64
 from synapse.api.errors import Codes, SynapseError
 from synapse.api.room_versions import RoomVersion
 from synapse.events import EventBase
-from synapse.events.utils import prune_event, prune_event_dict
+from synapse.events.utils import encode_json_from_fields, prune_event, prune_event_dict
 from synapse.logging.opentracing import trace
 from synapse.types import JsonDict
 
@@ -35,13 +35,35 @@ logger = logging.getLogger(__name__)
 
 Hasher = Callable[[bytes], "hashlib._Hash"]
 
+# The keys of an event which aren't covered by its content hash.
+_CONTENT_HASH_EXCLUDED_KEYS = (
+    "age_ts",
+    "unsigned",
+    "signatures",
+    "hashes",
+    "outlier",
+    "destinations",
+)
+
 
 @trace
 def check_event_content_hash(
     event: EventBase, hash_algorithm: Hasher = hashlib.sha256
 ) -> bool:
     """Check whether the hash for this PDU matches the contents"""
-    name, expected_hash = compute_content_hash(event.get_pdu_json(), hash_algorithm)
+    # We hash the encodings of the event's fields, rather than calling
+    # `compute_content_hash`, so that they can be reused if they are retained.
+    fields = event.get_canonical_json_fields()
+    hashed = hash_algorithm(
+        encode_json_from_fields(
+            {
+                key: value
+                for key, value in fields.items()
+                if key not in _CONTENT_HASH_EXCLUDED_KEYS
+            }
+        )
+    )
+    name, expected_hash = hashed.name, hashed.digest()
     logger.debug(
         "Verifying content hash on %s (expecting: %s)",
         event.event_id,
@@ -88,12 +110,8 @@ def compute_content_hash(
         A tuple of the name of hash and the hash as raw bytes.
     """
     event_dict = dict(event_dict)
-    event_dict.pop("age_ts", None)
-    event_dict.pop("unsigned", None)
-    event_dict.pop("signatures", None)
-    event_dict.pop("hashes", None)
-    event_dict.pop("outlier", None)
-    event_dict.pop("destinations", None)
+    for key in _CONTENT_HASH_EXCLUDED_KEYS:
+        event_dict.pop(key, None)
 
     event_json_bytes = encode_canonical_json(event_dict)
 
@@ -38,12 +38,19 @@ from synapse.api.errors import (
 from synapse.config.key import TrustedKeyServer
 from synapse.events import EventBase
 from synapse.events.utils import prune_event_dict
-from synapse.logging.context import make_deferred_yieldable, run_in_background
+from synapse.logging.context import (
+    defer_to_thread,
+    make_deferred_yieldable,
+    run_in_background,
+)
+from synapse.metrics.background_process_metrics import wrap_as_background_process
 from synapse.storage.keys import FetchKeyResult
 from synapse.types import JsonDict
 from synapse.util import unwrapFirstError
 from synapse.util.async_helpers import yieldable_gather_results
 from synapse.util.batching_queue import BatchingQueue
+from synapse.util.caches.expiringcache import ExpiringCache
+from synapse.util.caches.lrucache import LruCache
 from synapse.util.retryutils import NotRetryingDestination
 
 if TYPE_CHECKING:
@@ -51,6 +58,24 @@ if TYPE_CHECKING:
 
 logger = logging.getLogger(__name__)
 
+# The number of signatures which we need to verify at once before we do so on a
+# thread, rather than blocking the reactor.
+VERIFY_IN_THREAD_MIN_BATCH_SIZE = 10
+
+# The number of remote servers' verify keys to cache in memory.
+VERIFY_KEY_CACHE_SIZE = 10000
+
+# How long to remember that we couldn't find a key, during which requests
+# needing it fail without trying to fetch it again.
+MISSING_KEY_CACHE_DURATION_MS = 60 * 1000
+
+# How often to look for keys which are about to expire, and how long before
+# they expire we try to fetch a newer copy. Only keys which have been used
+# recently are refreshed.
+KEY_REFRESH_INTERVAL_MS = 5 * 60 * 1000
+KEY_REFRESH_BEFORE_EXPIRY_MS = 30 * 60 * 1000
+KEY_REFRESH_RECENTLY_USED_MS = 60 * 60 * 1000
+
 
 @attr.s(slots=True, frozen=True, cmp=False, auto_attribs=True)
 class VerifyJsonRequest:
@@ -137,6 +162,37 @@ class _FetchKeyRequest:
     key_ids: List[str]
 
 
+@attr.s(slots=True, frozen=True, eq=False, auto_attribs=True)
+class _VerifySignatureRequest:
+    """A request to verify the signature on a JSON object with a given key."""
+
+    verify_key: VerifyKey
+    verify_request: VerifyJsonRequest
+
+
+def _verify_signatures(
+    requests: List[_VerifySignatureRequest],
+) -> Dict[_VerifySignatureRequest, Optional[SignatureVerifyException]]:
+    """Verifies the signatures for a batch of requests.
+
+    Returns:
+        A map from each request to the exception raised when verifying it, or
+        None if the signature is valid.
+    """
+    results: Dict[_VerifySignatureRequest, Optional[SignatureVerifyException]] = {}
+    for request in requests:
+        try:
+            verify_signed_json(
+                request.verify_request.get_json_object(),
+                request.verify_request.server_name,
+                request.verify_key,
+            )
+            results[request] = None
+        except SignatureVerifyException as e:
+            results[request] = e
+    return results
+
+
 class Keyring:
     """Handles verifying signed JSON objects and fetching the keys needed to do
     so.
@@ -168,8 +224,40 @@ class Keyring:
             process_batch_callback=self._inner_fetch_key_requests,
         )
 
+        self._reactor = hs.get_reactor()
+
+        # Signatures are verified in batches, so that those on the events in a
+        # transaction, say, can be verified together off the reactor.
+        self._verify_signatures_queue: BatchingQueue[
+            _VerifySignatureRequest,
+            Dict[_VerifySignatureRequest, Optional[SignatureVerifyException]],
+        ] = BatchingQueue(
+            "keyring_verify",
+            clock=hs.get_clock(),
+            process_batch_callback=self._verify_signature_batch,
+        )
+
+        self._clock = hs.get_clock()
         self._is_mine_server_name = hs.is_mine_server_name
 
+        # Cache of the keys we've fetched for other servers, so that we don't
+        # have to go to the database each time, and of the keys we failed to
+        # find.
+        self._verify_key_cache: LruCache[Tuple[str, str], FetchKeyResult] = LruCache(
+            VERIFY_KEY_CACHE_SIZE, cache_name="keyring_verify_keys"
+        )
+        self._missing_key_cache: ExpiringCache[Tuple[str, str], None] = ExpiringCache(
+            cache_name="keyring_missing_verify_keys",
+            clock=self._clock,
+            max_len=VERIFY_KEY_CACHE_SIZE,
+            expiry_ms=MISSING_KEY_CACHE_DURATION_MS,
+        )
+
+        # When each cached key was last needed, so that we can fetch newer
+        # copies of those in use before they expire.
+        self._key_last_used_ms: Dict[Tuple[str, str], int] = {}
+        self._clock.looping_call(self._refresh_expiring_keys, KEY_REFRESH_INTERVAL_MS)
+
         # build a FetchKeyResult for each of our own keys, to shortcircuit the
         # fetcher.
         self._local_verify_keys: Dict[str, FetchKeyResult] = {}
@@ -277,16 +365,30 @@ class Keyring:
                 if key_id in self._local_verify_keys:
                     found_keys[key_id] = self._local_verify_keys[key_id]
 
-        key_ids_to_find = set(verify_request.key_ids) - found_keys.keys()
+        key_ids_to_find = set()
+        now = self._clock.time_msec()
+        for key_id in set(verify_request.key_ids) - found_keys.keys():
+            cache_key = (verify_request.server_name, key_id)
+            cached = self._verify_key_cache.get(cache_key)
+            if cached is not None:
+                self._key_last_used_ms[cache_key] = now
+                if cached.valid_until_ts >= verify_request.minimum_valid_until_ts:
+                    found_keys[key_id] = cached
+                    continue
+
+            # Don't try again to fetch keys which we recently failed to find.
+            if cache_key not in self._missing_key_cache:
+                key_ids_to_find.add(key_id)
+
+        key_request = _FetchKeyRequest(
+            server_name=verify_request.server_name,
+            minimum_valid_until_ts=verify_request.minimum_valid_until_ts,
+            key_ids=list(key_ids_to_find),
+        )
         if key_ids_to_find:
             # Add the keys we need to verify to the queue for retrieval. We queue
             # up requests for the same server so we don't end up with many in flight
             # requests for the same keys.
-            key_request = _FetchKeyRequest(
-                server_name=verify_request.server_name,
-                minimum_valid_until_ts=verify_request.minimum_valid_until_ts,
-                key_ids=list(key_ids_to_find),
-            )
             found_keys_by_server = await self._fetch_keys_queue.add_to_queue(
                 key_request, key=verify_request.server_name
             )
@@ -322,13 +424,10 @@ class Keyring:
         """Processes the `VerifyJsonRequest`. Raises if the signature can't be
         verified.
         """
-        try:
-            verify_signed_json(
-                verify_request.get_json_object(),
-                verify_request.server_name,
-                verify_key,
-            )
-        except SignatureVerifyException as e:
+        request = _VerifySignatureRequest(verify_key, verify_request)
+        results = await self._verify_signatures_queue.add_to_queue(request)
+        e = results[request]
+        if e is not None:
             logger.debug(
                 "Error verifying signature for %s:%s:%s with key %s: %s",
                 verify_request.server_name,
@@ -349,6 +448,17 @@ class Keyring:
                 Codes.UNAUTHORIZED,
             )
 
+    async def _verify_signature_batch(
+        self, requests: List[_VerifySignatureRequest]
+    ) -> Dict[_VerifySignatureRequest, Optional[SignatureVerifyException]]:
+        """Processing function for the queue of `_VerifySignatureRequest`."""
+        if len(requests) < VERIFY_IN_THREAD_MIN_BATCH_SIZE:
+            return _verify_signatures(requests)
+
+        # Canonicalising the JSON objects and checking the signatures is CPU
+        # bound, so we do it on a thread to avoid blocking the reactor.
+        return await defer_to_thread(self._reactor, _verify_signatures, requests)
+
     async def _inner_fetch_key_requests(
         self, requests: List[_FetchKeyRequest]
     ) -> Dict[str, Dict[str, FetchKeyResult]]:
@@ -402,8 +512,62 @@ class Keyring:
                 if not existing or existing.valid_until_ts < key_result.valid_until_ts:
                     to_return_by_server[key_id] = key_result
 
+            for key_id in request.key_ids:
+                cache_key = (request.server_name, key_id)
+                if key_id not in results and cache_key not in self._verify_key_cache:
+                    self._missing_key_cache[cache_key] = None
+
+        for server_name, keys in to_return.items():
+            for key_id, key_result in keys.items():
+                cache_key = (server_name, key_id)
+                self._missing_key_cache.pop(cache_key, None)
+                cached = self._verify_key_cache.get(cache_key)
+                if cached is None or cached.valid_until_ts < key_result.valid_until_ts:
+                    self._verify_key_cache.set(cache_key, key_result)
+
         return to_return
 
+    @wrap_as_background_process("refresh_expiring_verify_keys")
+    async def _refresh_expiring_keys(self) -> None:
+        """Fetch newer copies of the cached keys which have been used recently
+        and are about to expire, so that requests don't have to wait for them to
+        be fetched.
+        """
+        now = self._clock.time_msec()
+        refresh_before_ts = now + KEY_REFRESH_BEFORE_EXPIRY_MS
+
+        key_ids_by_server: Dict[str, List[str]] = {}
+        for cache_key, last_used_ms in list(self._key_last_used_ms.items()):
+            cached = self._verify_key_cache.get(cache_key)
+            if cached is None or last_used_ms < now - KEY_REFRESH_RECENTLY_USED_MS:
+                del self._key_last_used_ms[cache_key]
+                continue
+
+            # Keys which have already expired are only needed for old objects,
+            # so there's no rush to refresh them.
+            if now <= cached.valid_until_ts < refresh_before_ts:
+                server_name, key_id = cache_key
+                key_ids_by_server.setdefault(server_name, []).append(key_id)
+
+        if not key_ids_by_server:
+            return
+
+        logger.debug("Refreshing expiring keys for %s", key_ids_by_server)
+
+        await yieldable_gather_results(
+            lambda key_request: self._fetch_keys_queue.add_to_queue(
+                key_request, key=key_request.server_name
+            ),
+            [
+                _FetchKeyRequest(
+                    server_name=server_name,
+                    minimum_valid_until_ts=refresh_before_ts,
+                    key_ids=key_ids,
+                )
+                for server_name, key_ids in key_ids_by_server.items()
+            ],
+        )
+
     async def _inner_fetch_key_request(
         self, verify_request: _FetchKeyRequest
     ) -> Dict[str, FetchKeyResult]:
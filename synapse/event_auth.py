@@ -18,7 +18,6 @@ import logging
 import typing
 from typing import Any, Dict, Iterable, List, Mapping, Optional, Set, Tuple, Union
 
-from canonicaljson import encode_canonical_json
 from signedjson.key import decode_verify_key_bytes
 from signedjson.sign import SignatureVerifyException, verify_signed_json
 from typing_extensions import Protocol
@@ -44,6 +43,7 @@ from synapse.api.room_versions import (
     RoomVersion,
     RoomVersions,
 )
+from synapse.events.utils import encode_canonical_pdu_json
 from synapse.storage.databases.main.events_worker import EventRedactBehaviour
 from synapse.types import (
     MutableStateMap,
@@ -382,7 +382,7 @@ def _check_size_limits(event: "EventBase") -> None:
     """
 
     # Whole PDU check
-    if len(encode_canonical_json(event.get_pdu_json())) > MAX_PDU_SIZE:
+    if len(encode_canonical_pdu_json(event)) > MAX_PDU_SIZE:
         raise EventSizeError("event too large", unpersistable=True)
 
     # Codepoint size check: Synapse always enforced these limits, so apply
@@ -33,6 +33,7 @@ from typing import (
 )
 
 import attr
+from canonicaljson import encode_canonical_json
 from typing_extensions import Literal
 from unpaddedbase64 import encode_base64
 
@@ -318,6 +319,10 @@ class EventBase(metaclass=abc.ABCMeta):
 
         self.internal_metadata = _EventInternalMetadata(internal_metadata_dict)
 
+        # The canonical JSON encoding of each field of the event, if we are
+        # retaining them. See `retain_canonical_json_fields`.
+        self._canonical_json_fields: Optional[Dict[str, bytes]] = None
+
     depth: DictProperty[int] = DictProperty("depth")
     content: DictProperty[JsonDict] = DictProperty("content")
     hashes: DictProperty[Dict[str, str]] = DictProperty("hashes")
@@ -356,6 +361,42 @@ class EventBase(metaclass=abc.ABCMeta):
         """Get the state key of this event, or None if it's not a state event"""
         return self._dict.get("state_key")
 
+    def retain_canonical_json_fields(self) -> None:
+        """Remember the canonical JSON encodings of the event's fields once they
+        are computed by `get_canonical_json_fields`.
+
+        This is used for events received over federation, so that checking
+        their content hash and size and storing them only encodes their content
+        once. The encodings are dropped by `release_canonical_json_fields` once
+        the event has been persisted.
+        """
+        if self._canonical_json_fields is None:
+            self._canonical_json_fields = {}
+
+    def release_canonical_json_fields(self) -> None:
+        self._canonical_json_fields = None
+
+    def has_retained_canonical_json_fields(self) -> bool:
+        return self._canonical_json_fields is not None
+
+    def get_canonical_json_fields(self) -> Dict[str, bytes]:
+        """Returns the canonical JSON encoding of the value of each of the
+        event's fields, other than its signatures and unsigned data.
+
+        The result must not be modified.
+        """
+        fields = self._canonical_json_fields
+        if fields is None:
+            return {
+                key: encode_canonical_json(value) for key, value in self._dict.items()
+            }
+
+        if len(fields) != len(self._dict):
+            for key, value in self._dict.items():
+                if key not in fields:
+                    fields[key] = encode_canonical_json(value)
+        return fields
+
     def get_dict(self) -> JsonDict:
         d = dict(self._dict)
         d.update({"signatures": self.signatures, "unsigned": dict(self.unsigned)})
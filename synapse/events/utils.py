@@ -14,6 +14,7 @@
 # limitations under the License.
 import collections.abc
 import re
+import weakref
 from typing import (
     TYPE_CHECKING,
     Any,
@@ -26,6 +27,7 @@ from typing import (
     Match,
     MutableMapping,
     Optional,
+    Tuple,
     Union,
 )
 
@@ -41,6 +43,8 @@ from synapse.api.constants import (
 from synapse.api.errors import Codes, SynapseError
 from synapse.api.room_versions import RoomVersion
 from synapse.types import JsonDict, Requester
+from synapse.util import PreencodedJsonDict, json_encoder
+from synapse.util.caches.lrucache import LruCache
 
 from . import EventBase
 
@@ -65,6 +69,56 @@ ADD_EXTRA_FIELDS_TO_UNSIGNED_CLIENT_EVENT_CALLBACK = Callable[
 ]
 
 
+def encode_json_from_fields(fields: Mapping[str, bytes]) -> bytes:
+    """Encodes a JSON object given the JSON encoding of each of its values.
+
+    The keys are sorted, so if the values are encoded as canonical JSON then so
+    is the result.
+    """
+    return (
+        b"{"
+        + b",".join(
+            encode_canonical_json(key) + b":" + value
+            for key, value in sorted(fields.items())
+        )
+        + b"}"
+    )
+
+
+def encode_canonical_pdu_json(event: EventBase) -> bytes:
+    """Equivalent to `encode_canonical_json(event.get_pdu_json())`, but reuses
+    the canonical JSON encodings of the event's fields if they are retained.
+    """
+    unsigned = dict(event.unsigned)
+    unsigned.pop("redacted_because", None)
+
+    fields = dict(event.get_canonical_json_fields())
+    fields["signatures"] = encode_canonical_json(event.signatures)
+    fields["unsigned"] = encode_canonical_json(unsigned)
+    return encode_json_from_fields(fields)
+
+
+def encode_event_dict_json(event: EventBase, exclude: Iterable[str] = ()) -> str:
+    """Encodes `event.get_dict()` for storing in the database, without the given
+    keys.
+
+    If the event has retained the canonical JSON encodings of its fields they
+    are used, rather than encoding its content again.
+    """
+    if not event.has_retained_canonical_json_fields():
+        d = event.get_dict()
+        for key in exclude:
+            d.pop(key, None)
+        return json_encoder.encode(d)
+
+    fields = dict(event.get_canonical_json_fields())
+    fields["signatures"] = json_encoder.encode(event.signatures).encode("utf-8")
+    fields["unsigned"] = json_encoder.encode(event.unsigned).encode("utf-8")
+    for key in exclude:
+        fields.pop(key, None)
+    return encode_json_from_fields(fields).decode("utf-8")
+
+
 def prune_event(event: EventBase) -> EventBase:
     """Returns a pruned version of the given event, which removes all keys we
     don't know about or think could potentially be dodgy.
@@ -335,6 +389,18 @@ def format_event_raw(d: JsonDict) -> JsonDict:
     return d
 
 
+# The fields of the unsigned section of an event which the v1 client format also
+# has at the top level.
+_V1_UNSIGNED_KEYS_COPIED_TO_TOP_LEVEL = (
+    "age",
+    "redacted_because",
+    "replaces_state",
+    "prev_content",
+    "invite_room_state",
+    "knock_room_state",
+)
+
+
 def format_event_for_client_v1(d: JsonDict) -> JsonDict:
     d = format_event_for_client_v2(d)
 
@@ -342,15 +408,7 @@ def format_event_for_client_v1(d: JsonDict) -> JsonDict:
     if sender is not None:
         d["user_id"] = sender
 
-    copy_keys = (
-        "age",
-        "redacted_because",
-        "replaces_state",
-        "prev_content",
-        "invite_room_state",
-        "knock_room_state",
-    )
-    for key in copy_keys:
+    for key in _V1_UNSIGNED_KEYS_COPIED_TO_TOP_LEVEL:
         if key in d["unsigned"]:
             d[key] = d["unsigned"][key]
 
@@ -425,13 +483,49 @@ def serialize_event(
     d = dict(e.get_dict().items())
 
     d["event_id"] = e.event_id
+    d["unsigned"] = _serialize_unsigned(e, time_now_ms, config)
+
+    if config.as_client_event:
+        d = config.event_format(d)
+
+    # If the event is a redaction, the field with the redacted event ID appears
+    # in a different location depending on the room version. e.redacts handles
+    # fetching from the proper location; copy it to the other location for forwards-
+    # and backwards-compatibility with clients.
+    if e.type == EventTypes.Redaction and e.redacts is not None:
+        if e.room_version.updated_redaction_rules:
+            d["redacts"] = e.redacts
+        else:
+            d["content"] = dict(d["content"])
+            d["content"]["redacts"] = e.redacts
 
-    if "age_ts" in d["unsigned"]:
-        d["unsigned"]["age"] = time_now_ms - d["unsigned"]["age_ts"]
-        del d["unsigned"]["age_ts"]
+    only_event_fields = config.only_event_fields
+    if only_event_fields:
+        if not isinstance(only_event_fields, list) or not all(
+            isinstance(f, str) for f in only_event_fields
+        ):
+            raise TypeError("only_event_fields must be a list of strings")
+        d = only_fields(d, only_event_fields)
+
+    return d
+
+
+def _serialize_unsigned(
+    e: EventBase, time_now_ms: int, config: SerializeEventConfig
+) -> JsonDict:
+    """Serialize the unsigned section of an event for clients.
+
+    This is the only part of the serialization of an event which depends on
+    the time and the requester.
+    """
+    unsigned = dict(e.unsigned)
+
+    if "age_ts" in unsigned:
+        unsigned["age"] = time_now_ms - unsigned["age_ts"]
+        del unsigned["age_ts"]
 
     if "redacted_because" in e.unsigned:
-        d["unsigned"]["redacted_because"] = serialize_event(
+        unsigned["redacted_because"] = serialize_event(
             e.unsigned["redacted_because"],
             time_now_ms,
             config=config,
@@ -453,7 +547,7 @@ def serialize_event(
         event_device_id: Optional[str] = getattr(e.internal_metadata, "device_id", None)
         if event_device_id is not None:
             if event_device_id == config.requester.device_id:
-                d["unsigned"]["transaction_id"] = txn_id
+                unsigned["transaction_id"] = txn_id
 
         else:
             # Fallback behaviour: only include the transaction ID if the event
@@ -476,39 +570,76 @@ def serialize_event(
                 or config.requester.is_guest
                 or config.requester.app_service
             ):
-                d["unsigned"]["transaction_id"] = txn_id
+                unsigned["transaction_id"] = txn_id
 
     # invite_room_state and knock_room_state are a list of stripped room state events
     # that are meant to provide metadata about a room to an invitee/knocker. They are
     # intended to only be included in specific circumstances, such as down sync, and
     # should not be included in any other case.
     if not config.include_stripped_room_state:
-        d["unsigned"].pop("invite_room_state", None)
-        d["unsigned"].pop("knock_room_state", None)
+        unsigned.pop("invite_room_state", None)
+        unsigned.pop("knock_room_state", None)
+
+    return unsigned
+
 
+# The event formats for which `EventClientSerializer` caches serialized events.
+_CACHEABLE_EVENT_FORMATS = (
+    format_event_raw,
+    format_event_for_client_v1,
+    format_event_for_client_v2,
+    format_event_for_client_v2_without_room_id,
+)
+
+# The maximum number of serialized events `EventClientSerializer` caches.
+SERIALIZED_EVENT_CACHE_SIZE = 10000
+
+_SerializedEventCacheKey = Tuple[
+    str, bool, Optional[Callable[[JsonDict], JsonDict]], bool
+]
+
+
+def _get_serialized_event_cache_key(
+    event: EventBase, config: SerializeEventConfig
+) -> Optional[_SerializedEventCacheKey]:
+    """Returns the key under which `EventClientSerializer` caches the serialization
+    of the given event with the given config, or None if it can't be cached.
+
+    The key covers everything the serialization of the event depends on, other
+    than the time and the requester (which only affect the unsigned section),
+    and the event itself (see `EventClientSerializer._serialize_event_with_cache`).
+    """
+    if config.only_event_fields:
+        return None
+
+    event_format = None
     if config.as_client_event:
-        d = config.event_format(d)
+        if config.event_format not in _CACHEABLE_EVENT_FORMATS:
+            return None
+        event_format = config.event_format
+
+    return (
+        event.event_id,
+        event.internal_metadata.is_redacted(),
+        event_format,
+        config.include_stripped_room_state,
+    )
 
-    # If the event is a redaction, the field with the redacted event ID appears
-    # in a different location depending on the room version. e.redacts handles
-    # fetching from the proper location; copy it to the other location for forwards-
-    # and backwards-compatibility with clients.
-    if e.type == EventTypes.Redaction and e.redacts is not None:
-        if e.room_version.updated_redaction_rules:
-            d["redacts"] = e.redacts
-        else:
-            d["content"] = dict(d["content"])
-            d["content"]["redacts"] = e.redacts
 
-    only_event_fields = config.only_event_fields
-    if only_event_fields:
-        if not isinstance(only_event_fields, list) or not all(
-            isinstance(f, str) for f in only_event_fields
-        ):
-            raise TypeError("only_event_fields must be a list of strings")
-        d = only_fields(d, only_event_fields)
+def _get_unsigned_keys_copied_to_top_level(
+    serialized_event: JsonDict, config: SerializeEventConfig
+) -> List[str]:
+    """Returns the keys of the unsigned section of the given serialized event
+    which are also at its top level.
+    """
+    if (
+        not config.as_client_event
+        or config.event_format is not format_event_for_client_v1
+    ):
+        return []
 
-    return d
+    unsigned = serialized_event["unsigned"]
+    return [key for key in _V1_UNSIGNED_KEYS_COPIED_TO_TOP_LEVEL if key in unsigned]
 
 
 class EventClientSerializer:
@@ -524,6 +655,16 @@ class EventClientSerializer:
             ADD_EXTRA_FIELDS_TO_UNSIGNED_CLIENT_EVENT_CALLBACK
         ] = []
 
+        # Events are often serialized many times over, e.g. when a message is
+        # sent down sync to each member of a room. As only the unsigned section
+        # of a serialized event depends on the time and the requester, we cache
+        # the rest of it along with its JSON encoding, so that it can be written
+        # out as is.
+        self._serialized_event_cache: LruCache[
+            _SerializedEventCacheKey,
+            Tuple["weakref.ref[EventBase]", PreencodedJsonDict],
+        ] = LruCache(SERIALIZED_EVENT_CACHE_SIZE, cache_name="serialized_event_cache")
+
     async def serialize_event(
         self,
         event: Union[JsonDict, EventBase],
@@ -548,7 +689,7 @@ class EventClientSerializer:
         if not isinstance(event, EventBase):
             return event
 
-        serialized_event = serialize_event(event, time_now, config=config)
+        serialized_event = self._serialize_event_with_cache(event, time_now, config)
 
         new_unsigned = {}
         for callback in self._add_extra_fields_to_unsigned_client_event_callbacks:
@@ -574,6 +715,54 @@ class EventClientSerializer:
 
         return serialized_event
 
+    def _serialize_event_with_cache(
+        self, event: EventBase, time_now: int, config: SerializeEventConfig
+    ) -> JsonDict:
+        """Serializes a single event, reusing the parts of the serialization which
+        are the same for every request where possible.
+
+        Args:
+            event: The event being serialized.
+            time_now: The current time in milliseconds
+            config: Event serialization config
+
+        Returns:
+            The serialized event, which is a `PreencodedJsonDict` if it was cached.
+        """
+        key = _get_serialized_event_cache_key(event, config)
+        if key is None:
+            return serialize_event(event, time_now, config=config)
+
+        # The JSON of an event can change while its ID stays the same, e.g. when
+        # it is redacted or expires, but the event is then evicted from the event
+        # cache and fetched afresh. So we only use a cached serialization for the
+        # same event object as it was made from.
+        entry = self._serialized_event_cache.get(key)
+        cached = entry[1] if entry is not None and entry[0]() is event else None
+        if cached is None:
+            serialized_event = serialize_event(event, time_now, config=config)
+            per_request_keys = {"unsigned"}.union(
+                _get_unsigned_keys_copied_to_top_level(serialized_event, config)
+            )
+
+            cached = PreencodedJsonDict(
+                {k: v for k, v in serialized_event.items() if k not in per_request_keys}
+            )
+            self._serialized_event_cache.set(key, (weakref.ref(event), cached))
+
+            result = cached.copy()
+            for k in per_request_keys:
+                result[k] = serialized_event[k]
+            return result
+
+        result = cached.copy()
+        result["unsigned"] = unsigned = _serialize_unsigned(
+            event, int(time_now), config
+        )
+        for k in _get_unsigned_keys_copied_to_top_level(result, config):
+            result[k] = unsigned[k]
+        return result
+
     async def _inject_bundled_aggregations(
         self,
         event: EventBase,
@@ -13,7 +13,7 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 import logging
-from typing import TYPE_CHECKING, Awaitable, Callable, Optional
+from typing import TYPE_CHECKING, Awaitable, Callable, Dict, List, Optional, Union
 
 from synapse.api.constants import MAX_DEPTH, EventContentFields, EventTypes, Membership
 from synapse.api.errors import Codes, SynapseError
@@ -23,8 +23,11 @@ from synapse.crypto.keyring import Keyring
 from synapse.events import EventBase, make_event_from_dict
 from synapse.events.utils import prune_event, validate_canonicaljson
 from synapse.http.servlet import assert_params_in_dict
+from synapse.logging.context import defer_to_thread
 from synapse.logging.opentracing import log_kv, trace
 from synapse.types import JsonDict, get_domain_from_id
+from synapse.util.async_helpers import yieldable_gather_results
+from synapse.util.batching_queue import BatchingQueue
 
 if TYPE_CHECKING:
     from synapse.server import HomeServer
@@ -32,6 +35,10 @@ if TYPE_CHECKING:
 
 logger = logging.getLogger(__name__)
 
+# The number of events whose content hashes we need to check at once before we
+# do so on a thread, rather than blocking the reactor.
+CHECK_CONTENT_HASH_IN_THREAD_MIN_BATCH_SIZE = 10
+
 
 class InvalidEventSignatureError(RuntimeError):
     """Raised when the signature on an event is invalid.
@@ -54,8 +61,46 @@ class FederationBase:
         self._spam_checker_module_callbacks = hs.get_module_api_callbacks().spam_checker
         self.store = hs.get_datastores().main
         self._clock = hs.get_clock()
+        self._reactor = hs.get_reactor()
         self._storage_controllers = hs.get_storage_controllers()
 
+        # Content hashes are checked in batches, so that those of the events in
+        # a transaction, say, can be checked together off the reactor.
+        self._check_content_hash_queue: BatchingQueue[
+            EventBase, Dict[EventBase, Union[bool, Exception]]
+        ] = BatchingQueue(
+            f"{type(self).__name__}_check_content_hash",
+            clock=self._clock,
+            process_batch_callback=self._check_content_hash_batch,
+        )
+
+    async def _check_sigs_and_hashes(
+        self,
+        room_version: RoomVersion,
+        pdus: List[EventBase],
+        record_failure_callback: Optional[
+            Callable[[EventBase, str], Awaitable[None]]
+        ] = None,
+    ) -> List[Union[EventBase, Exception]]:
+        """Checks the signatures and hashes of several events at once, so that
+        they can be verified in batches. See `_check_sigs_and_hash`.
+
+        Returns:
+            For each event, the result of `_check_sigs_and_hash`, or the
+            exception it raised (an InvalidEventSignatureError if the signature
+            check failed).
+        """
+
+        async def check(pdu: EventBase) -> Union[EventBase, Exception]:
+            try:
+                return await self._check_sigs_and_hash(
+                    room_version, pdu, record_failure_callback
+                )
+            except Exception as e:
+                return e
+
+        return await yieldable_gather_results(check, pdus)
+
     @trace
     async def _check_sigs_and_hash(
         self,
@@ -97,7 +142,7 @@ class FederationBase:
                 await record_failure_callback(pdu, str(exc))
             raise exc
 
-        if not check_event_content_hash(pdu):
+        if not await self._check_content_hash(pdu):
             # let's try to distinguish between failures because the event was
             # redacted (which are somewhat expected) vs actual ball-tampering
             # incidents.
@@ -156,6 +201,45 @@ class FederationBase:
 
         return pdu
 
+    async def _check_content_hash(self, pdu: EventBase) -> bool:
+        """Checks whether the content hash of the event matches its contents."""
+        results = await self._check_content_hash_queue.add_to_queue(pdu)
+        result = results[pdu]
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    async def _check_content_hash_batch(
+        self, pdus: List[EventBase]
+    ) -> Dict[EventBase, Union[bool, Exception]]:
+        """Processing function for the queue of events to check the content
+        hashes of.
+        """
+        if len(pdus) < CHECK_CONTENT_HASH_IN_THREAD_MIN_BATCH_SIZE:
+            return _check_content_hashes(pdus)
+
+        # Canonicalising the events and hashing them is CPU bound, so we do it
+        # on a thread to avoid blocking the reactor.
+        return await defer_to_thread(self._reactor, _check_content_hashes, pdus)
+
+
+def _check_content_hashes(
+    pdus: List[EventBase],
+) -> Dict[EventBase, Union[bool, Exception]]:
+    """Checks the content hashes of a batch of events.
+
+    Returns:
+        A map from each event to whether its content hash matches, or the
+        exception raised when checking it.
+    """
+    results: Dict[EventBase, Union[bool, Exception]] = {}
+    for pdu in pdus:
+        try:
+            results[pdu] = check_event_content_hash(pdu)
+        except Exception as e:
+            results[pdu] = e
+    return results
+
 
 @trace
 async def _check_sigs_on_pdu(
@@ -60,6 +60,7 @@ from synapse.federation.federation_base import (
     event_from_pdu_json,
 )
 from synapse.federation.persistence import TransactionActions
+from synapse.federation.room_pdu_scheduler import RoomPduScheduler
 from synapse.federation.units import Edu, Transaction
 from synapse.handlers.worker_lock import NEW_EVENT_DURING_PURGE_LOCK_NAME
 from synapse.http.servlet import assert_params_in_dict
@@ -81,7 +82,6 @@ from synapse.replication.http.federation import (
     ReplicationFederationSendEduRestServlet,
     ReplicationGetQueryRestServlet,
 )
-from synapse.storage.databases.main.lock import Lock
 from synapse.storage.databases.main.roommember import extract_heroes_from_room_summary
 from synapse.storage.roommember import MemberSummary
 from synapse.types import JsonDict, StateMap, UserID, get_domain_from_id
@@ -179,10 +179,21 @@ class FederationServer(FederationBase):
         # Whether we have started handling old events in the staging area.
         self._started_handling_of_staged_events = False
 
+        # Rooms take turns at handling the events in their staging area.
+        self._room_pdu_scheduler = RoomPduScheduler(
+            self._clock,
+            self._handle_next_staged_event_in_room,
+            hs.config.federation.max_concurrent_inbound_rooms,
+        )
+
+        # The latest event we've received in each room scheduled to handle its
+        # staged events, with its origin.
+        self._latest_staged_events: Dict[str, Tuple[str, EventBase]] = {}
+
     @wrap_as_background_process("_handle_old_staged_events")
     async def _handle_old_staged_events(self) -> None:
         """Handle old staged events by fetching all rooms that have staged
-        events and start the processing of each of those rooms.
+        events and scheduling the processing of each of those rooms.
         """
 
         # Get all the rooms IDs with staged events.
@@ -193,23 +204,7 @@ class FederationServer(FederationBase):
         random.shuffle(room_ids)
 
         for room_id in room_ids:
-            room_version = await self.store.get_room_version(room_id)
-
-            # Try and acquire the processing lock for the room, if we get it start a
-            # background process for handling the events in the room.
-            lock = await self.store.try_acquire_lock(
-                _INBOUND_EVENT_HANDLING_LOCK_NAME, room_id
-            )
-            if lock:
-                logger.info("Handling old staged inbound events in %s", room_id)
-                self._process_incoming_pdus_in_room_inner(
-                    room_id,
-                    room_version,
-                    lock,
-                )
-
-            # We pause a bit so that we don't start handling all rooms at once.
-            await self._clock.sleep(random.uniform(0, 0.1))
+            await self._schedule_room(room_id)
 
     async def on_backfill_request(
         self, origin: str, room_id: str, versions: List[str], limit: int
@@ -464,6 +459,9 @@ class FederationServer(FederationBase):
                 continue
 
             event = event_from_pdu_json(p, room_version)
+            # Encode the event's content once for checking its hashes and size
+            # and storing it, rather than each time.
+            event.retain_canonical_json_fields()
             pdus_by_room.setdefault(room_id, []).append(event)
 
             if event.origin_server_ts > newest_pdu_ts:
@@ -490,10 +488,19 @@ class FederationServer(FederationBase):
                         pdu_results[event_id] = e.error_dict(self.hs.config)
                     return
 
-                for pdu in pdus_by_room[room_id]:
-                    pdu_results[pdu.event_id] = await process_pdu(pdu)
+                # Check the signatures and hashes of all the room's PDUs up
+                # front, so that they are verified in a batch, rather than one
+                # at a time as each PDU is handled.
+                pdus = pdus_by_room[room_id]
+                room_version = await self.store.get_room_version(room_id)
+                checked_pdus = await self._check_sigs_and_hashes(room_version, pdus)
+
+                for pdu, checked_pdu in zip(pdus, checked_pdus):
+                    pdu_results[pdu.event_id] = await process_pdu(pdu, checked_pdu)
 
-        async def process_pdu(pdu: EventBase) -> JsonDict:
+        async def process_pdu(
+            pdu: EventBase, checked_pdu: Union[EventBase, Exception]
+        ) -> JsonDict:
             """
             Processes a pushed PDU sent to us via a `/send` transaction
 
@@ -505,7 +512,7 @@ class FederationServer(FederationBase):
             event_id = pdu.event_id
             with nested_logging_context(event_id):
                 try:
-                    await self._handle_received_pdu(origin, pdu)
+                    await self._handle_received_pdu(origin, pdu, checked_pdu)
                     return {}
                 except FederationError as e:
                     logger.warning("Error handling PDU %s: %s", event_id, e)
@@ -1087,7 +1094,9 @@ class FederationServer(FederationBase):
             destination="",
         ).get_dict()
 
-    async def _handle_received_pdu(self, origin: str, pdu: EventBase) -> None:
+    async def _handle_received_pdu(
+        self, origin: str, pdu: EventBase, checked_pdu: Union[EventBase, Exception]
+    ) -> None:
         """Process a PDU received in a federation /send/ transaction.
 
         If the event is invalid, then this method throws a FederationError.
@@ -1110,21 +1119,21 @@ class FederationServer(FederationBase):
         Args:
             origin: server which sent the pdu
             pdu: received pdu
+            checked_pdu: the result of checking the signatures and hashes of
+                the pdu with `_check_sigs_and_hashes`.
 
         Raises: FederationError if the signatures / hash do not match, or
             if the event was unacceptable for any other reason (eg, too large,
             too many prev_events, couldn't find the prev_events)
         """
 
-        # We've already checked that we know the room version by this point
-        room_version = await self.store.get_room_version(pdu.room_id)
-
         # Check signature.
-        try:
-            pdu = await self._check_sigs_and_hash(room_version, pdu)
-        except InvalidEventSignatureError as e:
-            logger.warning("event id %s: %s", pdu.event_id, e)
-            raise FederationError("ERROR", 403, str(e), affected=pdu.event_id)
+        if isinstance(checked_pdu, InvalidEventSignatureError):
+            logger.warning("event id %s: %s", pdu.event_id, checked_pdu)
+            raise FederationError("ERROR", 403, str(checked_pdu), affected=pdu.event_id)
+        elif isinstance(checked_pdu, Exception):
+            raise checked_pdu
+        pdu = checked_pdu
 
         if await self._spam_checker_module_callbacks.should_drop_federated_event(pdu):
             logger.warning(
@@ -1135,15 +1144,15 @@ class FederationServer(FederationBase):
         # Add the event to our staging area
         await self.store.insert_received_event_to_staging(origin, pdu)
 
-        # Try and acquire the processing lock for the room, if we get it start a
-        # background process for handling the events in the room.
-        lock = await self.store.try_acquire_lock(
-            _INBOUND_EVENT_HANDLING_LOCK_NAME, pdu.room_id
-        )
-        if lock:
-            self._process_incoming_pdus_in_room_inner(
-                pdu.room_id, room_version, lock, origin, pdu
-            )
+        self._latest_staged_events[pdu.room_id] = (origin, pdu)
+        await self._schedule_room(pdu.room_id)
+
+    async def _schedule_room(self, room_id: str) -> None:
+        """Queue the room to take turns at handling the events in its staging
+        area, with priority if there are local users in the room.
+        """
+        is_joined = await self.store.is_host_joined(room_id, self.server_name)
+        self._room_pdu_scheduler.schedule_room(room_id, priority=is_joined)
 
     async def _get_next_nonspam_staged_event_for_room(
         self, room_id: str, room_version: RoomVersion
@@ -1182,106 +1191,43 @@ class FederationServer(FederationBase):
 
             return next
 
-    @wrap_as_background_process("_process_incoming_pdus_in_room_inner")
-    async def _process_incoming_pdus_in_room_inner(
-        self,
-        room_id: str,
-        room_version: RoomVersion,
-        lock: Lock,
-        latest_origin: Optional[str] = None,
-        latest_event: Optional[EventBase] = None,
-    ) -> None:
-        """Process events in the staging area for the given room.
+    async def _handle_next_staged_event_in_room(self, room_id: str) -> bool:
+        """Handle the next event in the staging area for the given room, if we
+        can acquire the room's processing lock.
 
-        The latest_origin and latest_event args are the latest origin and event
-        received (or None to simply pull the next event from the database).
+        Returns:
+            Whether there may be more events in the room to handle.
         """
+        room_version = await self.store.get_room_version(room_id)
 
-        # The common path is for the event we just received be the only event in
-        # the room, so instead of pulling the event out of the DB and parsing
-        # the event we just pull out the next event ID and check if that matches.
-        if latest_event is not None and latest_origin is not None:
+        # The common path is for the latest event we received to be the only
+        # event in the room, so instead of pulling the event out of the DB and
+        # parsing the event we just pull out the next event ID and check if that
+        # matches.
+        #
+        # We need to fetch the next event outside the lock to avoid a race
+        # between a new event being inserted by another instance and it
+        # attempting to acquire the lock.
+        next: Optional[Tuple[str, EventBase]] = None
+        latest = self._latest_staged_events.pop(room_id, None)
+        if latest is not None:
+            latest_origin, latest_event = latest
             result = await self.store.get_next_staged_event_id_for_room(room_id)
-            if result is None:
-                latest_origin = None
-                latest_event = None
-            else:
-                next_origin, next_event_id = result
-                if (
-                    next_origin != latest_origin
-                    or next_event_id != latest_event.event_id
-                ):
-                    latest_origin = None
-                    latest_event = None
-
-        if latest_origin is None or latest_event is None:
-            next = await self.store.get_next_staged_event_for_room(
-                room_id, room_version
-            )
-            if not next:
-                await lock.release()
-                return
-
-            origin, event = next
-        else:
-            origin = latest_origin
-            event = latest_event
-
-        # We loop round until there are no more events in the room in the
-        # staging area, or we fail to get the lock (which means another process
-        # has started processing).
-        while True:
-            async with lock:
-                logger.info("handling received PDU in room %s: %s", room_id, event)
-                try:
-                    with nested_logging_context(event.event_id):
-                        # We're taking out a lock within a lock, which could
-                        # lead to deadlocks if we're not careful. However, it is
-                        # safe on this occasion as we only ever take a write
-                        # lock when deleting a room, which we would never do
-                        # while holding the `_INBOUND_EVENT_HANDLING_LOCK_NAME`
-                        # lock.
-                        async with self._worker_lock_handler.acquire_read_write_lock(
-                            NEW_EVENT_DURING_PURGE_LOCK_NAME, room_id, write=False
-                        ):
-                            await self._federation_event_handler.on_receive_pdu(
-                                origin, event
-                            )
-                except FederationError as e:
-                    # XXX: Ideally we'd inform the remote we failed to process
-                    # the event, but we can't return an error in the transaction
-                    # response (as we've already responded).
-                    logger.warning("Error handling PDU %s: %s", event.event_id, e)
-                except Exception:
-                    f = failure.Failure()
-                    logger.error(
-                        "Failed to handle PDU %s",
-                        event.event_id,
-                        exc_info=(f.type, f.value, f.getTracebackObject()),
-                    )
-
-                received_ts = await self.store.remove_received_event_from_staging(
-                    origin, event.event_id
-                )
-                if received_ts is not None:
-                    pdu_process_time.observe(
-                        (self._clock.time_msec() - received_ts) / 1000
-                    )
+            if result == (latest_origin, latest_event.event_id):
+                next = latest
 
+        if next is None:
             next = await self._get_next_nonspam_staged_event_for_room(
                 room_id, room_version
             )
-
             if not next:
-                break
-
-            origin, event = next
+                return False
 
             # Prune the event queue if it's getting large.
             #
-            # We do this *after* handling the first event as the common case is
-            # that the queue is empty (/has the single event in), and so there's
-            # no need to do this check.
+            # We only do this if the event we just received isn't the next one
+            # to handle, as the common case is that the queue has the single
+            # event in, and so there's no need to do this check.
             pruned = await self.store.prune_staged_events_in_room(room_id, room_version)
             if pruned:
                 # If we have pruned the queue check we need to refetch the next
@@ -1290,16 +1236,53 @@ class FederationServer(FederationBase):
                     room_id, room_version
                 )
                 if not next:
-                    break
+                    return False
+
+        origin, event = next
+
+        # If we fail to get the lock then another process is handling the room,
+        # and will pick up the event once it has finished.
+        lock = await self.store.try_acquire_lock(
+            _INBOUND_EVENT_HANDLING_LOCK_NAME, room_id
+        )
+        if not lock:
+            return False
 
-                origin, event = next
+        async with lock:
+            logger.info("handling received PDU in room %s: %s", room_id, event)
+            try:
+                with nested_logging_context(event.event_id):
+                    # We're taking out a lock within a lock, which could lead to
+                    # deadlocks if we're not careful. However, it is safe on
+                    # this occasion as we only ever take a write lock when
+                    # deleting a room, which we would never do while holding the
+                    # `_INBOUND_EVENT_HANDLING_LOCK_NAME` lock.
+                    async with self._worker_lock_handler.acquire_read_write_lock(
+                        NEW_EVENT_DURING_PURGE_LOCK_NAME, room_id, write=False
+                    ):
+                        await self._federation_event_handler.on_receive_pdu(
+                            origin, event
+                        )
+            except FederationError as e:
+                # XXX: Ideally we'd inform the remote we failed to process the
+                # event, but we can't return an error in the transaction
+                # response (as we've already responded).
+                logger.warning("Error handling PDU %s: %s", event.event_id, e)
+            except Exception:
+                f = failure.Failure()
+                logger.error(
+                    "Failed to handle PDU %s",
+                    event.event_id,
+                    exc_info=(f.type, f.value, f.getTracebackObject()),
+                )
 
-            new_lock = await self.store.try_acquire_lock(
-                _INBOUND_EVENT_HANDLING_LOCK_NAME, room_id
+            received_ts = await self.store.remove_received_event_from_staging(
+                origin, event.event_id
             )
-            if not new_lock:
-                return
-            lock = new_lock
+            if received_ts is not None:
+                pdu_process_time.observe((self._clock.time_msec() - received_ts) / 1000)
+
+        return True
 
     async def exchange_third_party_invite(
         self, sender_user_id: str, target_user_id: str, room_id: str, signed: Dict
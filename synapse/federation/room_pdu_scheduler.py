@@ -0,0 +1,221 @@
+# Copyright 2023 The Matrix.org Foundation C.I.C.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+from prometheus_client import Counter, Histogram
+
+from synapse.metrics import LaterGauge
+from synapse.metrics.background_process_metrics import run_as_background_process
+from synapse.util import Clock
+
+logger = logging.getLogger(__name__)
+
+room_turns_counter = Counter(
+    "synapse_federation_server_room_pdu_turns",
+    "Number of times a room was given a turn at handling its next received PDU, "
+    "by whether it has local users",
+    ["priority"],
+)
+
+room_queue_wait_time = Histogram(
+    "synapse_federation_server_room_pdu_queue_wait_seconds",
+    "Time rooms waited for a turn at handling their next received PDU, by "
+    "whether they have local users",
+    ["priority"],
+)
+
+room_queue_depth = Histogram(
+    "synapse_federation_server_room_pdu_queue_depth",
+    "Number of received PDUs waiting to be handled in a room when it gets a turn",
+    buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500, "+Inf"),
+)
+
+# The number of turns given to rooms with local users for each turn given to
+# other rooms, when both are waiting.
+PRIORITY_ROOM_TURNS = 4
+
+
+def _priority_label(priority: bool) -> str:
+    return "local" if priority else "remote"
+
+
+class RoomPduScheduler:
+    """Schedules the handling of the PDUs received in each room, across a
+    bounded number of concurrent workers.
+
+    Rooms take turns at handling their next PDU: once a room has had its turn it
+    goes to the back of the queue if it has more PDUs to handle, so that a room
+    with a deep backlog can't hold up the rest. Rooms with local users get most
+    of the turns when other rooms are also waiting.
+    """
+
+    def __init__(
+        self,
+        clock: Clock,
+        handle_next_pdu: Callable[[str], Awaitable[bool]],
+        max_concurrent_rooms: Optional[int],
+    ):
+        """
+        Args:
+            clock
+            handle_next_pdu: handles the next PDU received in the given room,
+                returning whether the room may have more PDUs to handle.
+            max_concurrent_rooms: the number of rooms which may be handling a
+                PDU at once, or None for no limit.
+        """
+        self._clock = clock
+        self._handle_next_pdu = handle_next_pdu
+        self._max_concurrent_rooms = max_concurrent_rooms
+
+        # The rooms waiting for a turn, with whether they have local users, to
+        # when they started waiting.
+        self._queues: Dict[bool, "OrderedDict[str, float]"] = {
+            True: OrderedDict(),
+            False: OrderedDict(),
+        }
+
+        # The number of turns given to rooms with local users in a row.
+        self._priority_turns = 0
+
+        # The rooms currently having a turn, to whether they have local users.
+        self._active: Dict[str, bool] = {}
+
+        # The active rooms which have been scheduled again during their turn.
+        self._rescheduled: Dict[str, bool] = {}
+
+        # The number of PDUs we've been told about in each room which are yet to
+        # be handled.
+        self._pending_pdus: Dict[str, int] = {}
+
+        self._num_workers = 0
+
+        LaterGauge(
+            "synapse_federation_server_room_pdu_queue_rooms",
+            "Number of rooms waiting for a turn at handling received PDUs, by "
+            "whether they have local users",
+            ["priority"],
+            lambda: {
+                (_priority_label(priority),): len(queue)
+                for priority, queue in self._queues.items()
+            },
+        )
+        LaterGauge(
+            "synapse_federation_server_room_pdu_active_rooms",
+            "Number of rooms currently handling a received PDU",
+            [],
+            lambda: len(self._active),
+        )
+
+    def schedule_room(self, room_id: str, priority: bool, num_pdus: int = 1) -> None:
+        """Queues the room to handle its received PDUs, if it isn't already.
+
+        Args:
+            room_id: the room.
+            priority: whether the room has local users.
+            num_pdus: the number of PDUs which have been received in the room.
+        """
+        self._pending_pdus[room_id] = self._pending_pdus.get(room_id, 0) + num_pdus
+
+        if room_id in self._active:
+            self._rescheduled[room_id] = (
+                self._rescheduled.get(room_id, False) or priority
+            )
+            return
+
+        if room_id in self._queues[True]:
+            return
+
+        queued_at = self._queues[False].pop(room_id, None)
+        if queued_at is None:
+            queued_at = self._clock.time()
+        self._queues[priority][room_id] = queued_at
+
+        self._start_workers()
+
+    def _start_workers(self) -> None:
+        # Workers which aren't handling a room take from the queues until they
+        # are empty, so we only need new ones for rooms they can't take.
+        while self._num_workers - len(self._active) < self._num_queued() and (
+            self._max_concurrent_rooms is None
+            or self._num_workers < self._max_concurrent_rooms
+        ):
+            self._num_workers += 1
+            run_as_background_process(
+                "federation_handle_received_pdus", self._run_worker
+            )
+
+    def _num_queued(self) -> int:
+        return len(self._queues[True]) + len(self._queues[False])
+
+    def _next_room(self) -> Optional[Tuple[str, bool, float]]:
+        """Pops the next room to have a turn, with whether it has local users
+        and when it was queued.
+        """
+        if self._queues[True] and (
+            not self._queues[False] or self._priority_turns < PRIORITY_ROOM_TURNS
+        ):
+            priority = True
+            self._priority_turns += 1
+        elif self._queues[False]:
+            priority = False
+            self._priority_turns = 0
+        else:
+            return None
+
+        room_id, queued_at = self._queues[priority].popitem(last=False)
+        return room_id, priority, queued_at
+
+    async def _run_worker(self) -> None:
+        try:
+            while True:
+                next_room = self._next_room()
+                if next_room is None:
+                    return
+
+                room_id, priority, queued_at = next_room
+                await self._take_turn(room_id, priority, queued_at)
+        finally:
+            self._num_workers -= 1
+
+    async def _take_turn(self, room_id: str, priority: bool, queued_at: float) -> None:
+        label = _priority_label(priority)
+        room_turns_counter.labels(label).inc()
+        room_queue_wait_time.labels(label).observe(self._clock.time() - queued_at)
+        room_queue_depth.observe(self._pending_pdus.get(room_id, 0))
+
+        self._active[room_id] = priority
+        more = False
+        try:
+            more = await self._handle_next_pdu(room_id)
+        except Exception:
+            logger.exception("Failed to handle received PDUs in %s", room_id)
+        finally:
+            del self._active[room_id]
+
+        pending = self._pending_pdus.get(room_id, 0) - 1
+        if pending > 0:
+            self._pending_pdus[room_id] = pending
+        else:
+            self._pending_pdus.pop(room_id, None)
+
+        rescheduled_priority = self._rescheduled.pop(room_id, None)
+        if more or rescheduled_priority is not None:
+            self._queues[priority or bool(rescheduled_priority)][
+                room_id
+            ] = self._clock.time()
+        else:
+            self._pending_pdus.pop(room_id, None)
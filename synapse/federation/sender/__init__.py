@@ -125,21 +125,23 @@ EDUs).
 
 import abc
 import logging
-from collections import OrderedDict
+from collections import OrderedDict, deque
 from typing import (
     TYPE_CHECKING,
     Collection,
+    Deque,
     Dict,
     Hashable,
     Iterable,
     List,
+    Mapping,
     Optional,
     Set,
     Tuple,
 )
 
 import attr
-from prometheus_client import Counter
+from prometheus_client import Counter, Gauge, Histogram
 from typing_extensions import Literal
 
 from twisted.internet import defer
@@ -147,10 +149,12 @@ from twisted.internet import defer
 import synapse.metrics
 from synapse.api.presence import UserPresenceState
 from synapse.events import EventBase
+from synapse.federation.sender.catch_up import CatchUpFetcher
 from synapse.federation.sender.per_destination_queue import (
     CATCHUP_RETRY_INTERVAL,
     PerDestinationQueue,
 )
+from synapse.federation.sender.room_destinations import RoomDestinationsCache
 from synapse.federation.sender.transaction_manager import TransactionManager
 from synapse.federation.units import Edu
 from synapse.logging.context import make_deferred_yieldable, run_in_background
@@ -166,12 +170,14 @@ from synapse.metrics.background_process_metrics import (
 )
 from synapse.types import JsonDict, ReadReceipt, RoomStreamToken, StrCollection
 from synapse.util import Clock
+from synapse.util.iterutils import batch_iter
 from synapse.util.metrics import Measure
 from synapse.util.retryutils import filter_destinations_by_retry_limiter
 
 if TYPE_CHECKING:
     from synapse.events.presence_router import PresenceRouter
     from synapse.server import HomeServer
+    from synapse.storage.databases.main.events_worker import EventCacheEntry
 
 logger = logging.getLogger(__name__)
 
@@ -185,6 +191,35 @@ sent_pdus_destination_dist_total = Counter(
     "Total number of PDUs queued for sending across all destinations",
 )
 
+event_queue_stage_duration = Histogram(
+    "synapse_federation_sender_event_queue_stage_duration_seconds",
+    "Time taken by each stage of sending out new events: fetching a batch of "
+    "events, waiting for that fetch, and sending a batch out, per batch; and "
+    "working out the destinations, per event",
+    ["stage"],
+)
+
+event_queue_lag = Gauge(
+    "synapse_federation_sender_event_queue_lag",
+    "Number of stream positions that events have been fetched and sent up to "
+    "are behind the latest",
+    ["stage"],
+)
+
+event_queue_batch_size = Gauge(
+    "synapse_federation_sender_event_queue_batch_size",
+    "Number of events the federation sender currently pulls out of the event "
+    "stream at a time",
+)
+
+# The number of events we pull out of the event stream at a time. This doubles
+# with each batch while we are behind, up to the maximum.
+EVENT_QUEUE_MIN_BATCH_SIZE = 100
+EVENT_QUEUE_MAX_BATCH_SIZE = 1000
+
+# The number of events in a room whose destinations we work out ahead of sending.
+EVENT_QUEUE_DESTINATIONS_LOOKAHEAD = 10
+
 # Time (in s) to wait before trying to wake up destinations that have
 # catch-up outstanding. This will also be the delay applied at startup
 # before trying the same.
@@ -193,9 +228,9 @@ sent_pdus_destination_dist_total = Counter(
 # they are being rate limited following previous attempt failures.
 WAKEUP_RETRY_PERIOD_SEC = 60
 
-# Time (in s) to wait in between waking up each destination, i.e. one destination
-# will be woken up every <x> seconds until we have woken every destination
-# has outstanding catch-up.
+# Time (in s) to wait in between waking up each batch of destinations, i.e.
+# `catch_up_destinations_per_wakeup` destinations will be woken up every <x>
+# seconds until we have woken every destination has outstanding catch-up.
 WAKEUP_INTERVAL_BETWEEN_DESTINATIONS_SEC = 5
 
 
@@ -357,6 +392,24 @@ class _DestinationWakeupQueue:
             self.processing = False
 
 
+@attr.s(slots=True, frozen=True, auto_attribs=True)
+class _EventBatch:
+    """A batch of events pulled out of the event stream to be sent out."""
+
+    # The stream position to record once the batch has been handled, and to pull
+    # the next batch from.
+    next_token: int
+
+    # Whether the batch was limited by the batch size, i.e. there are probably
+    # more events waiting.
+    full: bool
+
+    # A map from event ID to when the event was received, in stream order.
+    event_to_received_ts: Dict[str, Optional[int]]
+
+    event_entries: Mapping[str, "EventCacheEntry"]
+
+
 class FederationSender(AbstractFederationSender):
     def __init__(self, hs: "HomeServer"):
         self.hs = hs
@@ -377,9 +430,25 @@ class FederationSender(AbstractFederationSender):
         self._instance_name = hs.get_instance_name()
         self._federation_shard_config = hs.config.worker.federation_shard_config
 
+        # The destinations of the events in each room, which we update as hosts
+        # join and leave rooms rather than work out for each event.
+        self._room_destinations = RoomDestinationsCache(
+            self.server_name,
+            lambda d: self._federation_shard_config.should_handle(
+                self._instance_name, d
+            ),
+        )
+
         # map from destination to PerDestinationQueue
         self._per_destination_queues: Dict[str, PerDestinationQueue] = {}
 
+        # Shared between the PerDestinationQueues so that destinations catching
+        # up at the same time share the work of doing so.
+        self._catch_up_fetcher = CatchUpFetcher(hs)
+        self._catch_up_destinations_per_wakeup = (
+            hs.config.federation.catch_up_destinations_per_wakeup
+        )
+
         LaterGauge(
             "synapse_federation_transaction_queue_pending_destinations",
             "",
@@ -442,7 +511,12 @@ class FederationSender(AbstractFederationSender):
         """
         queue = self._per_destination_queues.get(destination)
         if not queue:
-            queue = PerDestinationQueue(self.hs, self._transaction_manager, destination)
+            queue = PerDestinationQueue(
+                self.hs,
+                self._transaction_manager,
+                destination,
+                catch_up_fetcher=self._catch_up_fetcher,
+            )
             self._per_destination_queues[destination] = queue
         return queue
 
@@ -466,212 +540,57 @@ class FederationSender(AbstractFederationSender):
         )
 
     async def _process_event_queue_loop(self) -> None:
+        next_batch: "Optional[defer.Deferred[_EventBatch]]" = None
         try:
             self._is_processing = True
-            while True:
-                last_token = await self.store.get_federation_out_pos("events")
-                (
-                    next_token,
-                    event_to_received_ts,
-                ) = await self.store.get_all_new_event_ids_stream(
-                    last_token, self._last_poked_id, limit=100
-                )
 
-                event_ids = event_to_received_ts.keys()
-                event_entries = await self.store.get_unredacted_events_from_cache_or_db(
-                    event_ids
-                )
+            last_token = await self.store.get_federation_out_pos("events")
+            batch_size = EVENT_QUEUE_MIN_BATCH_SIZE
+            next_batch = run_in_background(
+                self._fetch_event_batch, last_token, batch_size
+            )
 
-                logger.debug(
-                    "Handling %i -> %i: %i events to send (current id %i)",
-                    last_token,
-                    next_token,
-                    len(event_entries),
-                    self._last_poked_id,
+            while True:
+                start = self.clock.time()
+                batch_d, next_batch = next_batch, None
+                batch = await make_deferred_yieldable(batch_d)
+                event_queue_stage_duration.labels("fetch_wait").observe(
+                    self.clock.time() - start
                 )
 
-                if not event_entries and next_token >= self._last_poked_id:
+                if not batch.event_entries and batch.next_token >= self._last_poked_id:
                     logger.debug("All events processed")
                     break
 
-                async def handle_event(event: EventBase) -> None:
-                    # Only send events for this server.
-                    send_on_behalf_of = event.internal_metadata.get_send_on_behalf_of()
-                    is_mine = self.is_mine_id(event.sender)
-                    if not is_mine and send_on_behalf_of is None:
-                        logger.debug("Not sending remote-origin event %s", event)
-                        return
-
-                    # We also want to not send out-of-band membership events.
-                    #
-                    # OOB memberships are used in three (and a half) situations:
-                    #
-                    # (1) invite events which we have received over federation. Those
-                    #     will have a `sender` on a different server, so will be
-                    #     skipped by the "is_mine" test above anyway.
-                    #
-                    # (2) rejections of invites to federated rooms - either remotely
-                    #     or locally generated. (Such rejections are normally
-                    #     created via federation, in which case the remote server is
-                    #     responsible for sending out the rejection. If that fails,
-                    #     we'll create a leave event locally, but that's only really
-                    #     for the benefit of the invited user - we don't have enough
-                    #     information to send it out over federation).
-                    #
-                    # (2a) rescinded knocks. These are identical to rejected invites.
-                    #
-                    # (3) knock events which we have sent over federation. As with
-                    #     invite rejections, the remote server should send them out to
-                    #     the federation.
-                    #
-                    # So, in all the above cases, we want to ignore such events.
-                    #
-                    # OOB memberships are always(?) outliers anyway, so if we *don't*
-                    # ignore them, we'll get an exception further down when we try to
-                    # fetch the membership list for the room.
-                    #
-                    # Arguably, we could equivalently ignore all outliers here, since
-                    # in theory the only way for an outlier with a local `sender` to
-                    # exist is by being an OOB membership (via one of (2), (2a) or (3)
-                    # above).
-                    #
-                    if event.internal_metadata.is_out_of_band_membership():
-                        logger.debug("Not sending OOB membership event %s", event)
-                        return
-
-                    # Finally, there are some other events that we should not send out
-                    # until someone asks for them. They are explicitly flagged as such
-                    # with `proactively_send: False`.
-                    if not event.internal_metadata.should_proactively_send():
-                        logger.debug(
-                            "Not sending event with proactively_send=false: %s", event
-                        )
-                        return
-
-                    destinations: Optional[Collection[str]] = None
-                    if not event.prev_event_ids():
-                        # If there are no prev event IDs then the state is empty
-                        # and so no remote servers in the room
-                        destinations = set()
-
-                    if destinations is None:
-                        # During partial join we use the set of servers that we got
-                        # when beginning the join. It's still possible that we send
-                        # events to servers that left the room in the meantime, but
-                        # we consider that an acceptable risk since it is only our own
-                        # events that we leak and not other server's ones.
-                        partial_state_destinations = (
-                            await self.store.get_partial_state_servers_at_join(
-                                event.room_id
-                            )
-                        )
-
-                        if partial_state_destinations is not None:
-                            destinations = partial_state_destinations
-
-                    if destinations is None:
-                        # We check the external cache for the destinations, which is
-                        # stored per state group.
-
-                        sg = await self._external_cache.get(
-                            "event_to_prev_state_group", event.event_id
-                        )
-                        if sg:
-                            destinations = await self._external_cache.get(
-                                "get_joined_hosts", str(sg)
-                            )
-                            if destinations is None:
-                                # Add logging to help track down https://github.com/matrix-org/synapse/issues/13444
-                                logger.info(
-                                    "Unexpectedly did not have cached destinations for %s / %s",
-                                    sg,
-                                    event.event_id,
-                                )
-                        else:
-                            # Add logging to help track down https://github.com/matrix-org/synapse/issues/13444
-                            logger.info(
-                                "Unexpectedly did not have cached prev group for %s",
-                                event.event_id,
-                            )
-
-                    if destinations is None:
-                        try:
-                            # Get the state from before the event.
-                            # We need to make sure that this is the state from before
-                            # the event and not from after it.
-                            # Otherwise if the last member on a server in a room is
-                            # banned then it won't receive the event because it won't
-                            # be in the room after the ban.
-                            destinations = await self.state.get_hosts_in_room_at_events(
-                                event.room_id, event_ids=event.prev_event_ids()
-                            )
-                        except Exception:
-                            logger.exception(
-                                "Failed to calculate hosts in room for event: %s",
-                                event.event_id,
-                            )
-                            return
-
-                    sharded_destinations = {
-                        d
-                        for d in destinations
-                        if self._federation_shard_config.should_handle(
-                            self._instance_name, d
-                        )
-                    }
-
-                    if send_on_behalf_of is not None:
-                        # If we are sending the event on behalf of another server
-                        # then it already has the event and there is no reason to
-                        # send the event to it.
-                        sharded_destinations.discard(send_on_behalf_of)
-
-                    logger.debug("Sending %s to %r", event, sharded_destinations)
-
-                    if sharded_destinations:
-                        await self._send_pdu(event, sharded_destinations)
-
-                        now = self.clock.time_msec()
-                        ts = event_to_received_ts[event.event_id]
-                        assert ts is not None
-                        synapse.metrics.event_processing_lag_by_event.labels(
-                            "federation_sender"
-                        ).observe((now - ts) / 1000)
-
-                async def handle_room_events(events: List[EventBase]) -> None:
-                    logger.debug(
-                        "Handling %i events in room %s", len(events), events[0].room_id
-                    )
-                    with Measure(self.clock, "handle_room_events"):
-                        for event in events:
-                            await handle_event(event)
-
-                events_by_room: Dict[str, List[EventBase]] = {}
-
-                for event_id in event_ids:
-                    # `event_entries` is unsorted, so we have to iterate over `event_ids`
-                    # to ensure the events are in the right order
-                    event_cache = event_entries.get(event_id)
-                    if event_cache:
-                        event = event_cache.event
-                        events_by_room.setdefault(event.room_id, []).append(event)
-
-                await make_deferred_yieldable(
-                    defer.gatherResults(
-                        [
-                            run_in_background(handle_room_events, evs)
-                            for evs in events_by_room.values()
-                        ],
-                        consumeErrors=True,
-                    )
+                # Pull out more events at a time while we are behind, so that the
+                # per-batch overheads are spread over more events, and more rooms
+                # are handled in parallel.
+                if batch.full:
+                    batch_size = min(batch_size * 2, EVENT_QUEUE_MAX_BATCH_SIZE)
+                else:
+                    batch_size = EVENT_QUEUE_MIN_BATCH_SIZE
+                event_queue_batch_size.set(batch_size)
+
+                # Start fetching the next batch while we send this one out.
+                next_batch = run_in_background(
+                    self._fetch_event_batch, batch.next_token, batch_size
+                )
+
+                start = self.clock.time()
+                room_count = await self._handle_event_batch(batch)
+                event_queue_stage_duration.labels("send").observe(
+                    self.clock.time() - start
                 )
 
-                logger.debug("Successfully handled up to %i", next_token)
-                await self.store.update_federation_out_pos("events", next_token)
+                logger.debug("Successfully handled up to %i", batch.next_token)
+                await self.store.update_federation_out_pos("events", batch.next_token)
+                event_queue_lag.labels("sent").set(
+                    max(self._last_poked_id - batch.next_token, 0)
+                )
 
-                if event_entries:
+                if batch.event_entries:
                     now = self.clock.time_msec()
-                    ts = max(t for t in event_to_received_ts.values() if t)
+                    ts = max(t for t in batch.event_to_received_ts.values() if t)
                     assert ts is not None
 
                     synapse.metrics.event_processing_lag.labels(
@@ -681,29 +600,311 @@ class FederationSender(AbstractFederationSender):
                         "federation_sender"
                     ).set(ts)
 
-                    events_processed_counter.inc(len(event_entries))
+                    events_processed_counter.inc(len(batch.event_entries))
 
                     event_processing_loop_room_count.labels("federation_sender").inc(
-                        len(events_by_room)
+                        room_count
                     )
 
                 event_processing_loop_counter.labels("federation_sender").inc()
 
                 synapse.metrics.event_processing_positions.labels(
                     "federation_sender"
-                ).set(next_token)
+                ).set(batch.next_token)
+
+        except Exception:
+            if next_batch is not None:
+                # We failed to send out the current batch, so won't use the next
+                # one. Consume its result, so that if it fails it isn't reported
+                # as an unhandled error.
+                next_batch.addErrback(lambda _: None)
+            raise
 
         finally:
             self._is_processing = False
 
-    async def _send_pdu(self, pdu: EventBase, destinations: Iterable[str]) -> None:
+    async def _fetch_event_batch(self, last_token: int, limit: int) -> _EventBatch:
+        """Pulls the next batch of events to send out of the event stream.
+
+        Args:
+            last_token: the stream position of the last event handled.
+            limit: the maximum number of events to pull out.
+        """
+        start = self.clock.time()
+
+        (
+            next_token,
+            event_to_received_ts,
+        ) = await self.store.get_all_new_event_ids_stream(
+            last_token, self._last_poked_id, limit=limit
+        )
+        event_entries = await self.store.get_unredacted_events_from_cache_or_db(
+            event_to_received_ts.keys()
+        )
+
+        logger.debug(
+            "Handling %i -> %i: %i events to send (current id %i)",
+            last_token,
+            next_token,
+            len(event_entries),
+            self._last_poked_id,
+        )
+
+        event_queue_stage_duration.labels("fetch").observe(self.clock.time() - start)
+        event_queue_lag.labels("fetched").set(max(self._last_poked_id - next_token, 0))
+
+        return _EventBatch(
+            next_token=next_token,
+            full=len(event_to_received_ts) >= limit,
+            event_to_received_ts=event_to_received_ts,
+            event_entries=event_entries,
+        )
+
+    async def _handle_event_batch(self, batch: _EventBatch) -> int:
+        """Sends out a batch of events, handling each room in parallel.
+
+        Returns:
+            The number of rooms in the batch.
+        """
+        events_by_room: Dict[str, List[EventBase]] = {}
+
+        for event_id in batch.event_to_received_ts:
+            # `event_entries` is unsorted, so we have to iterate over the event IDs
+            # to ensure the events are in the right order
+            event_cache = batch.event_entries.get(event_id)
+            if event_cache:
+                event = event_cache.event
+                events_by_room.setdefault(event.room_id, []).append(event)
+
+        await make_deferred_yieldable(
+            defer.gatherResults(
+                [
+                    run_in_background(
+                        self._handle_room_events, evs, batch.event_to_received_ts
+                    )
+                    for evs in events_by_room.values()
+                ],
+                consumeErrors=True,
+            )
+        )
+
+        return len(events_by_room)
+
+    async def _handle_room_events(
+        self,
+        events: List[EventBase],
+        event_to_received_ts: Mapping[str, Optional[int]],
+    ) -> None:
+        """Sends out the events in a room, in order.
+
+        The destinations of the next few events are worked out while the earlier
+        ones are being sent.
+        """
+        logger.debug("Handling %i events in room %s", len(events), events[0].room_id)
+        with Measure(self.clock, "handle_room_events"):
+            pending: Deque[
+                Tuple[EventBase, "defer.Deferred[Optional[StrCollection]]"]
+            ] = deque()
+
+            try:
+                for event in events:
+                    destinations_d = run_in_background(
+                        self._get_destinations_for_event, event
+                    )
+                    pending.append((event, destinations_d))
+                    if len(pending) > EVENT_QUEUE_DESTINATIONS_LOOKAHEAD:
+                        await self._send_event(*pending.popleft(), event_to_received_ts)
+
+                while pending:
+                    await self._send_event(*pending.popleft(), event_to_received_ts)
+            except Exception:
+                # We won't send out the rest of the events, so consume the results
+                # of the destination lookups started for them, so that failures
+                # aren't reported as unhandled errors.
+                for _, destinations_d in pending:
+                    destinations_d.addErrback(lambda _: None)
+                raise
+
+    async def _send_event(
+        self,
+        event: EventBase,
+        destinations_d: "defer.Deferred[Optional[StrCollection]]",
+        event_to_received_ts: Mapping[str, Optional[int]],
+    ) -> None:
+        """Sends an event to the destinations returned by
+        `_get_destinations_for_event`, once they are known.
+        """
+        destinations = await make_deferred_yieldable(destinations_d)
+        if not destinations:
+            return
+
+        await self._send_pdu(event, destinations)
+
+        now = self.clock.time_msec()
+        ts = event_to_received_ts[event.event_id]
+        assert ts is not None
+        synapse.metrics.event_processing_lag_by_event.labels(
+            "federation_sender"
+        ).observe((now - ts) / 1000)
+
+    async def _get_destinations_for_event(
+        self, event: EventBase
+    ) -> Optional[StrCollection]:
+        """Works out which of the destinations handled by this instance an event
+        should be sent to.
+
+        Returns:
+            The destinations, or None if the event shouldn't be sent out.
+        """
+        start = self.clock.time()
+        try:
+            return await self._calculate_destinations_for_event(event)
+        finally:
+            event_queue_stage_duration.labels("destinations").observe(
+                self.clock.time() - start
+            )
+
+    async def _calculate_destinations_for_event(
+        self, event: EventBase
+    ) -> Optional[StrCollection]:
+        # Only send events for this server.
+        send_on_behalf_of = event.internal_metadata.get_send_on_behalf_of()
+        is_mine = self.is_mine_id(event.sender)
+        if not is_mine and send_on_behalf_of is None:
+            logger.debug("Not sending remote-origin event %s", event)
+            return None
+
+        # We also want to not send out-of-band membership events.
+        #
+        # OOB memberships are used in three (and a half) situations:
+        #
+        # (1) invite events which we have received over federation. Those
+        #     will have a `sender` on a different server, so will be
+        #     skipped by the "is_mine" test above anyway.
+        #
+        # (2) rejections of invites to federated rooms - either remotely
+        #     or locally generated. (Such rejections are normally
+        #     created via federation, in which case the remote server is
+        #     responsible for sending out the rejection. If that fails,
+        #     we'll create a leave event locally, but that's only really
+        #     for the benefit of the invited user - we don't have enough
+        #     information to send it out over federation).
+        #
+        # (2a) rescinded knocks. These are identical to rejected invites.
+        #
+        # (3) knock events which we have sent over federation. As with
+        #     invite rejections, the remote server should send them out to
+        #     the federation.
+        #
+        # So, in all the above cases, we want to ignore such events.
+        #
+        # OOB memberships are always(?) outliers anyway, so if we *don't*
+        # ignore them, we'll get an exception further down when we try to
+        # fetch the membership list for the room.
+        #
+        # Arguably, we could equivalently ignore all outliers here, since
+        # in theory the only way for an outlier with a local `sender` to
+        # exist is by being an OOB membership (via one of (2), (2a) or (3)
+        # above).
+        #
+        if event.internal_metadata.is_out_of_band_membership():
+            logger.debug("Not sending OOB membership event %s", event)
+            return None
+
+        # Finally, there are some other events that we should not send out
+        # until someone asks for them. They are explicitly flagged as such
+        # with `proactively_send: False`.
+        if not event.internal_metadata.should_proactively_send():
+            logger.debug("Not sending event with proactively_send=false: %s", event)
+            return None
+
+        destinations: Optional[Collection[str]] = None
+        if not event.prev_event_ids():
+            # If there are no prev event IDs then the state is empty
+            # and so no remote servers in the room
+            destinations = set()
+
+        if destinations is None:
+            # During partial join we use the set of servers that we got
+            # when beginning the join. It's still possible that we send
+            # events to servers that left the room in the meantime, but
+            # we consider that an acceptable risk since it is only our own
+            # events that we leak and not other server's ones.
+            partial_state_destinations = (
+                await self.store.get_partial_state_servers_at_join(event.room_id)
+            )
+
+            if partial_state_destinations is not None:
+                destinations = partial_state_destinations
+
+        if destinations is None:
+            # We check the external cache for the destinations, which is
+            # stored per state group.
+
+            sg = await self._external_cache.get(
+                "event_to_prev_state_group", event.event_id
+            )
+            if sg:
+                destinations = await self._external_cache.get(
+                    "get_joined_hosts", str(sg)
+                )
+                if destinations is None:
+                    # Add logging to help track down https://github.com/matrix-org/synapse/issues/13444
+                    logger.info(
+                        "Unexpectedly did not have cached destinations for %s / %s",
+                        sg,
+                        event.event_id,
+                    )
+            else:
+                # Add logging to help track down https://github.com/matrix-org/synapse/issues/13444
+                logger.info(
+                    "Unexpectedly did not have cached prev group for %s",
+                    event.event_id,
+                )
+
+        if destinations is None:
+            try:
+                # Get the state from before the event.
+                # We need to make sure that this is the state from before
+                # the event and not from after it.
+                # Otherwise if the last member on a server in a room is
+                # banned then it won't receive the event because it won't
+                # be in the room after the ban.
+                destinations = await self.state.get_hosts_in_room_at_events(
+                    event.room_id, event_ids=event.prev_event_ids()
+                )
+            except Exception:
+                logger.exception(
+                    "Failed to calculate hosts in room for event: %s",
+                    event.event_id,
+                )
+                return None
+
+        sharded_destinations = self._room_destinations.get_destinations(
+            event.room_id, destinations
+        )
+
+        if send_on_behalf_of is not None and send_on_behalf_of in sharded_destinations:
+            # If we are sending the event on behalf of another server
+            # then it already has the event and there is no reason to
+            # send the event to it.
+            sharded_destinations = sharded_destinations - {send_on_behalf_of}
+
+        logger.debug("Sending %s to %r", event, sharded_destinations)
+
+        return sharded_destinations
+
+    async def _send_pdu(self, pdu: EventBase, destinations: StrCollection) -> None:
         # We loop through all destinations to see whether we already have
         # a transaction in progress. If we do, stick it in the pending_pdus
         # table and we'll get back to it later.
 
-        destinations = set(destinations)
-        destinations.discard(self.server_name)
-        logger.debug("Sending to: %s", str(destinations))
+        # The destinations are generally shared with other events in the room,
+        # so we avoid copying them unless we need to.
+        if self.server_name in destinations:
+            destinations = set(destinations)
+            destinations.discard(self.server_name)
+        logger.debug("Sending to: %s", destinations)
 
         if not destinations:
             return
@@ -989,7 +1190,8 @@ class FederationSender(AbstractFederationSender):
         Wakes up destinations that need catch-up and are not currently being
         backed off from.
 
-        In order to reduce load spikes, adds a delay between each destination.
+        In order to reduce load spikes, adds a delay between each batch of
+        `catch_up_destinations_per_wakeup` destinations.
         """
 
         last_processed: Optional[str] = None
@@ -1011,10 +1213,19 @@ class FederationSender(AbstractFederationSender):
                 if self._federation_shard_config.should_handle(self._instance_name, d)
             ]
 
-            for destination in destinations_to_wake:
-                logger.info(
-                    "Destination %s has outstanding catch-up, waking up.",
-                    last_processed,
-                )
-                self.wake_destination(destination)
+            # Wake the destinations which have been healthy first, so that they
+            # aren't held up behind ones which are likely still down.
+            destinations_to_wake = self._transaction_manager.scheduler.sort_by_priority(
+                destinations_to_wake
+            )
+
+            for batch in batch_iter(
+                destinations_to_wake, self._catch_up_destinations_per_wakeup
+            ):
+                for destination in batch:
+                    logger.info(
+                        "Destination %s has outstanding catch-up, waking up.",
+                        destination,
+                    )
+                    self.wake_destination(destination)
                 await self.clock.sleep(WAKEUP_INTERVAL_BETWEEN_DESTINATIONS_SEC)
@@ -0,0 +1,131 @@
+# Copyright 2023 The Matrix.org Foundation C.I.C.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+from typing import TYPE_CHECKING, Dict, List, Tuple
+
+from prometheus_client import Counter, Gauge
+
+from synapse.events import EventBase
+from synapse.util.batching_queue import BatchingQueue
+from synapse.util.caches.response_cache import ResponseCache
+
+if TYPE_CHECKING:
+    from synapse.server import HomeServer
+
+logger = logging.getLogger(__name__)
+
+catch_up_rooms_sent_counter = Counter(
+    "synapse_federation_sender_catch_up_rooms_sent",
+    "Number of rooms which destinations have been caught up on after an outage",
+)
+
+catch_up_pdus_sent_counter = Counter(
+    "synapse_federation_sender_catch_up_pdus_sent",
+    "Number of PDUs sent to destinations to catch them up after an outage",
+)
+
+catch_up_lag_metric = Gauge(
+    "synapse_federation_sender_catch_up_lag",
+    "How far behind the latest event the given destination is in catching up, "
+    "in stream positions. Only reported for the domains in "
+    "`federation_metrics_domains`",
+    labelnames=("server_name",),
+)
+
+# How long the extremities of a room are shared between the destinations
+# catching up on it, in milliseconds.
+CATCH_UP_EXTREMITIES_CACHE_MS = 10 * 1000
+
+
+class CatchUpFetcher:
+    """Fetches what destinations need to be sent to catch up after an outage,
+    sharing the work between the destinations catching up at the same time.
+
+    The events that each destination missed are looked up for all destinations
+    at once, and the latest events in each room are fetched once for all of the
+    destinations catching up on the room.
+    """
+
+    def __init__(self, hs: "HomeServer"):
+        self._store = hs.get_datastores().main
+
+        self._room_event_ids_queue: BatchingQueue[
+            Tuple[str, int], Dict[str, List[str]]
+        ] = BatchingQueue(
+            "federation_catch_up_room_event_ids",
+            hs.get_clock(),
+            self._fetch_room_event_ids,
+        )
+
+        self._extremities_cache: ResponseCache[str] = ResponseCache(
+            hs.get_clock(),
+            "federation_catch_up_extremities",
+            timeout_ms=CATCH_UP_EXTREMITIES_CACHE_MS,
+        )
+
+    async def get_room_event_ids(
+        self, destination: str, last_successful_stream_ordering: int
+    ) -> List[str]:
+        """Returns at most 50 event IDs, one per room, of the oldest events that
+        have not yet been sent to the destination.
+
+        See `TransactionWorkerStore.get_catch_up_room_event_ids_for_destinations`.
+        """
+        results = await self._room_event_ids_queue.add_to_queue(
+            (destination, last_successful_stream_ordering)
+        )
+        return results.get(destination, [])
+
+    async def _fetch_room_event_ids(
+        self, requests: List[Tuple[str, int]]
+    ) -> Dict[str, List[str]]:
+        return await self._store.get_catch_up_room_event_ids_for_destinations(
+            dict(requests)
+        )
+
+    async def get_extremities(
+        self, room_id: str, min_stream_ordering: int
+    ) -> List[EventBase]:
+        """Returns the current forward extremities of the room (at most 10).
+
+        Args:
+            room_id: the room to get the extremities of.
+            min_stream_ordering: the stream ordering of an event in the room which
+                the caller already has. Extremities which were fetched before it
+                was persisted aren't returned.
+        """
+        extremities = await self._extremities_cache.wrap(
+            room_id, self._fetch_extremities, room_id
+        )
+
+        if (
+            max(
+                (e.internal_metadata.stream_ordering or 0 for e in extremities),
+                default=0,
+            )
+            < min_stream_ordering
+        ):
+            # The shared extremities are older than the caller's event, so may
+            # not include it or anything after it. Fetch them again.
+            self._extremities_cache.unset(room_id)
+            extremities = await self._extremities_cache.wrap(
+                room_id, self._fetch_extremities, room_id
+            )
+
+        return extremities
+
+    async def _fetch_extremities(self, room_id: str) -> List[EventBase]:
+        extrems = await self._store.get_prev_events_for_room(room_id)
+        return await self._store.get_events_as_list(extrems)
@@ -29,6 +29,12 @@ from synapse.api.errors import (
 )
 from synapse.api.presence import UserPresenceState
 from synapse.events import EventBase
+from synapse.federation.sender.catch_up import (
+    CatchUpFetcher,
+    catch_up_lag_metric,
+    catch_up_pdus_sent_counter,
+    catch_up_rooms_sent_counter,
+)
 from synapse.federation.units import Edu
 from synapse.handlers.presence import format_user_presence_state
 from synapse.logging import issue9533_logger
@@ -72,6 +78,8 @@ class PerDestinationQueue:
         transaction_sender
         destination: the server_name of the destination that we are managing
             transmission for.
+        catch_up_fetcher: shares the work of catching up destinations between
+            the queues. A new one is created if not given.
     """
 
     def __init__(
@@ -79,6 +87,7 @@ class PerDestinationQueue:
         hs: "synapse.server.HomeServer",
         transaction_manager: "synapse.federation.sender.TransactionManager",
         destination: str,
+        catch_up_fetcher: Optional[CatchUpFetcher] = None,
     ):
         self._server_name = hs.hostname
         self._clock = hs.get_clock()
@@ -88,6 +97,10 @@ class PerDestinationQueue:
         self._instance_name = hs.get_instance_name()
         self._federation_shard_config = hs.config.worker.federation_shard_config
         self._state = hs.get_state_handler()
+        self._catch_up_fetcher = catch_up_fetcher or CatchUpFetcher(hs)
+        self._report_catch_up_lag = (
+            destination in hs.config.federation.federation_metrics_domains
+        )
 
         self._should_send_on_this_instance = True
         if not self._federation_shard_config.should_handle(
@@ -452,7 +465,7 @@ class PerDestinationQueue:
 
         # get at most 50 catchup room/PDUs
         while True:
-            event_ids = await self._store.get_catch_up_room_event_ids(
+            event_ids = await self._catch_up_fetcher.get_room_event_ids(
                 self._destination, last_successful_stream_ordering
             )
 
@@ -467,6 +480,8 @@ class PerDestinationQueue:
 
                 # we are done catching up!
                 self._catching_up = False
+                if self._report_catch_up_lag:
+                    catch_up_lag_metric.labels(server_name=self._destination).set(0)
                 break
 
             if first_catch_up_check:
@@ -513,10 +528,16 @@ class PerDestinationQueue:
                 # servers, but the remote will correctly deduplicate them and
                 # handle it only once.
 
-                # Step 1, fetch the current extremities
-                extrems = await self._store.get_prev_events_for_room(pdu.room_id)
+                # Step 1, fetch the current extremities. These are shared with
+                # the other destinations catching up on the room.
+                #
+                # We pulled this from the DB, so it'll be non-null
+                assert pdu.internal_metadata.stream_ordering
+                extrem_events = await self._catch_up_fetcher.get_extremities(
+                    pdu.room_id, pdu.internal_metadata.stream_ordering
+                )
 
-                if pdu.event_id in extrems:
+                if any(p.event_id == pdu.event_id for p in extrem_events):
                     # If the event is in the extremities, then great! We can just
                     # use that without having to do further checks.
                     room_catchup_pdus = [pdu]
@@ -526,10 +547,7 @@ class PerDestinationQueue:
                     # sending our the newest PDU the remote is missing from us.
                     room_catchup_pdus = [pdu]
                 else:
-                    # If not, fetch the extremities and figure out which we can
-                    # send.
-                    extrem_events = await self._store.get_events_as_list(extrems)
-
+                    # If not, figure out which of the extremities we can send.
                     new_pdus = []
                     for p in extrem_events:
                         # We pulled this from the DB, so it'll be non-null
@@ -578,6 +596,8 @@ class PerDestinationQueue:
                 )
 
                 sent_transactions_counter.inc()
+                catch_up_rooms_sent_counter.inc()
+                catch_up_pdus_sent_counter.inc(len(room_catchup_pdus))
 
                 # We pulled this from the DB, so it'll be non-null
                 assert pdu.internal_metadata.stream_ordering
@@ -593,6 +613,12 @@ class PerDestinationQueue:
                     self._destination, last_successful_stream_ordering
                 )
 
+                if self._report_catch_up_lag:
+                    catch_up_lag_metric.labels(server_name=self._destination).set(
+                        self._store.get_room_max_stream_ordering()
+                        - last_successful_stream_ordering
+                    )
+
     def _get_receipt_edus(self, force_flush: bool, limit: int) -> Iterable[Edu]:
         if not self._pending_receipt_edus:
             return
@@ -0,0 +1,113 @@
+# Copyright 2023 The Matrix.org Foundation C.I.C.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+from typing import Callable, Collection, FrozenSet, Set
+
+import attr
+from prometheus_client import Counter
+
+from synapse.util.caches.lrucache import LruCache
+
+logger = logging.getLogger(__name__)
+
+room_destinations_lookups = Counter(
+    "synapse_federation_sender_room_destinations_lookups",
+    "Number of times the destinations of an event were looked up, by whether "
+    "they were reused, updated with the hosts that joined or left the room, or "
+    "computed from scratch",
+    ["result"],
+)
+
+
+@attr.s(slots=True, frozen=True, auto_attribs=True)
+class _RoomDestinations:
+    # The hosts in the room that the destinations were derived from.
+    hosts: FrozenSet[str]
+
+    # The hosts which this instance sends the room's events to.
+    destinations: FrozenSet[str]
+
+
+class RoomDestinationsCache:
+    """Keeps track of the destinations that this instance sends the events in
+    each room to, i.e. the hosts in the room other than ourselves which this
+    federation sender is responsible for.
+
+    Rather than filtering the hosts in the room for every event sent, the
+    destinations for each room are kept and updated with the hosts that have
+    joined or left since the last event. The hosts in the room are generally the
+    same set object from one event to the next (see `_JoinedHostsCache`), in
+    which case the destinations are returned as is.
+
+    The sets returned are shared between callers, and so are frozen.
+    """
+
+    def __init__(
+        self,
+        server_name: str,
+        should_handle: Callable[[str], bool],
+        max_size: int = 10000,
+    ):
+        """
+        Args:
+            server_name: our server name, which is never a destination.
+            should_handle: whether this instance sends to the given destination.
+            max_size: the number of rooms to keep the destinations of.
+        """
+        self._server_name = server_name
+        self._should_handle = should_handle
+        self._cache: LruCache[str, _RoomDestinations] = LruCache(
+            max_size=max_size, cache_name="federation_sender_room_destinations"
+        )
+
+    def get_destinations(self, room_id: str, hosts: Collection[str]) -> FrozenSet[str]:
+        """Returns the destinations for an event in the room.
+
+        Args:
+            room_id: the room the event is in.
+            hosts: the hosts in the room at the event.
+        """
+        # This is a no-op if `hosts` is already a frozenset.
+        hosts = frozenset(hosts)
+
+        entry = self._cache.get(room_id)
+        if entry is not None and entry.hosts is hosts:
+            room_destinations_lookups.labels("reused").inc()
+            return entry.destinations
+
+        if entry is None:
+            room_destinations_lookups.labels("computed").inc()
+            destinations = frozenset(self._filter_hosts(hosts))
+        else:
+            joined = hosts - entry.hosts
+            left = entry.hosts - hosts
+            if not joined and not left:
+                room_destinations_lookups.labels("reused").inc()
+                destinations = entry.destinations
+            else:
+                room_destinations_lookups.labels("updated").inc()
+                destinations = entry.destinations.difference(left).union(
+                    self._filter_hosts(joined)
+                )
+
+        self._cache.set(room_id, _RoomDestinations(hosts, destinations))
+        return destinations
+
+    def _filter_hosts(self, hosts: Collection[str]) -> Set[str]:
+        return {
+            host
+            for host in hosts
+            if host != self._server_name and self._should_handle(host)
+        }
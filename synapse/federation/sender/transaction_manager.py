@@ -20,6 +20,7 @@ from synapse.api.constants import EduTypes
 from synapse.api.errors import HttpResponseException
 from synapse.events import EventBase
 from synapse.federation.persistence import TransactionActions
+from synapse.federation.sender.transaction_scheduler import TransactionScheduler
 from synapse.federation.units import Edu, Transaction
 from synapse.logging.opentracing import (
     extract_text_map,
@@ -65,6 +66,10 @@ class TransactionManager:
         # HACK to get unique tx id
         self._next_txn_id = int(self.clock.time_msec())
 
+        self.scheduler = TransactionScheduler(
+            self.clock, hs.config.federation.max_concurrent_transactions
+        )
+
     @measure_func("_send_new_transaction")
     async def send_new_transaction(
         self,
@@ -160,9 +165,10 @@ class TransactionManager:
                 return data
 
             try:
-                response = await self._transport_layer.send_transaction(
-                    transaction, json_data_cb
-                )
+                async with self.scheduler.schedule(destination, len(pdus) + len(edus)):
+                    response = await self._transport_layer.send_transaction(
+                        transaction, json_data_cb
+                    )
             except HttpResponseException as e:
                 code = e.code
 
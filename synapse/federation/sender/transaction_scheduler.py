@@ -0,0 +1,310 @@
+# Copyright 2023 The Matrix.org Foundation C.I.C.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import heapq
+import itertools
+import logging
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+import attr
+from prometheus_client import Histogram
+
+from twisted.internet import defer
+from twisted.internet.interfaces import IDelayedCall
+
+from synapse.logging.context import make_deferred_yieldable
+from synapse.metrics import LaterGauge
+from synapse.types import StrCollection
+from synapse.util import Clock
+from synapse.util.retryutils import NotRetryingDestination
+
+logger = logging.getLogger(__name__)
+
+transaction_slot_wait_time = Histogram(
+    "synapse_federation_sender_transaction_slot_wait_seconds",
+    "Time transactions waited to be sent due to the limit on the number of "
+    "transactions in flight, by the health of their destination",
+    ["health"],
+)
+
+# The weight given to the latest transaction when updating the moving averages
+# of a destination's latency and error rate.
+HEALTH_EWMA_ALPHA = 0.2
+
+# The latency we assume of destinations we haven't sent a transaction to yet.
+DEFAULT_LATENCY_SECONDS = 1.0
+
+# Destinations whose transactions take longer than this on average, or fail
+# more often than this, are considered unhealthy. Transactions which have been
+# in flight for longer than this are also counted as being to an unhealthy
+# destination, as we only find out how healthy a destination is when its
+# transactions finish.
+UNHEALTHY_LATENCY_SECONDS = 10.0
+UNHEALTHY_ERROR_RATE = 0.5
+
+# The proportion of the transactions in flight which may be to unhealthy
+# destinations, so that slow or dead servers can't hold up the rest.
+UNHEALTHY_SHARE = 0.25
+
+
+@attr.s(slots=True, auto_attribs=True)
+class _DestinationHealth:
+    # Exponentially-weighted moving averages of how long it takes to send a
+    # transaction to the destination, and of the proportion of transactions
+    # which fail.
+    latency: float = DEFAULT_LATENCY_SECONDS
+    error_rate: float = 0.0
+
+    def record(self, duration: Optional[float], success: bool) -> None:
+        if duration is not None:
+            self.latency += HEALTH_EWMA_ALPHA * (duration - self.latency)
+        self.error_rate += HEALTH_EWMA_ALPHA * (
+            (0.0 if success else 1.0) - self.error_rate
+        )
+
+    def is_healthy(self) -> bool:
+        return (
+            self.latency < UNHEALTHY_LATENCY_SECONDS
+            and self.error_rate < UNHEALTHY_ERROR_RATE
+        )
+
+
+@attr.s(slots=True, auto_attribs=True)
+class _InFlightTransaction:
+    # Whether the transaction counts as being to a healthy destination.
+    healthy: bool
+
+    # For transactions counted as healthy, fires once the transaction has been in
+    # flight for long enough that we count it as unhealthy instead.
+    timer: Optional[IDelayedCall] = None
+
+
+class TransactionScheduler:
+    """Schedules the transactions sent to other servers, tracking how healthy
+    each destination is.
+
+    The number of transactions in flight at once is capped. When transactions
+    have to wait, they are sent to healthy destinations first, those which get
+    through the most PDUs and EDUs per second spent sending going first.
+    Transactions to unhealthy destinations (ones which are slow, or whose
+    transactions keep failing) may only take up a share of the slots, so that a
+    dead server which shares lots of rooms with us can't starve the rest.
+
+    We only learn how healthy a destination is when its transactions finish, so
+    transactions which have been in flight for a while are counted as unhealthy
+    too. Beyond the unhealthy share, those don't take up any of the slots: so
+    that (e.g. after a restart) lots of unresponsive destinations which we don't
+    yet know are unhealthy can't hold up everything else until they time out.
+    """
+
+    def __init__(self, clock: Clock, max_concurrent_transactions: Optional[int]):
+        """
+        Args:
+            clock
+            max_concurrent_transactions: the maximum number of transactions in
+                flight at once, or None for no limit.
+        """
+        self._clock = clock
+
+        self._max_concurrent = max_concurrent_transactions
+        self._max_concurrent_unhealthy: Optional[int] = None
+        if max_concurrent_transactions is not None:
+            self._max_concurrent_unhealthy = max(
+                1, int(max_concurrent_transactions * UNHEALTHY_SHARE)
+            )
+
+        self._health: Dict[str, _DestinationHealth] = {}
+
+        self._in_flight = 0
+        self._in_flight_unhealthy = 0
+
+        # Heaps of transactions waiting to be sent to healthy and unhealthy
+        # destinations, of (priority, sequence number, deferred to resolve).
+        self._waiting: List[
+            Tuple[float, int, "defer.Deferred[_InFlightTransaction]"]
+        ] = []
+        self._waiting_unhealthy: List[
+            Tuple[float, int, "defer.Deferred[_InFlightTransaction]"]
+        ] = []
+        self._sequence = itertools.count()
+
+        LaterGauge(
+            "synapse_federation_sender_transactions_in_flight",
+            "Number of transactions being sent, by the health of their destination",
+            ["health"],
+            lambda: {
+                ("healthy",): self._in_flight - self._in_flight_unhealthy,
+                ("unhealthy",): self._in_flight_unhealthy,
+            },
+        )
+        LaterGauge(
+            "synapse_federation_sender_transactions_waiting",
+            "Number of transactions waiting to be sent due to the limit on the "
+            "number in flight, by the health of their destination",
+            ["health"],
+            lambda: {
+                ("healthy",): len(self._waiting),
+                ("unhealthy",): len(self._waiting_unhealthy),
+            },
+        )
+        LaterGauge(
+            "synapse_federation_sender_unhealthy_destinations",
+            "Number of destinations currently considered unhealthy",
+            [],
+            lambda: sum(
+                1 for health in self._health.values() if not health.is_healthy()
+            ),
+        )
+
+    def is_healthy(self, destination: str) -> bool:
+        health = self._health.get(destination)
+        return health is None or health.is_healthy()
+
+    def get_priority(self, destination: str, num_items: int = 1) -> float:
+        """The priority of sending a transaction of the given number of PDUs and
+        EDUs to the destination: the expected time it takes per item, including
+        retries. Lower is sent first.
+        """
+        health = self._health.get(destination)
+        if health is None:
+            latency, error_rate = DEFAULT_LATENCY_SECONDS, 0.0
+        else:
+            latency, error_rate = health.latency, health.error_rate
+
+        return latency / ((1.0 - min(error_rate, 0.99)) * max(num_items, 1))
+
+    def sort_by_priority(self, destinations: StrCollection) -> List[str]:
+        """Sorts the destinations so that the healthiest come first."""
+        return sorted(
+            destinations,
+            key=lambda d: (not self.is_healthy(d), self.get_priority(d)),
+        )
+
+    @asynccontextmanager
+    async def schedule(self, destination: str, num_items: int) -> AsyncIterator[None]:
+        """Waits until a transaction can be sent to the destination, and
+        records how long sending it takes and whether it succeeds.
+
+        Args:
+            destination: the server the transaction is to.
+            num_items: the number of PDUs and EDUs in the transaction.
+        """
+        healthy = self.is_healthy(destination)
+
+        wait_start = self._clock.time()
+        if self._can_send(healthy) and not (
+            self._waiting or (not healthy and self._waiting_unhealthy)
+        ):
+            transaction = self._start(healthy)
+        else:
+            d: "defer.Deferred[_InFlightTransaction]" = defer.Deferred()
+            heapq.heappush(
+                self._waiting if healthy else self._waiting_unhealthy,
+                (self.get_priority(destination, num_items), next(self._sequence), d),
+            )
+            # `_wake_waiting` starts the transaction before resolving `d`.
+            transaction = await make_deferred_yieldable(d)
+
+        start = self._clock.time()
+        transaction_slot_wait_time.labels(
+            "healthy" if healthy else "unhealthy"
+        ).observe(start - wait_start)
+
+        try:
+            yield
+        except defer.CancelledError:
+            raise
+        except NotRetryingDestination:
+            # We didn't actually try to reach the destination.
+            self._health.setdefault(destination, _DestinationHealth()).record(
+                None, success=False
+            )
+            raise
+        except Exception:
+            self._health.setdefault(destination, _DestinationHealth()).record(
+                self._clock.time() - start, success=False
+            )
+            raise
+        else:
+            self._health.setdefault(destination, _DestinationHealth()).record(
+                self._clock.time() - start, success=True
+            )
+        finally:
+            self._finish(transaction)
+
+    def _can_send(self, healthy: bool) -> bool:
+        if self._max_concurrent is None:
+            return True
+
+        assert self._max_concurrent_unhealthy is not None
+
+        # Transactions to unhealthy destinations beyond their share don't take
+        # up any slots. See the class docstring.
+        slots_used = (self._in_flight - self._in_flight_unhealthy) + min(
+            self._in_flight_unhealthy, self._max_concurrent_unhealthy
+        )
+        if slots_used >= self._max_concurrent:
+            return False
+        if not healthy:
+            return self._in_flight_unhealthy < self._max_concurrent_unhealthy
+        return True
+
+    def _start(self, healthy: bool) -> _InFlightTransaction:
+        transaction = _InFlightTransaction(healthy=healthy)
+        self._in_flight += 1
+        if not healthy:
+            self._in_flight_unhealthy += 1
+        elif self._max_concurrent is not None:
+            transaction.timer = self._clock.call_later(
+                UNHEALTHY_LATENCY_SECONDS, self._mark_unhealthy, transaction
+            )
+        return transaction
+
+    def _mark_unhealthy(self, transaction: _InFlightTransaction) -> None:
+        """Counts a transaction which has been in flight for a while as being to
+        an unhealthy destination.
+        """
+        transaction.timer = None
+        transaction.healthy = False
+        self._in_flight_unhealthy += 1
+        self._wake_waiting()
+
+    def _finish(self, transaction: _InFlightTransaction) -> None:
+        if transaction.timer is not None:
+            self._clock.cancel_call_later(transaction.timer)
+            transaction.timer = None
+
+        self._in_flight -= 1
+        if not transaction.healthy:
+            self._in_flight_unhealthy -= 1
+        self._wake_waiting()
+
+    def _wake_waiting(self) -> None:
+        """Starts as many of the waiting transactions as we can."""
+        while True:
+            if self._waiting and self._can_send(True):
+                healthy = True
+                _, _, d = heapq.heappop(self._waiting)
+            elif self._waiting_unhealthy and self._can_send(False):
+                healthy = False
+                _, _, d = heapq.heappop(self._waiting_unhealthy)
+            else:
+                return
+
+            if d.called:
+                # The waiting transaction was cancelled.
+                continue
+
+            d.callback(self._start(healthy))
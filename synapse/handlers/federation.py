@@ -33,7 +33,7 @@ from typing import (
 )
 
 import attr
-from prometheus_client import Histogram
+from prometheus_client import Counter, Histogram
 from signedjson.key import decode_verify_key_bytes
 from signedjson.sign import verify_signed_json
 from unpaddedbase64 import decode_base64
@@ -74,6 +74,7 @@ from synapse.storage.databases.main.events_worker import EventRedactBehaviour
 from synapse.types import JsonDict, StrCollection, get_domain_from_id
 from synapse.types.state import StateFilter
 from synapse.util.async_helpers import Linearizer
+from synapse.util.caches.response_cache import ResponseCache
 from synapse.util.retryutils import NotRetryingDestination
 from synapse.visibility import filter_events_for_server
 
@@ -105,6 +106,18 @@ backfill_processing_before_timer = Histogram(
     ),
 )
 
+backfill_prefetch_counter = Counter(
+    "synapse_federation_backfill_prefetches",
+    "Number of times clients paginating backwards asked to backfill ahead of "
+    "them, by whether a backfill was already being prefetched in the room",
+    ["deduplicated"],
+)
+
+# The minimum pagination limit to assume when prefetching backfill, so that we
+# backfill once clients get within `2 * BACKFILL_PREFETCH_MIN_LIMIT` events of a
+# gap in the room's history, even if they are paginating in small pages.
+BACKFILL_PREFETCH_MIN_LIMIT = 50
+
 
 # TODO: We can refactor this away now that there is only one backfill point again
 class _BackfillPointType(Enum):
@@ -170,6 +183,15 @@ class FederationHandler:
 
         self._room_backfill = Linearizer("room_backfill")
 
+        # Concurrent requests to backfill from the same point in a room share a
+        # single backfill.
+        self._backfill_response_cache: ResponseCache[
+            Tuple[str, int, int]
+        ] = ResponseCache(hs.get_clock(), "room_backfill")
+
+        # The rooms which we are prefetching backfill in.
+        self._backfill_prefetches: Set[str] = set()
+
         self._third_party_event_rules = (
             hs.get_module_api_callbacks().third_party_event_rules
         )
@@ -224,6 +246,59 @@ class FederationHandler:
         # linearizer lock queue in the timing
         processing_start_time = self.clock.time_msec() if record_time else 0
 
+        return await self._backfill_response_cache.wrap(
+            (room_id, current_depth, limit),
+            self._maybe_backfill,
+            room_id,
+            current_depth,
+            limit,
+            processing_start_time,
+        )
+
+    def prefetch_backfill(self, room_id: str, current_depth: int, limit: int) -> None:
+        """Backfills in the background if a client paginating backwards from
+        `current_depth` is approaching a backfill point, so that the events have
+        arrived by the time the client gets there.
+
+        Only one prefetch runs at a time in each room, which is shared by all the
+        clients paginating in it.
+
+        Args:
+            room_id
+            current_depth: The depth the client has paginated back to.
+            limit: The number of events the client is requesting at a time.
+        """
+        if room_id in self._backfill_prefetches:
+            backfill_prefetch_counter.labels("true").inc()
+            return
+
+        backfill_prefetch_counter.labels("false").inc()
+        self._backfill_prefetches.add(room_id)
+        run_as_background_process(
+            "prefetch_backfill",
+            self._prefetch_backfill,
+            room_id,
+            current_depth,
+            max(limit, BACKFILL_PREFETCH_MIN_LIMIT),
+        )
+
+    async def _prefetch_backfill(
+        self, room_id: str, current_depth: int, limit: int
+    ) -> None:
+        try:
+            await self.maybe_backfill(
+                room_id, current_depth, limit=limit, record_time=False
+            )
+        finally:
+            self._backfill_prefetches.discard(room_id)
+
+    async def _maybe_backfill(
+        self,
+        room_id: str,
+        current_depth: int,
+        limit: int,
+        processing_start_time: Optional[int],
+    ) -> bool:
         async with self._room_backfill.queue(room_id):
             async with self._worker_locks.acquire_read_write_lock(
                 PURGE_PAGINATION_LOCK_NAME, room_id, write=False
@@ -584,17 +584,16 @@ class PaginationHandler:
                         limit=pagin_config.limit,
                         event_filter=event_filter,
                     )
-            else:
-                # Otherwise, we can backfill in the background for eventual
-                # consistency's sake but we don't need to block the client waiting
-                # for a costly federation call and processing.
-                run_as_background_process(
-                    "maybe_backfill_in_the_background",
-                    self.hs.get_federation_handler().maybe_backfill,
-                    room_id,
-                    curr_topo,
-                    limit=pagin_config.limit,
-                )
+
+            # Either way, we backfill the history the client is likely to ask for
+            # next in the background, so that it has arrived by the time they
+            # do. This also backfills for eventual consistency's sake without
+            # blocking the client on a costly federation call.
+            self.hs.get_federation_handler().prefetch_backfill(
+                room_id,
+                min((event.depth for event in events), default=curr_topo),
+                limit=pagin_config.limit,
+            )
 
         next_token = from_token.copy_and_replace(StreamKeyType.ROOM, next_key)
 
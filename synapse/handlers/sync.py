@@ -17,6 +17,7 @@ from typing import (
     TYPE_CHECKING,
     AbstractSet,
     Any,
+    Collection,
     Dict,
     FrozenSet,
     List,
@@ -100,6 +101,12 @@ LAZY_LOADED_MEMBERS_CACHE_MAX_AGE = 30 * 60 * 1000
 # avoiding redundantly sending the same lazy-loaded members to the client
 LAZY_LOADED_MEMBERS_CACHE_MAX_SIZE = 100
 
+# How long to remember, for an incremental sync request, the point up to which
+# we know there is nothing to send to the client. Clients generally retry a
+# timed out long-poll straight away with the same token, so this only needs to
+# outlive a few requests.
+SYNC_SNAPSHOT_CACHE_MAX_AGE = 5 * 60 * 1000
+
 
 SyncRequestKey = Tuple[Any, ...]
 
@@ -295,6 +302,24 @@ class SyncHandler:
             expiry_ms=LAZY_LOADED_MEMBERS_CACHE_MAX_AGE,
         )
 
+        # ExpiringCache((SyncRequestKey, since token)) -> StreamToken
+        #
+        # For incremental syncs, the token up to which we have already computed
+        # an empty result for the request. As there is nothing to send between
+        # the request's `since` token and this token, the response for the
+        # request is the same as the response from this token. This means that
+        # when a long-polling request is woken up (or retried after timing out)
+        # we only have to look at what has changed since we last checked,
+        # rather than everything since the client's `since` token.
+        self._sync_snapshots: ExpiringCache[
+            Tuple[SyncRequestKey, StreamToken], StreamToken
+        ] = ExpiringCache(
+            "sync_snapshots",
+            self.clock,
+            max_len=0,
+            expiry_ms=SYNC_SNAPSHOT_CACHE_MAX_AGE,
+        )
+
         self.rooms_to_exclude_globally = hs.config.server.rooms_to_exclude_from_sync
 
     async def wait_for_sync_for_user(
@@ -372,18 +397,20 @@ class SyncHandler:
                 "Deleted %d to-device messages up to %d", deleted, since_stream_id
             )
 
-        if timeout == 0 or since_token is None or full_state:
+        if since_token is None or full_state:
             # we are going to return immediately, so don't bother calling
             # notifier.wait_for_events.
             result: SyncResult = await self.current_sync_for_user(
                 sync_config, since_token, full_state=full_state
             )
+        elif timeout == 0:
+            result = await self._incremental_sync_for_user(sync_config, since_token)
         else:
             # Otherwise, we wait for something to happen and report it to the user.
             async def current_sync_callback(
                 before_token: StreamToken, after_token: StreamToken
             ) -> SyncResult:
-                return await self.current_sync_for_user(sync_config, since_token)
+                return await self._incremental_sync_for_user(sync_config, since_token)
 
             result = await self.notifier.wait_for_events(
                 sync_config.user.to_string(),
@@ -412,6 +439,28 @@ class SyncHandler:
 
         return result
 
+    async def _incremental_sync_for_user(
+        self, sync_config: SyncConfig, since_token: StreamToken
+    ) -> SyncResult:
+        """Generates an incremental sync result for the request, starting from
+        the latest point up to which we know there is nothing to send.
+
+        If the result is empty, remembers its `next_batch` token so that the
+        next attempt at the same request only has to consider what has changed
+        since then.
+        """
+        # The request key normally includes the since token, but not all callers
+        # guarantee that.
+        snapshot_key = (sync_config.request_key, since_token)
+        from_token = self._sync_snapshots.get(snapshot_key, since_token)
+
+        result = await self.current_sync_for_user(sync_config, from_token)
+
+        if not result:
+            self._sync_snapshots[snapshot_key] = result.next_batch
+
+        return result
+
     async def current_sync_for_user(
         self,
         sync_config: SyncConfig,
@@ -1976,12 +2025,16 @@ class SyncHandler:
         # 3. Work out which rooms need reporting in the sync response.
         ignored_users = await self.store.ignored_users(user_id)
         if since_token:
-            room_changes = await self._get_room_changes_for_incremental_sync(
-                sync_result_builder, ignored_users
-            )
             tags_by_room = await self.store.get_updated_tags(
                 user_id, since_token.account_data_key
             )
+            room_changes = await self._get_room_changes_for_incremental_sync(
+                sync_result_builder,
+                ignored_users,
+                rooms_with_other_updates=ephemeral_by_room.keys()
+                | account_data_by_room.keys()
+                | tags_by_room.keys(),
+            )
         else:
             room_changes = await self._get_room_changes_for_initial_sync(
                 sync_result_builder, ignored_users
@@ -2035,16 +2088,17 @@ class SyncHandler:
         if membership_change_events or sync_result_builder.forced_newly_joined_room_ids:
             return True
 
-        stream_id = since_token.room_key.stream
-        for room_id in sync_result_builder.joined_room_ids:
-            if self.store.has_room_changed_since(room_id, stream_id):
-                return True
-        return False
+        return bool(
+            self.store.get_rooms_that_changed(
+                sync_result_builder.joined_room_ids, since_token.room_key
+            )
+        )
 
     async def _get_room_changes_for_incremental_sync(
         self,
         sync_result_builder: "SyncResultBuilder",
         ignored_users: FrozenSet[str],
+        rooms_with_other_updates: AbstractSet[str] = frozenset(),
     ) -> _RoomChanges:
         """Determine the changes in rooms to report to the user.
 
@@ -2065,6 +2119,10 @@ class SyncHandler:
         more complicated, so instead we report an intermediary `RoomSyncResultBuilder`
         struct, and leave the additional work to `_generate_room_entry`.
 
+        Joined rooms without any new events are only included if they are in
+        `rooms_with_other_updates` (i.e. there are ephemeral events, account data
+        or tags to send for them), or if this is a full state sync.
+
         The sync_result_builder is not modified by this function.
         """
         user_id = sync_result_builder.sync_config.user.to_string()
@@ -2244,9 +2302,24 @@ class SyncHandler:
             limit=timeline_limit + 1,
         )
 
-        # We loop through all room ids, even if there are no new events, in case
-        # there are non room events that we need to notify about.
-        for room_id in sync_result_builder.joined_room_ids:
+        # For a full state sync we need an entry for every joined room, even if
+        # there are no new events. Otherwise we only need entries for rooms
+        # where there is something to report: new events, the user having
+        # joined, or non room events that we need to notify about. The user
+        # may be in a great many rooms, so we avoid looping through all of
+        # them when only a few have changed.
+        if sync_result_builder.full_state:
+            joined_room_ids_to_sync: Collection[
+                str
+            ] = sync_result_builder.joined_room_ids
+        else:
+            joined_room_ids_to_sync = (
+                room_to_events.keys()
+                | set(newly_joined_rooms)
+                | rooms_with_other_updates
+            ) & sync_result_builder.joined_room_ids
+
+        for room_id in joined_room_ids_to_sync:
             room_entry = room_to_events.get(room_id, None)
 
             newly_joined = room_id in newly_joined_rooms
@@ -0,0 +1,690 @@
+# Copyright 2023 The Matrix.org Foundation C.I.C.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""An HTTP/2 client for federation requests, which multiplexes all the requests
+to a destination over a single connection.
+
+Requires the `h2` package (the `http2` extra).
+"""
+
+import logging
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple, cast
+
+import h2.config
+import h2.connection
+import h2.errors
+import h2.events
+import h2.exceptions
+from prometheus_client import Gauge
+from zope.interface import implementer
+
+from twisted.internet import defer
+from twisted.internet.interfaces import (
+    IConsumer,
+    IDelayedCall,
+    IHandshakeListener,
+    IProducer,
+    IProtocol,
+    IPushProducer,
+    IReactorTime,
+    ISSLTransport,
+    ITransport,
+)
+from twisted.internet.protocol import Factory, Protocol, connectionDone
+from twisted.python.failure import Failure
+from twisted.web.client import URI, ResponseDone, ResponseFailed
+from twisted.web.http import RESPONSES
+from twisted.web.http_headers import Headers
+from twisted.web.iweb import (
+    UNKNOWN_LENGTH,
+    IAgent,
+    IAgentEndpointFactory,
+    IBodyProducer,
+    IClientRequest,
+    IResponse,
+)
+
+from synapse.http.federation.matrix_federation_agent import connection_requests_counter
+from synapse.logging.context import make_deferred_yieldable, run_in_background
+from synapse.util.async_helpers import ObservableDeferred
+
+logger = logging.getLogger(__name__)
+
+open_connections_gauge = Gauge(
+    "synapse_http_federation_http2_open_connections",
+    "Number of HTTP/2 connections open to other homeservers",
+)
+
+# The ALPN protocol IDs we offer when connecting. Servers which don't support
+# HTTP/2 will pick HTTP/1.1, in which case we fall back to the HTTP/1.1 agent.
+ALPN_PROTOCOLS = [b"h2", b"http/1.1"]
+
+# How long to keep sending requests to a destination over HTTP/1.1 after we
+# found that it doesn't support HTTP/2, before trying HTTP/2 again.
+HTTP1_FALLBACK_PERIOD_SECONDS = 60 * 60
+
+# How long to keep a connection open without any requests on it.
+IDLE_CONNECTION_TIMEOUT_SECONDS = 2 * 60
+
+# Headers which are specific to an HTTP/1.1 connection, and must not be sent
+# over HTTP/2. (The `host` header is sent as the `:authority` pseudo-header.)
+_CONNECTION_SPECIFIC_HEADERS = frozenset(
+    (
+        b"connection",
+        b"host",
+        b"keep-alive",
+        b"proxy-connection",
+        b"transfer-encoding",
+        b"upgrade",
+    )
+)
+
+
+class Http2ConnectionLost(Exception):
+    """The connection was lost before the response to a request was complete."""
+
+
+class Http2StreamReset(Exception):
+    """The server reset the stream of a request."""
+
+    def __init__(self, error_code: int):
+        super().__init__("Stream reset with error code %d" % (error_code,))
+        self.error_code = error_code
+
+
+@implementer(IConsumer)
+class _BodyCollector:
+    """Collects the body written by an `IBodyProducer`."""
+
+    def __init__(self) -> None:
+        self.chunks: List[bytes] = []
+
+    def registerProducer(self, producer: IProducer, streaming: bool) -> None:
+        pass
+
+    def unregisterProducer(self) -> None:
+        pass
+
+    def write(self, data: bytes) -> None:
+        self.chunks.append(data)
+
+
+@implementer(IPushProducer)
+class _StreamTransport:
+    """The transport given to the protocol which the body of a response is
+    delivered to, which allows it to stop receiving the body.
+    """
+
+    def __init__(self, connection: "Http2ClientProtocol", stream_id: int):
+        self._connection = connection
+        self._stream_id = stream_id
+
+    def pauseProducing(self) -> None:
+        # We don't apply back-pressure to the server, as the bodies of federation
+        # responses are buffered in memory anyway.
+        pass
+
+    def resumeProducing(self) -> None:
+        pass
+
+    def stopProducing(self) -> None:
+        self._connection.cancel_stream(self._stream_id)
+
+    def loseConnection(self) -> None:
+        self.stopProducing()
+
+    def abortConnection(self) -> None:
+        self.stopProducing()
+
+
+@implementer(IResponse)
+class _Http2Response:
+    """The response to a request made over HTTP/2."""
+
+    version = (b"HTTP", 2, 0)
+    request: Optional[IClientRequest] = None
+    previousResponse: Optional[IResponse] = None
+
+    def __init__(
+        self,
+        connection: "Http2ClientProtocol",
+        stream_id: int,
+        code: int,
+        headers: Headers,
+    ):
+        self._connection = connection
+        self._stream_id = stream_id
+        self.code = code
+        self.phrase = RESPONSES.get(code, b"Unknown Status")
+        self.headers = headers
+
+        self.length: Any = UNKNOWN_LENGTH
+        content_length = headers.getRawHeaders(b"content-length")
+        if content_length:
+            try:
+                self.length = int(content_length[0])
+            except ValueError:
+                pass
+
+        # The body received before `deliverBody` was called, and how it ended.
+        self._buffer: List[bytes] = []
+        self._finished: Optional[Failure] = None
+
+        self._body_protocol: Optional[IProtocol] = None
+
+    def setPreviousResponse(self, response: IResponse) -> None:
+        self.previousResponse = response
+
+    def deliverBody(self, protocol: IProtocol) -> None:
+        self._body_protocol = protocol
+        # Like twisted's own responses, the "transport" is only a producer.
+        protocol.makeConnection(
+            cast(ITransport, _StreamTransport(self._connection, self._stream_id))
+        )
+
+        for data in self._buffer:
+            protocol.dataReceived(data)
+        self._buffer = []
+
+        if self._finished is not None:
+            protocol.connectionLost(self._finished)
+
+    def data_received(self, data: bytes) -> None:
+        if self._body_protocol is None:
+            self._buffer.append(data)
+        else:
+            self._body_protocol.dataReceived(data)
+
+    def finished(self, reason: Failure) -> None:
+        if self._finished is not None:
+            return
+
+        self._finished = reason
+        if self._body_protocol is not None:
+            self._body_protocol.connectionLost(reason)
+
+
+class _Stream:
+    """The state of a request sent on a connection."""
+
+    def __init__(self, response_deferred: "defer.Deferred[IResponse]", body: bytes):
+        self.response_deferred = response_deferred
+        self.response: Optional[_Http2Response] = None
+
+        # The part of the request body which we have yet to send, as we are
+        # waiting for the server to open its flow control window.
+        self.pending_body = body
+
+    def fail(self, reason: Failure) -> None:
+        if not self.response_deferred.called:
+            self.response_deferred.errback(ResponseFailed([reason]))
+        elif self.response is not None:
+            self.response.finished(reason)
+
+
+@implementer(IHandshakeListener)
+class Http2ClientProtocol(Protocol):
+    """A connection to a server which multiplexes requests over HTTP/2.
+
+    If the connection is over TLS, HTTP/2 is only used if it is negotiated with
+    ALPN: `negotiated` fires with whether it was. Otherwise (which is only
+    supported for the benefit of the unit tests), the server is assumed to
+    support HTTP/2.
+    """
+
+    def __init__(self, reactor: IReactorTime):
+        self._reactor = reactor
+        self._conn = h2.connection.H2Connection(
+            h2.config.H2Configuration(client_side=True, header_encoding=None)
+        )
+        self._streams: Dict[int, _Stream] = {}
+
+        # Requests waiting for the number of concurrent streams allowed by the
+        # server to drop.
+        self._waiting_for_stream: Deque["defer.Deferred[None]"] = deque()
+
+        # Fires with whether we are speaking HTTP/2 on the connection.
+        self.negotiated: "defer.Deferred[bool]" = defer.Deferred()
+
+        # Fires when the connection is lost.
+        self.closed: "defer.Deferred[None]" = defer.Deferred()
+
+        self._started = False
+
+        # Whether we may send new requests on the connection.
+        self._accepting_requests = False
+
+        self._idle_timer: Optional[IDelayedCall] = None
+
+    def connectionMade(self) -> None:
+        if not ISSLTransport.providedBy(self.transport):
+            self._start()
+
+    def handshakeCompleted(self) -> None:
+        negotiated_protocol = getattr(self.transport, "negotiatedProtocol", None)
+        if negotiated_protocol == b"h2":
+            self._start()
+        else:
+            logger.debug("Server negotiated %r rather than h2", negotiated_protocol)
+            self.negotiated.callback(False)
+            self._close()
+
+    def _start(self) -> None:
+        self._started = True
+        self._accepting_requests = True
+        open_connections_gauge.inc()
+
+        self._conn.initiate_connection()
+        self._flush()
+        self._reset_idle_timer()
+        self.negotiated.callback(True)
+
+    def is_usable(self) -> bool:
+        """Whether new requests can be sent on this connection."""
+        return self._accepting_requests
+
+    async def request(
+        self,
+        method: bytes,
+        uri: URI,
+        headers: Headers,
+        body_producer: Optional[IBodyProducer],
+    ) -> IResponse:
+        """Sends a request on the connection.
+
+        Returns:
+            The response, once its headers have been received.
+        """
+        body = b""
+        if body_producer is not None:
+            collector = _BodyCollector()
+            await make_deferred_yieldable(body_producer.startProducing(collector))
+            body = b"".join(collector.chunks)
+
+        # Wait until the server lets us open another stream.
+        while self._accepting_requests and not self._has_available_stream():
+            d: "defer.Deferred[None]" = defer.Deferred()
+            self._waiting_for_stream.append(d)
+            await make_deferred_yieldable(d)
+
+        if not self._accepting_requests:
+            raise ResponseFailed([Failure(Http2ConnectionLost())])
+
+        stream_id = self._conn.get_next_available_stream_id()
+
+        request_headers = [
+            (b":method", method),
+            (b":scheme", b"https"),
+            (b":authority", _get_authority(uri, headers)),
+            (b":path", uri.originForm),
+        ]
+        for name, values in headers.getAllRawHeaders():
+            name = name.lower()
+            if name in _CONNECTION_SPECIFIC_HEADERS:
+                continue
+            request_headers.extend((name, value) for value in values)
+        if body_producer is not None:
+            request_headers.append((b"content-length", b"%d" % (len(body),)))
+
+        response_deferred: "defer.Deferred[IResponse]" = defer.Deferred(
+            lambda _: self.cancel_stream(stream_id)
+        )
+        self._streams[stream_id] = _Stream(response_deferred, body)
+        self._cancel_idle_timer()
+
+        self._conn.send_headers(stream_id, request_headers, end_stream=not body)
+        self._send_pending_body(stream_id)
+        self._flush()
+
+        return await make_deferred_yieldable(response_deferred)
+
+    def cancel_stream(self, stream_id: int) -> None:
+        """Stops the request on the given stream, if it is still in progress."""
+        stream = self._streams.pop(stream_id, None)
+        if stream is None:
+            return
+
+        try:
+            self._conn.reset_stream(stream_id, h2.errors.ErrorCodes.CANCEL)
+        except h2.exceptions.StreamClosedError:
+            pass
+        self._flush()
+
+        # If we are still waiting for the response, this is being called as the
+        # response deferred is cancelled, which then fails with `CancelledError`.
+        if stream.response is not None:
+            stream.response.finished(Failure(defer.CancelledError()))
+        self._stream_closed()
+
+    def _has_available_stream(self) -> bool:
+        return (
+            self._conn.open_outbound_streams
+            < self._conn.remote_settings.max_concurrent_streams
+        )
+
+    def _send_pending_body(self, stream_id: int) -> None:
+        """Sends as much of the body of the request on the stream as flow
+        control allows.
+        """
+        stream = self._streams.get(stream_id)
+        if stream is None or not stream.pending_body:
+            return
+
+        while stream.pending_body:
+            window = self._conn.local_flow_control_window(stream_id)
+            if window <= 0:
+                return
+
+            chunk_size = min(window, self._conn.max_outbound_frame_size)
+            chunk = stream.pending_body[:chunk_size]
+            stream.pending_body = stream.pending_body[chunk_size:]
+            self._conn.send_data(stream_id, chunk, end_stream=not stream.pending_body)
+
+    def dataReceived(self, data: bytes) -> None:
+        try:
+            events = self._conn.receive_data(data)
+        except h2.exceptions.ProtocolError as e:
+            logger.info("HTTP/2 protocol error from server: %s", e)
+            self._flush()
+            self._close()
+            return
+
+        for event in events:
+            if isinstance(event, h2.events.ResponseReceived):
+                self._response_received(event.stream_id, event.headers)
+            elif isinstance(event, h2.events.DataReceived):
+                self._data_received(
+                    event.stream_id, event.data, event.flow_controlled_length
+                )
+            elif isinstance(event, h2.events.StreamEnded):
+                self._stream_ended(event.stream_id, Failure(ResponseDone()))
+            elif isinstance(event, h2.events.StreamReset):
+                self._stream_ended(
+                    event.stream_id, Failure(Http2StreamReset(event.error_code))
+                )
+            elif isinstance(event, h2.events.WindowUpdated):
+                if event.stream_id:
+                    self._send_pending_body(event.stream_id)
+                else:
+                    for stream_id in list(self._streams):
+                        self._send_pending_body(stream_id)
+            elif isinstance(event, h2.events.RemoteSettingsChanged):
+                self._wake_waiting_requests()
+            elif isinstance(event, h2.events.ConnectionTerminated):
+                # The server is going away: the streams it has processed will
+                # still complete, but we mustn't send any new ones.
+                logger.debug("Server closed HTTP/2 connection: %s", event)
+                self._stop_accepting_requests()
+                last_stream_id = event.last_stream_id or 0
+                for stream_id in [s for s in self._streams if s > last_stream_id]:
+                    self._stream_ended(
+                        stream_id, Failure(Http2ConnectionLost("Connection closed"))
+                    )
+                if not self._streams:
+                    self._close()
+
+        self._flush()
+
+    def _response_received(
+        self, stream_id: int, raw_headers: List[Tuple[bytes, bytes]]
+    ) -> None:
+        stream = self._streams.get(stream_id)
+        if stream is None:
+            return
+
+        code = 0
+        headers = Headers()
+        for name, value in raw_headers:
+            if name == b":status":
+                code = int(value)
+            elif not name.startswith(b":"):
+                headers.addRawHeader(name, value)
+
+        stream.response = _Http2Response(self, stream_id, code, headers)
+        stream.response_deferred.callback(stream.response)
+
+    def _data_received(
+        self, stream_id: int, data: bytes, flow_controlled_length: int
+    ) -> None:
+        # We buffer the whole body in memory, so let the server keep sending.
+        self._conn.acknowledge_received_data(flow_controlled_length, stream_id)
+
+        stream = self._streams.get(stream_id)
+        if stream is not None and stream.response is not None:
+            stream.response.data_received(data)
+
+    def _stream_ended(self, stream_id: int, reason: Failure) -> None:
+        stream = self._streams.pop(stream_id, None)
+        if stream is None:
+            return
+
+        if stream.response is not None:
+            stream.response.finished(reason)
+        else:
+            stream.fail(reason)
+        self._stream_closed()
+
+    def _stream_closed(self) -> None:
+        self._wake_waiting_requests()
+        if not self._streams:
+            if self._accepting_requests:
+                self._reset_idle_timer()
+            else:
+                self._close()
+
+    def _wake_waiting_requests(self) -> None:
+        while self._waiting_for_stream and (
+            self._has_available_stream() or not self._accepting_requests
+        ):
+            self._waiting_for_stream.popleft().callback(None)
+
+    def _stop_accepting_requests(self) -> None:
+        self._accepting_requests = False
+        self._cancel_idle_timer()
+        self._wake_waiting_requests()
+
+    def _reset_idle_timer(self) -> None:
+        self._cancel_idle_timer()
+        self._idle_timer = self._reactor.callLater(
+            IDLE_CONNECTION_TIMEOUT_SECONDS, self._close_idle_connection
+        )
+
+    def _cancel_idle_timer(self) -> None:
+        if self._idle_timer is not None and self._idle_timer.active():
+            self._idle_timer.cancel()
+        self._idle_timer = None
+
+    def _close_idle_connection(self) -> None:
+        self._idle_timer = None
+        if self._streams:
+            return
+
+        logger.debug("Closing idle HTTP/2 connection")
+        self._accepting_requests = False
+        self._conn.close_connection()
+        self._flush()
+        self._close()
+
+    def _flush(self) -> None:
+        data = self._conn.data_to_send()
+        if data:
+            assert self.transport is not None
+            self.transport.write(data)
+
+    def _close(self) -> None:
+        assert self.transport is not None
+        self.transport.loseConnection()
+
+    def connectionLost(self, reason: Failure = connectionDone) -> None:
+        if self._started:
+            open_connections_gauge.dec()
+            self._started = False
+        elif not self.negotiated.called:
+            self.negotiated.errback(reason)
+
+        self._stop_accepting_requests()
+
+        streams = self._streams
+        self._streams = {}
+        for stream in streams.values():
+            stream.fail(Failure(Http2ConnectionLost(reason.getErrorMessage())))
+
+        self.closed.callback(None)
+
+
+def _get_authority(uri: URI, headers: Headers) -> bytes:
+    host = headers.getRawHeaders(b"host")
+    if host:
+        return host[0]
+    return uri.netloc
+
+
+class _Http2ClientFactory(Factory):
+    def __init__(self, reactor: IReactorTime):
+        self._reactor = reactor
+
+    def buildProtocol(self, addr: Any) -> Http2ClientProtocol:
+        return Http2ClientProtocol(self._reactor)
+
+
+_ConnectionKey = Tuple[bytes, bytes, int]
+
+
+@implementer(IAgent)
+class Http2Agent:
+    """An agent which sends all the requests to each server over a single
+    HTTP/2 connection, falling back to another agent for servers which don't
+    support HTTP/2.
+
+    Args:
+        reactor: twisted reactor to use for timing out idle connections.
+        endpoint_factory: factory for the endpoints to connect to. If the
+            connection uses TLS, it must offer the `ALPN_PROTOCOLS`.
+        fallback_agent: the agent used for servers which don't support HTTP/2.
+    """
+
+    def __init__(
+        self,
+        reactor: IReactorTime,
+        endpoint_factory: IAgentEndpointFactory,
+        fallback_agent: IAgent,
+    ):
+        self._reactor = reactor
+        self._endpoint_factory = endpoint_factory
+        self._fallback_agent = fallback_agent
+
+        self._connections: Dict[_ConnectionKey, Http2ClientProtocol] = {}
+
+        # Connections which are being established, so that concurrent requests
+        # wait for them rather than opening their own.
+        self._pending_connections: Dict[
+            _ConnectionKey, ObservableDeferred[Optional[Http2ClientProtocol]]
+        ] = {}
+
+        # When we last found that a server doesn't support HTTP/2.
+        self._http1_servers: Dict[_ConnectionKey, float] = {}
+
+    def request(
+        self,
+        method: bytes,
+        uri: bytes,
+        headers: Optional[Headers] = None,
+        bodyProducer: Optional[IBodyProducer] = None,
+    ) -> "defer.Deferred[IResponse]":
+        return run_in_background(
+            self._request, method, uri, headers or Headers(), bodyProducer
+        )
+
+    async def _request(
+        self,
+        method: bytes,
+        uri: bytes,
+        headers: Headers,
+        body_producer: Optional[IBodyProducer],
+    ) -> IResponse:
+        parsed_uri = URI.fromBytes(uri)
+        key = (parsed_uri.scheme, parsed_uri.host, parsed_uri.port)
+
+        connection = None
+        fallen_back_at = self._http1_servers.get(key)
+        if (
+            fallen_back_at is None
+            or self._reactor.seconds() - fallen_back_at > HTTP1_FALLBACK_PERIOD_SECONDS
+        ):
+            connection = await self._get_connection(key, parsed_uri)
+
+        if connection is None:
+            return await make_deferred_yieldable(
+                self._fallback_agent.request(method, uri, headers, body_producer)
+            )
+
+        return await connection.request(method, parsed_uri, headers, body_producer)
+
+    async def _get_connection(
+        self, key: _ConnectionKey, parsed_uri: URI
+    ) -> Optional[Http2ClientProtocol]:
+        """Gets an HTTP/2 connection to the server, connecting if there isn't
+        already one.
+
+        Returns:
+            The connection, or None if the server doesn't support HTTP/2.
+        """
+        connection = self._connections.get(key)
+        if connection is not None and connection.is_usable():
+            connection_requests_counter.labels("h2", "reused").inc()
+            return connection
+
+        pending = self._pending_connections.get(key)
+        if pending is None:
+            pending = ObservableDeferred(
+                run_in_background(self._connect, key, parsed_uri), consumeErrors=True
+            )
+            self._pending_connections[key] = pending
+
+        try:
+            connection = await make_deferred_yieldable(pending.observe())
+        finally:
+            if self._pending_connections.get(key) is pending:
+                del self._pending_connections[key]
+
+        if connection is not None:
+            connection_requests_counter.labels("h2", "new").inc()
+        return connection
+
+    async def _connect(
+        self, key: _ConnectionKey, parsed_uri: URI
+    ) -> Optional[Http2ClientProtocol]:
+        endpoint = self._endpoint_factory.endpointForURI(parsed_uri)
+        connection = await make_deferred_yieldable(
+            endpoint.connect(_Http2ClientFactory(self._reactor))
+        )
+        assert isinstance(connection, Http2ClientProtocol)
+
+        if not await make_deferred_yieldable(connection.negotiated):
+            self._http1_servers[key] = self._reactor.seconds()
+            return None
+
+        self._http1_servers.pop(key, None)
+        self._connections[key] = connection
+        connection.closed.addCallback(
+            lambda _: self._on_connection_closed(key, connection)
+        )
+        return connection
+
+    def _on_connection_closed(
+        self, key: _ConnectionKey, connection: Http2ClientProtocol
+    ) -> None:
+        if self._connections.get(key) is connection:
+            del self._connections[key]
@@ -20,6 +20,7 @@ from urllib.request import (  # type: ignore[attr-defined]
 )
 
 from netaddr import AddrFormatError, IPAddress, IPSet
+from prometheus_client import Counter
 from zope.interface import implementer
 
 from twisted.internet import defer
@@ -47,6 +48,36 @@ from synapse.util import Clock
 
 logger = logging.getLogger(__name__)
 
+connection_requests_counter = Counter(
+    "synapse_http_federation_connection_requests",
+    "Number of outbound federation requests, by the HTTP version they were sent "
+    "with and whether they were sent on a new connection or reused one",
+    ["protocol", "connection"],
+)
+
+
+class _FederationConnectionPool(HTTPConnectionPool):
+    """An `HTTPConnectionPool` which tracks how often connections are reused."""
+
+    # Whether the connection being got is a new one.
+    _new_connection = False
+
+    def getConnection(
+        self, key: Any, endpoint: IStreamClientEndpoint
+    ) -> "defer.Deferred[Any]":
+        self._new_connection = False
+        d = super().getConnection(key, endpoint)
+        connection_requests_counter.labels(
+            "http/1.1", "new" if self._new_connection else "reused"
+        ).inc()
+        return d
+
+    def _newConnection(
+        self, key: Any, endpoint: IStreamClientEndpoint
+    ) -> "defer.Deferred[Any]":
+        self._new_connection = True
+        return super()._newConnection(key, endpoint)
+
 
 @implementer(IAgent)
 class MatrixFederationAgent:
@@ -75,6 +106,9 @@ class MatrixFederationAgent:
            reactor might have some blocking applied (i.e. for DNS queries),
            but we need unblocked access to the proxy.
 
+        http2: whether to send requests over HTTP/2 to the servers which
+            support it. Requires the `h2` library.
+
         _srv_resolver:
             SrvResolver implementation to use for looking up SRV records. None
             to use a default implementation.
@@ -91,6 +125,7 @@ class MatrixFederationAgent:
         user_agent: bytes,
         ip_allowlist: Optional[IPSet],
         ip_blocklist: IPSet,
+        http2: bool = False,
         _srv_resolver: Optional[SrvResolver] = None,
         _well_known_resolver: Optional[WellKnownResolver] = None,
     ):
@@ -102,12 +137,12 @@ class MatrixFederationAgent:
         reactor = BlocklistingReactorWrapper(reactor, ip_allowlist, ip_blocklist)
 
         self._clock = Clock(reactor)
-        self._pool = HTTPConnectionPool(reactor)
+        self._pool = _FederationConnectionPool(reactor)
         self._pool.retryAutomatically = False
         self._pool.maxPersistentPerHost = 5
         self._pool.cachedConnectionTimeout = 2 * 60
 
-        self._agent = Agent.usingEndpointFactory(
+        self._agent: IAgent = Agent.usingEndpointFactory(
             reactor,
             MatrixHostnameEndpointFactory(
                 reactor,
@@ -117,6 +152,22 @@ class MatrixFederationAgent:
             ),
             pool=self._pool,
         )
+        if http2:
+            from synapse.http.federation.http2 import ALPN_PROTOCOLS, Http2Agent
+
+            # Servers which don't agree to HTTP/2 when we connect to them are
+            # sent requests with the HTTP/1.1 agent.
+            self._agent = Http2Agent(
+                reactor,
+                MatrixHostnameEndpointFactory(
+                    reactor,
+                    proxy_reactor,
+                    tls_client_options_factory,
+                    _srv_resolver,
+                    alpn_protocols=ALPN_PROTOCOLS,
+                ),
+                fallback_agent=self._agent,
+            )
         self.user_agent = user_agent
 
         if _well_known_resolver is None:
@@ -230,10 +281,12 @@ class MatrixHostnameEndpointFactory:
         proxy_reactor: IReactorCore,
         tls_client_options_factory: Optional[FederationPolicyForHTTPS],
         srv_resolver: Optional[SrvResolver],
+        alpn_protocols: Optional[List[bytes]] = None,
     ):
         self._reactor = reactor
         self._proxy_reactor = proxy_reactor
         self._tls_client_options_factory = tls_client_options_factory
+        self._alpn_protocols = alpn_protocols
 
         if srv_resolver is None:
             srv_resolver = SrvResolver()
@@ -247,6 +300,7 @@ class MatrixHostnameEndpointFactory:
             self._tls_client_options_factory,
             self._srv_resolver,
             parsed_uri,
+            self._alpn_protocols,
         )
 
 
@@ -264,6 +318,8 @@ class MatrixHostnameEndpoint:
             factory to use for fetching client tls options, or none to disable TLS.
         srv_resolver: The SRV resolver to use
         parsed_uri: The parsed URI that we're wanting to connect to.
+        alpn_protocols: The protocols to offer with ALPN when connecting over
+            TLS, or None to not use ALPN.
 
     Raises:
         ValueError if the environment variables contain an invalid proxy specification.
@@ -277,6 +333,7 @@ class MatrixHostnameEndpoint:
         tls_client_options_factory: Optional[FederationPolicyForHTTPS],
         srv_resolver: SrvResolver,
         parsed_uri: URI,
+        alpn_protocols: Optional[List[bytes]] = None,
     ):
         self._reactor = reactor
         self._parsed_uri = parsed_uri
@@ -306,7 +363,7 @@ class MatrixHostnameEndpoint:
             self._tls_options = None
         else:
             self._tls_options = tls_client_options_factory.get_options(
-                self._parsed_uri.host
+                self._parsed_uri.host, alpn_protocols
             )
 
         self._srv_resolver = srv_resolver
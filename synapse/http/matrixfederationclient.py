@@ -18,11 +18,13 @@ import logging
 import random
 import sys
 import urllib.parse
+from contextlib import asynccontextmanager
 from http import HTTPStatus
 from io import BytesIO, StringIO
 from typing import (
     TYPE_CHECKING,
     Any,
+    AsyncIterator,
     BinaryIO,
     Callable,
     Dict,
@@ -80,7 +82,7 @@ from synapse.logging.context import make_deferred_yieldable, run_in_background
 from synapse.logging.opentracing import set_tag, start_active_span, tags
 from synapse.types import JsonDict
 from synapse.util import json_decoder
-from synapse.util.async_helpers import AwakenableSleeper, timeout_deferred
+from synapse.util.async_helpers import AwakenableSleeper, Linearizer, timeout_deferred
 from synapse.util.metrics import Measure
 from synapse.util.stringutils import parse_and_validate_server_name
 
@@ -413,6 +415,7 @@ class MatrixFederationHttpClient:
                 user_agent.encode("ascii"),
                 hs.config.server.federation_ip_range_allowlist,
                 hs.config.server.federation_ip_range_blocklist,
+                http2=hs.config.federation.client_http2,
             )
         else:
             proxy_authorization_secret = hs.config.worker.worker_replication_secret
@@ -458,6 +461,31 @@ class MatrixFederationHttpClient:
 
         self._sleeper = AwakenableSleeper(self.reactor)
 
+        # Limits the number of requests waiting for a response from each
+        # destination at once.
+        max_concurrent_requests = (
+            hs.config.federation.client_max_concurrent_requests_per_destination
+        )
+        self._destination_limiter: Optional[Linearizer] = None
+        if max_concurrent_requests:
+            self._destination_limiter = Linearizer(
+                name="federation_client_destination",
+                max_count=max_concurrent_requests,
+                clock=self.clock,
+            )
+
+    @asynccontextmanager
+    async def _limit_concurrent_requests(self, destination: str) -> AsyncIterator[None]:
+        """Waits until another request can be sent to the given destination, and
+        counts the request against the limit until the context is exited.
+        """
+        if self._destination_limiter is None:
+            yield
+            return
+
+        async with self._destination_limiter.queue(destination):
+            yield
+
     def wake_destination(self, destination: str) -> None:
         """Called when the remote server may have come back online."""
 
@@ -678,33 +706,40 @@ class MatrixFederationHttpClient:
 
                     outgoing_requests_counter.labels(request.method).inc()
 
+                    async def send_request() -> IResponse:
+                        # The timeout covers any time spent waiting for the
+                        # destination to have capacity for another request.
+                        async with self._limit_concurrent_requests(request.destination):
+                            with Measure(self.clock, "outbound_request"):
+                                # we don't want all the fancy cookie and redirect handling
+                                # that treq.request gives: just use the raw Agent.
+                                return await make_deferred_yieldable(
+                                    run_in_background(
+                                        self.agent.request,
+                                        method_bytes,
+                                        url_bytes,
+                                        headers=Headers(headers_dict),
+                                        bodyProducer=producer,
+                                    )
+                                )
+
                     try:
-                        with Measure(self.clock, "outbound_request"):
-                            # we don't want all the fancy cookie and redirect handling
-                            # that treq.request gives: just use the raw Agent.
-
-                            # To preserve the logging context, the timeout is treated
-                            # in a similar way to `defer.gatherResults`:
-                            # * Each logging context-preserving fork is wrapped in
-                            #   `run_in_background`. In this case there is only one,
-                            #   since the timeout fork is not logging-context aware.
-                            # * The `Deferred` that joins the forks back together is
-                            #   wrapped in `make_deferred_yieldable` to restore the
-                            #   logging context regardless of the path taken.
-                            request_deferred = run_in_background(
-                                self.agent.request,
-                                method_bytes,
-                                url_bytes,
-                                headers=Headers(headers_dict),
-                                bodyProducer=producer,
-                            )
-                            request_deferred = timeout_deferred(
-                                request_deferred,
-                                timeout=_sec_timeout,
-                                reactor=self.reactor,
-                            )
+                        # To preserve the logging context, the timeout is treated
+                        # in a similar way to `defer.gatherResults`:
+                        # * Each logging context-preserving fork is wrapped in
+                        #   `run_in_background`. In this case there is only one,
+                        #   since the timeout fork is not logging-context aware.
+                        # * The `Deferred` that joins the forks back together is
+                        #   wrapped in `make_deferred_yieldable` to restore the
+                        #   logging context regardless of the path taken.
+                        request_deferred = run_in_background(send_request)
+                        request_deferred = timeout_deferred(
+                            request_deferred,
+                            timeout=_sec_timeout,
+                            reactor=self.reactor,
+                        )
 
-                            response = await make_deferred_yieldable(request_deferred)
+                        response = await make_deferred_yieldable(request_deferred)
                     except DNSLookupError as e:
                         raise RequestSendFailed(e, can_retry=retry_on_dns_fail) from e
                     except Exception as e:
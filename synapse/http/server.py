@@ -15,6 +15,7 @@
 
 import abc
 import html
+import itertools
 import logging
 import types
 import urllib
@@ -40,6 +41,7 @@ from typing import (
 import attr
 import jinja2
 from canonicaljson import encode_canonical_json
+from immutabledict import immutabledict
 from typing_extensions import Protocol
 from zope.interface import implementer
 
@@ -66,12 +68,17 @@ from synapse.api.errors import (
     UnrecognizedRequestError,
 )
 from synapse.config.homeserver import HomeServerConfig
-from synapse.logging.context import defer_to_thread, preserve_fn, run_in_background
+from synapse.logging.context import (
+    defer_to_thread,
+    make_deferred_yieldable,
+    preserve_fn,
+    run_in_background,
+)
 from synapse.logging.opentracing import active_span, start_active_span, trace_servlet
-from synapse.util import json_encoder
+from synapse.util import PreencodedJsonDict, json_encoder
 from synapse.util.caches import intern_dict
 from synapse.util.cancellation import is_function_cancellable
-from synapse.util.iterutils import chunk_seq
+from synapse.util.iterutils import batch_iter, chunk_seq
 
 if TYPE_CHECKING:
     import opentracing
@@ -738,6 +745,134 @@ class _ByteProducer:
         self._request = None
 
 
+@implementer(interfaces.IPushProducer)
+class _ThreadedByteProducer:
+    """
+    Write bytes to the request as they are produced by an iterator which is
+    advanced on a thread, a chunk at a time, so that expensive iterators (such
+    as encoding a large JSON response) don't block the reactor.
+
+    Only one chunk is produced at once, and no more are produced while the
+    request is paused.
+    """
+
+    # The minimum number of bytes to produce on the thread at once. Note that
+    # the last chunk will usually be smaller than this.
+    min_chunk_size = 64 * 1024
+
+    def __init__(
+        self,
+        request: "SynapseRequest",
+        iterator: Iterator[bytes],
+    ):
+        self._request: Optional["SynapseRequest"] = request
+        self._reactor = request.reactor
+        self._iterator = iterator
+        self._paused = False
+
+        # Fired when we are resumed or stopped while paused.
+        self._waiter: Optional["defer.Deferred[None]"] = None
+
+        try:
+            self._request.registerProducer(self, True)
+        except AttributeError as e:
+            # See `_ByteProducer`.
+            logger.info("Connection disconnected before response was written: %r", e)
+            self._request = None
+            self._iterator = iter(())
+
+    def _next_chunk(self) -> Tuple[bytes, bool]:
+        """Advances the iterator until we have at least `min_chunk_size` bytes.
+        Called on a thread.
+
+        Returns:
+            The chunk, and whether the iterator is exhausted.
+        """
+        buffer = []
+        buffered_bytes = 0
+        for data in self._iterator:
+            buffer.append(data)
+            buffered_bytes += len(data)
+            if buffered_bytes >= self.min_chunk_size:
+                return b"".join(buffer), False
+        return b"".join(buffer), True
+
+    async def run(self, opentracing_span: "Optional[opentracing.Span]") -> None:
+        """Writes the chunks to the request until the iterator is exhausted or
+        the connection is lost.
+        """
+        while self._request is not None:
+            if self._paused:
+                self._waiter = defer.Deferred()
+                await make_deferred_yieldable(self._waiter)
+                continue
+
+            try:
+                chunk, done = await defer_to_thread(self._reactor, self._next_chunk)
+            except Exception:
+                # The response is written as it's produced, so we may have
+                # already sent part of it. All we can do is drop the
+                # connection, so that the client doesn't think it has the
+                # whole response.
+                logger.exception("Failed to encode response")
+                self._finish(lose_connection=True)
+                return
+
+            # The connection may have been lost while we were producing the
+            # chunk.
+            request = self._get_request()
+            if request is None:
+                return
+
+            if opentracing_span:
+                opentracing_span.log_kv({"event": "chunk", "bytes": len(chunk)})
+
+            if chunk:
+                request.write(chunk)
+
+            if done:
+                self._finish(lose_connection=False)
+                return
+
+    def _get_request(self) -> Optional["SynapseRequest"]:
+        # A method, so that mypy doesn't assume that the request can't have
+        # been cleared by `stopProducing` while we were waiting.
+        return self._request
+
+    def _finish(self, lose_connection: bool) -> None:
+        """Finishes the request, or drops the connection, unless we have
+        already been stopped.
+        """
+        request = self._get_request()
+        if request is None:
+            return
+
+        request.unregisterProducer()
+        if lose_connection:
+            request.loseConnection()
+        else:
+            request.finish()
+        self.stopProducing()
+
+    def _wake(self) -> None:
+        if self._waiter is not None:
+            waiter = self._waiter
+            self._waiter = None
+            waiter.callback(None)
+
+    def pauseProducing(self) -> None:
+        self._paused = True
+
+    def resumeProducing(self) -> None:
+        self._paused = False
+        self._wake()
+
+    def stopProducing(self) -> None:
+        # Clear a circular reference.
+        self._request = None
+        self._wake()
+
+
 def _encode_json_bytes(json_object: object) -> bytes:
     """
     Encode an object into JSON. Returns an iterator of bytes.
@@ -745,6 +880,101 @@ def _encode_json_bytes(json_object: object) -> bytes:
     return json_encoder.encode(json_object).encode("utf-8")
 
 
+# The number of items of a list that `_iterencode_json` encodes at once.
+_ITERENCODE_LIST_BATCH_SIZE = 50
+
+
+def _iterencode_json(
+    json_object: object,
+    encoder: Callable[[object], bytes],
+    sort_keys: bool = False,
+) -> Iterator[bytes]:
+    """Encode an object into JSON piece by piece, so that the encoding of a
+    large object never has to be held in memory all at once.
+
+    We walk down through dicts in Python, but encode the items of a list (such
+    as a list of events) in one go with `encoder`, a batch at a time. This means
+    we still get the speed of the C JSON encoder for the bulk of the work,
+    unlike with `JSONEncoder.iterencode` which falls back to the pure Python
+    implementation.
+
+    The encoding carried by a `PreencodedJsonDict` (such as a serialized event)
+    is written out as is, unless the keys must be sorted.
+
+    Args:
+        json_object: The object to encode.
+        encoder: The function used to encode the values we don't walk. Its
+            output for a dict or list must be the same as what we'd produce by
+            walking it.
+        sort_keys: Whether to write dict keys in sorted order, which must match
+            what `encoder` does.
+
+    Returns:
+        An iterator of the pieces of the encoding.
+    """
+    if isinstance(json_object, PreencodedJsonDict) and not sort_keys:
+        encoding = json_object.get_encoding()
+        if encoding is not None:
+            encoded, new_keys = encoding
+            # Strip the closing brace from the encoding of the pre-encoded
+            # entries, and add the new entries after them.
+            yield encoded[:-1]
+            for key in new_keys:
+                yield b","
+                yield encoder(key)
+                yield b":"
+                yield from _iterencode_json(json_object[key], encoder, sort_keys)
+            yield b"}"
+            return
+
+    if isinstance(json_object, (list, tuple)):
+        if not json_object:
+            yield b"[]"
+            return
+
+        # Items which are pre-encoded are written out individually, as encoding
+        # them as part of a batch would encode them all over again. (The
+        # pre-encoded entries aren't in canonical JSON, so can't be used if the
+        # keys must be sorted.)
+        separator = b"["
+        for preencoded, items in itertools.groupby(
+            json_object,
+            key=lambda item: not sort_keys and isinstance(item, PreencodedJsonDict),
+        ):
+            if preencoded:
+                for item in items:
+                    yield separator
+                    yield from _iterencode_json(item, encoder, sort_keys)
+                    separator = b","
+            else:
+                for batch in batch_iter(items, _ITERENCODE_LIST_BATCH_SIZE):
+                    yield separator
+                    # Strip the brackets from the encoding of the batch.
+                    yield encoder(batch)[1:-1]
+                    separator = b","
+        yield b"]"
+    elif isinstance(json_object, (dict, immutabledict)) and all(
+        isinstance(key, str) for key in json_object
+    ):
+        if not json_object:
+            yield b"{}"
+            return
+
+        keys = sorted(json_object) if sort_keys else json_object
+        separator = b"{"
+        for key in keys:
+            yield separator
+            yield encoder(key)
+            yield b":"
+            yield from _iterencode_json(json_object[key], encoder, sort_keys)
+            separator = b","
+        yield b"}"
+    else:
+        # Anything else (including dicts with keys which the encoder converts
+        # to strings) is encoded in one go.
+        yield encoder(json_object)
+
+
 def respond_with_json(
     request: "SynapseRequest",
     code: int,
@@ -790,7 +1020,11 @@ def respond_with_json(
         set_cors_headers(request)
 
     run_in_background(
-        _async_write_json_to_request_in_thread, request, encoder, json_object
+        _async_write_json_to_request_in_thread,
+        request,
+        encoder,
+        json_object,
+        canonical_json,
     )
     return NOT_DONE_YET
 
@@ -837,34 +1071,29 @@ async def _async_write_json_to_request_in_thread(
     request: "SynapseRequest",
     json_encoder: Callable[[Any], bytes],
     json_object: Any,
+    sort_keys: bool,
 ) -> None:
-    """Encodes the given JSON object on a thread and then writes it to the
-    request.
+    """Encodes the given JSON object on a thread and writes it to the request,
+    a chunk at a time.
 
     This is done so that encoding large JSON objects doesn't block the reactor
-    thread.
+    thread. We encode the response as it is written, rather than up front, so
+    that large responses (such as initial syncs) don't need their whole
+    encoding to be held in memory at once: the next chunk is only encoded when
+    the client is ready to receive it.
 
     Note: We don't use JsonEncoder.iterencode here as that falls back to the
     Python implementation (rather than the C backend), which is *much* more
-    expensive.
+    expensive. See `_iterencode_json`.
     """
-
-    def encode(opentracing_span: "Optional[opentracing.Span]") -> bytes:
-        # it might take a while for the threadpool to schedule us, so we write
-        # opentracing logs once we actually get scheduled, so that we can see how
-        # much that contributed.
-        if opentracing_span:
-            opentracing_span.log_kv({"event": "scheduled"})
-        res = json_encoder(json_object)
-        if opentracing_span:
-            opentracing_span.log_kv({"event": "encoded"})
-        return res
-
     with start_active_span("encode_json_response"):
         span = active_span()
-        json_str = await defer_to_thread(request.reactor, encode, span)
-
-    _write_bytes_to_request(request, json_str)
+        producer = _ThreadedByteProducer(
+            request, _iterencode_json(json_object, json_encoder, sort_keys)
+        )
+        await producer.run(span)
+        if span:
+            span.log_kv({"event": "encoded"})
 
 
 def _write_bytes_to_request(request: Request, bytes_to_write: bytes) -> None:
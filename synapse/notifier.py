@@ -34,6 +34,7 @@ import attr
 from prometheus_client import Counter
 
 from twisted.internet import defer
+from twisted.internet.interfaces import IDelayedCall
 
 from synapse.api.constants import EduTypes, EventTypes, HistoryVisibility, Membership
 from synapse.api.errors import AuthError
@@ -69,6 +70,12 @@ users_woken_by_stream_counter = Counter(
     "synapse_notifier_users_woken_by_stream", "", ["stream"]
 )
 
+coalesced_wakeups_counter = Counter(
+    "synapse_notifier_coalesced_wakeups",
+    "Number of user stream wakeups saved by batching up notifications",
+    ["stream"],
+)
+
 T = TypeVar("T")
 
 
@@ -127,6 +134,12 @@ class _NotifierUserStream:
             defer.Deferred()
         )
 
+        # The token (and the streams that advanced to get to it) that we will
+        # move to when we next wake up the listeners, if the notifier is
+        # batching up notifications.
+        self.pending_token: Optional[StreamToken] = None
+        self.pending_stream_keys: Set[StreamKeyType] = set()
+
     def notify(
         self,
         stream_key: StreamKeyType,
@@ -140,21 +153,61 @@ class _NotifierUserStream:
             stream_id: The new id for the stream the event came from.
             time_now_ms: The current time in milliseconds.
         """
-        self.current_token = self.current_token.copy_and_advance(stream_key, stream_id)
+        self.add_pending(stream_key, stream_id)
+        self.notify_pending(time_now_ms)
+
+    def add_pending(
+        self,
+        stream_key: StreamKeyType,
+        stream_id: Union[int, RoomStreamToken, MultiWriterStreamToken],
+    ) -> bool:
+        """Record a new event from an event source, without yet waking up any
+        listeners for this user. They will be woken by `notify_pending`.
+
+        Args:
+            stream_key: The stream the event came from.
+            stream_id: The new id for the stream the event came from.
+
+        Returns:
+            True if there were already events waiting to be notified about.
+        """
+        already_pending = self.pending_token is not None
+        self.pending_token = (
+            self.pending_token or self.current_token
+        ).copy_and_advance(stream_key, stream_id)
+        self.pending_stream_keys.add(stream_key)
+        return already_pending
+
+    def notify_pending(self, time_now_ms: int) -> None:
+        """Wake up any listeners for this user for the events recorded by
+        `add_pending`, if any.
+
+        Args:
+            time_now_ms: The current time in milliseconds.
+        """
+        if self.pending_token is None:
+            return
+
+        self.current_token = self.pending_token
         self.last_notified_token = self.current_token
         self.last_notified_ms = time_now_ms
         notify_deferred = self.notify_deferred
 
+        stream_keys = self.pending_stream_keys
+        self.pending_token = None
+        self.pending_stream_keys = set()
+
         log_kv(
             {
                 "notify": self.user_id,
-                "stream": stream_key,
-                "stream_id": stream_id,
+                "streams": stream_keys,
+                "token": self.current_token,
                 "listeners": self.count_listeners(),
             }
         )
 
-        users_woken_by_stream_counter.labels(stream_key).inc()
+        for stream_key in stream_keys:
+            users_woken_by_stream_counter.labels(stream_key).inc()
 
         with PreserveLoggingContext():
             self.notify_deferred = ObservableDeferred(defer.Deferred())
@@ -254,6 +307,14 @@ class Notifier:
             self.remove_expired_streams, self.UNUSED_STREAM_EXPIRY_MS
         )
 
+        # If set, rather than waking up user streams as soon as something happens
+        # we batch up notifications for this long, so that each stream is woken
+        # up at most once per window however many events there are (e.g. during
+        # a burst of messages in a large room).
+        self._coalescing_window_ms = hs.config.server.notifier_coalescing_window_ms
+        self._user_streams_pending_wakeup: Set[_NotifierUserStream] = set()
+        self._pending_wakeup_call: Optional[IDelayedCall] = None
+
         # This is not a very cheap test to perform, but it's only executed
         # when rendering the metrics page, which is likely once per minute at
         # most when scraping it.
@@ -539,12 +600,15 @@ class Notifier:
                     users,
                 )
 
-            time_now_ms = self.clock.time_msec()
-            for user_stream in user_streams:
-                try:
-                    user_stream.notify(stream_key, new_token, time_now_ms)
-                except Exception:
-                    logger.exception("Failed to notify listener")
+            if self._coalescing_window_ms:
+                self._add_pending_wakeups(user_streams, stream_key, new_token)
+            else:
+                time_now_ms = self.clock.time_msec()
+                for user_stream in user_streams:
+                    try:
+                        user_stream.notify(stream_key, new_token, time_now_ms)
+                    except Exception:
+                        logger.exception("Failed to notify listener")
 
             self.notify_replication()
 
@@ -560,6 +624,51 @@ class Notifier:
                     "Error notifying application services of ephemeral events"
                 )
 
+    def _add_pending_wakeups(
+        self,
+        user_streams: Iterable[_NotifierUserStream],
+        stream_key: StreamKeyType,
+        new_token: Union[int, RoomStreamToken, MultiWriterStreamToken],
+    ) -> None:
+        """Record that the given user streams need waking up for a new event,
+        and schedule them to be woken at the end of the current coalescing
+        window.
+        """
+        coalesced = 0
+        for user_stream in user_streams:
+            try:
+                if user_stream.add_pending(stream_key, new_token):
+                    coalesced += 1
+            except Exception:
+                logger.exception("Failed to notify listener")
+                continue
+            self._user_streams_pending_wakeup.add(user_stream)
+
+        if coalesced:
+            coalesced_wakeups_counter.labels(stream_key).inc(coalesced)
+
+        if self._user_streams_pending_wakeup and self._pending_wakeup_call is None:
+            self._pending_wakeup_call = self.clock.call_later(
+                self._coalescing_window_ms / 1000, self._wake_pending_user_streams
+            )
+
+    def _wake_pending_user_streams(self) -> None:
+        """Wake up the user streams that have had something happen since the
+        start of the coalescing window.
+        """
+        self._pending_wakeup_call = None
+
+        user_streams = self._user_streams_pending_wakeup
+        self._user_streams_pending_wakeup = set()
+
+        with Measure(self.clock, "wake_pending_user_streams"):
+            time_now_ms = self.clock.time_msec()
+            for user_stream in user_streams:
+                try:
+                    user_stream.notify_pending(time_now_ms)
+                except Exception:
+                    logger.exception("Failed to notify listener")
+
     def on_new_replication_data(self) -> None:
         """Used to inform replication listeners that something has happened
         without waking up any of the normal user event streams"""
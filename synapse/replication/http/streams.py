@@ -13,7 +13,7 @@
 # limitations under the License.
 
 import logging
-from typing import TYPE_CHECKING, Tuple
+from typing import TYPE_CHECKING, List, Tuple
 
 from twisted.web.server import Request
 
@@ -22,6 +22,7 @@ from synapse.http.server import HttpServer
 from synapse.http.servlet import parse_integer
 from synapse.replication.http._base import ReplicationEndpoint
 from synapse.types import JsonDict
+from synapse.util.async_helpers import yieldable_gather_results
 
 if TYPE_CHECKING:
     from synapse.server import HomeServer
@@ -90,5 +91,107 @@ class ReplicationGetStreamUpdates(ReplicationEndpoint):
         )
 
 
+class ReplicationGetMultiStreamUpdates(ReplicationEndpoint):
+    """Fetches the updates of several streams from a server at once. Used to
+    catch up on streams not persisted to the database, e.g. typing
+    notifications.
+
+    The API looks like:
+
+        POST /_synapse/replication/get_repl_multi_stream_updates
+
+        {
+            "requests": [
+                {"stream_name": "typing", "from_token": 0, "upto_token": 10},
+                ...
+            ],
+            "limit": 1000,
+        }
+
+        200 OK
+
+        {
+            "results": [
+                {
+                    updates: [ ... ],
+                    upto_token: 10,
+                    limited: False,
+                },
+                ...
+            ],
+        }
+
+    The results are in the same order as the requests. `limit` is a target for
+    the number of rows to return for each request, and as with
+    `ReplicationGetStreamUpdates` the caller should make another request from
+    `upto_token` for any results which are `limited`.
+    """
+
+    NAME = "get_repl_multi_stream_updates"
+    PATH_ARGS = ()
+    METHOD = "POST"
+    CACHE = False
+
+    # We don't want to wait for replication streams to catch up, as this gets
+    # called in the process of catching replication streams up.
+    WAIT_FOR_STREAMS = False
+
+    # The most rows that may be requested for each stream.
+    MAX_LIMIT = 10000
+
+    def __init__(self, hs: "HomeServer"):
+        super().__init__(hs)
+
+        self._instance_name = hs.get_instance_name()
+        self.streams = hs.get_replication_streams()
+
+    @staticmethod
+    async def _serialize_payload(  # type: ignore[override]
+        requests: List[Tuple[str, int, int]], limit: int
+    ) -> JsonDict:
+        """
+        Args:
+            requests: the stream name, from token and upto token of each
+                range of updates to fetch.
+            limit: a target for the number of rows to return for each range.
+        """
+        return {
+            "requests": [
+                {
+                    "stream_name": stream_name,
+                    "from_token": from_token,
+                    "upto_token": upto_token,
+                }
+                for stream_name, from_token, upto_token in requests
+            ],
+            "limit": limit,
+        }
+
+    async def _handle_request(  # type: ignore[override]
+        self, request: Request, content: JsonDict
+    ) -> Tuple[int, JsonDict]:
+        requests = content["requests"]
+        for stream_request in requests:
+            if stream_request["stream_name"] not in self.streams:
+                raise SynapseError(400, "Unknown stream")
+
+        limit = min(int(content["limit"]), self.MAX_LIMIT)
+
+        async def get_updates(stream_request: JsonDict) -> JsonDict:
+            stream = self.streams[stream_request["stream_name"]]
+            updates, upto_token, limited = await stream.get_updates_since(
+                self._instance_name,
+                stream_request["from_token"],
+                stream_request["upto_token"],
+                target_row_count=limit,
+            )
+            return {"updates": updates, "upto_token": upto_token, "limited": limited}
+
+        results = await yieldable_gather_results(get_updates, requests)
+
+        return 200, {"results": results}
+
+
 def register_servlets(hs: "HomeServer", http_server: HttpServer) -> None:
     ReplicationGetStreamUpdates(hs).register(http_server)
+    ReplicationGetMultiStreamUpdates(hs).register(http_server)
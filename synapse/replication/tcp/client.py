@@ -73,6 +73,7 @@ class ReplicationDataHandler:
         self._clock = hs.get_clock()
         self._streams = hs.get_replication_streams()
         self._instance_name = hs.get_instance_name()
+        self._hs = hs
         self._typing_handler = hs.get_typing_handler()
         self._state_storage_controller = hs.get_storage_controllers().state
 
@@ -300,6 +301,13 @@ class ReplicationDataHandler:
             # anyway in that case we don't need to wait.
             return
 
+        if not self._hs.get_replication_command_handler().is_subscribed_to_stream(
+            stream_name
+        ):
+            # We won't be told about updates to the stream, so there is nothing
+            # to wait for.
+            return
+
         current_position = self._streams[stream_name].current_token(instance_name)
         if position <= current_position:
             # We're already past the position
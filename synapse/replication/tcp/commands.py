@@ -28,6 +28,13 @@ logger = logging.getLogger(__name__)
 T = TypeVar("T", bound="Command")
 
 
+def stream_channel_name(stream_name: str) -> str:
+    """Returns the suffix of the Redis channel that commands about the given
+    replication stream are published on.
+    """
+    return "STREAM/" + stream_name
+
+
 class Command(metaclass=abc.ABCMeta):
     """The base command class.
 
@@ -159,6 +166,58 @@ class RdataCommand(Command):
     def get_logcontext_id(self) -> str:
         return "RDATA-" + self.stream_name
 
+    def redis_channel_name(self, prefix: str) -> str:
+        return f"{prefix}/{stream_channel_name(self.stream_name)}"
+
+
+class RdataBatchCommand(Command):
+    """Sent by server when a subscribed stream has updates, as an alternative to
+    sending an RDATA for each row.
+
+    Format::
+
+        RDATA_BATCH <stream_name> <instance_name> <updates_json>
+
+    The `<updates_json>` is a list of `[<token>, <row>]` pairs, in stream order.
+    Multiple rows may have the same token, in which case they are handled
+    together, as with a series of RDATA with a token of "batch". The token of
+    the last row is the new position of the stream.
+
+    An example, equivalent to the series of RDATA described in `RdataCommand`::
+
+        RDATA_BATCH presence master [[59, ["@foo:example.com", "online", ...]], [59, ["@bar:example.com", "online", ...]], [59, ["@baz:example.com", "online", ...]]]
+    """
+
+    __slots__ = ["stream_name", "instance_name", "updates"]
+
+    NAME = "RDATA_BATCH"
+
+    def __init__(
+        self,
+        stream_name: str,
+        instance_name: str,
+        updates: List[Tuple[int, StreamRow]],
+    ):
+        self.stream_name = stream_name
+        self.instance_name = instance_name
+        self.updates = updates
+
+    @classmethod
+    def from_line(cls: Type["RdataBatchCommand"], line: str) -> "RdataBatchCommand":
+        stream_name, instance_name, updates_json = line.split(" ", 2)
+        return cls(stream_name, instance_name, json_decoder.decode(updates_json))
+
+    def to_line(self) -> str:
+        return " ".join(
+            (self.stream_name, self.instance_name, json_encoder.encode(self.updates))
+        )
+
+    def get_logcontext_id(self) -> str:
+        return "RDATA_BATCH-" + self.stream_name
+
+    def redis_channel_name(self, prefix: str) -> str:
+        return f"{prefix}/{stream_channel_name(self.stream_name)}"
+
 
 class PositionCommand(Command):
     """Sent by an instance to tell others the stream position without needing to
@@ -210,6 +269,9 @@ class PositionCommand(Command):
             )
         )
 
+    def redis_channel_name(self, prefix: str) -> str:
+        return f"{prefix}/{stream_channel_name(self.stream_name)}"
+
 
 class ErrorCommand(_SimpleCommand):
     """Sent by either side if there was an ERROR. The data is a string describing
@@ -500,6 +562,7 @@ class NewActiveTaskCommand(_SimpleCommand):
 _COMMANDS: Tuple[Type[Command], ...] = (
     ServerCommand,
     RdataCommand,
+    RdataBatchCommand,
     PositionCommand,
     ErrorCommand,
     PingCommand,
@@ -521,6 +584,7 @@ COMMAND_MAP = {cmd.NAME: cmd for cmd in _COMMANDS}
 VALID_SERVER_COMMANDS = (
     ServerCommand.NAME,
     RdataCommand.NAME,
+    RdataBatchCommand.NAME,
     PositionCommand.NAME,
     ErrorCommand.NAME,
     PingCommand.NAME,
@@ -13,13 +13,14 @@
 # limitations under the License.
 
 import logging
-from typing import TYPE_CHECKING, Any, Optional
+from typing import TYPE_CHECKING, Any, Collection, Dict, Optional
 
 from prometheus_client import Counter, Histogram
 
 from synapse.logging import opentracing
-from synapse.logging.context import make_deferred_yieldable
+from synapse.logging.context import defer_to_thread, make_deferred_yieldable
 from synapse.util import json_decoder, json_encoder
+from synapse.util.caches.disk_cache import DiskCache
 
 if TYPE_CHECKING:
     from txredisapi import ConnectionHandler
@@ -38,6 +39,12 @@ get_counter = Counter(
     labelnames=["cache_name", "hit"],
 )
 
+host_cache_get_counter = Counter(
+    "synapse_external_cache_host_get",
+    "Number of times we get a cache from the host-local cache",
+    labelnames=["cache_name", "hit"],
+)
+
 response_timer = Histogram(
     "synapse_external_cache_response_time_seconds",
     "Time taken to get a response from Redis for a cache get/set request",
@@ -57,11 +64,16 @@ logger = logging.getLogger(__name__)
 
 
 class ExternalCache:
-    """A cache backed by an external Redis. Does nothing if no Redis is
-    configured.
+    """A cache backed by an external Redis and/or a cache shared between the
+    processes on the same host. Does nothing if neither is configured.
+
+    The host-local cache (if configured) sits in front of Redis: values are
+    written to both, and looked up in the host-local cache first.
     """
 
     def __init__(self, hs: "HomeServer"):
+        self._reactor = hs.get_reactor()
+
         if hs.config.redis.redis_enabled:
             self._redis_connection: Optional[
                 "ConnectionHandler"
@@ -69,21 +81,37 @@ class ExternalCache:
         else:
             self._redis_connection = None
 
+        self._host_cache: Optional[DiskCache] = None
+        if hs.config.caches.host_cache_path:
+            self._host_cache = DiskCache(
+                cache_name="external_host_cache",
+                path=hs.config.caches.host_cache_path,
+                max_size=hs.config.caches.host_cache_max_entries,
+                clock=hs.get_clock(),
+            )
+
     def _get_redis_key(self, cache_name: str, key: str) -> str:
         return "cache_v1:%s:%s" % (cache_name, key)
 
     def is_enabled(self) -> bool:
-        """Whether the external cache is used or not.
+        """Whether the external cache is used or not, i.e. whether Redis is
+        configured. See also `is_host_cache_enabled`.
 
         It's safe to use the cache when this returns false, the methods will
         just no-op, but the function is useful to avoid doing unnecessary work.
         """
         return self._redis_connection is not None
 
+    def is_host_cache_enabled(self) -> bool:
+        """Whether the cache shared between the processes on this host is used
+        or not.
+        """
+        return self._host_cache is not None
+
     async def set(self, cache_name: str, key: str, value: Any, expiry_ms: int) -> None:
         """Add the key/value to the named cache, with the expiry time given."""
 
-        if self._redis_connection is None:
+        if not self.is_enabled() and not self.is_host_cache_enabled():
             return
 
         set_counter.labels(cache_name).inc()
@@ -94,6 +122,17 @@ class ExternalCache:
 
         logger.debug("Caching %s %s: %r", cache_name, key, encoded_value)
 
+        if self._host_cache is not None:
+            await defer_to_thread(
+                self._reactor,
+                self._host_cache.set_many,
+                [(self._get_redis_key(cache_name, key), encoded_value)],
+                expiry_ms,
+            )
+
+        if self._redis_connection is None:
+            return
+
         with opentracing.start_active_span(
             "ExternalCache.set",
             tags={opentracing.SynapseTags.CACHE_NAME: cache_name},
@@ -110,6 +149,15 @@ class ExternalCache:
     async def get(self, cache_name: str, key: str) -> Optional[Any]:
         """Look up a key/value in the named cache."""
 
+        if self._host_cache is not None:
+            redis_key = self._get_redis_key(cache_name, key)
+            host_result = await defer_to_thread(
+                self._reactor, self._host_cache.get_many, [redis_key]
+            )
+            host_cache_get_counter.labels(cache_name, redis_key in host_result).inc()
+            if redis_key in host_result:
+                return json_decoder.decode(host_result[redis_key])
+
         if self._redis_connection is None:
             return None
 
@@ -134,3 +182,95 @@ class ExternalCache:
             return result
 
         return json_decoder.decode(result)
+
+    async def get_many(self, cache_name: str, keys: Collection[str]) -> Dict[str, Any]:
+        """Look up a set of keys in the named cache.
+
+        Returns:
+            A map from key to value for the keys that were found.
+        """
+        results: Dict[str, Any] = {}
+        if not keys:
+            return results
+
+        if self._host_cache is not None:
+            redis_keys = {self._get_redis_key(cache_name, key): key for key in keys}
+            host_results = await defer_to_thread(
+                self._reactor, self._host_cache.get_many, list(redis_keys)
+            )
+            for redis_key, encoded_value in host_results.items():
+                results[redis_keys[redis_key]] = json_decoder.decode(encoded_value)
+
+            host_cache_get_counter.labels(cache_name, True).inc(len(host_results))
+            host_cache_get_counter.labels(cache_name, False).inc(
+                len(keys) - len(host_results)
+            )
+
+        if self._redis_connection is None:
+            return results
+
+        missing_keys = [key for key in keys if key not in results]
+        if not missing_keys:
+            return results
+
+        with opentracing.start_active_span(
+            "ExternalCache.get_many",
+            tags={opentracing.SynapseTags.CACHE_NAME: cache_name},
+        ):
+            with response_timer.labels("get_many").time():
+                values = await make_deferred_yieldable(
+                    self._redis_connection.mget(
+                        [self._get_redis_key(cache_name, key) for key in missing_keys]
+                    )
+                )
+
+        for key, value in zip(missing_keys, values):
+            get_counter.labels(cache_name, value is not None).inc()
+
+            if not value:
+                continue
+
+            # As in `get`, integers come back as integers.
+            if isinstance(value, int):
+                results[key] = value
+            else:
+                results[key] = json_decoder.decode(value)
+
+        return results
+
+    async def delete(self, cache_name: str, keys: Collection[str]) -> None:
+        """Remove the given keys from the named cache."""
+        await self.delete_from_host_cache(cache_name, keys)
+
+        if self._redis_connection is None or not keys:
+            return
+
+        with opentracing.start_active_span(
+            "ExternalCache.delete",
+            tags={opentracing.SynapseTags.CACHE_NAME: cache_name},
+        ):
+            with response_timer.labels("delete").time():
+                await make_deferred_yieldable(
+                    self._redis_connection.delete(
+                        [self._get_redis_key(cache_name, key) for key in keys]
+                    )
+                )
+
+    async def delete_from_host_cache(
+        self, cache_name: str, keys: Collection[str]
+    ) -> None:
+        """Remove the given keys from the named cache, but only in the cache
+        shared between processes on this host (if any).
+
+        This is useful when processing invalidations received over replication:
+        the process which made the change is responsible for removing the keys
+        from Redis, but every host needs to remove them from its own cache.
+        """
+        if self._host_cache is None or not keys:
+            return
+
+        await defer_to_thread(
+            self._reactor,
+            self._host_cache.invalidate_many,
+            [self._get_redis_key(cache_name, key) for key in keys],
+        )
@@ -31,8 +31,11 @@ from typing import (
 
 from prometheus_client import Counter
 
+from twisted.internet import defer
 from twisted.internet.protocol import ReconnectingClientFactory
 
+from synapse.config import ConfigError
+from synapse.logging.context import make_deferred_yieldable, run_in_background
 from synapse.metrics import LaterGauge
 from synapse.metrics.background_process_metrics import run_as_background_process
 from synapse.replication.tcp.commands import (
@@ -42,11 +45,13 @@ from synapse.replication.tcp.commands import (
     LockReleasedCommand,
     NewActiveTaskCommand,
     PositionCommand,
+    RdataBatchCommand,
     RdataCommand,
     RemoteServerUpCommand,
     ReplicateCommand,
     UserIpCommand,
     UserSyncCommand,
+    stream_channel_name,
 )
 from synapse.replication.tcp.context import ClientContextFactory
 from synapse.replication.tcp.protocol import IReplicationConnection
@@ -64,6 +69,10 @@ from synapse.replication.tcp.streams import (
     ToDeviceStream,
     TypingStream,
 )
+from synapse.replication.tcp.streams._base import (
+    STREAM_CATCH_UP_TARGET_ROW_COUNT,
+    StreamUpdateResult,
+)
 
 if TYPE_CHECKING:
     from synapse.server import HomeServer
@@ -84,7 +93,9 @@ user_ip_cache_counter = Counter("synapse_replication_tcp_resource_user_ip_cache"
 
 # the type of the entries in _command_queues_by_stream
 _StreamCommandQueue = Deque[
-    Tuple[Union[RdataCommand, PositionCommand], IReplicationConnection]
+    Tuple[
+        Union[RdataCommand, RdataBatchCommand, PositionCommand], IReplicationConnection
+    ]
 ]
 
 
@@ -185,6 +196,30 @@ class ReplicationCommandHandler:
 
             self._streams_to_replicate.append(stream)
 
+        # The streams this instance receives updates to. Commands about each
+        # stream are published on their own Redis channel, so that workers only
+        # receive the streams they need.
+        replication_streams = hs.config.worker.worker_replication_streams
+        if replication_streams is None:
+            self._subscribed_streams = set(self._streams)
+        else:
+            unknown_streams = set(replication_streams) - self._streams.keys()
+            if unknown_streams:
+                raise ConfigError(
+                    "Unknown replication streams: %s"
+                    % (", ".join(sorted(unknown_streams)),),
+                    ("worker_replication_streams",),
+                )
+
+            # We always need to know how far the other writers of the streams we
+            # write to have got, except for the caches stream which everyone
+            # writes to.
+            self._subscribed_streams = set(replication_streams) | {
+                stream.NAME
+                for stream in self._streams_to_replicate
+                if stream.NAME != CachesStream.NAME
+            }
+
         # Map of stream name to batched updates. See RdataCommand for info on
         # how batching works.
         self._pending_batches: Dict[str, List[Any]] = {}
@@ -254,6 +289,9 @@ class ReplicationCommandHandler:
         if self._is_master or self._should_insert_client_ips:
             self.subscribe_to_channel("USER_IP")
 
+        for stream_name in sorted(self._subscribed_streams):
+            self.subscribe_to_channel(stream_channel_name(stream_name))
+
         if hs.config.redis.redis_enabled:
             self._notifier.add_lock_released_callback(self.on_lock_released)
 
@@ -262,6 +300,10 @@ class ReplicationCommandHandler:
         # RDATA/POSITION commands
         self._should_announce_positions = True
 
+    def is_subscribed_to_stream(self, stream_name: str) -> bool:
+        """Returns whether this instance receives updates to the given stream."""
+        return stream_name in self._subscribed_streams
+
     def subscribe_to_channel(self, channel_name: str) -> None:
         """
         Indicates that we wish to subscribe to a Redis channel by name.
@@ -285,7 +327,9 @@ class ReplicationCommandHandler:
             self._channels_to_subscribe_to.append(channel_name)
 
     def _add_command_to_stream_queue(
-        self, conn: IReplicationConnection, cmd: Union[RdataCommand, PositionCommand]
+        self,
+        conn: IReplicationConnection,
+        cmd: Union[RdataCommand, RdataBatchCommand, PositionCommand],
     ) -> None:
         """Queue the given received command for processing
 
@@ -331,7 +375,7 @@ class ReplicationCommandHandler:
 
     async def _process_command(
         self,
-        cmd: Union[PositionCommand, RdataCommand],
+        cmd: Union[PositionCommand, RdataCommand, RdataBatchCommand],
         conn: IReplicationConnection,
         stream_name: str,
     ) -> None:
@@ -339,6 +383,8 @@ class ReplicationCommandHandler:
             await self._process_position(stream_name, conn, cmd)
         elif isinstance(cmd, RdataCommand):
             await self._process_rdata(stream_name, conn, cmd)
+        elif isinstance(cmd, RdataBatchCommand):
+            await self._process_rdata_batch(stream_name, conn, cmd)
         else:
             # This shouldn't be possible
             raise Exception("Unrecognised command %s in stream queue", cmd.NAME)
@@ -563,6 +609,62 @@ class ReplicationCommandHandler:
         else:
             await self.on_rdata(stream_name, cmd.instance_name, cmd.token, rows)
 
+    def on_RDATA_BATCH(
+        self, conn: IReplicationConnection, cmd: RdataBatchCommand
+    ) -> None:
+        if cmd.instance_name == self._instance_name:
+            # Ignore RDATA_BATCH that are just our own echoes
+            return
+
+        stream_name = cmd.stream_name
+        inbound_rdata_count.labels(stream_name).inc(len(cmd.updates))
+
+        # As with RDATA, we queue the command so that it is handled in order
+        # with the other commands for the stream.
+        self._add_command_to_stream_queue(conn, cmd)
+
+    async def _process_rdata_batch(
+        self, stream_name: str, conn: IReplicationConnection, cmd: RdataBatchCommand
+    ) -> None:
+        """Process an RDATA_BATCH command
+
+        Called after the command has been popped off the queue of inbound commands
+        """
+        try:
+            parse_row = STREAMS_MAP[stream_name].parse_row
+            updates = [(token, parse_row(row)) for token, row in cmd.updates]
+        except Exception as e:
+            raise Exception(
+                "Failed to parse RDATA_BATCH: %r %r" % (stream_name, cmd.updates)
+            ) from e
+
+        # As with RDATA, we drop the rows if we haven't yet processed a POSITION
+        # for this stream on this connection.
+        sbc = self._streams_by_connection.get(conn)
+        if not sbc or stream_name not in sbc:
+            logger.debug(
+                "Discarding RDATA_BATCH for unconnected stream %s", stream_name
+            )
+            return
+
+        stream = self._streams[stream_name]
+
+        for token, rows in _batch_updates(updates):
+            # Discard any rows before the current position, as we would for
+            # RDATA.
+            current_token = stream.current_token(cmd.instance_name)
+            if token <= current_token:
+                logger.debug(
+                    "Discarding RDATA_BATCH rows from stream %s at position %s "
+                    "before previous position %s",
+                    stream_name,
+                    token,
+                    current_token,
+                )
+                continue
+
+            await self.on_rdata(stream_name, cmd.instance_name, token, rows)
+
     async def on_rdata(
         self, stream_name: str, instance_name: str, token: int, rows: list
     ) -> None:
@@ -644,38 +746,56 @@ class ReplicationCommandHandler:
         # Note: We also have to check that `current_token` is at most the
         # new position, to handle the case where the stream gets "reset"
         # (e.g. for `caches` and `typing` after the writer's restart).
-        missing_updates = not (cmd.prev_token <= current_token <= cmd.new_token)
-        while missing_updates:
-            # Note: There may very well not be any new updates, but we check to
-            # make sure. This can particularly happen for the event stream where
-            # event persisters continuously send `POSITION`. See `resource.py`
-            # for why this can happen.
-
-            logger.info(
-                "Fetching replication rows for '%s' / %s between %i and %i",
-                stream_name,
-                cmd.instance_name,
-                current_token,
-                cmd.new_token,
-            )
-            (updates, current_token, missing_updates) = await stream.get_updates_since(
-                cmd.instance_name, current_token, cmd.new_token
+        #
+        # Note: There may very well not be any new updates, but we check to
+        # make sure. This can particularly happen for the event stream where
+        # event persisters continuously send `POSITION`. See `resource.py`
+        # for why this can happen.
+        next_updates: "Optional[defer.Deferred[StreamUpdateResult]]" = None
+        if not (cmd.prev_token <= current_token <= cmd.new_token):
+            next_updates = self._fetch_missing_updates(
+                stream, cmd.instance_name, current_token, cmd.new_token
             )
 
-            # TODO: add some tests for this
+        try:
+            while next_updates is not None:
+                page, next_updates = next_updates, None
+                (
+                    updates,
+                    current_token,
+                    missing_updates,
+                ) = await make_deferred_yieldable(page)
+
+                # Start fetching the next page of updates while we process this
+                # one.
+                if missing_updates:
+                    next_updates = self._fetch_missing_updates(
+                        stream, cmd.instance_name, current_token, cmd.new_token
+                    )
 
-            # Some streams return multiple rows with the same stream IDs,
-            # which need to be processed in batches.
+                # TODO: add some tests for this
 
-            for token, rows in _batch_updates(updates):
-                await self.on_rdata(
-                    stream_name,
-                    cmd.instance_name,
-                    token,
-                    [stream.parse_row(row) for row in rows],
-                )
+                # Some streams return multiple rows with the same stream IDs,
+                # which need to be processed in batches.
 
-            logger.info("Caught up with stream '%s' to %i", stream_name, current_token)
+                for token, rows in _batch_updates(updates):
+                    await self.on_rdata(
+                        stream_name,
+                        cmd.instance_name,
+                        token,
+                        [stream.parse_row(row) for row in rows],
+                    )
+
+                logger.info(
+                    "Caught up with stream '%s' to %i", stream_name, current_token
+                )
+        except Exception:
+            if next_updates is not None:
+                # We failed to process the current page, so won't use the next
+                # one. Consume its result, so that if it fails it isn't
+                # reported as an unhandled error.
+                next_updates.addErrback(lambda _: None)
+            raise
 
         # We've now caught up to position sent to us, notify handler.
         await self._replication_data_handler.on_position(
@@ -684,6 +804,28 @@ class ReplicationCommandHandler:
 
         self._streams_by_connection.setdefault(conn, set()).add(stream_name)
 
+    def _fetch_missing_updates(
+        self, stream: Stream, instance_name: str, from_token: int, upto_token: int
+    ) -> "defer.Deferred[StreamUpdateResult]":
+        """Starts fetching a page of the updates to the stream that we missed,
+        returning a deferred which resolves to the result of
+        `Stream.get_updates_since`.
+        """
+        logger.info(
+            "Fetching replication rows for '%s' / %s between %i and %i",
+            stream.NAME,
+            instance_name,
+            from_token,
+            upto_token,
+        )
+        return run_in_background(
+            stream.get_updates_since,
+            instance_name,
+            from_token,
+            upto_token,
+            target_row_count=STREAM_CATCH_UP_TARGET_ROW_COUNT,
+        )
+
     def is_stream_connected(
         self, conn: IReplicationConnection, stream_name: str
     ) -> bool:
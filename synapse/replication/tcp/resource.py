@@ -24,7 +24,7 @@ from twisted.internet.interfaces import IAddress
 from twisted.internet.protocol import ServerFactory
 
 from synapse.metrics.background_process_metrics import run_as_background_process
-from synapse.replication.tcp.commands import PositionCommand
+from synapse.replication.tcp.commands import PositionCommand, RdataBatchCommand
 from synapse.replication.tcp.protocol import ServerReplicationStreamProtocol
 from synapse.replication.tcp.streams import EventsStream
 from synapse.replication.tcp.streams._base import CachesStream, StreamRow, Token
@@ -78,6 +78,7 @@ class ReplicationStreamer:
         self._instance_name = hs.get_instance_name()
 
         self._replication_torture_level = hs.config.server.replication_torture_level
+        self._batch_replication_rows = hs.config.worker.batch_replication_rows
 
         self.notifier.add_replication_callback(self.on_notifier_poke)
 
@@ -260,20 +261,33 @@ class ReplicationStreamer:
                             )
                             continue
 
-                        # Some streams return multiple rows with the same stream IDs,
-                        # we need to make sure they get sent out in batches. We do
-                        # this by setting the current token to all but the last of
-                        # a series of updates with the same token to have a None
-                        # token. See RdataCommand for more details.
-                        batched_updates = _batch_updates(updates)
-
-                        for token, row in batched_updates:
+                        if self._batch_replication_rows:
+                            # Send all the rows in one command, which is much
+                            # cheaper for other workers to parse and handle.
                             try:
-                                self.command_handler.stream_update(
-                                    stream.NAME, token, row
+                                self.command_handler.send_command(
+                                    RdataBatchCommand(
+                                        stream.NAME, self._instance_name, updates
+                                    )
                                 )
                             except Exception:
                                 logger.exception("Failed to replicate")
+                        else:
+                            # Some streams return multiple rows with the same
+                            # stream IDs, we need to make sure they get sent out in
+                            # batches. We do this by setting the current token to
+                            # all but the last of a series of updates with the same
+                            # token to have a None token. See RdataCommand for more
+                            # details.
+                            batched_updates = _batch_updates(updates)
+
+                            for token, row in batched_updates:
+                                try:
+                                    self.command_handler.stream_update(
+                                        stream.NAME, token, row
+                                    )
+                                except Exception:
+                                    logger.exception("Failed to replicate")
 
                         # The last token we send may not match the current
                         # token, in which case we want to send out a `POSITION`
@@ -20,6 +20,7 @@ from typing import (
     Any,
     Awaitable,
     Callable,
+    Dict,
     List,
     Optional,
     Tuple,
@@ -29,7 +30,8 @@ from typing import (
 import attr
 
 from synapse.api.constants import AccountDataTypes
-from synapse.replication.http.streams import ReplicationGetStreamUpdates
+from synapse.replication.http.streams import ReplicationGetMultiStreamUpdates
+from synapse.util.batching_queue import BatchingQueue
 
 if TYPE_CHECKING:
     from synapse.server import HomeServer
@@ -40,6 +42,11 @@ logger = logging.getLogger(__name__)
 # the number of rows to request from an update_function.
 _STREAM_UPDATE_TARGET_ROW_COUNT = 100
 
+# the number of rows to request from an update_function when catching up on
+# missed updates, which we fetch in bigger pages as they are processed locally
+# rather than being sent on to other processes.
+STREAM_CATCH_UP_TARGET_ROW_COUNT = 1000
+
 
 # Some type aliases to make things a bit easier.
 
@@ -187,11 +194,21 @@ class Stream:
         return updates, current_token, limited
 
     async def get_updates_since(
-        self, instance_name: str, from_token: Token, upto_token: Token
+        self,
+        instance_name: str,
+        from_token: Token,
+        upto_token: Token,
+        target_row_count: int = _STREAM_UPDATE_TARGET_ROW_COUNT,
     ) -> StreamUpdateResult:
         """Like get_updates except allows specifying from when we should
         stream updates
 
+        Args:
+            instance_name: the writer to get updates from.
+            from_token: the token to get updates from. Exclusive.
+            upto_token: the token to get updates up to. Inclusive.
+            target_row_count: a target for the number of rows to return.
+
         Returns:
             A triplet `(updates, new_last_token, limited)`, where `updates` is
             a list of `(token, row)` entries, `new_last_token` is the new
@@ -208,7 +225,7 @@ class Stream:
             instance_name,
             from_token,
             upto_token,
-            _STREAM_UPDATE_TARGET_ROW_COUNT,
+            target_row_count,
         )
         return updates, upto_token, limited
 
@@ -250,23 +267,86 @@ def current_token_without_instance(
     return lambda instance_name: current_token()
 
 
+# A request for the updates of a stream from a writer: the writer, stream name,
+# from token, upto token and target row count.
+_HttpStreamUpdatesRequest = Tuple[str, str, Token, Token, int]
+
+
+class HttpStreamUpdatesFetcher:
+    """Fetches the updates of streams from the processes which write them, over
+    HTTP.
+
+    Requests made to the same writer at the same time, e.g. for each of the
+    streams being caught up on after reconnecting to replication, are sent in a
+    single HTTP request and fetched concurrently by the writer.
+    """
+
+    def __init__(self, hs: "HomeServer"):
+        self._client = ReplicationGetMultiStreamUpdates.make_client(hs)
+
+        self._queue: BatchingQueue[
+            _HttpStreamUpdatesRequest,
+            Dict[_HttpStreamUpdatesRequest, StreamUpdateResult],
+        ] = BatchingQueue(
+            "replication_stream_updates",
+            hs.get_clock(),
+            self._fetch_updates,
+        )
+
+    async def get_updates(
+        self,
+        instance_name: str,
+        stream_name: str,
+        from_token: Token,
+        upto_token: Token,
+        limit: int,
+    ) -> StreamUpdateResult:
+        """Gets the updates of the stream from the given writer. Suitable for
+        use as an `update_function`, see `UpdateFunction`.
+        """
+        request = (instance_name, stream_name, from_token, upto_token, limit)
+        results = await self._queue.add_to_queue(request, key=instance_name)
+        return results[request]
+
+    async def _fetch_updates(
+        self, requests: List[_HttpStreamUpdatesRequest]
+    ) -> Dict[_HttpStreamUpdatesRequest, StreamUpdateResult]:
+        # All of the requests in a batch are for the same writer.
+        instance_name = requests[0][0]
+        unique_requests = list(dict.fromkeys(requests))
+
+        result = await self._client(
+            instance_name=instance_name,
+            requests=[
+                (stream_name, from_token, upto_token)
+                for _, stream_name, from_token, upto_token, _ in unique_requests
+            ],
+            limit=max(limit for *_, limit in unique_requests),
+        )
+
+        return {
+            request: (
+                request_result["updates"],
+                request_result["upto_token"],
+                request_result["limited"],
+            )
+            for request, request_result in zip(unique_requests, result["results"])
+        }
+
+
 def make_http_update_function(hs: "HomeServer", stream_name: str) -> UpdateFunction:
     """Makes a suitable function for use as an `update_function` that queries
-    the master process for updates.
+    the writer of the stream for updates.
     """
 
-    client = ReplicationGetStreamUpdates.make_client(hs)
+    fetcher = hs.get_http_stream_updates_fetcher()
 
     async def update_function(
         instance_name: str, from_token: int, upto_token: int, limit: int
     ) -> StreamUpdateResult:
-        result = await client(
-            instance_name=instance_name,
-            stream_name=stream_name,
-            from_token=from_token,
-            upto_token=upto_token,
+        return await fetcher.get_updates(
+            instance_name, stream_name, from_token, upto_token, limit
         )
-        return result["updates"], result["upto_token"], result["limited"]
 
     return update_function
 
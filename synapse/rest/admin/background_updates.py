@@ -13,7 +13,7 @@
 # limitations under the License.
 import logging
 from http import HTTPStatus
-from typing import TYPE_CHECKING, Tuple
+from typing import TYPE_CHECKING, Dict, List, Tuple
 
 from synapse.api.errors import SynapseError
 from synapse.http.servlet import (
@@ -23,10 +23,12 @@ from synapse.http.servlet import (
 )
 from synapse.http.site import SynapseRequest
 from synapse.rest.admin._base import admin_patterns, assert_requester_is_admin
+from synapse.storage.background_updates import BackgroundUpdatePerformance
 from synapse.types import JsonDict
 
 if TYPE_CHECKING:
     from synapse.server import HomeServer
+    from synapse.storage.database import DatabasePool
 
 logger = logging.getLogger(__name__)
 
@@ -88,21 +90,38 @@ class BackgroundUpdateRestServlet(RestServlet):
         # (They *should* all be in sync.)
         enabled = all(db.updates.enabled for db in self._data_stores.databases)
 
-        current_updates = {}
+        current_updates: Dict[str, JsonDict] = {}
+        concurrent_updates: Dict[str, List[JsonDict]] = {}
 
         for db in self._data_stores.databases:
             update = db.updates.get_current_update()
-            if not update:
-                continue
-
-            current_updates[db.name()] = {
-                "name": update.name,
-                "total_item_count": update.total_item_count,
-                "total_duration_ms": update.total_duration_ms,
-                "average_items_per_ms": update.average_items_per_ms(),
-            }
-
-        return HTTPStatus.OK, {"enabled": enabled, "current_updates": current_updates}
+            if update:
+                current_updates[db.name()] = await _describe_update(db, update)
+
+            db_concurrent_updates = db.updates.get_concurrent_updates()
+            if db_concurrent_updates:
+                concurrent_updates[db.name()] = [
+                    await _describe_update(db, update)
+                    for update in db_concurrent_updates
+                ]
+
+        return HTTPStatus.OK, {
+            "enabled": enabled,
+            "current_updates": current_updates,
+            "concurrent_updates": concurrent_updates,
+        }
+
+
+async def _describe_update(
+    db: "DatabasePool", update: BackgroundUpdatePerformance
+) -> JsonDict:
+    return {
+        "name": update.name,
+        "total_item_count": update.total_item_count,
+        "total_duration_ms": update.total_duration_ms,
+        "average_items_per_ms": update.average_items_per_ms(),
+        "eta_ms": await db.updates.estimate_time_remaining_ms(update.name),
+    }
 
 
 class BackgroundUpdateStartJobRestServlet(RestServlet):
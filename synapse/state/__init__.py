@@ -53,6 +53,7 @@ from synapse.types.state import StateFilter
 from synapse.util.async_helpers import Linearizer
 from synapse.util.caches.expiringcache import ExpiringCache
 from synapse.util.metrics import Measure, measure_func
+from synapse.util.process_pool import ProcessPool
 
 if TYPE_CHECKING:
     from synapse.server import HomeServer
@@ -562,6 +563,19 @@ class _StateResMetrics:
     # number of events fetched from the db.
     db_events: int = 0
 
+    # time we would have spent recomputing the results of parts of state res
+    # which we had cached instead, in seconds.
+    memoised_time: float = 0.0
+
+    # time spent running parts of state res in the process pool rather than on
+    # the reactor, in seconds.
+    offloaded_time: float = 0.0
+
+    @property
+    def time_saved(self) -> float:
+        """The amount of time we avoided spending on the reactor, in seconds."""
+        return self.memoised_time + self.offloaded_time
+
 
 _biggest_room_by_cpu_counter = Counter(
     "synapse_state_res_cpu_for_biggest_room_seconds",
@@ -573,6 +587,11 @@ _biggest_room_by_db_counter = Counter(
     "Database time spent performing state resolution for the single most "
     "expensive room for state resolution",
 )
+_biggest_room_by_time_saved_counter = Counter(
+    "synapse_state_res_time_saved_for_biggest_room_seconds",
+    "Time saved on the reactor during state resolution, by caching parts of it "
+    "or running it in the process pool, for the room with the most time saved",
+)
 
 _cpu_times = Histogram(
     "synapse_state_res_cpu_for_all_rooms_seconds",
@@ -582,6 +601,14 @@ _db_times = Histogram(
     "synapse_state_res_db_for_all_rooms_seconds",
     "Database time spent computing a single state resolution",
 )
+_memoised_times = Histogram(
+    "synapse_state_res_memoised_for_all_rooms_seconds",
+    "Time saved by caching parts of a single state resolution",
+)
+_offloaded_times = Histogram(
+    "synapse_state_res_offloaded_for_all_rooms_seconds",
+    "Time spent running parts of a single state resolution in the process pool",
+)
 
 
 class StateResolutionHandler:
@@ -617,6 +644,17 @@ class StateResolutionHandler:
             _StateResMetrics
         )
 
+        # caches the results of parts of state res v2, across resolutions.
+        self._v2_cache = v2.StateResCache()
+
+        self._process_pool: Optional[ProcessPool] = None
+        if hs.config.server.state_res_process_pool_size:
+            self._process_pool = ProcessPool(
+                hs.get_reactor(),
+                "state_res",
+                hs.config.server.state_res_process_pool_size,
+            )
+
         self.clock.looping_call(self._report_metrics, 120 * 1000)
 
     async def resolve_state_groups(
@@ -717,6 +755,7 @@ class StateResolutionHandler:
         Returns:
             a map from (type, state_key) to event_id.
         """
+        stats = v2.StateResStats()
         try:
             with Measure(self.clock, "state._resolve_events") as m:
                 room_version_obj = KNOWN_ROOM_VERSIONS[room_version]
@@ -736,20 +775,27 @@ class StateResolutionHandler:
                         state_sets,
                         event_map,
                         state_res_store,
+                        cache=self._v2_cache,
+                        process_pool=self._process_pool,
+                        stats=stats,
                     )
         finally:
-            self._record_state_res_metrics(room_id, m.get_resource_usage())
+            self._record_state_res_metrics(room_id, m.get_resource_usage(), stats)
 
     def _record_state_res_metrics(
-        self, room_id: str, rusage: ContextResourceUsage
+        self, room_id: str, rusage: ContextResourceUsage, stats: v2.StateResStats
     ) -> None:
         room_metrics = self._state_res_metrics[room_id]
         room_metrics.cpu_time += rusage.ru_utime + rusage.ru_stime
         room_metrics.db_time += rusage.db_txn_duration_sec
         room_metrics.db_events += rusage.evt_db_fetch_count
+        room_metrics.memoised_time += stats.memoised_time
+        room_metrics.offloaded_time += stats.offloaded_time
 
         _cpu_times.observe(rusage.ru_utime + rusage.ru_stime)
         _db_times.observe(rusage.db_txn_duration_sec)
+        _memoised_times.observe(stats.memoised_time)
+        _offloaded_times.observe(stats.offloaded_time)
 
     def _report_metrics(self) -> None:
         if not self._state_res_metrics:
@@ -768,6 +814,12 @@ class StateResolutionHandler:
             _biggest_room_by_db_counter,
         )
 
+        self._report_biggest(
+            lambda i: i.time_saved,
+            "time saved",
+            _biggest_room_by_time_saved_counter,
+        )
+
         self._state_res_metrics.clear()
 
     def _report_biggest(
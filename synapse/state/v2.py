@@ -12,25 +12,32 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import functools
 import heapq
 import itertools
 import logging
+import time
 from typing import (
     Any,
     Awaitable,
     Callable,
     Dict,
+    FrozenSet,
     Generator,
+    Generic,
+    Hashable,
     Iterable,
     List,
     Optional,
     Sequence,
     Set,
     Tuple,
+    TypeVar,
     overload,
 )
 
-from typing_extensions import Literal, Protocol
+import attr
+from typing_extensions import Literal, ParamSpec, Protocol
 
 from synapse import event_auth
 from synapse.api.constants import EventTypes
@@ -38,9 +45,14 @@ from synapse.api.errors import AuthError
 from synapse.api.room_versions import RoomVersion
 from synapse.events import EventBase
 from synapse.types import MutableStateMap, StateMap, StrCollection
+from synapse.util.caches.lrucache import LruCache
 
 logger = logging.getLogger(__name__)
 
+P = ParamSpec("P")
+R = TypeVar("R")
+T = TypeVar("T")
+
 
 class Clock(Protocol):
     # This is usually synapse.util.Clock, but it's replaced with a FakeClock in tests.
@@ -64,11 +76,169 @@ class StateResolutionStore(Protocol):
         ...
 
 
+class ProcessPool(Protocol):
+    # This is usually synapse.util.process_pool.ProcessPool.
+    def run(self, f: Callable[..., T], *args: Any) -> Awaitable[T]:
+        ...
+
+
 # We want to await to the reactor occasionally during state res when dealing
 # with large data sets, so that we don't exhaust the reactor. This is done by
 # awaiting to reactor during loops every N iterations.
 _AWAIT_AFTER_ITERATIONS = 100
 
+# The minimum size of the full conflicted set for which we run the sorting and
+# auth checking of events in the process pool (if there is one). For smaller
+# sets, the cost of sending the events to another process outweighs the
+# benefit.
+_MIN_EVENTS_TO_OFFLOAD = 100
+
+# The maximum number of event IDs in the cached auth chain differences,
+# including the state sets they are the differences of.
+_AUTH_CHAIN_DIFFERENCE_CACHE_SIZE = 500000
+
+# The maximum number of mainlines and mainline depths to cache.
+_MAINLINE_CACHE_SIZE = 1000
+_MAINLINE_DEPTH_CACHE_SIZE = 100000
+
+
+@attr.s(slots=True, auto_attribs=True)
+class StateResStats:
+    """Tracks how much work was saved during a single state resolution."""
+
+    # Time we would have spent recomputing the results of parts of the
+    # resolution which we found in the `StateResCache`, in seconds.
+    memoised_time: float = 0.0
+
+    # Time spent waiting for parts of the resolution to run in the process pool,
+    # rather than on the reactor, in seconds.
+    offloaded_time: float = 0.0
+
+
+@attr.s(slots=True, frozen=True, auto_attribs=True)
+class _MemoisedResult(Generic[T]):
+    value: T
+
+    # How long it took to compute the value, in seconds.
+    duration: float
+
+    # The size of the entry in its cache.
+    size: int = 1
+
+
+class StateResCache:
+    """Caches the results of the parts of state res that are likely to be
+    repeated across different resolutions in the same room.
+
+    These are only ever pure functions of their keys, so never need to be
+    invalidated.
+    """
+
+    def __init__(self) -> None:
+        # Map from room ID and state sets, as sets of event IDs, to their auth
+        # chain difference.
+        self._auth_chain_differences: LruCache[
+            Tuple[str, FrozenSet[FrozenSet[str]]], _MemoisedResult[FrozenSet[str]]
+        ] = LruCache(
+            _AUTH_CHAIN_DIFFERENCE_CACHE_SIZE,
+            cache_name="state_res_auth_chain_difference",
+            size_callback=lambda entry: entry.size,
+        )
+
+        # Map from a power levels event ID to the mainline of that event, as a
+        # map from event ID to mainline depth.
+        self._mainlines: LruCache[str, _MemoisedResult[Dict[str, int]]] = LruCache(
+            _MAINLINE_CACHE_SIZE, cache_name="state_res_mainline"
+        )
+
+        # Map from the resolved power levels event ID (if any) and an event ID
+        # to the mainline depth of the event.
+        self._mainline_depths: LruCache[
+            Tuple[Optional[str], str], _MemoisedResult[int]
+        ] = LruCache(_MAINLINE_DEPTH_CACHE_SIZE, cache_name="state_res_mainline_depth")
+
+    async def get_auth_chain_difference(
+        self,
+        room_id: str,
+        state_sets: List[Set[str]],
+        state_res_store: "StateResolutionStore",
+        stats: StateResStats,
+    ) -> Set[str]:
+        """Gets the auth chain difference of the given (persisted) state sets,
+        see `StateResolutionStore.get_auth_chain_difference`.
+        """
+        key = (room_id, frozenset(frozenset(state_set) for state_set in state_sets))
+
+        async def compute() -> FrozenSet[str]:
+            return frozenset(
+                await state_res_store.get_auth_chain_difference(room_id, state_sets)
+            )
+
+        difference = await _memoise(
+            self._auth_chain_differences,
+            key,
+            compute,
+            stats,
+            size=lambda value: sum(len(state_set) for state_set in key[1]) + len(value),
+        )
+        return set(difference)
+
+    async def get_mainline(
+        self,
+        power_event_id: str,
+        compute: Callable[[], Awaitable[Dict[str, int]]],
+        stats: StateResStats,
+    ) -> Dict[str, int]:
+        """Gets the mainline of the given power levels event, computing it with
+        `compute` if it isn't cached. The result must not be modified.
+        """
+        return await _memoise(self._mainlines, power_event_id, compute, stats)
+
+    async def get_mainline_depth(
+        self,
+        resolved_power_event_id: Optional[str],
+        event_id: str,
+        compute: Callable[[], Awaitable[int]],
+        stats: StateResStats,
+    ) -> int:
+        """Gets the mainline depth of the given event, for the mainline of the
+        given power levels event, computing it with `compute` if it isn't
+        cached.
+        """
+        return await _memoise(
+            self._mainline_depths, (resolved_power_event_id, event_id), compute, stats
+        )
+
+
+K = TypeVar("K", bound=Hashable)
+
+
+async def _memoise(
+    cache: LruCache[K, _MemoisedResult[T]],
+    key: K,
+    compute: Callable[[], Awaitable[T]],
+    stats: StateResStats,
+    size: Optional[Callable[[T], int]] = None,
+) -> T:
+    """Returns the value for `key` from the cache, or computes it with `compute`
+    and adds it to the cache. Records the time saved in `stats` if the value was
+    cached.
+    """
+    entry = cache.get(key)
+    if entry is not None:
+        stats.memoised_time += entry.duration
+        return entry.value
+
+    start = time.perf_counter()
+    value = await compute()
+    duration = time.perf_counter() - start
+
+    cache.set(
+        key,
+        _MemoisedResult(value, duration, size(value) if size is not None else 1),
+    )
+    return value
+
 
 __all__ = [
     "resolve_events_with_store",
@@ -82,6 +252,9 @@ async def resolve_events_with_store(
     state_sets: Sequence[StateMap[str]],
     event_map: Optional[Dict[str, EventBase]],
     state_res_store: StateResolutionStore,
+    cache: Optional[StateResCache] = None,
+    process_pool: Optional[ProcessPool] = None,
+    stats: Optional[StateResStats] = None,
 ) -> StateMap[str]:
     """Resolves the state using the v2 state resolution algorithm
 
@@ -100,6 +273,12 @@ async def resolve_events_with_store(
             If None, all events will be fetched via state_res_store.
 
         state_res_store:
+        cache: if given, used to cache the results of parts of the resolution
+            for use in later resolutions.
+        process_pool: if given, used to run the sorting and auth checking of
+            events for large resolutions, rather than doing it on the reactor.
+        stats: if given, updated with how much work was saved by `cache` and
+            `process_pool`.
 
     Returns:
         A map from (type, state_key) to event_id.
@@ -111,6 +290,9 @@ async def resolve_events_with_store(
     if event_map is None:
         event_map = {}
 
+    if stats is None:
+        stats = StateResStats()
+
     # First split up the un/conflicted state
     unconflicted_state, conflicted_state = _seperate(state_sets)
 
@@ -123,7 +305,7 @@ async def resolve_events_with_store(
     # Also fetch all auth events that appear in only some of the state sets'
     # auth chains.
     auth_diff = await _get_auth_chain_difference(
-        room_id, state_sets, event_map, state_res_store
+        room_id, state_sets, event_map, state_res_store, cache, stats
     )
 
     full_conflicted_set = set(
@@ -154,26 +336,38 @@ async def resolve_events_with_store(
 
     logger.debug("%d full_conflicted_set entries", len(full_conflicted_set))
 
-    # Get and sort all the power events (kicks/bans/etc)
-    power_events = (
-        eid for eid in full_conflicted_set if _is_power_event(event_map[eid])
+    # Fetch all the other events we need to sort and auth check the events in
+    # the full conflicted set, so that we can do so without going back to the
+    # store.
+    auth_event_map = await _get_events_for_auth_checks(
+        room_id,
+        room_version,
+        full_conflicted_set,
+        unconflicted_state,
+        event_map,
+        state_res_store,
     )
 
-    sorted_power_events = await _reverse_topological_power_sort(
-        clock, room_id, power_events, event_map, state_res_store, full_conflicted_set
-    )
+    if len(full_conflicted_set) < _MIN_EVENTS_TO_OFFLOAD:
+        process_pool = None
 
-    logger.debug("sorted %d power events", len(sorted_power_events))
+    # Get and sort all the power events (kicks/bans/etc), and then sequentially
+    # auth each one
+    power_events = [
+        eid for eid in full_conflicted_set if _is_power_event(event_map[eid])
+    ]
 
-    # Now sequentially auth each one
-    resolved_state = await _iterative_auth_checks(
+    sorted_power_events, resolved_state = await _run_stage(
         clock,
+        process_pool,
+        stats,
+        _sort_and_check_power_events,
         room_id,
         room_version,
-        sorted_power_events,
+        power_events,
+        full_conflicted_set,
         unconflicted_state,
-        event_map,
-        state_res_store,
+        auth_event_map,
     )
 
     logger.debug("resolved power events")
@@ -190,19 +384,21 @@ async def resolve_events_with_store(
 
     pl = resolved_state.get((EventTypes.PowerLevels, ""), None)
     leftover_events = await _mainline_sort(
-        clock, room_id, leftover_events, pl, event_map, state_res_store
+        clock, room_id, leftover_events, pl, event_map, state_res_store, cache, stats
     )
 
     logger.debug("resolving remaining events")
 
-    resolved_state = await _iterative_auth_checks(
+    resolved_state = await _run_stage(
         clock,
+        process_pool,
+        stats,
+        _iterative_auth_checks,
         room_id,
         room_version,
         leftover_events,
         resolved_state,
-        event_map,
-        state_res_store,
+        auth_event_map,
     )
 
     logger.debug("resolved")
@@ -215,11 +411,134 @@ async def resolve_events_with_store(
     return resolved_state
 
 
-async def _get_power_level_for_sender(
+async def _get_events_for_auth_checks(
     room_id: str,
-    event_id: str,
+    room_version: RoomVersion,
+    full_conflicted_set: Set[str],
+    unconflicted_state: StateMap[str],
     event_map: Dict[str, EventBase],
     state_res_store: StateResolutionStore,
+) -> Dict[str, EventBase]:
+    """Fetch the events needed to sort and auth check the events in the full
+    conflicted set, in one go.
+
+    These are the events themselves, their auth events, and the events in the
+    unconflicted state which they might be auth checked against.
+
+    Args:
+        room_id
+        room_version
+        full_conflicted_set: the event IDs of the full conflicted set, which
+            must all be in `event_map`.
+        unconflicted_state
+        event_map: updated with the fetched events.
+        state_res_store
+
+    Returns:
+        A map from event ID to event, for the events that we need which exist.
+    """
+    auth_keys = set()
+    needed_event_ids = set(full_conflicted_set)
+    for event_id in full_conflicted_set:
+        event = event_map[event_id]
+        needed_event_ids.update(event.auth_event_ids())
+        auth_keys.update(event_auth.auth_types_for_event(room_version, event))
+
+    needed_event_ids.update(
+        unconflicted_state[key] for key in auth_keys if key in unconflicted_state
+    )
+
+    events = await state_res_store.get_events(
+        [eid for eid in needed_event_ids if eid not in event_map],
+        allow_rejected=True,
+    )
+    event_map.update(events)
+
+    return {eid: event_map[eid] for eid in needed_event_ids if eid in event_map}
+
+
+async def _run_stage(
+    clock: Clock,
+    process_pool: Optional[ProcessPool],
+    stats: StateResStats,
+    stage: Callable[P, Generator[None, None, R]],
+    *args: P.args,
+    **kwargs: P.kwargs,
+) -> R:
+    """Run one of the stages of state res which don't need the store.
+
+    The stages are generators which yield every so often to give the reactor a
+    chance to do other work, and return their result. If we have a process
+    pool, we run the stage there instead.
+    """
+    if process_pool is not None:
+        start = time.perf_counter()
+        try:
+            return await process_pool.run(
+                _run_to_completion, functools.partial(stage, *args, **kwargs)
+            )
+        finally:
+            stats.offloaded_time += time.perf_counter() - start
+
+    gen = stage(*args, **kwargs)
+    while True:
+        try:
+            next(gen)
+        except StopIteration as e:
+            return e.value
+
+        # We await occasionally when we're working with large data sets to
+        # ensure that we don't block the reactor loop for too long.
+        await clock.sleep(0)
+
+
+def _run_to_completion(stage: Callable[[], Generator[None, None, R]]) -> R:
+    """Run one of the stages of state res to completion, without yielding. This
+    is what gets run in the process pool.
+    """
+    gen = stage()
+    while True:
+        try:
+            next(gen)
+        except StopIteration as e:
+            return e.value
+
+
+def _sort_and_check_power_events(
+    room_id: str,
+    room_version: RoomVersion,
+    power_events: List[str],
+    full_conflicted_set: Set[str],
+    unconflicted_state: StateMap[str],
+    event_map: Dict[str, EventBase],
+) -> Generator[None, None, Tuple[List[str], MutableStateMap[str]]]:
+    """Sort the power events by reverse topological power ordering, and then
+    sequentially auth check them on top of the unconflicted state.
+
+    Returns:
+        The sorted power events, and the state after the auth checks.
+    """
+    sorted_power_events = yield from _reverse_topological_power_sort(
+        room_id, power_events, event_map, full_conflicted_set
+    )
+
+    logger.debug("sorted %d power events", len(sorted_power_events))
+
+    resolved_state = yield from _iterative_auth_checks(
+        room_id,
+        room_version,
+        sorted_power_events,
+        unconflicted_state,
+        event_map,
+    )
+
+    return sorted_power_events, resolved_state
+
+
+def _get_power_level_for_sender(
+    room_id: str,
+    event_id: str,
+    event_map: Dict[str, EventBase],
 ) -> int:
     """Return the power level of the sender of the given event according to
     their auth events.
@@ -227,19 +546,16 @@ async def _get_power_level_for_sender(
     Args:
         room_id
         event_id
-        event_map
-        state_res_store
+        event_map: must contain the event and its auth events
 
     Returns:
         The power level.
     """
-    event = await _get_event(room_id, event_id, event_map, state_res_store)
+    event = _get_prefetched_event(room_id, event_id, event_map)
 
     pl = None
     for aid in event.auth_event_ids():
-        aev = await _get_event(
-            room_id, aid, event_map, state_res_store, allow_none=True
-        )
+        aev = _get_prefetched_event(room_id, aid, event_map, allow_none=True)
         if aev and (aev.type, aev.state_key) == (EventTypes.PowerLevels, ""):
             pl = aev
             break
@@ -247,9 +563,7 @@ async def _get_power_level_for_sender(
     if pl is None:
         # Couldn't find power level. Check if they're the creator of the room
         for aid in event.auth_event_ids():
-            aev = await _get_event(
-                room_id, aid, event_map, state_res_store, allow_none=True
-            )
+            aev = _get_prefetched_event(room_id, aid, event_map, allow_none=True)
             if aev and (aev.type, aev.state_key) == (EventTypes.Create, ""):
                 if aev.content.get("creator") == event.sender:
                     return 100
@@ -271,6 +585,8 @@ async def _get_auth_chain_difference(
     state_sets: Sequence[StateMap[str]],
     unpersisted_events: Dict[str, EventBase],
     state_res_store: StateResolutionStore,
+    cache: Optional[StateResCache] = None,
+    stats: Optional[StateResStats] = None,
 ) -> Set[str]:
     """Compare the auth chains of each state set and return the set of events
     that only appear in some, but not all of the auth chains.
@@ -280,6 +596,9 @@ async def _get_auth_chain_difference(
         unpersisted_events: A map from event ID to EventBase containing all unpersisted
             events involved in this resolution.
         state_res_store:
+        cache: if given, used to cache the auth chain difference of the
+            persisted events.
+        stats: updated with the time saved by `cache`.
 
     Returns:
         The auth difference of the given state sets, as a set of event IDs.
@@ -369,9 +688,14 @@ async def _get_auth_chain_difference(
         auth_difference_unpersisted_part = ()
         state_sets_ids = [set(state_set.values()) for state_set in state_sets]
 
-    difference = await state_res_store.get_auth_chain_difference(
-        room_id, state_sets_ids
-    )
+    if cache is not None:
+        difference = await cache.get_auth_chain_difference(
+            room_id, state_sets_ids, state_res_store, stats or StateResStats()
+        )
+    else:
+        difference = await state_res_store.get_auth_chain_difference(
+            room_id, state_sets_ids
+        )
     difference.update(auth_difference_unpersisted_part)
 
     return difference
@@ -431,12 +755,11 @@ def _is_power_event(event: EventBase) -> bool:
     return False
 
 
-async def _add_event_and_auth_chain_to_graph(
+def _add_event_and_auth_chain_to_graph(
     graph: Dict[str, Set[str]],
     room_id: str,
     event_id: str,
     event_map: Dict[str, EventBase],
-    state_res_store: StateResolutionStore,
     full_conflicted_set: Set[str],
 ) -> None:
     """Helper function for _reverse_topological_power_sort that add the event
@@ -447,7 +770,6 @@ async def _add_event_and_auth_chain_to_graph(
         room_id: the room we are working in
         event_id: Event to add to the graph
         event_map
-        state_res_store
         full_conflicted_set: Set of event IDs that are in the full conflicted set.
     """
 
@@ -456,7 +778,7 @@ async def _add_event_and_auth_chain_to_graph(
         eid = state.pop()
         graph.setdefault(eid, set())
 
-        event = await _get_event(room_id, eid, event_map, state_res_store)
+        event = _get_prefetched_event(room_id, eid, event_map)
         for aid in event.auth_event_ids():
             if aid in full_conflicted_set:
                 if aid not in graph:
@@ -465,23 +787,22 @@ async def _add_event_and_auth_chain_to_graph(
                 graph.setdefault(eid, set()).add(aid)
 
 
-async def _reverse_topological_power_sort(
-    clock: Clock,
+def _reverse_topological_power_sort(
     room_id: str,
     event_ids: Iterable[str],
     event_map: Dict[str, EventBase],
-    state_res_store: StateResolutionStore,
     full_conflicted_set: Set[str],
-) -> List[str]:
+) -> Generator[None, None, List[str]]:
     """Returns a list of the event_ids sorted by reverse topological ordering,
     and then by power level and origin_server_ts
 
+    Yields every so often, see `_run_stage`.
+
     Args:
-        clock
         room_id: the room we are working in
         event_ids: The events to sort
-        event_map
-        state_res_store
+        event_map: must contain the events in the full conflicted set and their
+            auth events
         full_conflicted_set: Set of event IDs that are in the full conflicted set.
 
     Returns:
@@ -490,26 +811,20 @@ async def _reverse_topological_power_sort(
 
     graph: Dict[str, Set[str]] = {}
     for idx, event_id in enumerate(event_ids, start=1):
-        await _add_event_and_auth_chain_to_graph(
-            graph, room_id, event_id, event_map, state_res_store, full_conflicted_set
+        _add_event_and_auth_chain_to_graph(
+            graph, room_id, event_id, event_map, full_conflicted_set
         )
 
-        # We await occasionally when we're working with large data sets to
-        # ensure that we don't block the reactor loop for too long.
         if idx % _AWAIT_AFTER_ITERATIONS == 0:
-            await clock.sleep(0)
+            yield
 
     event_to_pl = {}
     for idx, event_id in enumerate(graph, start=1):
-        pl = await _get_power_level_for_sender(
-            room_id, event_id, event_map, state_res_store
-        )
+        pl = _get_power_level_for_sender(room_id, event_id, event_map)
         event_to_pl[event_id] = pl
 
-        # We await occasionally when we're working with large data sets to
-        # ensure that we don't block the reactor loop for too long.
         if idx % _AWAIT_AFTER_ITERATIONS == 0:
-            await clock.sleep(0)
+            yield
 
     def _get_power_order(event_id: str) -> Tuple[int, int, str]:
         ev = event_map[event_id]
@@ -524,26 +839,25 @@ async def _reverse_topological_power_sort(
     return sorted_events
 
 
-async def _iterative_auth_checks(
-    clock: Clock,
+def _iterative_auth_checks(
     room_id: str,
     room_version: RoomVersion,
     event_ids: List[str],
     base_state: StateMap[str],
     event_map: Dict[str, EventBase],
-    state_res_store: StateResolutionStore,
-) -> MutableStateMap[str]:
+) -> Generator[None, None, MutableStateMap[str]]:
     """Sequentially apply auth checks to each event in given list, updating the
     state as it goes along.
 
+    Yields every so often, see `_run_stage`.
+
     Args:
-        clock
         room_id
         room_version
         event_ids: Ordered list of events to apply auth checks to
         base_state: The set of state to start with
-        event_map
-        state_res_store
+        event_map: must contain the events, their auth events and any events
+            in the state they may be auth checked against
 
     Returns:
         Returns the final updated state
@@ -555,9 +869,7 @@ async def _iterative_auth_checks(
 
         auth_events = {}
         for aid in event.auth_event_ids():
-            ev = await _get_event(
-                room_id, aid, event_map, state_res_store, allow_none=True
-            )
+            ev = _get_prefetched_event(room_id, aid, event_map, allow_none=True)
 
             if not ev:
                 logger.warning(
@@ -570,7 +882,7 @@ async def _iterative_auth_checks(
         for key in event_auth.auth_types_for_event(room_version, event):
             if key in resolved_state:
                 ev_id = resolved_state[key]
-                ev = await _get_event(room_id, ev_id, event_map, state_res_store)
+                ev = _get_prefetched_event(room_id, ev_id, event_map)
 
                 if ev.rejected_reason is None:
                     auth_events[key] = event_map[ev_id]
@@ -600,10 +912,8 @@ async def _iterative_auth_checks(
         except AuthError:
             pass
 
-        # We await occasionally when we're working with large data sets to
-        # ensure that we don't block the reactor loop for too long.
         if idx % _AWAIT_AFTER_ITERATIONS == 0:
-            await clock.sleep(0)
+            yield
 
     return resolved_state
 
@@ -615,6 +925,8 @@ async def _mainline_sort(
     resolved_power_event_id: Optional[str],
     event_map: Dict[str, EventBase],
     state_res_store: StateResolutionStore,
+    cache: Optional[StateResCache] = None,
+    stats: Optional[StateResStats] = None,
 ) -> List[str]:
     """Returns a sorted list of event_ids sorted by mainline ordering based on
     the given event resolved_power_event_id
@@ -626,6 +938,9 @@ async def _mainline_sort(
         resolved_power_event_id: The final resolved power level event ID
         event_map
         state_res_store
+        cache: if given, used to cache the mainline and the mainline depths of
+            the events.
+        stats: updated with the time saved by `cache`.
 
     Returns:
         The sorted list
@@ -635,8 +950,69 @@ async def _mainline_sort(
         # skip calculating the mainline in that case.
         return []
 
+    if stats is None:
+        stats = StateResStats()
+
+    compute_mainline = functools.partial(
+        _get_mainline,
+        clock,
+        room_id,
+        resolved_power_event_id,
+        event_map,
+        state_res_store,
+    )
+    if cache is not None and resolved_power_event_id is not None:
+        mainline_map = await cache.get_mainline(
+            resolved_power_event_id, compute_mainline, stats
+        )
+    else:
+        mainline_map = await compute_mainline()
+
+    event_ids = list(event_ids)
+
+    order_map = {}
+    for idx, ev_id in enumerate(event_ids, start=1):
+        compute_depth = functools.partial(
+            _get_mainline_depth_for_event,
+            clock,
+            event_map[ev_id],
+            mainline_map,
+            event_map,
+            state_res_store,
+        )
+        if cache is not None:
+            depth = await cache.get_mainline_depth(
+                resolved_power_event_id, ev_id, compute_depth, stats
+            )
+        else:
+            depth = await compute_depth()
+        order_map[ev_id] = (depth, event_map[ev_id].origin_server_ts, ev_id)
+
+        # We await occasionally when we're working with large data sets to
+        # ensure that we don't block the reactor loop for too long.
+        if idx % _AWAIT_AFTER_ITERATIONS == 0:
+            await clock.sleep(0)
+
+    event_ids.sort(key=lambda ev_id: order_map[ev_id])
+
+    return event_ids
+
+
+async def _get_mainline(
+    clock: Clock,
+    room_id: str,
+    power_event_id: Optional[str],
+    event_map: Dict[str, EventBase],
+    state_res_store: StateResolutionStore,
+) -> Dict[str, int]:
+    """Get the mainline of the given power levels event, i.e. the chain of power
+    levels events formed by following their power levels auth events.
+
+    Returns:
+        A map from the event IDs in the mainline to their mainline depth.
+    """
     mainline = []
-    pl = resolved_power_event_id
+    pl = power_event_id
     idx = 0
     while pl:
         mainline.append(pl)
@@ -658,25 +1034,7 @@ async def _mainline_sort(
 
         idx += 1
 
-    mainline_map = {ev_id: i + 1 for i, ev_id in enumerate(reversed(mainline))}
-
-    event_ids = list(event_ids)
-
-    order_map = {}
-    for idx, ev_id in enumerate(event_ids, start=1):
-        depth = await _get_mainline_depth_for_event(
-            clock, event_map[ev_id], mainline_map, event_map, state_res_store
-        )
-        order_map[ev_id] = (depth, event_map[ev_id].origin_server_ts, ev_id)
-
-        # We await occasionally when we're working with large data sets to
-        # ensure that we don't block the reactor loop for too long.
-        if idx % _AWAIT_AFTER_ITERATIONS == 0:
-            await clock.sleep(0)
-
-    event_ids.sort(key=lambda ev_id: order_map[ev_id])
-
-    return event_ids
+    return {ev_id: i + 1 for i, ev_id in enumerate(reversed(mainline))}
 
 
 async def _get_mainline_depth_for_event(
@@ -790,6 +1148,50 @@ async def _get_event(
     return event
 
 
+@overload
+def _get_prefetched_event(
+    room_id: str,
+    event_id: str,
+    event_map: Dict[str, EventBase],
+    allow_none: Literal[False] = False,
+) -> EventBase:
+    ...
+
+
+@overload
+def _get_prefetched_event(
+    room_id: str,
+    event_id: str,
+    event_map: Dict[str, EventBase],
+    allow_none: Literal[True],
+) -> Optional[EventBase]:
+    ...
+
+
+def _get_prefetched_event(
+    room_id: str,
+    event_id: str,
+    event_map: Dict[str, EventBase],
+    allow_none: bool = False,
+) -> Optional[EventBase]:
+    """Like `_get_event`, but for the stages of state res which run without
+    access to the store, so any events must already be in `event_map`.
+    """
+    event = event_map.get(event_id)
+
+    if event is None:
+        if allow_none:
+            return None
+        raise Exception("Unknown event %s" % (event_id,))
+
+    if event.room_id != room_id:
+        raise Exception(
+            "In state res for room %s, event %s is in %s"
+            % (room_id, event_id, event.room_id)
+        )
+    return event
+
+
 def lexicographical_topological_sort(
     graph: Dict[str, Set[str]], key: Callable[[str], Any]
 ) -> Generator[str, None, None]:
@@ -26,6 +26,7 @@ from typing import (
     List,
     Optional,
     Sequence,
+    Set,
     Tuple,
     Type,
     cast,
@@ -61,6 +62,15 @@ logger = logging.getLogger(__name__)
 ON_UPDATE_CALLBACK = Callable[[str, str, bool], AsyncContextManager[int]]
 DEFAULT_BATCH_SIZE_CALLBACK = Callable[[str, str], Awaitable[int]]
 MIN_BATCH_SIZE_CALLBACK = Callable[[str, str], Awaitable[int]]
+ESTIMATE_REMAINING_ITEMS_CALLBACK = Callable[[JsonDict], Awaitable[Optional[int]]]
+
+# How often to check whether another update can be run, when all of the updates
+# left to run are either being run concurrently or depend on one which is.
+CONCURRENT_UPDATES_POLL_INTERVAL_MS = 1000
+
+# The smallest fraction of `background_update_duration_ms` we'll run a batch for
+# when adapting to the load on the database.
+MIN_DATABASE_LOAD_FACTOR = 0.1
 
 
 class Constraint(metaclass=abc.ABCMeta):
@@ -148,10 +158,17 @@ class _BackgroundUpdateHandler:
         oneshot: Wether the update is likely to happen all in one go, ignoring
             the supplied target duration, e.g. index creation. This is used by
             the update controller to help correctly schedule the update.
+        estimate_remaining_items: An optional function to estimate how many
+            items the update has left to process, given its progress.
+        independent: Whether the update can be run at the same time as, and out
+            of order with, other updates. Only independent updates are run
+            concurrently, see `max_concurrent_updates`.
     """
 
     callback: Callable[[JsonDict, int], Awaitable[int]]
     oneshot: bool = False
+    estimate_remaining_items: Optional[ESTIMATE_REMAINING_ITEMS_CALLBACK] = None
+    independent: bool = False
 
 
 class _BackgroundUpdateContextManager:
@@ -253,6 +270,24 @@ class BackgroundUpdater:
         # if a background update is currently running, its name.
         self._current_background_update: Optional[str] = None
 
+        # The names of the background updates being run concurrently with the
+        # current one, see `max_concurrent_updates`.
+        self._concurrent_background_updates: Set[str] = set()
+
+        # The number of processes running background updates concurrently with
+        # `run_background_updates`.
+        self._num_concurrent_runners = 0
+
+        # The lowest and the recent average latency of probing the database,
+        # in milliseconds, used to adapt the batch size to the database load.
+        self._min_probe_latency_ms: Optional[float] = None
+        self._avg_probe_latency_ms = 0.0
+
+        # Whether we can check the replication lag of the database, which
+        # requires access to `pg_stat_replication` on Postgres. This is decided
+        # when we first probe the database, as the engine isn't set up yet.
+        self._check_replication_lag: Optional[bool] = None
+
         self._on_update_callback: Optional[ON_UPDATE_CALLBACK] = None
         self._default_batch_size_callback: Optional[DEFAULT_BATCH_SIZE_CALLBACK] = None
         self._min_batch_size_callback: Optional[MIN_BATCH_SIZE_CALLBACK] = None
@@ -280,6 +315,15 @@ class BackgroundUpdater:
         self.update_duration_ms = hs.config.background_updates.update_duration_ms
         self.sleep_duration_ms = hs.config.background_updates.sleep_duration_ms
         self.sleep_enabled = hs.config.background_updates.sleep_enabled
+        self.max_concurrent_updates = (
+            hs.config.background_updates.max_concurrent_updates
+        )
+        self.adapt_to_database_load = (
+            hs.config.background_updates.adapt_to_database_load
+        )
+        self.max_replication_lag_ms = (
+            hs.config.background_updates.max_replication_lag_ms
+        )
 
     def get_status(self) -> UpdaterStatus:
         """An integer summarising the updater status. Used as a metric."""
@@ -381,12 +425,71 @@ class BackgroundUpdater:
         if not update_name:
             return None
 
+        return self._get_performance(update_name)
+
+    def get_concurrent_updates(self) -> List[BackgroundUpdatePerformance]:
+        """Returns the background updates being run concurrently with the
+        current one, see `max_concurrent_updates`.
+        """
+        return [
+            self._get_performance(update_name)
+            for update_name in sorted(self._concurrent_background_updates)
+        ]
+
+    def _get_performance(self, update_name: str) -> BackgroundUpdatePerformance:
         perf = self._background_update_performance.get(update_name)
         if not perf:
             perf = BackgroundUpdatePerformance(update_name)
 
         return perf
 
+    async def estimate_time_remaining_ms(self, update_name: str) -> Optional[float]:
+        """Estimates how long the given background update will take to finish,
+        if it continues at its recent rate.
+
+        Returns:
+            The estimate in milliseconds, or None if the update can't estimate
+            how much it has left to do or hasn't run yet.
+        """
+        handler = self._background_update_handlers.get(update_name)
+        if handler is None or handler.estimate_remaining_items is None:
+            return None
+
+        perf = self._background_update_performance.get(update_name)
+        items_per_ms = perf.average_items_per_ms() if perf else None
+        if perf is None or not items_per_ms:
+            return None
+
+        progress_json = await self.db_pool.simple_select_one_onecol(
+            "background_updates",
+            keyvalues={"update_name": update_name},
+            retcol="progress_json",
+            allow_none=True,
+            desc="estimate_time_remaining_ms",
+        )
+        if progress_json is None:
+            # The update has just finished.
+            return 0
+
+        # Avoid a circular import.
+        from synapse.storage._base import db_to_json
+
+        remaining_items = await handler.estimate_remaining_items(
+            db_to_json(progress_json)
+        )
+        if remaining_items is None:
+            return None
+
+        remaining_ms = remaining_items / items_per_ms
+
+        # Add on the time we'll spend sleeping between the remaining batches,
+        # each of which is sized to take `update_duration_ms`.
+        if self.sleep_enabled and self._on_update_callback is None:
+            remaining_batches = remaining_ms / self.update_duration_ms
+            remaining_ms += remaining_batches * self.sleep_duration_ms
+
+        return remaining_ms
+
     def start_doing_background_updates(self) -> None:
         if self.enabled:
             # if we start a new background update, not all updates are done.
@@ -410,6 +513,14 @@ class BackgroundUpdater:
                 self._database_name,
             )
             while self.enabled:
+                if (
+                    self.max_concurrent_updates > 1
+                    and not self._current_background_update
+                ):
+                    # We're about to move on to another update, so there may
+                    # be more which can be run concurrently.
+                    self._start_concurrent_background_updates(sleep)
+
                 try:
                     result = await self.do_next_background_update(sleep)
                     back_to_back_failures = 0
@@ -432,6 +543,50 @@ class BackgroundUpdater:
         finally:
             self._running = False
 
+    def _start_concurrent_background_updates(self, sleep: bool) -> None:
+        """Starts running background updates concurrently with the current one,
+        up to `max_concurrent_updates` at once.
+        """
+        while self._num_concurrent_runners < self.max_concurrent_updates - 1:
+            self._num_concurrent_runners += 1
+            run_as_background_process(
+                "background_updates_concurrent",
+                self._run_concurrent_background_updates,
+                sleep,
+            )
+
+    async def _run_concurrent_background_updates(self, sleep: bool) -> None:
+        """Runs independent background updates concurrently with
+        `run_background_updates`, until there are none left which don't depend on
+        another pending update.
+        """
+        try:
+            while self.enabled and not self._aborted:
+                all_pending_updates = await self._get_pending_background_updates()
+                update_name = self._next_runnable_background_update(
+                    all_pending_updates, independent_only=True
+                )
+                if update_name is None:
+                    return
+
+                self._concurrent_background_updates.add(update_name)
+                try:
+                    # `_end_background_update` removes the update from the set
+                    # once it is done.
+                    while (
+                        self.enabled
+                        and update_name in self._concurrent_background_updates
+                    ):
+                        await self._run_background_update_batch(update_name, sleep)
+                except Exception:
+                    # Leave `run_background_updates` to retry the update later.
+                    logger.exception("Error doing update %s", update_name)
+                    return
+                finally:
+                    self._concurrent_background_updates.discard(update_name)
+        finally:
+            self._num_concurrent_runners -= 1
+
     async def has_completed_background_updates(self) -> bool:
         """Check if all the background updates have completed
 
@@ -444,7 +599,7 @@ class BackgroundUpdater:
             return True
 
         # obviously, if we are currently processing an update, we're not done.
-        if self._current_background_update:
+        if self._current_background_update or self._concurrent_background_updates:
             return False
 
         # otherwise, check if there are updates to be run. This is important,
@@ -467,7 +622,10 @@ class BackgroundUpdater:
         if self._all_done:
             return True
 
-        if update_name == self._current_background_update:
+        if (
+            update_name == self._current_background_update
+            or update_name in self._concurrent_background_updates
+        ):
             return False
 
         update_exists = await self.db_pool.simple_select_one_onecol(
@@ -493,6 +651,42 @@ class BackgroundUpdater:
             True if we have finished running all the background updates, otherwise False
         """
 
+        if not self._current_background_update:
+            all_pending_updates = await self._get_pending_background_updates()
+            if not all_pending_updates:
+                # no work left to do
+                return True
+
+            # find the first update which isn't dependent on another one in the queue.
+            update_name = self._next_runnable_background_update(
+                all_pending_updates, log_blocked=True
+            )
+            if update_name is None:
+                if self._concurrent_background_updates:
+                    # Everything left to do is either being run concurrently or
+                    # depends on an update which is, so wait for them.
+                    await self._clock.sleep(CONCURRENT_UPDATES_POLL_INTERVAL_MS / 1000)
+                    return False
+
+                # if there is nothing we can run, there is a problem
+                raise Exception(
+                    "Unable to find a background update which doesn't depend on "
+                    "another: dependency cycle?"
+                )
+
+            self._current_background_update = update_name
+
+        await self._run_background_update_batch(self._current_background_update, sleep)
+
+        return False
+
+    async def _get_pending_background_updates(
+        self,
+    ) -> List[Tuple[str, Optional[str]]]:
+        """Returns the name and dependency of each pending background update, in
+        the order they should be run.
+        """
+
         def get_background_updates_txn(txn: Cursor) -> List[Tuple[str, Optional[str]]]:
             txn.execute(
                 """
@@ -502,54 +696,83 @@ class BackgroundUpdater:
             )
             return cast(List[Tuple[str, Optional[str]]], txn.fetchall())
 
-        if not self._current_background_update:
-            all_pending_updates = await self.db_pool.runInteraction(
-                "background_updates",
-                get_background_updates_txn,
-            )
-            if not all_pending_updates:
-                # no work left to do
-                return True
+        return await self.db_pool.runInteraction(
+            "background_updates",
+            get_background_updates_txn,
+        )
 
-            # find the first update which isn't dependent on another one in the queue.
-            pending = {update_name for update_name, depends_on in all_pending_updates}
-            for update_name, depends_on in all_pending_updates:
-                if not depends_on or depends_on not in pending:
-                    break
+    def _next_runnable_background_update(
+        self,
+        all_pending_updates: List[Tuple[str, Optional[str]]],
+        log_blocked: bool = False,
+        independent_only: bool = False,
+    ) -> Optional[str]:
+        """Returns the first of the pending background updates which isn't
+        already running and doesn't depend on another pending update, if any.
+
+        Args:
+            all_pending_updates: the name and dependency of each pending update,
+                in order.
+            log_blocked: whether to log the updates which are waiting on another.
+            independent_only: whether to only return updates which were
+                registered as independent, and so can be run out of order.
+        """
+        running = self._concurrent_background_updates | {
+            self._current_background_update
+        }
+        pending = {update_name for update_name, depends_on in all_pending_updates}
+        for update_name, depends_on in all_pending_updates:
+            if update_name in running:
+                continue
+
+            if independent_only:
+                update_info = self._background_update_handlers.get(update_name)
+                if update_info is None or not update_info.independent:
+                    continue
+
+            if not depends_on or depends_on not in pending:
+                return update_name
+
+            if log_blocked:
                 logger.info(
                     "Not starting on bg update %s until %s is done",
                     update_name,
                     depends_on,
                 )
-            else:
-                # if we get to the end of that for loop, there is a problem
-                raise Exception(
-                    "Unable to find a background update which doesn't depend on "
-                    "another: dependency cycle?"
-                )
 
-            self._current_background_update = update_name
+        return None
 
-        # We have a background update to run, otherwise we would have returned
-        # early.
-        assert self._current_background_update is not None
-        update_info = self._background_update_handlers[self._current_background_update]
+    async def _run_background_update_batch(self, update_name: str, sleep: bool) -> None:
+        """Runs a batch of the given background update."""
+        update_info = self._background_update_handlers[update_name]
 
         async with self._get_context_manager_for_update(
             sleep=sleep,
-            update_name=self._current_background_update,
+            update_name=update_name,
             database_name=self._database_name,
             oneshot=update_info.oneshot,
         ) as desired_duration_ms:
-            await self._do_background_update(desired_duration_ms)
+            await self._do_background_update(update_name, desired_duration_ms)
 
-        return False
-
-    async def _do_background_update(self, desired_duration_ms: float) -> int:
-        assert self._current_background_update is not None
-        update_name = self._current_background_update
+    async def _do_background_update(
+        self, update_name: str, desired_duration_ms: float
+    ) -> int:
         logger.info("Starting update batch on background update '%s'", update_name)
 
+        progress_json = await self.db_pool.simple_select_one_onecol(
+            "background_updates",
+            keyvalues={"update_name": update_name},
+            retcol="progress_json",
+            allow_none=True,
+        )
+        if progress_json is None:
+            # The update was finished concurrently after we picked it to run.
+            logger.info("Background update '%s' has already completed", update_name)
+            if update_name == self._current_background_update:
+                self._current_background_update = None
+            self._concurrent_background_updates.discard(update_name)
+            return len(self._background_update_performance)
+
         update_handler = self._background_update_handlers[update_name].callback
 
         performance = self._background_update_performance.get(update_name)
@@ -560,6 +783,9 @@ class BackgroundUpdater:
 
         items_per_ms = performance.average_items_per_ms()
 
+        if self.adapt_to_database_load:
+            desired_duration_ms *= await self._get_database_load_factor()
+
         if items_per_ms is not None:
             batch_size = int(desired_duration_ms * items_per_ms)
             # Clamp the batch size so that we always make progress
@@ -572,12 +798,6 @@ class BackgroundUpdater:
                 update_name, self._database_name
             )
 
-        progress_json = await self.db_pool.simple_select_one_onecol(
-            "background_updates",
-            keyvalues={"update_name": update_name},
-            retcol="progress_json",
-        )
-
         # Avoid a circular import.
         from synapse.storage._base import db_to_json
 
@@ -605,10 +825,74 @@ class BackgroundUpdater:
 
         return len(self._background_update_performance)
 
+    async def _get_database_load_factor(self) -> float:
+        """Returns the fraction of the target duration to run the next batch of
+        a background update for, based on how loaded the database is.
+
+        The load is judged by how long a trivial query takes compared to when
+        the database is quietest, and on Postgres by how far behind its
+        replicas are compared to `max_replication_lag_ms`.
+        """
+
+        def probe_txn(txn: "LoggingTransaction") -> Optional[float]:
+            txn.execute("SELECT 1")
+            txn.fetchall()
+
+            if not self._check_replication_lag:
+                return None
+
+            txn.execute(
+                """
+                SELECT MAX(EXTRACT(EPOCH FROM replay_lag)) FROM pg_stat_replication
+                """
+            )
+            row = txn.fetchone()
+            if row is None or row[0] is None:
+                return None
+
+            # `EXTRACT` returns a `numeric` from Postgres 14, which we get as a
+            # `Decimal`.
+            return float(row[0])
+
+        if self._check_replication_lag is None:
+            self._check_replication_lag = isinstance(
+                self.db_pool.engine, PostgresEngine
+            )
+
+        start = self._clock.time_msec()
+        try:
+            replication_lag_s = await self.db_pool.runInteraction(
+                "background_updates_probe", probe_txn
+            )
+        except self.db_pool.engine.module.DatabaseError as e:
+            # We probably aren't allowed to see the replication statistics.
+            logger.warning("Unable to check the database replication lag: %s", e)
+            self._check_replication_lag = False
+            return 1.0
+        latency_ms = self._clock.time_msec() - start
+
+        if self._min_probe_latency_ms is None:
+            self._min_probe_latency_ms = self._avg_probe_latency_ms = latency_ms
+        self._min_probe_latency_ms = min(self._min_probe_latency_ms, latency_ms)
+        self._avg_probe_latency_ms += 0.1 * (latency_ms - self._avg_probe_latency_ms)
+
+        # Add a millisecond to both, so that jitter on a quiet database doesn't
+        # look like load.
+        factor = (self._min_probe_latency_ms + 1) / (self._avg_probe_latency_ms + 1)
+
+        if replication_lag_s:
+            factor = min(
+                factor, self.max_replication_lag_ms / (replication_lag_s * 1000)
+            )
+
+        return max(MIN_DATABASE_LOAD_FACTOR, min(factor, 1.0))
+
     def register_background_update_handler(
         self,
         update_name: str,
         update_handler: Callable[[JsonDict, int], Awaitable[int]],
+        estimate_remaining_items: Optional[ESTIMATE_REMAINING_ITEMS_CALLBACK] = None,
+        independent: bool = False,
     ) -> None:
         """Register a handler for doing a background update.
 
@@ -625,9 +909,19 @@ class BackgroundUpdater:
         Args:
             update_name: The name of the update that this code handles.
             update_handler: The function that does the update.
+            estimate_remaining_items: An optional function which estimates how
+                many items the update has left to process given its progress,
+                used to estimate when the update will finish.
+            independent: Whether the update can be run at the same time as, and
+                out of order with, other updates when `max_concurrent_updates`
+                is set. Only set this if no other update relies on it having
+                finished, except via `depends_on`, and it doesn't rely on the
+                updates ordered before it.
         """
         self._background_update_handlers[update_name] = _BackgroundUpdateHandler(
-            update_handler
+            update_handler,
+            estimate_remaining_items=estimate_remaining_items,
+            independent=independent,
         )
 
     def register_background_index_update(
@@ -1025,16 +1319,26 @@ class BackgroundUpdater:
         Returns:
             None, completes once the task is removed.
         """
-        if update_name != self._current_background_update:
+        if (
+            update_name != self._current_background_update
+            and update_name not in self._concurrent_background_updates
+        ):
             raise Exception(
                 "Cannot end background update %s which isn't currently running"
                 % update_name
             )
-        self._current_background_update = None
+
+        # Remove the update from the queue before we stop tracking it as running,
+        # so that it isn't picked to run again in the meantime.
         await self.db_pool.simple_delete_one(
             "background_updates", keyvalues={"update_name": update_name}
         )
 
+        if update_name == self._current_background_update:
+            self._current_background_update = None
+        else:
+            self._concurrent_background_updates.discard(update_name)
+
     async def _background_update_progress(
         self, update_name: str, progress: dict
     ) -> None:
@@ -24,6 +24,7 @@ from typing import (
     List,
     Mapping,
     Optional,
+    Set,
     Tuple,
     Union,
 )
@@ -702,7 +703,7 @@ class StateStorageController:
 
         # If the state group in the cache matches, we already have the data we need.
         if state_entry.state_group == cache.state_group:
-            return frozenset(cache.hosts_to_joined_users)
+            return cache.get_hosts()
 
         # Since we'll mutate the cache we need to lock.
         async with self._joined_host_linearizer.queue(room_id):
@@ -721,16 +722,12 @@ class StateStorageController:
 
                     host = intern_string(get_domain_from_id(state_key))
                     user_id = state_key
-                    known_joins = cache.hosts_to_joined_users.setdefault(host, set())
 
                     event = await self.stores.main.get_event(event_id)
                     if event.membership == Membership.JOIN:
-                        known_joins.add(user_id)
+                        cache.add_joined_user(host, user_id)
                     else:
-                        known_joins.discard(user_id)
-
-                        if not known_joins:
-                            cache.hosts_to_joined_users.pop(host, None)
+                        cache.remove_joined_user(host, user_id)
             else:
                 # The cache doesn't match the state group or prev state group,
                 # so we calculate the result from first principles.
@@ -765,17 +762,18 @@ class StateStorageController:
                     room_id, unknown_state_events
                 )
 
-                cache.hosts_to_joined_users = {}
+                hosts_to_joined_users: Dict[str, Set[str]] = {}
                 for user_id in chain(joined_user_ids, joined_users_in_current_state):
                     host = intern_string(get_domain_from_id(user_id))
-                    cache.hosts_to_joined_users.setdefault(host, set()).add(user_id)
+                    hosts_to_joined_users.setdefault(host, set()).add(user_id)
+                cache.set_joined_users(hosts_to_joined_users)
 
             if state_entry.state_group:
                 cache.state_group = state_entry.state_group
             else:
                 cache.state_group = object()
 
-        return frozenset(cache.hosts_to_joined_users)
+        return cache.get_hosts()
 
 
 def server_acl_evaluator_from_event(acl_event: EventBase) -> "ServerAclEvaluator":
@@ -601,6 +601,14 @@ class DatabasePool:
         "Return the name of this database"
         return self._database_config.name
 
+    def max_connections(self) -> int:
+        """Return the maximum number of connections the pool will open to the
+        database, as configured by `cp_max`.
+        """
+        return self._database_config.config.get("args", {}).get(
+            "cp_max", adbapi.ConnectionPool.max
+        )
+
     def is_running(self) -> bool:
         """Is the database pool currently running"""
         return self._db_pool.running
@@ -17,6 +17,8 @@ import itertools
 import logging
 from typing import TYPE_CHECKING, Any, Collection, Iterable, List, Optional, Tuple
 
+from prometheus_client import Counter
+
 from synapse.api.constants import EventTypes
 from synapse.config._base import Config
 from synapse.metrics.background_process_metrics import wrap_as_background_process
@@ -55,6 +57,16 @@ PURGE_HISTORY_CACHE_NAME = "ph_cache_fake"
 # As above, but for invalidating room caches on room deletion
 DELETE_ROOM_CACHE_NAME = "dr_cache_fake"
 
+# As above, but for invalidating many entries of a single cache at once. The
+# first key is the name of the cache, and the rest are the first arguments of
+# the entries to invalidate. For caches with `tree=True` this invalidates every
+# entry whose key starts with the given argument.
+BULK_INVALIDATION_CACHE_NAME = "bi_cache_fake"
+
+# The maximum number of keys to send in a single bulk invalidation. Max line
+# length is 16K, and max user ID length is 255, so 50 should be safe.
+BULK_INVALIDATION_MAX_KEYS = 50
+
 # How long between cache invalidation table cleanups, once we have caught up
 # with the backlog.
 REGULAR_CLEANUP_INTERVAL_MS = Config.parse_duration("1h")
@@ -70,6 +82,19 @@ CLEAN_UP_MAX_BATCH_SIZE = 20_000
 # (This is likely to be quite excessive.)
 RETENTION_PERIOD_OF_CACHE_INVALIDATIONS_MS = Config.parse_duration("7d")
 
+cache_invalidations_sent_counter = Counter(
+    "synapse_storage_cache_invalidations_sent",
+    "Number of cache entries invalidated over replication, by cache",
+    ["cache_name"],
+)
+
+cache_invalidations_received_counter = Counter(
+    "synapse_storage_cache_invalidations_received",
+    "Number of cache entries invalidated by other workers over replication, "
+    "by cache",
+    ["cache_name"],
+)
+
 
 class CacheInvalidationWorkerStore(SQLBaseStore):
     def __init__(
@@ -202,6 +227,21 @@ class CacheInvalidationWorkerStore(SQLBaseStore):
                 )
         elif stream_name == CachesStream.NAME:
             for row in rows:
+                if row.cache_func == BULK_INVALIDATION_CACHE_NAME:
+                    if row.keys is None:
+                        raise Exception(
+                            "Can't send an 'invalidate all' for 'bulk invalidation' cache"
+                        )
+
+                    cache_name = row.keys[0]
+                    for key in row.keys[1:]:
+                        self._attempt_to_invalidate_cache(cache_name, (key,))
+                    cache_invalidations_received_counter.labels(cache_name).inc(
+                        len(row.keys) - 1
+                    )
+                    continue
+
+                cache_invalidations_received_counter.labels(row.cache_func).inc()
                 if row.cache_func == CURRENT_STATE_CACHE_NAME:
                     if row.keys is None:
                         raise Exception(
@@ -495,7 +535,9 @@ class CacheInvalidationWorkerStore(SQLBaseStore):
         for each key-tuple over replication.
 
         This implementation is more efficient than a loop which repeatedly calls the
-        non-bulk version.
+        non-bulk version. If every key-tuple is a single argument, they are sent
+        over replication in as few rows as possible. For caches with `tree=True`
+        this can be used to invalidate every entry starting with each argument.
         """
         if not key_tuples:
             return
@@ -585,6 +627,11 @@ class CacheInvalidationWorkerStore(SQLBaseStore):
         if cache_name == DELETE_ROOM_CACHE_NAME and keys is None:
             raise Exception("Can't stream invalidate all with magic delete room cache")
 
+        if cache_name == BULK_INVALIDATION_CACHE_NAME and keys is None:
+            raise Exception(
+                "Can't stream invalidate all with magic bulk invalidation cache"
+            )
+
         if isinstance(self.database_engine, PostgresEngine):
             assert self._cache_id_gen is not None
 
@@ -594,6 +641,12 @@ class CacheInvalidationWorkerStore(SQLBaseStore):
             if keys is not None:
                 keys = list(keys)
 
+            if cache_name == BULK_INVALIDATION_CACHE_NAME:
+                assert keys is not None
+                cache_invalidations_sent_counter.labels(keys[0]).inc(len(keys) - 1)
+            else:
+                cache_invalidations_sent_counter.labels(cache_name).inc()
+
             self.db_pool.simple_insert_txn(
                 txn,
                 table="cache_invalidation_stream_by_instance",
@@ -625,9 +678,22 @@ class CacheInvalidationWorkerStore(SQLBaseStore):
             cache_name
             key_tuples: Key-tuples to invalidate. Assumed to be non-empty.
         """
+        if all(len(key_tuple) == 1 for key_tuple in key_tuples):
+            # Pack the keys into as few rows as we can, rather than sending a
+            # row for each.
+            for chunk in batch_iter(key_tuples, BULK_INVALIDATION_MAX_KEYS):
+                self._send_invalidation_to_replication(
+                    txn,
+                    BULK_INVALIDATION_CACHE_NAME,
+                    itertools.chain([cache_name], (key for (key,) in chunk)),
+                )
+            return
+
         if isinstance(self.database_engine, PostgresEngine):
             assert self._cache_id_gen is not None
 
+            cache_invalidations_sent_counter.labels(cache_name).inc(len(key_tuples))
+
             stream_ids = self._cache_id_gen.get_next_mult_txn(txn, len(key_tuples))
             ts = self._clock.time_msec()
             txn.call_after(self.hs.get_notifier().on_new_replication_data)
@@ -36,6 +36,7 @@ from synapse.api.constants import MAX_DEPTH
 from synapse.api.errors import StoreError
 from synapse.api.room_versions import EventFormatVersions, RoomVersion
 from synapse.events import EventBase, make_event_from_dict
+from synapse.events.utils import encode_event_dict_json
 from synapse.logging.opentracing import tag_args, trace
 from synapse.metrics.background_process_metrics import wrap_as_background_process
 from synapse.storage._base import SQLBaseStore, db_to_json, make_in_list_sql_clause
@@ -1728,7 +1729,7 @@ class EventFederationWorkerStore(SignatureWorkerStore, EventsWorkerStore, SQLBas
             insertion_values={
                 "room_id": event.room_id,
                 "received_ts": self._clock.time_msec(),
-                "event_json": json_encoder.encode(event.get_dict()),
+                "event_json": encode_event_dict_json(event),
                 "internal_metadata": json_encoder.encode(
                     event.internal_metadata.get_dict()
                 ),
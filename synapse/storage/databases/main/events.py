@@ -40,6 +40,7 @@ from synapse.api.errors import PartialStateConflictError
 from synapse.api.room_versions import RoomVersions
 from synapse.events import EventBase, relation_from_event
 from synapse.events.snapshot import EventContext
+from synapse.events.utils import encode_event_dict_json
 from synapse.logging.opentracing import trace
 from synapse.storage._base import db_to_json, make_in_list_sql_clause
 from synapse.storage.database import (
@@ -52,7 +53,7 @@ from synapse.storage.databases.main.search import SearchEntry
 from synapse.storage.engines import PostgresEngine
 from synapse.storage.util.id_generators import AbstractStreamIdGenerator
 from synapse.storage.util.sequence import SequenceGenerator
-from synapse.types import JsonDict, StateMap, StrCollection, get_domain_from_id
+from synapse.types import StateMap, StrCollection, get_domain_from_id
 from synapse.util import json_encoder
 from synapse.util.iterutils import batch_iter, sorted_topologically
 from synapse.util.stringutils import non_null_str_or_none
@@ -213,6 +214,10 @@ class PersistEventsStore:
                 synapse.metrics.event_persisted_position.set(stream)
 
             for event, context in events_and_contexts:
+                # We no longer need the encodings of the event's fields now
+                # that it has been stored.
+                event.release_canonical_json_fields()
+
                 if context.app_service:
                     origin_type = "local"
                     origin_entity = context.app_service.id
@@ -1466,12 +1471,6 @@ class PersistEventsStore:
             # nothing to do here
             return
 
-        def event_dict(event: EventBase) -> JsonDict:
-            d = event.get_dict()
-            d.pop("redacted", None)
-            d.pop("redacted_because", None)
-            return d
-
         self.db_pool.simple_insert_many_txn(
             txn,
             table="event_json",
@@ -1481,7 +1480,9 @@ class PersistEventsStore:
                     event.event_id,
                     event.room_id,
                     json_encoder.encode(event.internal_metadata.get_dict()),
-                    json_encoder.encode(event_dict(event)),
+                    encode_event_dict_json(
+                        event, exclude=("redacted", "redacted_because")
+                    ),
                     event.format_version,
                 )
                 for event, _ in events_and_contexts
@@ -197,6 +197,7 @@ class EventsBackgroundUpdatesStore(SQLBaseStore):
         self.db_pool.updates.register_background_update_handler(
             _BackgroundUpdates.POPULATE_STREAM_ORDERING2,
             self._background_populate_stream_ordering2,
+            estimate_remaining_items=self._estimate_populate_stream_ordering2_remaining,
         )
         # CREATE UNIQUE INDEX events_stream_ordering ON events(stream_ordering2);
         self.db_pool.updates.register_background_index_update(
@@ -260,6 +261,7 @@ class EventsBackgroundUpdatesStore(SQLBaseStore):
         self.db_pool.updates.register_background_update_handler(
             _BackgroundUpdates.EVENTS_POPULATE_STATE_KEY_REJECTIONS,
             self._background_events_populate_state_key_rejections,
+            estimate_remaining_items=self._estimate_populate_state_key_rejections_remaining,
         )
 
         # Add an index that would be useful for jumping to date using
@@ -1297,6 +1299,30 @@ class EventsBackgroundUpdatesStore(SQLBaseStore):
         )
         return 0
 
+    async def _estimate_populate_stream_ordering2_remaining(
+        self, progress: JsonDict
+    ) -> Optional[int]:
+        """Estimates how many events are left for
+        `_background_populate_stream_ordering2` to populate, assuming there are
+        few gaps in the stream orderings.
+        """
+        if "last_stream" not in progress:
+            # We don't know where the stream orderings start until the first
+            # batch has been populated.
+            return None
+
+        max_stream_ordering = await self.db_pool.simple_select_one_onecol(
+            table="events",
+            keyvalues={},
+            retcol="MAX(stream_ordering)",
+            allow_none=True,
+            desc="_estimate_populate_stream_ordering2_remaining",
+        )
+        if max_stream_ordering is None:
+            return None
+
+        return max(max_stream_ordering - progress["last_stream"], 0)
+
     async def _background_replace_stream_ordering_column(
         self, progress: JsonDict, batch_size: int
     ) -> int:
@@ -1420,6 +1446,19 @@ class EventsBackgroundUpdatesStore(SQLBaseStore):
 
         return batch_size
 
+    async def _estimate_populate_state_key_rejections_remaining(
+        self, progress: JsonDict
+    ) -> Optional[int]:
+        """Estimates how many events are left for
+        `_background_events_populate_state_key_rejections` to populate, assuming
+        there are few gaps in the stream orderings.
+        """
+        return max(
+            progress["max_stream_ordering_inclusive"]
+            - progress["min_stream_ordering_exclusive"],
+            0,
+        )
+
     async def _background_events_populate_state_key_rejections(
         self, progress: JsonDict, batch_size: int
     ) -> int:
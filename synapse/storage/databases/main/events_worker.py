@@ -14,12 +14,15 @@
 
 import logging
 import threading
+import time
 import weakref
 from enum import Enum, auto
 from itertools import chain
 from typing import (
     TYPE_CHECKING,
     Any,
+    Awaitable,
+    Callable,
     Collection,
     Dict,
     Iterable,
@@ -34,7 +37,7 @@ from typing import (
 )
 
 import attr
-from prometheus_client import Gauge
+from prometheus_client import Gauge, Histogram
 from typing_extensions import Literal
 
 from twisted.internet import defer
@@ -53,6 +56,7 @@ from synapse.events.utils import prune_event
 from synapse.logging.context import (
     PreserveLoggingContext,
     current_context,
+    defer_to_thread,
     make_deferred_yieldable,
 )
 from synapse.logging.opentracing import start_active_span, tag_args, trace
@@ -82,6 +86,7 @@ from synapse.types.state import StateFilter
 from synapse.util import unwrapFirstError
 from synapse.util.async_helpers import ObservableDeferred, delay_cancellation
 from synapse.util.caches.descriptors import cached, cachedList
+from synapse.util.caches.disk_cache import DiskCache
 from synapse.util.caches.lrucache import AsyncLruCache
 from synapse.util.caches.stream_change_cache import StreamChangeCache
 from synapse.util.cancellation import cancellable
@@ -99,16 +104,53 @@ logger = logging.getLogger(__name__)
 # The values are plucked out of thing air to make initial sync run faster
 # on jki.re
 # TODO: Make these configurable.
-EVENT_QUEUE_THREADS = 3  # Max number of threads that will fetch events
+EVENT_QUEUE_MAX_THREADS = 10  # Max number of threads that will fetch events
 EVENT_QUEUE_ITERATIONS = 3  # No. times we block waiting for requests for events
 EVENT_QUEUE_TIMEOUT_S = 0.1  # Timeout when waiting for requests for events
 
+# When requests for events are arriving faster than one per
+# `EVENT_QUEUE_BATCH_WINDOW_S`, a fetch thread waits up to that long for more
+# requests to turn up before querying the database, unless it already has
+# `EVENT_QUEUE_BATCH_SIZE` events to fetch.
+EVENT_QUEUE_BATCH_WINDOW_S = 0.002
+EVENT_QUEUE_BATCH_SIZE = 200
+
+# The weight given to the latest interval between requests for events in the
+# moving average of that interval.
+EVENT_QUEUE_INTERVAL_SMOOTHING = 0.1
+
+# How often we remove invalidated events from the on-disk event cache, if enabled.
+EVENT_DISK_CACHE_INVALIDATION_INTERVAL_MS = 5 * 1000
+
+# How often we remove invalidated events from the external event cache shared
+# between processes on this host, if enabled.
+EXTERNAL_EVENT_CACHE_INVALIDATION_INTERVAL_MS = 1000
+
 
 event_fetch_ongoing_gauge = Gauge(
     "synapse_event_fetch_ongoing",
     "The number of event fetchers that are running",
 )
 
+event_fetch_queue_latency = Histogram(
+    "synapse_event_fetch_queue_latency_seconds",
+    "Time that requests for events wait in the queue before an event fetcher "
+    "picks them up",
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1),
+)
+
+event_fetch_batch_size = Histogram(
+    "synapse_event_fetch_batch_size",
+    "Number of events fetched from the database in one go by an event fetcher",
+    buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500, 1000),
+)
+
+event_fetch_batch_requests = Histogram(
+    "synapse_event_fetch_batch_requests",
+    "Number of requests for events served by one fetch from the database",
+    buckets=(1, 2, 3, 5, 10, 20, 50, 100),
+)
+
 
 class InvalidEventError(Exception):
     """The event retrieved from the database is invalid and cannot be used."""
@@ -120,6 +162,199 @@ class EventCacheEntry:
     redacted_event: Optional[EventBase]
 
 
+# The name of the event cache in the `ExternalCache`.
+EXTERNAL_EVENT_CACHE_NAME = "getEvent"
+
+# How long events are kept in the external cache.
+EXTERNAL_EVENT_CACHE_EXPIRY_MS = 30 * 60 * 1000
+
+# Keys in the internal metadata of events which are not persisted, and so
+# should not be put in the external cache.
+_UNPERSISTED_INTERNAL_METADATA_KEYS = ("before", "after", "order")
+
+# The parts of an event which can change after it is persisted, and so aren't
+# put in the external cache: its stream ordering, whether it is an outlier, and
+# why it was rejected (if it was).
+_MutableEventFields = Tuple[int, bool, Optional[str]]
+
+
+class ExternalEventCache(AsyncLruCache[Tuple[str], EventCacheEntry]):
+    """An event cache which is backed by the `ExternalCache`, i.e. Redis and/or
+    a cache shared between all the processes on the same host.
+
+    Entries for redacted events are not stored externally, and only the parts of
+    events which can't change are: the rest are read from the database (with
+    `get_mutable_fields`) when entries are read. That also means that we never
+    return events which have since been purged or redacted.
+
+    Invalidations received over replication (`invalidate_local`) are applied to
+    the cache shared by the processes on this host in batches in the background.
+    Until they have been, we ignore any externally cached entries for those events
+    which were written before the invalidation.
+    """
+
+    def __init__(
+        self,
+        hs: "HomeServer",
+        get_mutable_fields: Callable[
+            [Collection[str]], Awaitable[Dict[str, _MutableEventFields]]
+        ],
+        *args: Any,
+        **kwargs: Any,
+    ):
+        super().__init__(*args, **kwargs)
+
+        self._clock = hs.get_clock()
+        self._external_cache = hs.get_external_cache()
+
+        # Returns the mutable fields of the given events which are in the
+        # database and have not been redacted.
+        self._get_mutable_fields = get_mutable_fields
+
+        # Map from event ID to the time we were told to invalidate it, for
+        # invalidations that have not yet been applied to the host cache.
+        self._pending_host_invalidations: Dict[str, int] = {}
+        self._clock.looping_call(
+            self._flush_host_invalidations,
+            EXTERNAL_EVENT_CACHE_INVALIDATION_INTERVAL_MS,
+        )
+
+    async def get_external(
+        self,
+        key: Tuple[str],
+        default: Optional[Any] = None,
+        update_metrics: bool = True,
+    ) -> Optional[EventCacheEntry]:
+        results = await self.get_many_external((key,), update_metrics=update_metrics)
+        return results.get(key)
+
+    async def get_many_external(
+        self, keys: Collection[Tuple[str]], update_metrics: bool = True
+    ) -> Dict[Tuple[str], EventCacheEntry]:
+        values = await self._external_cache.get_many(
+            EXTERNAL_EVENT_CACHE_NAME, [event_id for (event_id,) in keys]
+        )
+
+        values = {
+            event_id: value
+            for event_id, value in values.items()
+            if value["ts"] > self._pending_host_invalidations.get(event_id, -1)
+        }
+        if not values:
+            return {}
+
+        mutable_fields = await self._get_mutable_fields(list(values))
+
+        results = {}
+        for event_id, value in values.items():
+            fields = mutable_fields.get(event_id)
+            if fields is None:
+                continue
+
+            entry = _event_cache_entry_from_json(value, *fields)
+            if entry is not None:
+                results[(event_id,)] = entry
+
+        return results
+
+    async def set_external(self, key: Tuple[str], value: EventCacheEntry) -> None:
+        if value.redacted_event is not None:
+            return
+
+        (event_id,) = key
+        await self._external_cache.set(
+            EXTERNAL_EVENT_CACHE_NAME,
+            event_id,
+            _event_cache_entry_to_json(value, self._clock.time_msec()),
+            EXTERNAL_EVENT_CACHE_EXPIRY_MS,
+        )
+
+    async def invalidate(self, key: Tuple[str]) -> None:
+        await self._external_cache.delete(EXTERNAL_EVENT_CACHE_NAME, key)
+        self._lru_cache.invalidate(key)
+
+    def invalidate_local(self, key: Tuple[str]) -> None:
+        self._lru_cache.invalidate(key)
+
+        (event_id,) = key
+        self._pending_host_invalidations[event_id] = self._clock.time_msec()
+
+    @wrap_as_background_process("flush_external_event_cache_invalidations")
+    async def _flush_host_invalidations(self) -> None:
+        if not self._pending_host_invalidations:
+            return
+
+        pending = self._pending_host_invalidations
+        self._pending_host_invalidations = {}
+
+        try:
+            await self._external_cache.delete_from_host_cache(
+                EXTERNAL_EVENT_CACHE_NAME, list(pending)
+            )
+        except Exception:
+            # Put the invalidations back so that we retry them, keeping any
+            # newer ones.
+            pending.update(self._pending_host_invalidations)
+            self._pending_host_invalidations = pending
+            raise
+
+
+def _event_cache_entry_to_json(entry: EventCacheEntry, now_ms: int) -> JsonDict:
+    """Serialise an (unredacted) event cache entry for the external cache."""
+    event = entry.event
+    internal_metadata = event.internal_metadata.get_dict()
+    for key in _UNPERSISTED_INTERNAL_METADATA_KEYS:
+        internal_metadata.pop(key, None)
+
+    return {
+        "event": event.get_dict(),
+        "internal_metadata": internal_metadata,
+        "room_version": event.room_version.identifier,
+        # When the entry was written, so that we can tell if it predates an
+        # invalidation.
+        "ts": now_ms,
+    }
+
+
+def _event_cache_entry_from_json(
+    value: JsonDict,
+    stream_ordering: int,
+    outlier: bool,
+    rejected_reason: Optional[str],
+) -> Optional[EventCacheEntry]:
+    """The inverse of `_event_cache_entry_to_json`, given the mutable fields of
+    the event from the database.
+    """
+    room_version = KNOWN_ROOM_VERSIONS.get(value["room_version"])
+    if room_version is None:
+        return None
+
+    event = make_event_from_dict(
+        event_dict=value["event"],
+        room_version=room_version,
+        internal_metadata_dict=value["internal_metadata"],
+        rejected_reason=rejected_reason,
+    )
+    event.internal_metadata.stream_ordering = stream_ordering
+    event.internal_metadata.outlier = outlier
+
+    return EventCacheEntry(event=event, redacted_event=None)
+
+
+@attr.s(slots=True, frozen=True, auto_attribs=True)
+class _EventFetchRequest:
+    """A request for events, queued for an event fetch thread."""
+
+    event_ids: Collection[str]
+
+    # Completed with a map from event ID to row, which may contain events that
+    # weren't requested.
+    deferred: "defer.Deferred[Dict[str, _EventRow]]"
+
+    # When the request was queued, per `time.monotonic()`.
+    queued_at: float
+
+
 @attr.s(slots=True, frozen=True, auto_attribs=True)
 class _EventRow:
     """
@@ -161,6 +396,34 @@ class _EventRow:
     outlier: bool
 
 
+def _encode_event_disk_cache_value(
+    internal_metadata: str, json: str, format_version: Optional[int]
+) -> str:
+    """Encode the immutable parts of an event row for the on-disk event cache.
+
+    We avoid wrapping the (already JSON encoded) fields in another layer of JSON,
+    as that would mean escaping and unescaping the whole of the event JSON.
+    """
+    return "%s:%d:%s%s" % (
+        "" if format_version is None else format_version,
+        len(internal_metadata),
+        internal_metadata,
+        json,
+    )
+
+
+def _decode_event_disk_cache_value(value: str) -> Tuple[str, str, Optional[int]]:
+    """The inverse of `_encode_event_disk_cache_value`.
+
+    Returns:
+        A tuple of internal metadata, event JSON and format version.
+    """
+    format_version_str, metadata_length_str, rest = value.split(":", 2)
+    metadata_length = int(metadata_length_str)
+    format_version = int(format_version_str) if format_version_str else None
+    return rest[:metadata_length], rest[metadata_length:], format_version
+
+
 class EventRedactBehaviour(Enum):
     """
     What to do when retrieving a redacted event from the database.
@@ -257,12 +520,43 @@ class EventsWorkerStore(SQLBaseStore):
                 5 * 60 * 1000,
             )
 
-        self._get_event_cache: AsyncLruCache[
-            Tuple[str], EventCacheEntry
-        ] = AsyncLruCache(
-            cache_name="*getEvent*",
-            max_size=hs.config.caches.event_cache_size,
-        )
+        self._get_event_cache: AsyncLruCache[Tuple[str], EventCacheEntry]
+        if hs.config.caches.external_event_cache:
+            self._get_event_cache = ExternalEventCache(
+                hs,
+                self._get_unredacted_event_mutable_fields,
+                cache_name="*getEvent*",
+                max_size=hs.config.caches.event_cache_size,
+            )
+        else:
+            self._get_event_cache = AsyncLruCache(
+                cache_name="*getEvent*",
+                max_size=hs.config.caches.event_cache_size,
+            )
+
+        # An optional persistent, on-disk, second tier behind `_get_event_cache`.
+        # This only stores the immutable parts of the event rows (the event JSON,
+        # internal metadata and format version), which are the expensive parts to
+        # pull out of the database: the rest of the row is always read from the
+        # database, so the entries can never become stale in a way that matters.
+        # See `_fetch_event_rows_with_disk_cache`.
+        self._event_disk_cache: Optional[DiskCache] = None
+        if hs.config.caches.event_disk_cache_path:
+            self._event_disk_cache = DiskCache(
+                cache_name="*getEventDisk*",
+                path=hs.config.caches.event_disk_cache_path,
+                max_size=hs.config.caches.event_disk_cache_max_entries,
+                clock=self._clock,
+            )
+
+            # Event IDs which have been invalidated and should be removed from
+            # the disk cache. We remove them in batches in the background so as
+            # not to do disk I/O on the reactor for each persisted event.
+            self._event_disk_cache_pending_invalidations: Set[str] = set()
+            self._clock.looping_call(
+                self._flush_event_disk_cache_invalidations,
+                EVENT_DISK_CACHE_INVALIDATION_INTERVAL_MS,
+            )
 
         # Map from event ID to a deferred that will result in a map from event
         # ID to cache entry. Note that the returned dict may not have the
@@ -278,12 +572,25 @@ class EventsWorkerStore(SQLBaseStore):
         self._event_ref: MutableMapping[str, EventBase] = weakref.WeakValueDictionary()
 
         self._event_fetch_lock = threading.Condition()
-        self._event_fetch_list: List[
-            Tuple[Iterable[str], "defer.Deferred[Dict[str, _EventRow]]"]
-        ] = []
+        self._event_fetch_list: List[_EventFetchRequest] = []
         self._event_fetch_ongoing = 0
         event_fetch_ongoing_gauge.set(self._event_fetch_ongoing)
 
+        # The number of event fetch threads which are waiting for requests. We
+        # only start another thread if none of them are.
+        self._event_fetch_idle = 0
+
+        # Leave a couple of database connections for everything else.
+        self._event_fetch_max_threads = max(
+            1, min(EVENT_QUEUE_MAX_THREADS, database.max_connections() - 2)
+        )
+
+        # A moving average of the interval between requests for events, and when
+        # the last one was queued, which determine whether it's worth waiting for
+        # more requests to batch together.
+        self._event_fetch_interval = EVENT_QUEUE_TIMEOUT_S
+        self._event_fetch_last_queued_at = 0.0
+
         # We define this sequence here so that it can be referenced from both
         # the DataStore and PersistEventStore.
         def get_chain_id_txn(txn: Cursor) -> int:
@@ -810,10 +1117,12 @@ class EventsWorkerStore(SQLBaseStore):
                         missing_events_ids,
                     )
                     # Now actually fetch any remaining events from the DB
-                    db_missing_events = await self._get_events_from_db(
-                        missing_events_ids - missing_events.keys(),
-                    )
-                    missing_events.update(db_missing_events)
+                    db_missing_event_ids = missing_events_ids - missing_events.keys()
+                    if db_missing_event_ids:
+                        db_missing_events = await self._get_events_from_db(
+                            db_missing_event_ids,
+                        )
+                        missing_events.update(db_missing_events)
                 except Exception as e:
                     with PreserveLoggingContext():
                         fetching_deferred.errback(e)
@@ -904,8 +1213,32 @@ class EventsWorkerStore(SQLBaseStore):
         self._event_ref.pop(event_id, None)
         self._current_event_fetches.pop(event_id, None)
 
+        if self._event_disk_cache is not None:
+            self._event_disk_cache_pending_invalidations.add(event_id)
+
+    @wrap_as_background_process("flush_event_disk_cache_invalidations")
+    async def _flush_event_disk_cache_invalidations(self) -> None:
+        """Removes any invalidated events from the on-disk event cache.
+
+        Note that this is not required for correctness, as the mutable parts of
+        the event rows are never read from the disk cache, but it ensures that we
+        don't keep the original content of redacted or purged events around.
+        """
+        assert self._event_disk_cache is not None
+
+        if not self._event_disk_cache_pending_invalidations:
+            return
+
+        event_ids = self._event_disk_cache_pending_invalidations
+        self._event_disk_cache_pending_invalidations = set()
+
+        await defer_to_thread(
+            self.hs.get_reactor(), self._event_disk_cache.invalidate_many, event_ids
+        )
+
     def _invalidate_local_get_event_cache_all(self) -> None:
-        """Clears the in-memory get event caches.
+        """Clears the in-memory get event caches, and the on-disk one (if any) in
+        the background.
 
         Used when we purge room history.
         """
@@ -913,6 +1246,20 @@ class EventsWorkerStore(SQLBaseStore):
         self._event_ref.clear()
         self._current_event_fetches.clear()
 
+        if self._event_disk_cache is not None:
+            # We don't know which events were purged, so we can't just remove
+            # those. Clearing the whole cache at least ensures that we don't keep
+            # the content of purged events around on disk.
+            self._event_disk_cache_pending_invalidations.clear()
+            self._clear_event_disk_cache()
+
+    @wrap_as_background_process("clear_event_disk_cache")
+    async def _clear_event_disk_cache(self) -> None:
+        """Removes all events from the on-disk event cache."""
+        assert self._event_disk_cache is not None
+
+        await defer_to_thread(self.hs.get_reactor(), self._event_disk_cache.clear)
+
     async def _get_events_from_cache(
         self, events: Iterable[str], update_metrics: bool = True
     ) -> Dict[str, EventCacheEntry]:
@@ -949,16 +1296,60 @@ class EventsWorkerStore(SQLBaseStore):
             events: list of event_ids to fetch
             update_metrics: Whether to update the cache hit ratio metrics
         """
-        event_map = {}
+        entries = await self._get_event_cache.get_many_external(
+            [(event_id,) for event_id in events], update_metrics=update_metrics
+        )
+        return {event_id: entry for (event_id,), entry in entries.items()}
 
-        for event_id in events:
-            ret = await self._get_event_cache.get_external(
-                (event_id,), None, update_metrics=update_metrics
+    async def _get_unredacted_event_mutable_fields(
+        self, event_ids: Collection[str]
+    ) -> Dict[str, _MutableEventFields]:
+        """Fetches the parts of the given events which can change after they are
+        persisted, for events read from the external event cache.
+
+        Args:
+            event_ids: The event IDs to look up.
+
+        Returns:
+            A map from event ID to its stream ordering, whether it is an outlier
+            and why it was rejected (if it was). Events which are not in the
+            database, or for which there are redactions, are omitted.
+        """
+        return await self.db_pool.runInteraction(
+            "get_unredacted_event_mutable_fields",
+            self._get_unredacted_event_mutable_fields_txn,
+            event_ids,
+        )
+
+    @staticmethod
+    def _get_unredacted_event_mutable_fields_txn(
+        txn: LoggingTransaction, event_ids: Collection[str]
+    ) -> Dict[str, _MutableEventFields]:
+        results: Dict[str, _MutableEventFields] = {}
+        for evs in batch_iter(event_ids, 200):
+            sql = """
+                SELECT e.event_id, e.stream_ordering, e.outlier, rej.reason
+                FROM events AS e
+                  LEFT JOIN rejections as rej USING (event_id)
+                WHERE
+            """
+            clause, args = make_in_list_sql_clause(
+                txn.database_engine, "e.event_id", evs
             )
-            if ret:
-                event_map[event_id] = ret
+            txn.execute(sql + clause, args)
 
-        return event_map
+            batch_results = {row[0]: (row[1], row[2], row[3]) for row in txn}
+
+            # The external cache never holds redacted events, so if there are
+            # redactions the event needs to be fetched from the database.
+            clause, args = make_in_list_sql_clause(txn.database_engine, "redacts", evs)
+            txn.execute("SELECT redacts FROM redactions WHERE " + clause, args)
+            for (redacted,) in txn:
+                batch_results.pop(redacted, None)
+
+            results.update(batch_results)
+
+        return results
 
     def _get_events_from_local_cache(
         self, events: Iterable[str], update_metrics: bool = True
@@ -1057,11 +1448,15 @@ class EventsWorkerStore(SQLBaseStore):
         ]
 
     def _maybe_start_fetch_thread(self) -> None:
-        """Starts an event fetch thread if we are not yet at the maximum number."""
+        """Starts an event fetch thread if there are requests waiting which no
+        existing thread is free to pick up, and we are not yet at the maximum
+        number.
+        """
         with self._event_fetch_lock:
             if (
                 self._event_fetch_list
-                and self._event_fetch_ongoing < EVENT_QUEUE_THREADS
+                and self._event_fetch_idle == 0
+                and self._event_fetch_ongoing < self._event_fetch_max_threads
             ):
                 self._event_fetch_ongoing += 1
                 event_fetch_ongoing_gauge.set(self._event_fetch_ongoing)
@@ -1137,16 +1532,24 @@ class EventsWorkerStore(SQLBaseStore):
                 # Fail any outstanding fetches since no one else will handle them.
                 assert exc is not None
                 with PreserveLoggingContext():
-                    for _, deferred in event_fetches_to_fail:
-                        deferred.errback(exc)
+                    for request in event_fetches_to_fail:
+                        request.deferred.errback(exc)
 
     def _fetch_loop(self, conn: LoggingDatabaseConnection) -> None:
         """Takes a database connection and waits for requests for events from
         the _event_fetch_list queue.
         """
+        dedicated = (
+            self.USE_DEDICATED_DB_THREADS_FOR_EVENT_FETCHING
+            and not self.database_engine.single_threaded
+        )
+
         i = 0
         while True:
             with self._event_fetch_lock:
+                if dedicated and self._event_fetch_list:
+                    self._wait_for_event_fetch_batch()
+
                 event_list = self._event_fetch_list
                 self._event_fetch_list = []
 
@@ -1154,25 +1557,47 @@ class EventsWorkerStore(SQLBaseStore):
                     # There are no requests waiting. If we haven't yet reached the
                     # maximum iteration limit, wait for some more requests to turn up.
                     # Otherwise, bail out.
-                    single_threaded = self.database_engine.single_threaded
-                    if (
-                        not self.USE_DEDICATED_DB_THREADS_FOR_EVENT_FETCHING
-                        or single_threaded
-                        or i > EVENT_QUEUE_ITERATIONS
-                    ):
+                    if not dedicated or i > EVENT_QUEUE_ITERATIONS:
                         return
 
-                    self._event_fetch_lock.wait(EVENT_QUEUE_TIMEOUT_S)
+                    self._event_fetch_idle += 1
+                    try:
+                        self._event_fetch_lock.wait(EVENT_QUEUE_TIMEOUT_S)
+                    finally:
+                        self._event_fetch_idle -= 1
                     i += 1
                     continue
                 i = 0
 
+            now = time.monotonic()
+            for request in event_list:
+                event_fetch_queue_latency.observe(now - request.queued_at)
+
             self._fetch_event_list(conn, event_list)
 
+    def _wait_for_event_fetch_batch(self) -> None:
+        """Waits a short while for more requests for events to be queued, if they
+        are arriving often enough that it's worth fetching them together.
+
+        Must be called with `_event_fetch_lock` held.
+        """
+        if self._event_fetch_interval >= EVENT_QUEUE_BATCH_WINDOW_S:
+            return
+
+        deadline = time.monotonic() + EVENT_QUEUE_BATCH_WINDOW_S
+        while (
+            sum(len(request.event_ids) for request in self._event_fetch_list)
+            < EVENT_QUEUE_BATCH_SIZE
+        ):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            self._event_fetch_lock.wait(remaining)
+
     def _fetch_event_list(
         self,
         conn: LoggingDatabaseConnection,
-        event_list: List[Tuple[Iterable[str], "defer.Deferred[Dict[str, _EventRow]]"]],
+        event_list: List[_EventFetchRequest],
     ) -> None:
         """Handle a load of requests from the _event_fetch_list queue
 
@@ -1180,19 +1605,17 @@ class EventsWorkerStore(SQLBaseStore):
             conn: database connection
 
             event_list:
-                The fetch requests. Each entry consists of a list of event
-                ids to be fetched, and a deferred to be completed once the
-                events have been fetched.
-
-                The deferreds are callbacked with a dictionary mapping from event id
-                to event row. Note that it may well contain additional events that
-                were not part of this request.
+                The fetch requests. The deferred of each is callbacked with a
+                dictionary mapping from event id to event row. Note that it may
+                well contain additional events that were not part of the request.
         """
         with Measure(self._clock, "_fetch_event_list"):
             try:
                 events_to_fetch = {
-                    event_id for events, _ in event_list for event_id in events
+                    event_id for request in event_list for event_id in request.event_ids
                 }
+                event_fetch_batch_size.observe(len(events_to_fetch))
+                event_fetch_batch_requests.observe(len(event_list))
 
                 row_dict = self.db_pool.new_transaction(
                     conn,
@@ -1206,8 +1629,8 @@ class EventsWorkerStore(SQLBaseStore):
 
                 # We only want to resolve deferreds from the main thread
                 def fire() -> None:
-                    for _, d in event_list:
-                        d.callback(row_dict)
+                    for request in event_list:
+                        request.deferred.callback(row_dict)
 
                 with PreserveLoggingContext():
                     self.hs.get_reactor().callFromThread(fire)
@@ -1216,8 +1639,8 @@ class EventsWorkerStore(SQLBaseStore):
 
                 # We only want to resolve deferreds from the main thread
                 def fire_errback(exc: Exception) -> None:
-                    for _, d in event_list:
-                        d.errback(exc)
+                    for request in event_list:
+                        request.deferred.errback(exc)
 
                 with PreserveLoggingContext():
                     self.hs.get_reactor().callFromThread(fire_errback, e)
@@ -1429,7 +1852,18 @@ class EventsWorkerStore(SQLBaseStore):
 
         events_d: "defer.Deferred[Dict[str, _EventRow]]" = defer.Deferred()
         with self._event_fetch_lock:
-            self._event_fetch_list.append((events, events_d))
+            now = time.monotonic()
+            # Long gaps between requests are capped, so that the average drops
+            # back down quickly once requests start to arrive in bursts again.
+            interval = min(
+                now - self._event_fetch_last_queued_at, EVENT_QUEUE_TIMEOUT_S
+            )
+            self._event_fetch_interval += (
+                interval - self._event_fetch_interval
+            ) * EVENT_QUEUE_INTERVAL_SMOOTHING
+            self._event_fetch_last_queued_at = now
+
+            self._event_fetch_list.append(_EventFetchRequest(events, events_d, now))
             self._event_fetch_lock.notify()
 
         self._maybe_start_fetch_thread()
@@ -1455,6 +1889,11 @@ class EventsWorkerStore(SQLBaseStore):
         Returns:
             A map from event id to event info.
         """
+        if self._event_disk_cache is not None:
+            return self._fetch_event_rows_with_disk_cache(
+                txn, event_ids, self._event_disk_cache
+            )
+
         event_dict = {}
         for evs in batch_iter(event_ids, 200):
             sql = """\
@@ -1507,6 +1946,129 @@ class EventsWorkerStore(SQLBaseStore):
 
         return event_dict
 
+    def _fetch_event_rows_with_disk_cache(
+        self,
+        txn: LoggingTransaction,
+        event_ids: Iterable[str],
+        disk_cache: DiskCache,
+    ) -> Dict[str, _EventRow]:
+        """As `_fetch_event_rows`, but reads the event JSON from the on-disk
+        event cache where possible.
+
+        The mutable parts of the rows (stream ordering, outlier status, rejection
+        reason and redactions) are still read from the database, but that avoids
+        pulling the (large) event JSON out of `event_json` for cached events.
+
+        Args:
+            txn: The database transaction.
+            event_ids: event IDs to fetch
+            disk_cache: The on-disk event cache.
+
+        Returns:
+            A map from event id to event info.
+        """
+        event_dict = {}
+        for evs in batch_iter(event_ids, 200):
+            sql = """\
+                SELECT
+                  e.event_id,
+                  e.stream_ordering,
+                  r.room_version,
+                  rej.reason,
+                  e.outlier
+                FROM events AS e
+                  LEFT JOIN rooms r ON r.room_id = e.room_id
+                  LEFT JOIN rejections as rej USING (event_id)
+                WHERE """
+
+            clause, args = make_in_list_sql_clause(
+                txn.database_engine, "e.event_id", evs
+            )
+
+            txn.execute(sql + clause, args)
+
+            metadata_rows = {row[0]: row for row in txn}
+            if not metadata_rows:
+                continue
+
+            json_rows = {
+                event_id: _decode_event_disk_cache_value(value)
+                for event_id, value in disk_cache.get_many(list(metadata_rows)).items()
+            }
+
+            missing_event_ids = [e for e in metadata_rows if e not in json_rows]
+            fetched_json_rows: Dict[str, Tuple[str, str, Optional[int]]] = {}
+            if missing_event_ids:
+                clause, args = make_in_list_sql_clause(
+                    txn.database_engine, "event_id", missing_event_ids
+                )
+                txn.execute(
+                    """
+                    SELECT event_id, internal_metadata, json, format_version
+                    FROM event_json
+                    WHERE
+                    """
+                    + clause,
+                    args,
+                )
+                for event_id, internal_metadata, json, format_version in txn:
+                    fetched_json_rows[event_id] = (
+                        internal_metadata,
+                        json,
+                        format_version,
+                    )
+                json_rows.update(fetched_json_rows)
+
+            for event_id, json_row in json_rows.items():
+                (
+                    _,
+                    stream_ordering,
+                    room_version_id,
+                    rejected_reason,
+                    outlier,
+                ) = metadata_rows[event_id]
+                internal_metadata, json, format_version = json_row
+                event_dict[event_id] = _EventRow(
+                    event_id=event_id,
+                    stream_ordering=stream_ordering,
+                    internal_metadata=internal_metadata,
+                    json=json,
+                    format_version=format_version,
+                    room_version_id=room_version_id,
+                    rejected_reason=rejected_reason,
+                    redactions=[],
+                    outlier=outlier,
+                )
+
+            # check for redactions
+            redactions_sql = "SELECT event_id, redacts FROM redactions WHERE "
+
+            clause, args = make_in_list_sql_clause(txn.database_engine, "redacts", evs)
+
+            txn.execute(redactions_sql + clause, args)
+
+            for redacter, redacted in txn:
+                d = event_dict.get(redacted)
+                if d:
+                    d.redactions.append(redacter)
+
+            # We don't keep the JSON of (potentially) redacted events on disk, as
+            # the original content may later be censored.
+            disk_cache.invalidate_many(
+                [
+                    event_id
+                    for event_id, row in event_dict.items()
+                    if row.redactions and event_id not in fetched_json_rows
+                ]
+            )
+            disk_cache.set_many(
+                (event_id, _encode_event_disk_cache_value(*json_row))
+                for event_id, json_row in fetched_json_rows.items()
+                if not event_dict[event_id].redactions
+            )
+
+        return event_dict
+
     def _maybe_redact_event_row(
         self,
         original_ev: EventBase,
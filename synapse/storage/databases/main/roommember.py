@@ -1548,5 +1548,43 @@ class _JoinedHostsCache:
     # equal to anything else).
     state_group: Union[object, int] = attr.Factory(object)
 
+    # The hosts in `hosts_to_joined_users`, or None if they have changed since
+    # the set was last built. The same set is returned for consecutive state
+    # groups as long as no host joins or leaves the room, so that callers can
+    # reuse any work they derive from it.
+    _hosts: Optional[FrozenSet[str]] = None
+
+    def get_hosts(self) -> FrozenSet[str]:
+        """Returns the hosts which have users joined to the room."""
+        if self._hosts is None:
+            self._hosts = frozenset(self.hosts_to_joined_users)
+        return self._hosts
+
+    def add_joined_user(self, host: str, user_id: str) -> None:
+        known_joins = self.hosts_to_joined_users.get(host)
+        if known_joins is None:
+            self.hosts_to_joined_users[host] = {user_id}
+            self._hosts = None
+        else:
+            known_joins.add(user_id)
+
+    def remove_joined_user(self, host: str, user_id: str) -> None:
+        known_joins = self.hosts_to_joined_users.get(host)
+        if known_joins is None:
+            return
+
+        known_joins.discard(user_id)
+        if not known_joins:
+            del self.hosts_to_joined_users[host]
+            self._hosts = None
+
+    def set_joined_users(self, hosts_to_joined_users: Dict[str, Set[str]]) -> None:
+        """Replaces the joined users, keeping the current set of hosts if it
+        hasn't changed.
+        """
+        if self._hosts is not None and self._hosts != hosts_to_joined_users.keys():
+            self._hosts = None
+        self.hosts_to_joined_users = hosts_to_joined_users
+
     def __len__(self) -> int:
         return sum(len(v) for v in self.hosts_to_joined_users.values())
@@ -622,12 +622,13 @@ class StreamWorkerStore(EventsWorkerStore, SQLBaseStore):
         """Given a list of rooms and a token, return rooms where there may have
         been changes.
         """
-        from_id = from_key.stream
-        return {
-            room_id
-            for room_id in room_ids
-            if self._events_stream_cache.has_entity_changed(room_id, from_id)
-        }
+        # This is called on every incremental sync for every room the user is
+        # in, so we ask the stream change cache for the rooms that have changed
+        # since the token (which is proportional to the number of changes)
+        # rather than checking each room in turn.
+        return set(
+            self._events_stream_cache.get_entities_changed(room_ids, from_key.stream)
+        )
 
     async def get_room_events_stream_for_room(
         self,
@@ -14,7 +14,7 @@
 
 import logging
 from enum import Enum
-from typing import TYPE_CHECKING, Iterable, List, Mapping, Optional, Tuple, cast
+from typing import TYPE_CHECKING, Dict, Iterable, List, Mapping, Optional, Tuple, cast
 
 import attr
 from canonicaljson import encode_canonical_json
@@ -366,50 +366,61 @@ class TransactionWorkerStore(CacheInvalidationWorkerStore):
             desc="set_last_successful_stream_ordering",
         )
 
-    async def get_catch_up_room_event_ids(
-        self,
-        destination: str,
-        last_successful_stream_ordering: int,
-    ) -> List[str]:
+    async def get_catch_up_room_event_ids_for_destinations(
+        self, last_successful_stream_orderings: Mapping[str, int]
+    ) -> Dict[str, List[str]]:
         """
-        Returns at most 50 event IDs and their corresponding stream_orderings
-        that correspond to the oldest events that have not yet been sent to
-        the destination.
+        Returns, for each of the given destinations, at most 50 event IDs of the
+        oldest events that have not yet been sent to it. The destinations are
+        all looked up in one query.
 
         Args:
-            destination: the destination in question
-            last_successful_stream_ordering: the stream_ordering of the
-                most-recently successfully-transmitted event to the destination
+            last_successful_stream_orderings: map from destination to the
+                stream_ordering of the most-recently successfully-transmitted
+                event to it.
 
         Returns:
-            list of event_ids
+            map from destination to at most 50 event IDs, in stream order. The
+            destinations with nothing to catch up on are omitted.
         """
+        if not last_successful_stream_orderings:
+            return {}
+
         return await self.db_pool.runInteraction(
-            "get_catch_up_room_event_ids",
-            self._get_catch_up_room_event_ids_txn,
-            destination,
-            last_successful_stream_ordering,
+            "get_catch_up_room_event_ids_for_destinations",
+            self._get_catch_up_room_event_ids_for_destinations_txn,
+            last_successful_stream_orderings,
         )
 
     @staticmethod
-    def _get_catch_up_room_event_ids_txn(
-        txn: LoggingTransaction,
-        destination: str,
-        last_successful_stream_ordering: int,
-    ) -> List[str]:
-        q = """
-                SELECT event_id FROM destination_rooms
-                 JOIN events USING (stream_ordering)
-                WHERE destination = ?
-                  AND stream_ordering > ?
-                ORDER BY stream_ordering
-                LIMIT 50
-            """
-        txn.execute(
-            q,
-            (destination, last_successful_stream_ordering),
-        )
-        event_ids = [row[0] for row in txn]
+    def _get_catch_up_room_event_ids_for_destinations_txn(
+        txn: LoggingTransaction, last_successful_stream_orderings: Mapping[str, int]
+    ) -> Dict[str, List[str]]:
+        clauses = []
+        args: List[object] = []
+        for destination, stream_ordering in last_successful_stream_orderings.items():
+            clauses.append("(destination = ? AND stream_ordering > ?)")
+            args.extend((destination, stream_ordering))
+
+        q = f"""
+            SELECT destination, event_id FROM (
+                SELECT
+                    destination, event_id, stream_ordering,
+                    ROW_NUMBER() OVER (
+                        PARTITION BY destination ORDER BY stream_ordering
+                    ) AS row_num
+                FROM destination_rooms
+                INNER JOIN events USING (stream_ordering)
+                WHERE {" OR ".join(clauses)}
+            ) AS catch_up
+            WHERE row_num <= 50
+            ORDER BY destination, stream_ordering
+        """
+        txn.execute(q, args)
+
+        event_ids: Dict[str, List[str]] = {}
+        for destination, event_id in txn:
+            event_ids.setdefault(destination, []).append(event_id)
         return event_ids
 
     async def get_catch_up_outstanding_destinations(
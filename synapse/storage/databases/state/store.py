@@ -44,6 +44,11 @@ from synapse.types import MutableStateMap, StateKey, StateMap
 from synapse.types.state import StateFilter
 from synapse.util.caches.descriptors import cached
 from synapse.util.caches.dictionary_cache import DictionaryCache
+from synapse.util.caches.state_map import (
+    CompactStateMap,
+    compact_state_map,
+    compact_state_map_from_delta,
+)
 from synapse.util.cancellation import cancellable
 
 if TYPE_CHECKING:
@@ -107,6 +112,13 @@ class StateGroupDataStore(StateBackgroundUpdateStore, SQLBaseStore):
         #
         # We size the non-members cache to be smaller than the members cache as the
         # vast majority of state in Matrix (today) is member events.
+        #
+        # Large complete state maps are stored in the caches as `CompactStateMap`s,
+        # which take a fraction of the memory of the equivalent dicts, and which can
+        # share the state of a previous group where we know the delta from it.
+        self._compact_state_group_threshold = (
+            hs.config.caches.compact_state_group_threshold
+        )
 
         self._state_group_cache: DictionaryCache[int, StateKey, str] = DictionaryCache(
             "*stateGroupCache*",
@@ -417,17 +429,74 @@ class StateGroupDataStore(StateBackgroundUpdateStore, SQLBaseStore):
             self._state_group_members_cache.update(
                 cache_seq_num_members,
                 key=group,
-                value=state_dict_members,
+                value=state_dict_members
+                if member_types is not None
+                else compact_state_map(
+                    state_dict_members, self._compact_state_group_threshold
+                ),
                 fetched_keys=member_types,
             )
 
             self._state_group_cache.update(
                 cache_seq_num_non_members,
                 key=group,
-                value=state_dict_non_members,
+                value=state_dict_non_members
+                if non_member_types is not None
+                else compact_state_map(
+                    state_dict_non_members, self._compact_state_group_threshold
+                ),
                 fetched_keys=non_member_types,
             )
 
+    def _insert_delta_into_cache(
+        self,
+        state_group: int,
+        prev_group: int,
+        delta_ids: StateMap[str],
+        cache_seq_num_members: int,
+        cache_seq_num_non_members: int,
+    ) -> None:
+        """Prefills the caches with the state of a new state group, which is
+        `delta_ids` on top of the state of `prev_group`, if we have the full state
+        of `prev_group` cached in compact form.
+
+        In that case the new entry shares the memory of the previous group's, so
+        is cheap to add. Otherwise we leave the new group to be fetched from the
+        database if it's needed.
+
+        Args:
+            state_group: The new state group.
+            prev_group: The state group the new group is a delta from.
+            delta_ids: The delta between the two groups.
+            cache_seq_num_members: Sequence number of member cache since
+                the new group was persisted
+            cache_seq_num_non_members: Sequence number of non-member cache
+                since the new group was persisted
+        """
+        member_delta = {}
+        non_member_delta = {}
+        for k, v in delta_ids.items():
+            if k[0] == EventTypes.Member:
+                member_delta[k] = v
+            else:
+                non_member_delta[k] = v
+
+        for cache, cache_seq_num, delta in (
+            (self._state_group_members_cache, cache_seq_num_members, member_delta),
+            (self._state_group_cache, cache_seq_num_non_members, non_member_delta),
+        ):
+            prev_entry = cache.get(prev_group)
+            if not prev_entry.full or not isinstance(prev_entry.value, CompactStateMap):
+                continue
+
+            cache.update(
+                cache_seq_num,
+                key=state_group,
+                value=compact_state_map_from_delta(
+                    prev_entry.value, delta, self._compact_state_group_threshold
+                ),
+            )
+
     @trace
     @tag_args
     async def store_state_deltas_for_batched(
@@ -636,6 +705,19 @@ class StateGroupDataStore(StateBackgroundUpdateStore, SQLBaseStore):
                 ],
             )
 
+            # Prefill the state group caches with this group, if we can do so
+            # cheaply from the cached state of the previous group. As with full
+            # groups below, it's fine to use the sequence like this as state group
+            # maps are immutable.
+            txn.call_after(
+                self._insert_delta_into_cache,
+                state_group,
+                prev_group,
+                delta_ids,
+                cache_seq_num_members=self._state_group_members_cache.sequence,
+                cache_seq_num_non_members=self._state_group_cache.sequence,
+            )
+
             return state_group
 
         def insert_full_state_txn(
@@ -674,7 +756,9 @@ class StateGroupDataStore(StateBackgroundUpdateStore, SQLBaseStore):
                 self._state_group_members_cache.update,
                 self._state_group_members_cache.sequence,
                 key=state_group,
-                value=current_member_state_ids,
+                value=compact_state_map(
+                    current_member_state_ids, self._compact_state_group_threshold
+                ),
             )
 
             current_non_member_state_ids = {
@@ -686,7 +770,9 @@ class StateGroupDataStore(StateBackgroundUpdateStore, SQLBaseStore):
                 self._state_group_cache.update,
                 self._state_group_cache.sequence,
                 key=state_group,
-                value=current_non_member_state_ids,
+                value=compact_state_map(
+                    current_non_member_state_ids, self._compact_state_group_threshold
+                ),
             )
 
             return state_group
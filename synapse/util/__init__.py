@@ -15,7 +15,7 @@
 import json
 import logging
 import typing
-from typing import Any, Callable, Dict, Generator, Optional, Sequence
+from typing import Any, Callable, Dict, Generator, List, Optional, Sequence, Tuple
 
 import attr
 from immutabledict import immutabledict
@@ -71,6 +71,68 @@ json_encoder = json.JSONEncoder(
 json_decoder = json.JSONDecoder(parse_constant=_reject_invalid_json)
 
 
+class PreencodedJsonDict(Dict[str, Any]):
+    """A dict which carries the encoding by `json_encoder` of the entries it was
+    created with.
+
+    This allows the encoding of a value which is sent in many responses (such as
+    an event) to be reused: `respond_with_json` writes out the pre-encoded
+    entries verbatim, and only encodes the entries which were added afterwards.
+
+    Entries may be added, replaced or removed as with any dict (which will stop
+    the encoding from being used if it affects the pre-encoded entries), but the
+    values of the pre-encoded entries must not be mutated in place.
+    """
+
+    __slots__ = ("_encoded_entries", "_encoding")
+
+    def __init__(self, entries: Dict[str, Any], encoding: Optional[bytes] = None):
+        """
+        Args:
+            entries: The entries to encode. This must not be mutated afterwards.
+            encoding: The encoding of `entries`, if it is already known.
+        """
+        super().__init__(entries)
+        self._encoded_entries = entries
+        if encoding is None:
+            encoding = json_encoder.encode(entries).encode("utf-8")
+        self._encoding = encoding
+
+    def copy(self) -> "PreencodedJsonDict":
+        """Returns a shallow copy of the dict, which shares its encoding."""
+        new = PreencodedJsonDict(self._encoded_entries, self._encoding)
+        new.update(self)
+        for key in self._encoded_entries.keys() - self.keys():
+            del new[key]
+        return new
+
+    def get_encoding(self) -> Optional[Tuple[bytes, List[str]]]:
+        """Returns the encoding of the pre-encoded entries, along with the keys of
+        the entries which have been added since.
+
+        Returns None if any of the pre-encoded entries have since been replaced
+        or removed, or if there weren't any.
+        """
+        encoded_entries = self._encoded_entries
+        if not encoded_entries:
+            return None
+
+        new_keys = []
+        num_encoded = 0
+        for key, value in self.items():
+            if key not in encoded_entries:
+                new_keys.append(key)
+            elif encoded_entries[key] is value:
+                num_encoded += 1
+            else:
+                return None
+
+        if num_encoded != len(encoded_entries):
+            return None
+
+        return self._encoding, new_keys
+
+
 def unwrapFirstError(failure: Failure) -> Failure:
     # Deprecated: you probably just want to catch defer.FirstError and reraise
     # the subFailure's value, which will do a better job of preserving stacktraces.
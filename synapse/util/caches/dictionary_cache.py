@@ -14,12 +14,23 @@
 import enum
 import logging
 import threading
-from typing import Dict, Generic, Iterable, Optional, Set, Tuple, TypeVar, Union
+from typing import (
+    Dict,
+    Generic,
+    Iterable,
+    Mapping,
+    Optional,
+    Set,
+    Tuple,
+    TypeVar,
+    Union,
+)
 
 import attr
 from typing_extensions import Literal
 
 from synapse.util.caches.lrucache import LruCache
+from synapse.util.caches.state_map import CompactStateMap
 from synapse.util.caches.treecache import TreeCache
 
 logger = logging.getLogger(__name__)
@@ -49,7 +60,7 @@ class DictionaryEntry(Generic[DKT, DV]):
 
     full: bool
     known_absent: Set[DKT]
-    value: Dict[DKT, DV]
+    value: Mapping[DKT, DV]
 
     def __len__(self) -> int:
         return len(self.value)
@@ -83,6 +94,14 @@ class _PerKeyValue(Generic[DV]):
         return 1
 
 
+def _cache_entry_size(value: Union[_PerKeyValue, Mapping]) -> int:
+    """The size of an entry in the LRU cache backing a `DictionaryCache`."""
+    if isinstance(value, CompactStateMap):
+        # These keep alive the parent maps they are layered on.
+        return value.retained_size()
+    return len(value)
+
+
 class DictionaryCache(Generic[KT, DKT, DV]):
     """Caches key -> dictionary lookups, supporting caching partial dicts, i.e.
     fetching a subset of dictionary keys for a particular key.
@@ -130,15 +149,15 @@ class DictionaryCache(Generic[KT, DKT, DV]):
         #
         # Typing:
         #     * A key of `(KT, DKT)` has a value of `_PerKeyValue`
-        #     * A key of `(KT, _FullCacheKey.KEY)` has a value of `Dict[DKT, DV]`
+        #     * A key of `(KT, _FullCacheKey.KEY)` has a value of `Mapping[DKT, DV]`
         self.cache: LruCache[
             Tuple[KT, Union[DKT, Literal[_FullCacheKey.KEY]]],
-            Union[_PerKeyValue, Dict[DKT, DV]],
+            Union[_PerKeyValue, Mapping[DKT, DV]],
         ] = LruCache(
             max_size=max_entries,
             cache_name=name,
             cache_type=TreeCache,
-            size_callback=len,
+            size_callback=_cache_entry_size,
         )
 
         self.name = name
@@ -181,7 +200,7 @@ class DictionaryCache(Generic[KT, DKT, DV]):
 
         # First go and check for each requested dict key in the cache, tracking
         # which we couldn't find.
-        values = {}
+        values: Dict[DKT, DV] = {}
         known_absent = set()
         missing = []
         for dict_key in dict_keys:
@@ -217,7 +236,7 @@ class DictionaryCache(Generic[KT, DKT, DV]):
             return DictionaryEntry(False, known_absent, values)
 
         # We have the full dict!
-        assert isinstance(entry, dict)
+        assert not isinstance(entry, _PerKeyValue)
 
         for dict_key in missing:
             # We explicitly add each dict key to the cache, so that cache hit
@@ -239,7 +258,7 @@ class DictionaryCache(Generic[KT, DKT, DV]):
         # First we check if we have cached the full dict.
         entry = self.cache.get((key, _FullCacheKey.KEY), _Sentinel.sentinel)
         if entry is not _Sentinel.sentinel:
-            assert isinstance(entry, dict)
+            assert not isinstance(entry, _PerKeyValue)
             return DictionaryEntry(True, set(), entry)
 
         return DictionaryEntry(False, set(), {})
@@ -267,7 +286,7 @@ class DictionaryCache(Generic[KT, DKT, DV]):
         self,
         sequence: int,
         key: KT,
-        value: Dict[DKT, DV],
+        value: Mapping[DKT, DV],
         fetched_keys: Optional[Iterable[DKT]] = None,
     ) -> None:
         """Updates the entry in the cache.
@@ -284,7 +303,8 @@ class DictionaryCache(Generic[KT, DKT, DV]):
         Args:
             sequence
             key
-            value: The value to update the cache with.
+            value: The value to update the cache with. This is stored as is
+                if it is the complete value, so must not be mutated afterwards.
             fetched_keys: All of the dictionary keys which were
                 fetched from the database.
 
@@ -302,7 +322,7 @@ class DictionaryCache(Generic[KT, DKT, DV]):
                 self._update_subset(key, value, fetched_keys)
 
     def _update_subset(
-        self, key: KT, value: Dict[DKT, DV], fetched_keys: Iterable[DKT]
+        self, key: KT, value: Mapping[DKT, DV], fetched_keys: Iterable[DKT]
     ) -> None:
         """Add the given dictionary values as explicit keys in the cache.
 
@@ -0,0 +1,250 @@
+# Copyright 2023 The Matrix.org Foundation C.I.C.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+import sqlite3
+import threading
+from typing import Collection, Dict, Iterable, Optional, Tuple
+
+from synapse.util import Clock
+from synapse.util.caches import EvictionReason, register_cache
+from synapse.util.iterutils import batch_iter
+
+logger = logging.getLogger(__name__)
+
+# The maximum number of keys we put in a single `IN (...)` clause. SQLite limits
+# the number of bound parameters per statement.
+_BATCH_SIZE = 500
+
+# When the cache is over its size limit we evict down to this fraction of the
+# limit, so that we don't have to evict on every single insertion.
+_EVICTION_HEADROOM = 0.9
+
+# We only update when an entry was last accessed if it was longer ago than this,
+# so that most reads don't have to write to the file.
+_ACCESS_UPDATE_INTERVAL_MS = 60 * 1000
+
+# How long to wait for another process to release its lock on the file.
+_BUSY_TIMEOUT_S = 5
+
+# Bumped whenever the schema of the cache file changes.
+_SCHEMA_VERSION = 1
+
+
+class DiskCache:
+    """A size-bounded, persistent key/value cache stored in a local SQLite file.
+
+    This is intended as a second tier behind an in-memory cache, for data which
+    is expensive to pull out of the main database and which does not change (or
+    is explicitly invalidated when it does), so that it survives restarts of the
+    process. Keys and values are both strings.
+
+    The file may be shared between processes on the same host (e.g. by putting
+    it on a tmpfs such as `/dev/shm`, in which case it is effectively a shared
+    memory segment).
+
+    Entries are evicted in approximately least-recently-used order once the
+    cache holds more than `max_size` entries (when an entry was last used is
+    only tracked to within a minute or so), and may optionally be given an
+    expiry time.
+
+    All methods are blocking and thread-safe: callers on the reactor thread
+    should be aware that they do disk I/O.
+
+    Args:
+        cache_name: the name of the cache, used for metrics.
+        path: the path of the SQLite database file to use. Will be created if
+            it doesn't exist.
+        max_size: the maximum number of entries to store.
+        clock: used to track when entries were last accessed and when they
+            expire.
+    """
+
+    def __init__(self, cache_name: str, path: str, max_size: int, clock: Clock):
+        self._cache_name = cache_name
+        self.max_size = max_size
+        self._clock = clock
+
+        self._lock = threading.Lock()
+
+        # We share the one connection between the threads that use it, guarded
+        # by `_lock`.
+        self._conn = sqlite3.connect(
+            path, timeout=_BUSY_TIMEOUT_S, check_same_thread=False
+        )
+        self._conn.execute("PRAGMA journal_mode = WAL")
+        self._conn.execute("PRAGMA synchronous = NORMAL")
+
+        # The contents of the file are only a cache, so if it was created by a
+        # different version of this class we just start again.
+        (schema_version,) = self._conn.execute("PRAGMA user_version").fetchone()
+        if schema_version != _SCHEMA_VERSION:
+            self._conn.execute("DROP TABLE IF EXISTS disk_cache")
+            self._conn.execute("PRAGMA user_version = %d" % (_SCHEMA_VERSION,))
+
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS disk_cache (
+                key TEXT NOT NULL PRIMARY KEY,
+                value TEXT NOT NULL,
+                last_access BIGINT NOT NULL,
+                expires_at BIGINT
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS disk_cache_last_access"
+            " ON disk_cache (last_access)"
+        )
+        self._conn.commit()
+
+        (size,) = self._conn.execute("SELECT COUNT(*) FROM disk_cache").fetchone()
+
+        # The number of entries in the cache. Other processes may be sharing
+        # the file, so this is only an estimate.
+        self._size: int = size
+
+        self._metrics = register_cache("disk_cache", cache_name, self, resizable=False)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def get_many(self, keys: Collection[str]) -> Dict[str, str]:
+        """Look up a set of keys in the cache.
+
+        Args:
+            keys: the keys to look up.
+
+        Returns:
+            A map from key to value for the keys that were in the cache.
+        """
+        results: Dict[str, str] = {}
+        if not keys:
+            return results
+
+        now = self._clock.time_msec()
+        with self._lock:
+            updated_access = False
+            for batch in batch_iter(keys, _BATCH_SIZE):
+                placeholders = ",".join("?" for _ in batch)
+                rows = self._conn.execute(
+                    """
+                    SELECT key, value, last_access FROM disk_cache
+                    WHERE key IN (%s) AND (expires_at IS NULL OR expires_at > ?)
+                    """
+                    % (placeholders,),
+                    (*batch, now),
+                ).fetchall()
+                results.update((key, value) for key, value, _ in rows)
+
+                to_touch = [
+                    key
+                    for key, _, last_access in rows
+                    if last_access <= now - _ACCESS_UPDATE_INTERVAL_MS
+                ]
+                if to_touch:
+                    self._conn.execute(
+                        "UPDATE disk_cache SET last_access = ? WHERE key IN (%s)"
+                        % (",".join("?" for _ in to_touch),),
+                        (now, *to_touch),
+                    )
+                    updated_access = True
+
+            if updated_access:
+                self._conn.commit()
+
+        self._metrics.hits += len(results)
+        self._metrics.misses += len(keys) - len(results)
+
+        return results
+
+    def set_many(
+        self, items: Iterable[Tuple[str, str]], expiry_ms: Optional[int] = None
+    ) -> None:
+        """Add entries to the cache, replacing any existing entries for the keys.
+
+        Evicts older entries if the cache is now over its size limit.
+
+        Args:
+            items: the key/value pairs to add.
+            expiry_ms: if given, how long the entries should stay in the cache.
+        """
+        now = self._clock.time_msec()
+        expires_at = now + expiry_ms if expiry_ms is not None else None
+        with self._lock:
+            cursor = self._conn.executemany(
+                """
+                INSERT OR REPLACE INTO disk_cache (key, value, last_access, expires_at)
+                VALUES (?, ?, ?, ?)
+                """,
+                ((key, value, now, expires_at) for key, value in items),
+            )
+            self._size += max(cursor.rowcount, 0)
+
+            if self._size > self.max_size:
+                self._evict_locked()
+
+            self._conn.commit()
+
+    def _evict_locked(self) -> None:
+        """Evict least recently used entries. Must be called with `_lock` held."""
+        (size,) = self._conn.execute("SELECT COUNT(*) FROM disk_cache").fetchone()
+        to_evict = size - int(self.max_size * _EVICTION_HEADROOM)
+        if to_evict > 0:
+            self._conn.execute(
+                """
+                DELETE FROM disk_cache WHERE key IN (
+                    SELECT key FROM disk_cache ORDER BY last_access ASC LIMIT ?
+                )
+                """,
+                (to_evict,),
+            )
+            self._metrics.inc_evictions(EvictionReason.size, to_evict)
+            size -= to_evict
+
+        self._size = max(size, 0)
+
+    def invalidate_many(self, keys: Collection[str]) -> None:
+        """Remove the given keys from the cache, if present."""
+        if not keys:
+            return
+
+        with self._lock:
+            for batch in batch_iter(keys, _BATCH_SIZE):
+                cursor = self._conn.execute(
+                    "DELETE FROM disk_cache WHERE key IN (%s)"
+                    % (",".join("?" for _ in batch),),
+                    batch,
+                )
+                self._size = max(self._size - max(cursor.rowcount, 0), 0)
+                self._metrics.inc_evictions(
+                    EvictionReason.invalidation, max(cursor.rowcount, 0)
+                )
+            self._conn.commit()
+
+    def invalidate(self, key: str) -> None:
+        """Remove the given key from the cache, if present."""
+        self.invalidate_many((key,))
+
+    def clear(self) -> None:
+        """Remove all entries from the cache."""
+        with self._lock:
+            self._conn.execute("DELETE FROM disk_cache")
+            self._conn.commit()
+            self._metrics.inc_evictions(EvictionReason.invalidation, self._size)
+            self._size = 0
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
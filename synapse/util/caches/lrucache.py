@@ -836,6 +836,13 @@ class AsyncLruCache(Generic[KT, VT]):
         # This method should fetch from any configured external cache, in this case noop.
         return None
 
+    async def get_many_external(
+        self, keys: Collection[KT], update_metrics: bool = True
+    ) -> Dict[KT, VT]:
+        # This method should fetch the given keys from any configured external cache,
+        # in this case noop.
+        return {}
+
     def get_local(
         self, key: KT, default: Optional[T] = None, update_metrics: bool = True
     ) -> Optional[VT]:
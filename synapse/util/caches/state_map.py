@@ -0,0 +1,328 @@
+# Copyright 2023 The Matrix.org Foundation C.I.C.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import sys
+from array import array
+from bisect import bisect_left
+from itertools import accumulate
+from typing import (
+    ItemsView,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Set,
+    Tuple,
+    Union,
+    ValuesView,
+)
+
+from synapse.types import StateKey, StateMap
+
+# The maximum number of delta layers we allow on top of a full state map before
+# we flatten it. Each layer adds a lookup for keys that aren't in it, so this
+# bounds the cost of a lookup.
+MAX_DELTA_LAYERS = 10
+
+# Separates the strings packed together by `_pack`, so that they can be split
+# apart again in one go.
+_SEPARATOR = "\x00"
+
+
+def compact_state_map(state: StateMap[str], min_size: int) -> StateMap[str]:
+    """Returns the given state map in a form suitable for keeping in a cache.
+
+    Maps with at least `min_size` entries are converted to a `CompactStateMap`.
+    Otherwise the map is returned as is, so the caller must not mutate it
+    afterwards.
+
+    Turning a compact map back into a dict (which happens whenever the full state
+    is requested) is an order of magnitude slower than copying a dict, so this
+    is only worth doing for large maps.
+
+    Args:
+        state: the state map.
+        min_size: the minimum size of map to convert, or 0 to never convert.
+    """
+    if not min_size or len(state) < min_size:
+        return state
+
+    try:
+        return CompactStateMap(state)
+    except ValueError:
+        # One of the strings contains the separator.
+        return state
+
+
+def compact_state_map_from_delta(
+    parent: StateMap[str], delta: StateMap[str], min_size: int
+) -> StateMap[str]:
+    """Returns the parent state map updated with the delta, in a form suitable for
+    keeping in a cache.
+
+    If the parent is a `CompactStateMap` with room for another layer, the new
+    map shares the parent's entries rather than copying them.
+
+    Args:
+        parent: the state map to apply the delta to.
+        delta: the entries to add or replace in the parent.
+        min_size: see `compact_state_map`.
+    """
+    if isinstance(parent, CompactStateMap) and parent._depth < MAX_DELTA_LAYERS:
+        try:
+            return CompactStateMap(delta, parent)
+        except ValueError:
+            pass
+
+    state = dict(parent.items())
+    state.update(delta)
+    return compact_state_map(state, min_size)
+
+
+def _pack(strings: List[str]) -> Tuple[Union[str, bytes], "array[int]"]:
+    """Pack a list of strings into a single string, along with the offsets of
+    the start of each string.
+
+    If all the strings are ASCII (which is almost always the case for event IDs
+    and state keys) we use a `str`, so that unpacking them is just a slice.
+    Otherwise we UTF-8 encode them, as a single non-ASCII character would
+    otherwise make Python store the whole string with 2 or 4 bytes per
+    character.
+
+    Raises:
+        ValueError if any of the strings contain the separator.
+    """
+    joined = _SEPARATOR.join(strings)
+    if joined.count(_SEPARATOR) != max(len(strings) - 1, 0):
+        raise ValueError("Strings to pack contain the separator")
+
+    if joined.isascii():
+        lengths: Iterable[int] = (len(s) + 1 for s in strings)
+        blob: Union[str, bytes] = joined
+    else:
+        encoded = [s.encode("utf-8") for s in strings]
+        lengths = (len(b) + 1 for b in encoded)
+        blob = _SEPARATOR.encode("ascii").join(encoded)
+
+    return blob, array("I", accumulate(lengths, initial=0))
+
+
+def _unpack(blob: Union[str, bytes], starts: "array[int]", index: int) -> str:
+    """Get the string at the given index from a blob made by `_pack`."""
+    value = blob[starts[index] : starts[index + 1] - 1]
+    if isinstance(value, bytes):
+        return value.decode("utf-8")
+    return value
+
+
+def _unpack_all(blob: Union[str, bytes], count: int) -> List[str]:
+    """Get all `count` strings from a blob made by `_pack`."""
+    if not count:
+        return []
+    if isinstance(blob, bytes):
+        return [value.decode("utf-8") for value in blob.split(b"\x00")]
+    return blob.split(_SEPARATOR)
+
+
+class CompactStateMap(Mapping[StateKey, str]):
+    """An immutable map from `(type, state_key)` to event ID, which uses much
+    less memory than the equivalent dict.
+
+    A dict based state map costs a hash table slot and a tuple per entry, on top
+    of a string object for each of the state key and event ID. Instead, we
+    store:
+
+      * the distinct event types, interned, and an array of the index of the
+        type of each entry;
+      * the state keys and event IDs each packed into a single string, along
+        with an array of the offsets at which each entry starts;
+      * a sorted array of the hashes of the keys, which determines the order of
+        the entries.
+
+    Lookups are then a binary search for the hash of the key.
+
+    A map may also be built as a delta on top of a parent map (as state groups
+    are stored in the database), in which case the two share the memory for
+    the parent's entries. As state never has keys removed, a delta only ever
+    adds or replaces entries.
+
+    Raises:
+        ValueError if any of the state keys or event IDs contain a null
+        character, which we use as a separator.
+    """
+
+    __slots__ = (
+        "_hashes",
+        "_types",
+        "_type_indices",
+        "_state_keys",
+        "_state_key_starts",
+        "_event_ids",
+        "_event_id_starts",
+        "_parent",
+        "_depth",
+        "_len",
+    )
+
+    def __init__(
+        self,
+        state: StateMap[str],
+        parent: Optional["CompactStateMap"] = None,
+    ):
+        """
+        Args:
+            state: the entries in the map. If `parent` is given, the entries to
+                add or replace in the parent.
+            parent: the map that `state` is a delta on top of, if any.
+        """
+        keys = list(state)
+        hashes = [hash(key) for key in keys]
+        order = sorted(range(len(keys)), key=hashes.__getitem__)
+        keys = [keys[i] for i in order]
+
+        type_to_index = {event_type: 0 for event_type, _ in keys}
+        for index, event_type in enumerate(type_to_index):
+            type_to_index[event_type] = index
+
+        self._hashes = array("q", (hashes[i] for i in order))
+        self._types = tuple(sys.intern(event_type) for event_type in type_to_index)
+        self._type_indices = array(
+            "H" if len(type_to_index) <= 0xFFFF else "I",
+            (type_to_index[event_type] for event_type, _ in keys),
+        )
+        self._state_keys, self._state_key_starts = _pack(
+            [state_key for _, state_key in keys]
+        )
+        self._event_ids, self._event_id_starts = _pack([state[key] for key in keys])
+
+        self._parent = parent
+        if parent is None:
+            self._depth = 0
+            self._len = len(keys)
+        else:
+            self._depth = parent._depth + 1
+            self._len = len(parent) + sum(1 for key in state if key not in parent)
+
+    def _layer_get(self, key: StateKey) -> Optional[str]:
+        """Look up a key in this layer only, ignoring the parent."""
+        key_hash = hash(key)
+        hashes = self._hashes
+
+        index = bisect_left(hashes, key_hash)
+        while index < len(hashes) and hashes[index] == key_hash:
+            if (
+                self._types[self._type_indices[index]] == key[0]
+                and _unpack(self._state_keys, self._state_key_starts, index) == key[1]
+            ):
+                return _unpack(self._event_ids, self._event_id_starts, index)
+            index += 1
+
+        return None
+
+    def _layer_items(self) -> Iterator[Tuple[StateKey, str]]:
+        """Iterate over the entries in this layer only, ignoring the parent."""
+        count = len(self._hashes)
+        return zip(
+            zip(
+                map(self._types.__getitem__, self._type_indices),
+                _unpack_all(self._state_keys, count),
+            ),
+            _unpack_all(self._event_ids, count),
+        )
+
+    def _iter_items(self) -> Iterator[Tuple[StateKey, str]]:
+        if self._parent is None:
+            return self._layer_items()
+        return self._iter_layered_items()
+
+    def _iter_layered_items(self) -> Iterator[Tuple[StateKey, str]]:
+        # Keys in the layers we've already been through, which override any
+        # entries in the layers below.
+        overridden: Set[StateKey] = set()
+
+        layer: Optional[CompactStateMap] = self
+        while layer is not None:
+            layer_items = list(layer._layer_items())
+            if overridden:
+                for key, event_id in layer_items:
+                    if key not in overridden:
+                        yield key, event_id
+            else:
+                yield from layer_items
+
+            if layer._parent is not None:
+                overridden.update(key for key, _ in layer_items)
+            layer = layer._parent
+
+    def __getitem__(self, key: StateKey) -> str:
+        layer: Optional[CompactStateMap] = self
+        while layer is not None:
+            event_id = layer._layer_get(key)
+            if event_id is not None:
+                return event_id
+            layer = layer._parent
+
+        raise KeyError(key)
+
+    def __iter__(self) -> Iterator[StateKey]:
+        for key, _ in self._iter_items():
+            yield key
+
+    def __len__(self) -> int:
+        return self._len
+
+    def retained_size(self) -> int:
+        """The number of entries stored by this map and the parent maps it
+        keeps alive, including entries which later layers have replaced.
+
+        This is used as the size of the map in caches: a layered map keeps its
+        parents in memory even once they have been evicted from the cache, so
+        it must be charged for them. Maps which share a parent that is still
+        cached are charged for it more than once, which errs on the side of
+        evicting too early.
+        """
+        size = 0
+        layer: Optional[CompactStateMap] = self
+        while layer is not None:
+            size += len(layer._hashes)
+            layer = layer._parent
+        return max(size, 1)
+
+    def items(self) -> ItemsView[StateKey, str]:
+        return _CompactStateMapItemsView(self)
+
+    def values(self) -> ValuesView[str]:
+        return _CompactStateMapValuesView(self)
+
+    def __repr__(self) -> str:
+        return "CompactStateMap(%r)" % (dict(self.items()),)
+
+
+class _CompactStateMapItemsView(ItemsView[StateKey, str]):
+    # The default implementation looks up each key in turn.
+    __slots__ = ()
+    _mapping: CompactStateMap
+
+    def __iter__(self) -> Iterator[Tuple[StateKey, str]]:
+        return self._mapping._iter_items()
+
+
+class _CompactStateMapValuesView(ValuesView[str]):
+    __slots__ = ()
+    _mapping: CompactStateMap
+
+    def __iter__(self) -> Iterator[str]:
+        for _, event_id in self._mapping._iter_items():
+            yield event_id
@@ -0,0 +1,86 @@
+# Copyright 2023 The Matrix.org Foundation C.I.C.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Callable, TypeVar
+
+from typing_extensions import ParamSpec
+
+from twisted.internet import defer
+
+from synapse.logging.context import make_deferred_yieldable
+from synapse.types import ISynapseReactor
+
+logger = logging.getLogger(__name__)
+
+P = ParamSpec("P")
+R = TypeVar("R")
+
+
+class ProcessPool:
+    """A pool of worker processes for running CPU-bound functions off the
+    reactor, and without holding the GIL of the main process.
+
+    The functions and their arguments and results must be picklable, and the
+    functions should be pure: they don't have access to any of the state of the
+    main process (including the logcontext, the database or the homeserver).
+
+    The processes are started with the "spawn" method, as forking a process
+    with running threads (such as the database threadpool) isn't safe. They are
+    started the first time they are needed.
+    """
+
+    def __init__(self, reactor: ISynapseReactor, name: str, max_workers: int):
+        """
+        Args:
+            reactor: the reactor on which results are delivered.
+            name: a name for the pool, used in logging.
+            max_workers: the number of worker processes.
+        """
+        self._reactor = reactor
+        self._name = name
+        self._executor = ProcessPoolExecutor(
+            max_workers=max_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+
+        reactor.addSystemEventTrigger("during", "shutdown", self.shutdown)
+
+    def run(
+        self, f: Callable[P, R], *args: P.args, **kwargs: P.kwargs
+    ) -> "defer.Deferred[R]":
+        """Calls `f` in one of the worker processes.
+
+        Returns:
+            A Deferred, following the Synapse logcontext rules, which fires with
+            the result of `f`, or fails with the exception it raised.
+        """
+        d: "defer.Deferred[R]" = defer.Deferred()
+
+        def on_done(future: "Future[R]") -> None:
+            # This is called from one of the executor's threads.
+            exception = future.exception()
+            if exception is not None:
+                self._reactor.callFromThread(d.errback, exception)
+            else:
+                self._reactor.callFromThread(d.callback, future.result())
+
+        self._executor.submit(f, *args, **kwargs).add_done_callback(on_done)
+        return make_deferred_yieldable(d)
+
+    def shutdown(self) -> None:
+        logger.info("Shutting down process pool %s", self._name)
+        self._executor.shutdown(wait=False)
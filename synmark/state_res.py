@@ -0,0 +1,267 @@
+# Copyright 2023 The Matrix.org Foundation C.I.C.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Synthetic rooms for the state resolution benchmarks."""
+
+import functools
+import random
+from typing import Dict, FrozenSet, Iterable, List, Set
+
+import attr
+
+from twisted.internet import defer
+
+from synapse.api.constants import EventTypes, JoinRules, Membership
+from synapse.api.room_versions import RoomVersion, RoomVersions
+from synapse.events import EventBase, make_event_from_dict
+from synapse.types import JsonDict, MutableStateMap, StateMap, StrCollection
+
+ROOM_ID = "!benchmark:example.com"
+ROOM_VERSION = RoomVersions.V10
+ADMIN = "@admin:example.com"
+
+# The shape of the room used by the benchmarks: a room with many members,
+# whose state forks into many branches, each of which changes the power levels
+# and membership of the room.
+NUM_MEMBERS = 10000
+NUM_FORKS = 10
+EVENTS_PER_FORK = 100
+
+# The proportion of the events on each fork which change the power levels.
+POWER_LEVEL_CHURN = 0.2
+
+
+class NoopClock:
+    """A clock for state res which doesn't give the reactor a chance to run, so
+    that only the state res itself is measured.
+    """
+
+    def sleep(self, duration_ms: float) -> "defer.Deferred[None]":
+        return defer.succeed(None)
+
+
+@attr.s(slots=True, auto_attribs=True)
+class SyntheticRoom:
+    room_version: RoomVersion
+
+    # All the events in the room, by event ID.
+    events: Dict[str, EventBase]
+
+    # The state at the end of each fork.
+    state_sets: List[StateMap[str]]
+
+    # The events on each fork, in the order they were sent.
+    fork_events: List[List[EventBase]]
+
+
+class InMemoryStateResolutionStore:
+    """A `StateResolutionStore` backed by a map of events."""
+
+    def __init__(self, events: Dict[str, EventBase]):
+        self._events = events
+        self._auth_chains: Dict[str, FrozenSet[str]] = {}
+
+    def get_events(
+        self, event_ids: StrCollection, allow_rejected: bool = False
+    ) -> "defer.Deferred[Dict[str, EventBase]]":
+        return defer.succeed(
+            {eid: self._events[eid] for eid in event_ids if eid in self._events}
+        )
+
+    def _get_auth_chain(self, event_id: str) -> FrozenSet[str]:
+        chain = self._auth_chains.get(event_id)
+        if chain is None:
+            # Auth chains are short compared to the number of events, so
+            # recursing is fine.
+            chain = frozenset(
+                {event_id}.union(
+                    *(
+                        self._get_auth_chain(auth_id)
+                        for auth_id in self._events[event_id].auth_event_ids()
+                    )
+                )
+            )
+            self._auth_chains[event_id] = chain
+        return chain
+
+    def get_auth_chain_difference(
+        self, room_id: str, state_sets: List[Set[str]]
+    ) -> "defer.Deferred[Set[str]]":
+        chains: List[Set[str]] = [
+            set().union(*(self._get_auth_chain(eid) for eid in state_set))
+            for state_set in state_sets
+        ]
+        common = chains[0].intersection(*chains[1:])
+        return defer.succeed(chains[0].union(*chains[1:]) - common)
+
+
+class _RoomBuilder:
+    def __init__(self, room_version: RoomVersion):
+        self.room_version = room_version
+        self.events: Dict[str, EventBase] = {}
+        self._ts = 0
+
+    def send(
+        self,
+        state: MutableStateMap[str],
+        prev_event_id: str,
+        event_type: str,
+        state_key: str,
+        sender: str,
+        content: JsonDict,
+    ) -> EventBase:
+        """Create a state event on top of the given state, and update the state
+        with it.
+        """
+        auth_keys = [
+            (EventTypes.Create, ""),
+            (EventTypes.PowerLevels, ""),
+            (EventTypes.Member, sender),
+        ]
+        if event_type == EventTypes.Member:
+            auth_keys.append((EventTypes.Member, state_key))
+            if content["membership"] == Membership.JOIN:
+                auth_keys.append((EventTypes.JoinRules, ""))
+
+        self._ts += 1
+        event = make_event_from_dict(
+            {
+                "room_id": ROOM_ID,
+                "type": event_type,
+                "state_key": state_key,
+                "sender": sender,
+                "content": content,
+                "auth_events": _unique(state[k] for k in auth_keys if k in state),
+                "prev_events": [prev_event_id] if prev_event_id else [],
+                "origin_server_ts": self._ts,
+                "depth": self._ts,
+            },
+            self.room_version,
+        )
+
+        self.events[event.event_id] = event
+        state[(event_type, state_key)] = event.event_id
+        return event
+
+
+def _unique(event_ids: Iterable[str]) -> List[str]:
+    return list(dict.fromkeys(event_ids))
+
+
+def _member(i: int) -> str:
+    return "@user%d:example.com" % (i,)
+
+
+@functools.lru_cache(maxsize=None)
+def make_forked_room(
+    num_members: int = NUM_MEMBERS,
+    num_forks: int = NUM_FORKS,
+    events_per_fork: int = EVENTS_PER_FORK,
+    power_level_churn: float = POWER_LEVEL_CHURN,
+) -> SyntheticRoom:
+    """Build a room with `num_members` members, whose state then forks into
+    `num_forks` branches of `events_per_fork` events each.
+
+    Each event on a fork either changes the power level of a member (with
+    probability `power_level_churn`), or is a member leaving, being kicked or
+    being banned, or a topic change.
+
+    The room is cached, as building it takes a while.
+    """
+    rng = random.Random(0)
+    builder = _RoomBuilder(ROOM_VERSION)
+    state: MutableStateMap[str] = {}
+
+    power_levels: JsonDict = {
+        "users": {ADMIN: 100},
+        "users_default": 0,
+        "state_default": 50,
+        "events_default": 0,
+        "ban": 50,
+        "kick": 50,
+    }
+
+    prev = builder.send(
+        state, "", EventTypes.Create, "", ADMIN, {"room_version": "10"}
+    ).event_id
+    for event_type, content in (
+        (EventTypes.Member, {"membership": Membership.JOIN}),
+        (EventTypes.PowerLevels, power_levels),
+        (EventTypes.JoinRules, {"join_rule": JoinRules.PUBLIC}),
+    ):
+        state_key = ADMIN if event_type == EventTypes.Member else ""
+        prev = builder.send(state, prev, event_type, state_key, ADMIN, content).event_id
+
+    for i in range(num_members):
+        prev = builder.send(
+            state,
+            prev,
+            EventTypes.Member,
+            _member(i),
+            _member(i),
+            {"membership": Membership.JOIN},
+        ).event_id
+
+    state_sets: List[StateMap[str]] = []
+    fork_events = []
+    for _ in range(num_forks):
+        fork_state = dict(state)
+        fork_prev = prev
+        fork_power_levels = power_levels
+        joined = list(range(num_members))
+        events = []
+
+        for _ in range(events_per_fork):
+            if rng.random() < power_level_churn:
+                fork_power_levels = dict(fork_power_levels)
+                fork_power_levels["users"] = dict(fork_power_levels["users"])
+                fork_power_levels["users"][_member(rng.choice(joined))] = rng.randint(
+                    0, 60
+                )
+                args = (EventTypes.PowerLevels, "", ADMIN, fork_power_levels)
+            else:
+                op = rng.randrange(4)
+                if op == 0:
+                    args = (EventTypes.Topic, "", ADMIN, {"topic": str(rng.random())})
+                else:
+                    member = _member(joined.pop(rng.randrange(len(joined))))
+                    if op == 1:
+                        args = (
+                            EventTypes.Member,
+                            member,
+                            member,
+                            {"membership": Membership.LEAVE},
+                        )
+                    else:
+                        membership = Membership.LEAVE if op == 2 else Membership.BAN
+                        args = (
+                            EventTypes.Member,
+                            member,
+                            ADMIN,
+                            {"membership": membership},
+                        )
+
+            event = builder.send(fork_state, fork_prev, *args)
+            fork_prev = event.event_id
+            events.append(event)
+
+        state_sets.append(fork_state)
+        fork_events.append(events)
+
+    return SyntheticRoom(
+        room_version=ROOM_VERSION,
+        events=builder.events,
+        state_sets=state_sets,
+        fork_events=fork_events,
+    )
@@ -1,4 +1,17 @@
-from . import logging, lrucache, lrucache_evict
+from . import (
+    federation_fanout,
+    logging,
+    lrucache,
+    lrucache_evict,
+    replication_rdata,
+    replication_rdata_batch,
+    state_map,
+    state_res_auth_checks,
+    state_res_mainline_sort,
+    state_res_topological_sort,
+    state_res_v2,
+    verify_pdus,
+)
 
 SUITES = [
     (logging, 1000),
@@ -6,4 +19,13 @@ SUITES = [
     (logging, None),
     (lrucache, None),
     (lrucache_evict, None),
+    (state_map, None),
+    (state_res_v2, None),
+    (state_res_topological_sort, None),
+    (state_res_mainline_sort, None),
+    (state_res_auth_checks, None),
+    (federation_fanout, None),
+    (verify_pdus, None),
+    (replication_rdata, 10000),
+    (replication_rdata_batch, 10000),
 ]
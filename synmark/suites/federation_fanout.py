@@ -0,0 +1,154 @@
+# Copyright 2023 The Matrix.org Foundation C.I.C.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import random
+from typing import Callable, Collection, FrozenSet, List, Optional, Tuple
+
+from pyperf import perf_counter
+
+from synapse.config._base import ShardedWorkerHandlingConfig
+from synapse.federation.sender.room_destinations import RoomDestinationsCache
+from synapse.storage.databases.main.roommember import _JoinedHostsCache
+from synapse.types import ISynapseReactor
+
+ROOM_ID = "!benchmark:example.com"
+SERVER_NAME = "example.com"
+
+# The number of servers in the room to benchmark.
+NUM_SERVERS = 5000
+
+# The proportion of events which are a user joining or leaving the room, and of
+# those the proportion which change the servers in the room (i.e. are the first
+# user on a server joining, or the last one leaving).
+MEMBERSHIP_CHURN = 0.1
+SERVER_CHURN = 0.1
+
+# The federation senders that the destinations are sharded over.
+FEDERATION_SENDERS = ["federation_sender1", "federation_sender2"]
+
+
+def _server(i: int) -> str:
+    return "server%d.example.org" % (i,)
+
+
+def make_room(num_servers: int) -> _JoinedHostsCache:
+    """Make the joined hosts of a room with a user on each of the given number
+    of servers.
+    """
+    cache = _JoinedHostsCache()
+    cache.set_joined_users(
+        {_server(i): {"@user:%s" % (_server(i),)} for i in range(num_servers)}
+    )
+    return cache
+
+
+def make_membership_changes(
+    num_events: int, num_servers: int
+) -> List[Optional[Tuple[bool, str, str]]]:
+    """Make the membership changes of the given number of events sent in the
+    room: for each event, whether a user joined (or left), and the server and
+    user; or None if the event doesn't change the membership.
+    """
+    rng = random.Random(0)
+    changes: List[Optional[Tuple[bool, str, str]]] = []
+    next_server = num_servers
+    for i in range(num_events):
+        if rng.random() >= MEMBERSHIP_CHURN:
+            changes.append(None)
+            continue
+
+        if rng.random() < SERVER_CHURN:
+            # A user on a new server joins, or the user on a server leaves.
+            if rng.random() < 0.5:
+                server = _server(next_server)
+                next_server += 1
+                changes.append((True, server, "@user:%s" % (server,)))
+            else:
+                server = _server(rng.randrange(num_servers))
+                changes.append((False, server, "@user:%s" % (server,)))
+        else:
+            # Another user joins on a server which is already in the room.
+            server = _server(rng.randrange(num_servers))
+            changes.append((True, server, "@user%d:%s" % (i, server)))
+
+    return changes
+
+
+def run(
+    loops: int, get_destinations: Callable[[Collection[str]], Collection[str]]
+) -> float:
+    """Time working out the destinations of `loops` events in the room, given
+    a function to work them out from the hosts in the room.
+    """
+    room = make_room(NUM_SERVERS)
+    changes = make_membership_changes(loops, NUM_SERVERS)
+
+    start = perf_counter()
+
+    for change in changes:
+        if change is not None:
+            joined, server, user_id = change
+            if joined:
+                room.add_joined_user(server, user_id)
+            else:
+                room.remove_joined_user(server, user_id)
+
+        get_destinations(room.get_hosts())
+
+    return perf_counter() - start
+
+
+_shard_config = ShardedWorkerHandlingConfig(FEDERATION_SENDERS)
+
+
+def _should_handle(destination: str) -> bool:
+    return _shard_config.should_handle(FEDERATION_SENDERS[0], destination)
+
+
+def recompute_destinations(hosts: Collection[str]) -> FrozenSet[str]:
+    """Work out the destinations from scratch, as was done for every event
+    before `RoomDestinationsCache`.
+    """
+    return frozenset(
+        host for host in hosts if host != SERVER_NAME and _should_handle(host)
+    )
+
+
+async def main(reactor: ISynapseReactor, loops: int) -> float:
+    """
+    Benchmark working out the destinations of `loops` events sent in a room
+    with `NUM_SERVERS` servers, whose membership changes every so often.
+    """
+    cache = RoomDestinationsCache(SERVER_NAME, _should_handle)
+    return run(loops, lambda hosts: cache.get_destinations(ROOM_ID, hosts))
+
+
+if __name__ == "__main__":
+    # Compare with working out the destinations for each event, e.g. with
+    # `python -m synmark.suites.federation_fanout`.
+    num_events = 1000
+    cache = RoomDestinationsCache(SERVER_NAME, _should_handle)
+    cached = run(num_events, lambda hosts: cache.get_destinations(ROOM_ID, hosts))
+    recomputed = run(num_events, recompute_destinations)
+    print(
+        "%d events in a room with %d servers: cached %.2fms, recomputed %.2fms "
+        "(%.1fx faster)"
+        % (
+            num_events,
+            NUM_SERVERS,
+            cached * 1000,
+            recomputed * 1000,
+            recomputed / cached,
+        )
+    )
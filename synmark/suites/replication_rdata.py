@@ -0,0 +1,90 @@
+# Copyright 2023 The Matrix.org Foundation C.I.C.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from typing import Any, List, Tuple
+
+from pyperf import perf_counter
+
+from synapse.replication.tcp.commands import (
+    RdataBatchCommand,
+    RdataCommand,
+    parse_command_from_line,
+)
+from synapse.replication.tcp.streams import EventsStream
+from synapse.types import ISynapseReactor
+
+
+def make_updates(num_rows: int) -> List[Tuple[int, Tuple[Any, ...]]]:
+    """Make the given number of updates to the events stream, as they would be
+    sent over replication.
+    """
+    return [
+        (
+            1000 + i,
+            (
+                "ev",
+                (
+                    "$%043d" % (i,),
+                    "!benchmark:example.com",
+                    "m.room.message",
+                    None,
+                    None,
+                    None,
+                    None,
+                    False,
+                    False,
+                ),
+            ),
+        )
+        for i in range(num_rows)
+    ]
+
+
+def parse_lines(lines: List[str]) -> int:
+    """Parse the received replication lines and the rows in them, returning the
+    number of rows.
+    """
+    num_rows = 0
+    for line in lines:
+        cmd = parse_command_from_line(line)
+        if isinstance(cmd, RdataBatchCommand):
+            for _, row in cmd.updates:
+                EventsStream.parse_row(row)
+                num_rows += 1
+        else:
+            assert isinstance(cmd, RdataCommand)
+            EventsStream.parse_row(cmd.row)
+            num_rows += 1
+    return num_rows
+
+
+async def main(reactor: ISynapseReactor, loops: int) -> float:
+    """
+    Benchmark parsing `loops` rows of the events stream, each received in its
+    own RDATA command.
+    """
+    lines = [
+        "%s %s" % (cmd.NAME, cmd.to_line())
+        for cmd in (
+            RdataCommand(EventsStream.NAME, "master", token, row)
+            for token, row in make_updates(loops)
+        )
+    ]
+
+    start = perf_counter()
+    num_rows = parse_lines(lines)
+    end = perf_counter() - start
+
+    assert num_rows == loops
+    return end
@@ -0,0 +1,47 @@
+# Copyright 2023 The Matrix.org Foundation C.I.C.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from pyperf import perf_counter
+
+from synapse.replication.tcp.commands import RdataBatchCommand
+from synapse.replication.tcp.streams import EventsStream
+from synapse.replication.tcp.streams._base import _STREAM_UPDATE_TARGET_ROW_COUNT
+from synapse.types import ISynapseReactor
+from synmark.suites.replication_rdata import make_updates, parse_lines
+
+
+async def main(reactor: ISynapseReactor, loops: int) -> float:
+    """
+    Benchmark parsing `loops` rows of the events stream, received in RDATA_BATCH
+    commands of as many rows as the stream sends at once.
+    """
+    updates = make_updates(loops)
+    lines = [
+        "%s %s" % (cmd.NAME, cmd.to_line())
+        for cmd in (
+            RdataBatchCommand(
+                EventsStream.NAME,
+                "master",
+                updates[i : i + _STREAM_UPDATE_TARGET_ROW_COUNT],
+            )
+            for i in range(0, loops, _STREAM_UPDATE_TARGET_ROW_COUNT)
+        )
+    ]
+
+    start = perf_counter()
+    num_rows = parse_lines(lines)
+    end = perf_counter() - start
+
+    assert num_rows == loops
+    return end
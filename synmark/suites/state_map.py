@@ -0,0 +1,93 @@
+# Copyright 2023 The Matrix.org Foundation C.I.C.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import tracemalloc
+from typing import Callable, Dict, Tuple
+
+from pyperf import perf_counter
+
+from synapse.types import ISynapseReactor, StateKey
+from synapse.util.caches.state_map import CompactStateMap
+
+# The number of members in the room to benchmark.
+ROOM_SIZE = 100000
+
+
+def make_state(num_members: int) -> Dict[StateKey, str]:
+    """Make a state map that looks like that of a room with the given number of
+    members.
+    """
+    state = {
+        ("m.room.create", ""): "$" + "c" * 43,
+        ("m.room.power_levels", ""): "$" + "p" * 43,
+        ("m.room.join_rules", ""): "$" + "j" * 43,
+    }
+    for i in range(num_members):
+        state[("m.room.member", "@user%d:example.com" % (i,))] = "$%043d" % (i,)
+    return state
+
+
+def measure_memory(build: Callable[[], object]) -> int:
+    """Return the number of bytes allocated by `build` that are still in use
+    once it returns.
+    """
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        value = build()
+        after, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del value
+    return after - before
+
+
+def compare_memory(num_members: int) -> Tuple[int, int]:
+    """Return the memory used by the state of a room with the given number of
+    members as a dict and as a `CompactStateMap`.
+    """
+    return (
+        measure_memory(lambda: make_state(num_members)),
+        measure_memory(lambda: CompactStateMap(make_state(num_members))),
+    )
+
+
+async def main(reactor: ISynapseReactor, loops: int) -> float:
+    """
+    Benchmark `loops` number of lookups of members in a `CompactStateMap` for a
+    large room.
+    """
+    state = make_state(ROOM_SIZE)
+    state_map = CompactStateMap(state)
+    keys = list(state)
+
+    start = perf_counter()
+
+    for i in range(loops):
+        state_map[keys[i % len(keys)]]
+
+    end = perf_counter() - start
+
+    return end
+
+
+if __name__ == "__main__":
+    # Compare the memory used by the two representations, e.g. with
+    # `python -m synmark.suites.state_map`.
+    for num_members in (100, 10000, ROOM_SIZE):
+        dict_size, compact_size = compare_memory(num_members)
+        print(
+            "%d members: dict %d bytes, CompactStateMap %d bytes (%.1fx smaller)"
+            % (num_members, dict_size, compact_size, dict_size / compact_size)
+        )
@@ -0,0 +1,47 @@
+# Copyright 2023 The Matrix.org Foundation C.I.C.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from pyperf import perf_counter
+
+from synapse.api.errors import AuthError
+from synapse.event_auth import check_state_dependent_auth_rules
+from synapse.types import ISynapseReactor
+from synmark.state_res import make_forked_room
+
+
+async def main(reactor: ISynapseReactor, loops: int) -> float:
+    """
+    Benchmark `loops` number of auth checks of the events on the forks of a
+    large room against their auth events.
+    """
+    room = make_forked_room()
+
+    checks = [
+        (event, [room.events[auth_id] for auth_id in event.auth_event_ids()])
+        for events in room.fork_events
+        for event in events
+    ]
+
+    start = perf_counter()
+
+    for i in range(loops):
+        event, auth_events = checks[i % len(checks)]
+        try:
+            check_state_dependent_auth_rules(event, auth_events)
+        except AuthError:
+            pass
+
+    end = perf_counter() - start
+
+    return end
@@ -0,0 +1,63 @@
+# Copyright 2023 The Matrix.org Foundation C.I.C.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from pyperf import perf_counter
+
+from synapse.api.constants import EventTypes
+from synapse.state.v2 import _is_power_event, _mainline_sort
+from synapse.types import ISynapseReactor
+from synmark.state_res import (
+    ROOM_ID,
+    InMemoryStateResolutionStore,
+    NoopClock,
+    make_forked_room,
+)
+
+
+async def main(reactor: ISynapseReactor, loops: int) -> float:
+    """
+    Benchmark `loops` number of mainline sorts of the non-power events on all
+    the forks of a large room, against the power levels at the end of one of
+    the forks.
+    """
+    room = make_forked_room()
+    clock = NoopClock()
+
+    event_ids = [
+        event.event_id
+        for events in room.fork_events
+        for event in events
+        if not _is_power_event(event)
+    ]
+    power_event_id = room.state_sets[0][(EventTypes.PowerLevels, "")]
+
+    # The events to sort are expected to have been fetched already, but the
+    # events in the mainlines are not.
+    event_map = {event_id: room.events[event_id] for event_id in event_ids}
+
+    start = perf_counter()
+
+    for _ in range(loops):
+        await _mainline_sort(
+            clock,
+            ROOM_ID,
+            event_ids,
+            power_event_id,
+            event_map=dict(event_map),
+            state_res_store=InMemoryStateResolutionStore(room.events),
+        )
+
+    end = perf_counter() - start
+
+    return end
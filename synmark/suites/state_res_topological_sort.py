@@ -0,0 +1,55 @@
+# Copyright 2023 The Matrix.org Foundation C.I.C.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from typing import Dict, Set, Tuple
+
+from pyperf import perf_counter
+
+from synapse.state.v2 import lexicographical_topological_sort
+from synapse.types import ISynapseReactor
+from synmark.state_res import make_forked_room
+
+
+async def main(reactor: ISynapseReactor, loops: int) -> float:
+    """
+    Benchmark `loops` number of sorts of the auth graph of the events on all the
+    forks of a large room.
+    """
+    room = make_forked_room()
+
+    fork_event_ids = {event.event_id for events in room.fork_events for event in events}
+    graph = {
+        event_id: {
+            auth_id
+            for auth_id in room.events[event_id].auth_event_ids()
+            if auth_id in fork_event_ids
+        }
+        for event_id in fork_event_ids
+    }
+
+    def key(event_id: str) -> Tuple[int, str]:
+        return room.events[event_id].origin_server_ts, event_id
+
+    elapsed = 0.0
+
+    for _ in range(loops):
+        # The sort consumes the graph, so we need to copy it each time.
+        graph_copy: Dict[str, Set[str]] = {k: set(v) for k, v in graph.items()}
+
+        start = perf_counter()
+        for _ in lexicographical_topological_sort(graph_copy, key):
+            pass
+        elapsed += perf_counter() - start
+
+    return elapsed
@@ -0,0 +1,50 @@
+# Copyright 2023 The Matrix.org Foundation C.I.C.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from pyperf import perf_counter
+
+from synapse.state.v2 import resolve_events_with_store
+from synapse.types import ISynapseReactor
+from synmark.state_res import (
+    ROOM_ID,
+    InMemoryStateResolutionStore,
+    NoopClock,
+    make_forked_room,
+)
+
+
+async def main(reactor: ISynapseReactor, loops: int) -> float:
+    """
+    Benchmark `loops` number of resolutions of the state of a large room which
+    has forked many times.
+    """
+    room = make_forked_room()
+    clock = NoopClock()
+
+    start = perf_counter()
+
+    for _ in range(loops):
+        # Each resolution starts without any events, as it would in practice.
+        await resolve_events_with_store(
+            clock,
+            ROOM_ID,
+            room.room_version,
+            room.state_sets,
+            event_map=None,
+            state_res_store=InMemoryStateResolutionStore(room.events),
+        )
+
+    end = perf_counter() - start
+
+    return end
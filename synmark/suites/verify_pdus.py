@@ -0,0 +1,103 @@
+# Copyright 2023 The Matrix.org Foundation C.I.C.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from typing import List
+
+from pyperf import perf_counter
+from signedjson.key import generate_signing_key, get_verify_key
+
+from synapse.api.room_versions import RoomVersions
+from synapse.crypto.event_signing import add_hashes_and_signatures
+from synapse.crypto.keyring import (
+    VerifyJsonRequest,
+    _verify_signatures,
+    _VerifySignatureRequest,
+)
+from synapse.events import EventBase, make_event_from_dict
+from synapse.federation.federation_base import _check_content_hashes
+from synapse.types import ISynapseReactor
+
+SERVER_NAME = "remote.example.com"
+ROOM_VERSION = RoomVersions.V10
+
+# The number of PDUs in each transaction, which is the most a server will send.
+TRANSACTION_SIZE = 50
+
+SIGNING_KEY = generate_signing_key("1")
+VERIFY_KEY = get_verify_key(SIGNING_KEY)
+
+
+def make_pdus(num_pdus: int) -> List[EventBase]:
+    """Make the given number of messages, signed by `SERVER_NAME`."""
+    pdus = []
+    for i in range(num_pdus):
+        pdu_json = {
+            "room_id": "!benchmark:example.com",
+            "type": "m.room.message",
+            "sender": "@user:%s" % (SERVER_NAME,),
+            "content": {"msgtype": "m.text", "body": "Message %d" % (i,)},
+            "auth_events": ["$" + "a" * 43, "$" + "b" * 43, "$" + "c" * 43],
+            "prev_events": ["$%043d" % (i,)],
+            "origin_server_ts": 1000000 + i,
+            "depth": i,
+            "unsigned": {"age": 100},
+        }
+        add_hashes_and_signatures(ROOM_VERSION, pdu_json, SERVER_NAME, SIGNING_KEY)
+        pdus.append(make_event_from_dict(pdu_json, ROOM_VERSION))
+    return pdus
+
+
+def verify_transaction(pdus: List[EventBase]) -> None:
+    """Check the content hashes and signatures of the PDUs in a transaction,
+    as a batch.
+    """
+    hash_results = _check_content_hashes(pdus)
+    assert all(result is True for result in hash_results.values())
+
+    requests = [
+        _VerifySignatureRequest(
+            VERIFY_KEY, VerifyJsonRequest.from_event(SERVER_NAME, pdu, 0)
+        )
+        for pdu in pdus
+    ]
+    signature_results = _verify_signatures(requests)
+    assert all(result is None for result in signature_results.values())
+
+
+async def main(reactor: ISynapseReactor, loops: int) -> float:
+    """
+    Benchmark checking the content hashes and signatures of `loops` PDUs
+    received in transactions of `TRANSACTION_SIZE` PDUs.
+    """
+    pdus = make_pdus(loops)
+
+    start = perf_counter()
+
+    for i in range(0, loops, TRANSACTION_SIZE):
+        verify_transaction(pdus[i : i + TRANSACTION_SIZE])
+
+    end = perf_counter() - start
+
+    return end
+
+
+if __name__ == "__main__":
+    # Print the number of PDUs verified per second, e.g. with
+    # `python -m synmark.suites.verify_pdus`.
+    num_pdus = 5000
+    pdus = make_pdus(num_pdus)
+    start = perf_counter()
+    for i in range(0, num_pdus, TRANSACTION_SIZE):
+        verify_transaction(pdus[i : i + TRANSACTION_SIZE])
+    print("%.0f PDUs/sec" % (num_pdus / (perf_counter() - start),))
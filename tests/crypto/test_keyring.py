@@ -13,7 +13,7 @@
 # limitations under the License.
 import time
 from typing import Any, Dict, List, Optional, cast
-from unittest.mock import Mock
+from unittest.mock import Mock, patch
 
 import attr
 import canonicaljson
@@ -381,6 +381,125 @@ class KeyringTestCase(unittest.HomeserverTestCase):
         mock_fetcher1.get_keys.assert_called_once()
         mock_fetcher2.get_keys.assert_called_once()
 
+    def test_verify_json_batched(self) -> None:
+        """Signatures which are verified at the same time are verified in one
+        batch, on a thread.
+        """
+        key1 = signedjson.key.generate_signing_key("1")
+
+        async def get_keys(
+            server_name: str, key_ids: List[str], minimum_valid_until_ts: int
+        ) -> Dict[str, FetchKeyResult]:
+            return {get_key_id(key1): FetchKeyResult(get_verify_key(key1), 1200)}
+
+        mock_fetcher = Mock()
+        mock_fetcher.get_keys = Mock(side_effect=get_keys)
+        kr = keyring.Keyring(self.hs, key_fetchers=(mock_fetcher,))
+
+        num_objects = keyring.VERIFY_IN_THREAD_MIN_BATCH_SIZE
+        json_objects: List[JsonDict] = [{"i": i} for i in range(num_objects)]
+        for json_object in json_objects:
+            signedjson.sign.sign_json(json_object, "server1", key1)
+
+        # Tamper with one of the objects, which should only fail that one.
+        json_objects[0]["i"] = -1
+
+        with patch.object(
+            keyring, "_verify_signatures", wraps=keyring._verify_signatures
+        ) as verify_signatures, patch.object(
+            keyring, "defer_to_thread", wraps=keyring.defer_to_thread
+        ) as defer_to_thread:
+            results = kr.verify_json_objects_for_server(
+                [("server1", json_object, 0) for json_object in json_objects]
+            )
+            self.get_failure(results[0], SynapseError)
+            for result in results[1:]:
+                self.get_success(result)
+
+        verify_signatures.assert_called_once()
+        self.assertEqual(len(verify_signatures.call_args[0][0]), num_objects)
+        defer_to_thread.assert_called_once()
+
+    def test_verify_keys_cached(self) -> None:
+        """Keys are cached in memory, and keys which can't be found aren't
+        fetched again for a while.
+        """
+        key1 = signedjson.key.generate_signing_key("1")
+        valid_until_ts = self.clock.time_msec() + 24 * 60 * 60 * 1000
+
+        async def get_keys(
+            server_name: str, key_ids: List[str], minimum_valid_until_ts: int
+        ) -> Dict[str, FetchKeyResult]:
+            if server_name == "server1":
+                return {
+                    get_key_id(key1): FetchKeyResult(
+                        get_verify_key(key1), valid_until_ts
+                    )
+                }
+            return {}
+
+        mock_fetcher = Mock()
+        mock_fetcher.get_keys = Mock(side_effect=get_keys)
+        kr = keyring.Keyring(self.hs, key_fetchers=(mock_fetcher,))
+
+        json1: JsonDict = {}
+        signedjson.sign.sign_json(json1, "server1", key1)
+        for _ in range(2):
+            self.get_success(kr.verify_json_for_server("server1", json1, 0))
+        mock_fetcher.get_keys.assert_called_once()
+
+        # A key we can't find isn't looked for again straight away.
+        json2: JsonDict = {}
+        signedjson.sign.sign_json(json2, "server2", key1)
+        for _ in range(2):
+            self.get_failure(
+                kr.verify_json_for_server("server2", json2, 0), SynapseError
+            )
+        self.assertEqual(mock_fetcher.get_keys.call_count, 2)
+
+        self.reactor.advance(2 * keyring.MISSING_KEY_CACHE_DURATION_MS / 1000)
+        self.get_failure(kr.verify_json_for_server("server2", json2, 0), SynapseError)
+        self.assertEqual(mock_fetcher.get_keys.call_count, 3)
+
+    def test_expiring_keys_refreshed(self) -> None:
+        """Keys which are in use are fetched again before they expire."""
+        key1 = signedjson.key.generate_signing_key("1")
+        now = self.clock.time_msec()
+        valid_until_ts = now + keyring.KEY_REFRESH_BEFORE_EXPIRY_MS
+
+        async def get_keys(
+            server_name: str, key_ids: List[str], minimum_valid_until_ts: int
+        ) -> Dict[str, FetchKeyResult]:
+            return {
+                get_key_id(key1): FetchKeyResult(get_verify_key(key1), valid_until_ts)
+            }
+
+        mock_fetcher = Mock()
+        mock_fetcher.get_keys = Mock(side_effect=get_keys)
+        kr = keyring.Keyring(self.hs, key_fetchers=(mock_fetcher,))
+
+        json1: JsonDict = {}
+        signedjson.sign.sign_json(json1, "server1", key1)
+        for _ in range(2):
+            self.get_success(kr.verify_json_for_server("server1", json1, now))
+        mock_fetcher.get_keys.assert_called_once()
+
+        # The key is refreshed in the background...
+        valid_until_ts = now + 24 * 60 * 60 * 1000
+        self.reactor.advance(keyring.KEY_REFRESH_INTERVAL_MS / 1000)
+        self.assertEqual(mock_fetcher.get_keys.call_count, 2)
+        _, _, minimum_valid_until_ts = mock_fetcher.get_keys.call_args[0]
+        self.assertGreater(
+            minimum_valid_until_ts, now + keyring.KEY_REFRESH_BEFORE_EXPIRY_MS
+        )
+
+        # ... so requests after the old copy expires don't need to fetch it.
+        self.reactor.advance(keyring.KEY_REFRESH_BEFORE_EXPIRY_MS / 1000)
+        self.get_success(
+            kr.verify_json_for_server("server1", json1, self.clock.time_msec())
+        )
+        self.assertEqual(mock_fetcher.get_keys.call_count, 2)
+
 
 @logcontext_clean
 class ServerKeyFetcherTestCase(unittest.HomeserverTestCase):
@@ -16,8 +16,11 @@ import unittest as stdlib_unittest
 from typing import Any, List, Mapping, Optional
 
 import attr
+from canonicaljson import encode_canonical_json
 from parameterized import parameterized
 
+from twisted.test.proto_helpers import MemoryReactor
+
 from synapse.api.constants import EventContentFields
 from synapse.api.room_versions import RoomVersions
 from synapse.events import EventBase, make_event_from_dict
@@ -26,13 +29,22 @@ from synapse.events.utils import (
     SerializeEventConfig,
     _split_field,
     copy_and_fixup_power_levels_contents,
+    encode_canonical_pdu_json,
+    encode_event_dict_json,
+    format_event_for_client_v1,
+    format_event_for_client_v2,
+    format_event_for_client_v2_without_room_id,
     maybe_upsert_event_field,
     prune_event,
     serialize_event,
 )
-from synapse.types import JsonDict
+from synapse.server import HomeServer
+from synapse.types import JsonDict, create_requester
+from synapse.util import Clock, PreencodedJsonDict, json_decoder
 from synapse.util.frozenutils import freeze
 
+from tests import unittest
+
 
 def MockEvent(**kwargs: Any) -> EventBase:
     if "event_id" not in kwargs:
@@ -68,6 +80,65 @@ class TestMaybeUpsertEventField(stdlib_unittest.TestCase):
         self.assertEqual(event.unsigned["key"], "value")
 
 
+class EncodeEventJsonTestCase(stdlib_unittest.TestCase):
+    def _make_event(self) -> EventBase:
+        return make_event_from_dict(
+            {
+                "type": "m.room.message",
+                "room_id": "!room:test",
+                "sender": "@alice:test",
+                "content": {"body": "caf\u00e9 \u2603", "msgtype": "m.text"},
+                "depth": 5,
+                "prev_events": [],
+                "auth_events": [],
+                "hashes": {"sha256": "abc"},
+                "signatures": {"test": {"ed25519:1": "sig"}},
+                "unsigned": {"age_ts": 1000, "redacted_because": {}},
+                "origin_server_ts": 1234,
+            },
+            RoomVersions.V10,
+        )
+
+    @parameterized.expand([(False,), (True,)])
+    def test_encode_canonical_pdu_json(self, retain: bool) -> None:
+        event = self._make_event()
+        if retain:
+            event.retain_canonical_json_fields()
+
+        expected = encode_canonical_json(event.get_pdu_json())
+        self.assertEqual(encode_canonical_pdu_json(event), expected)
+        # The second time the retained encodings may be used.
+        self.assertEqual(encode_canonical_pdu_json(event), expected)
+
+    @parameterized.expand([(False,), (True,)])
+    def test_encode_event_dict_json(self, retain: bool) -> None:
+        event = self._make_event()
+        if retain:
+            event.retain_canonical_json_fields()
+            event.get_canonical_json_fields()
+
+        expected = event.get_dict()
+        expected.pop("depth")
+        self.assertEqual(
+            json_decoder.decode(encode_event_dict_json(event, exclude=("depth",))),
+            expected,
+        )
+
+    def test_retained_fields_reused(self) -> None:
+        event = self._make_event()
+        self.assertIsNot(
+            event.get_canonical_json_fields()["content"],
+            event.get_canonical_json_fields()["content"],
+        )
+
+        event.retain_canonical_json_fields()
+        content = event.get_canonical_json_fields()["content"]
+        self.assertIs(event.get_canonical_json_fields()["content"], content)
+
+        event.release_canonical_json_fields()
+        self.assertFalse(event.has_retained_canonical_json_fields())
+
+
 class PruneEventTestCase(stdlib_unittest.TestCase):
     def run_test(self, evdict: JsonDict, matchdict: JsonDict, **kwargs: Any) -> None:
         """
@@ -726,6 +797,96 @@ class SerializeEventTestCase(stdlib_unittest.TestCase):
             )
 
 
+class EventClientSerializerTestCase(unittest.HomeserverTestCase):
+    def prepare(
+        self, reactor: MemoryReactor, clock: Clock, homeserver: HomeServer
+    ) -> None:
+        self.serializer = homeserver.get_event_client_serializer()
+
+        self.event = make_event_from_dict(
+            {
+                "type": "m.room.message",
+                "event_id": "$event",
+                "room_id": "!room:test",
+                "sender": "@alice:test",
+                "content": {"body": "hello"},
+                "unsigned": {"age_ts": 1000},
+            },
+            internal_metadata_dict={"txn_id": "txn", "token_id": 1},
+        )
+
+    def serialize(
+        self, event: EventBase, time_now: int, config: SerializeEventConfig
+    ) -> JsonDict:
+        return self.get_success(
+            self.serializer.serialize_event(event, time_now, config=config)
+        )
+
+    @parameterized.expand(
+        [
+            ("v1", format_event_for_client_v1),
+            ("v2", format_event_for_client_v2),
+            ("v2_without_room_id", format_event_for_client_v2_without_room_id),
+        ]
+    )
+    def test_cached(self, _: str, event_format: Any) -> None:
+        """Serializing an event a second time reuses the cached serialization, but
+        still fills in the per-request fields.
+        """
+        alice = SerializeEventConfig(
+            event_format=event_format,
+            requester=create_requester("@alice:test", access_token_id=1),
+        )
+        bob = SerializeEventConfig(
+            event_format=event_format, requester=create_requester("@bob:test")
+        )
+
+        for time_now, config in ((2000, alice), (3000, bob), (4000, alice)):
+            serialized = self.serialize(self.event, time_now, config)
+            self.assertEqual(
+                serialized, serialize_event(self.event, time_now, config=config)
+            )
+
+        self.assertEqual(serialized["unsigned"]["transaction_id"], "txn")
+        self.assertEqual(serialized["unsigned"]["age"], 3000)
+
+        # The cached entries must not be modified by the serialization.
+        assert isinstance(serialized, PreencodedJsonDict)
+        encoding = serialized.get_encoding()
+        assert encoding is not None
+        self.assertNotIn(b'"transaction_id"', encoding[0])
+        self.assertNotIn(b'"age"', encoding[0])
+
+    def test_redacted(self) -> None:
+        """A redacted event isn't served from the cached serialization of the
+        original event.
+        """
+        self.serialize(self.event, 2000, SerializeEventConfig())
+
+        redacted = prune_event(self.event)
+        serialized = self.serialize(redacted, 2000, SerializeEventConfig())
+        self.assertEqual(serialized["content"], {})
+
+    def test_different_event_object(self) -> None:
+        """A cached serialization is only used for the event object it was made
+        from, as the JSON of an event can change (e.g. when it expires).
+        """
+        self.serialize(self.event, 2000, SerializeEventConfig())
+
+        event_dict = self.event.get_dict()
+        event_dict["content"] = {}
+        changed = make_event_from_dict(event_dict)
+        serialized = self.serialize(changed, 2000, SerializeEventConfig())
+        self.assertEqual(serialized["content"], {})
+
+    def test_only_event_fields(self) -> None:
+        """Serializations with a filter on the event fields aren't cached."""
+        config = SerializeEventConfig(only_event_fields=["content.body"])
+        serialized = self.serialize(self.event, 2000, config)
+        self.assertNotIsInstance(serialized, PreencodedJsonDict)
+        self.assertEqual(serialized, {"content": {"body": "hello"}})
+
+
 class CopyPowerLevelsContentTestCase(stdlib_unittest.TestCase):
     def setUp(self) -> None:
         self.test_content: PowerLevelsContent = {
@@ -449,6 +449,123 @@ class FederationCatchUpTestCases(FederatingHomeserverTestCase):
         # has been successfully sent.
         self.assertCountEqual(woken, set(server_names[:-1]))
 
+    def test_catch_up_room_event_ids_for_destinations(self) -> None:
+        """
+        Tests that get_catch_up_room_event_ids_for_destinations returns the
+        events each destination has yet to be sent, in stream order.
+        """
+        store = self.hs.get_datastores().main
+        self.is_online = False
+
+        self.register_user("u1", "you the one")
+        u1_token = self.login("u1", "you the one")
+        rooms = [self.helper.create_room_as("u1", tok=u1_token) for _ in range(3)]
+        for room_id in rooms:
+            for server_name in ("host2", "host3"):
+                self.get_success(
+                    event_injection.inject_member_event(
+                        self.hs, room_id, "@user:%s" % server_name, "join"
+                    )
+                )
+
+        event_ids = [
+            self.helper.send(room_id, "wombats!", tok=u1_token)["event_id"]
+            for room_id in rooms + rooms[:1]
+        ]
+        event_1 = self.get_success(store.get_event(event_ids[1]))
+        assert event_1.internal_metadata.stream_ordering is not None
+
+        last_successful_stream_orderings = {
+            "host2": 0,
+            "host3": event_1.internal_metadata.stream_ordering,
+            "host4": 0,
+        }
+        results = self.get_success(
+            store.get_catch_up_room_event_ids_for_destinations(
+                last_successful_stream_orderings
+            )
+        )
+
+        # host4 isn't in any of the rooms, so has nothing to catch up on.
+        self.assertEqual(results.keys(), {"host2", "host3"})
+        self.assertEqual(results["host2"], event_ids[1:])
+        self.assertEqual(results["host3"], event_ids[2:])
+
+    def test_catch_up_extremities_shared(self) -> None:
+        """
+        Tests that destinations catching up on the same room share the fetched
+        extremities.
+        """
+        per_dest_queue_2, sent_pdus_2 = self.make_fake_destination_queue("host2")
+        per_dest_queue_3, sent_pdus_3 = self.make_fake_destination_queue("host3")
+        per_dest_queue_3._catch_up_fetcher = per_dest_queue_2._catch_up_fetcher
+
+        self.register_user("u1", "you the one")
+        u1_token = self.login("u1", "you the one")
+        room_id = self.helper.create_room_as("u1", tok=u1_token)
+        for server_name in ("host2", "host3"):
+            self.get_success(
+                event_injection.inject_member_event(
+                    self.hs, room_id, "@user:%s" % server_name, "join"
+                )
+            )
+        event_id = self.helper.send(room_id, "wombats!", tok=u1_token)["event_id"]
+
+        store = self.hs.get_datastores().main
+        for destination in ("host2", "host3"):
+            self.get_success(
+                store.set_destination_last_successful_stream_ordering(destination, 0)
+            )
+
+        with mock.patch.object(
+            store, "get_prev_events_for_room", wraps=store.get_prev_events_for_room
+        ) as get_prev_events_for_room:
+            self.get_success(per_dest_queue_2._catch_up_transmission_loop())
+            self.get_success(per_dest_queue_3._catch_up_transmission_loop())
+
+        get_prev_events_for_room.assert_called_once_with(room_id)
+        self.assertEqual([pdu.event_id for pdu in sent_pdus_2], [event_id])
+        self.assertEqual([pdu.event_id for pdu in sent_pdus_3], [event_id])
+        self.assertFalse(per_dest_queue_2._catching_up)
+        self.assertFalse(per_dest_queue_3._catching_up)
+
+    def test_catch_up_extremities_refreshed(self) -> None:
+        """
+        Tests that shared extremities which predate the event being caught up on
+        are not used.
+        """
+        per_dest_queue, sent_pdus = self.make_fake_destination_queue()
+        catch_up_fetcher = per_dest_queue._catch_up_fetcher
+
+        self.register_user("u1", "you the one")
+        u1_token = self.login("u1", "you the one")
+        room_id = self.helper.create_room_as("u1", tok=u1_token)
+        self.get_success(
+            event_injection.inject_member_event(self.hs, room_id, "@user:host2", "join")
+        )
+        event_id_1 = self.helper.send(room_id, "wombats!", tok=u1_token)["event_id"]
+
+        # Another destination catching up fetches the extremities.
+        extremities = self.get_success(catch_up_fetcher.get_extremities(room_id, 0))
+        self.assertEqual([e.event_id for e in extremities], [event_id_1])
+
+        event_id_2 = self.helper.send(room_id, "more wombats!", tok=u1_token)[
+            "event_id"
+        ]
+
+        store = self.hs.get_datastores().main
+        event_1 = self.get_success(store.get_event(event_id_1))
+        assert event_1.internal_metadata.stream_ordering is not None
+        self.get_success(
+            store.set_destination_last_successful_stream_ordering(
+                "host2", event_1.internal_metadata.stream_ordering
+            )
+        )
+
+        self.get_success(per_dest_queue._catch_up_transmission_loop())
+
+        self.assertEqual([pdu.event_id for pdu in sent_pdus], [event_id_2])
+
     def test_not_latest_event(self) -> None:
         """Test that we send the latest event in the room even if its not ours."""
 
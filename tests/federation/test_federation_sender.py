@@ -11,6 +11,7 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
+import gc
 from typing import Callable, FrozenSet, List, Optional, Set
 from unittest.mock import AsyncMock, Mock
 
@@ -21,14 +22,17 @@ from twisted.internet import defer
 from twisted.test.proto_helpers import MemoryReactor
 
 from synapse.api.constants import EduTypes, RoomEncryptionAlgorithms
+from synapse.events import EventBase
+from synapse.federation.sender import FederationSender, _EventBatch
 from synapse.federation.units import Transaction
 from synapse.handlers.device import DeviceHandler
 from synapse.rest import admin
-from synapse.rest.client import login
+from synapse.rest.client import login, room
 from synapse.server import HomeServer
 from synapse.types import JsonDict, ReadReceipt
 from synapse.util import Clock
 
+from tests.test_utils import event_injection
 from tests.unittest import HomeserverTestCase
 
 
@@ -763,3 +767,159 @@ def build_device_dict(user_id: str, device_id: str, sk: SigningKey) -> JsonDict:
             key_id(sk): encode_pubkey(sk),
         },
     }
+
+
+class FederationSenderEventQueueTestCases(HomeserverTestCase):
+    """
+    Test the federation sender's handling of new events.
+
+    By default for test cases federation sending is disabled. This Test class has it
+    re-enabled for the main process.
+    """
+
+    servlets = [
+        admin.register_servlets,
+        login.register_servlets,
+        room.register_servlets,
+    ]
+
+    def make_homeserver(self, reactor: MemoryReactor, clock: Clock) -> HomeServer:
+        self.federation_transport_client = Mock(spec=["send_transaction"])
+        return self.setup_test_homeserver(
+            federation_transport_client=self.federation_transport_client,
+        )
+
+    def default_config(self) -> JsonDict:
+        config = super().default_config()
+        config["federation_sender_instances"] = None
+        return config
+
+    def prepare(self, reactor: MemoryReactor, clock: Clock, hs: HomeServer) -> None:
+        self.pdus: List[JsonDict] = []
+
+        async def record_transaction(
+            txn: Transaction, json_cb: Optional[Callable[[], JsonDict]] = None
+        ) -> JsonDict:
+            assert json_cb is not None
+            self.pdus.extend(json_cb()["pdus"])
+            return {}
+
+        self.federation_transport_client.send_transaction.side_effect = (
+            record_transaction
+        )
+
+        federation_sender = hs.get_federation_sender()
+        assert isinstance(federation_sender, FederationSender)
+        self.federation_sender = federation_sender
+        self.store = hs.get_datastores().main
+
+    def test_backlog(self) -> None:
+        """A backlog of events is sent out in order, in growing batches."""
+        user_id = self.register_user("user", "pass")
+        tok = self.login("user", "pass")
+        room_id = self.helper.create_room_as(user_id, tok=tok)
+        self.get_success(
+            event_injection.inject_member_event(self.hs, room_id, "@user:host2", "join")
+        )
+        self.pump()
+
+        # Hold off the event queue while a backlog of events builds up.
+        self.federation_sender._is_processing = True
+        bodies = [str(i) for i in range(150)]
+        for body in bodies:
+            self.helper.send(room_id, body, tok=tok)
+        self.pdus.clear()
+
+        get_all_new_event_ids_stream = Mock(
+            wraps=self.store.get_all_new_event_ids_stream
+        )
+        self.store.get_all_new_event_ids_stream = get_all_new_event_ids_stream  # type: ignore[method-assign]
+
+        self.federation_sender._is_processing = False
+        self.federation_sender.notify_new_events(self.store.get_room_max_token())
+        self.pump()
+
+        self.assertEqual([pdu["content"]["body"] for pdu in self.pdus], bodies)
+
+        # The batch size doubled after the first batch was full, and went back
+        # down once we had caught up.
+        self.assertEqual(
+            [
+                call.kwargs["limit"]
+                for call in get_all_new_event_ids_stream.call_args_list
+            ],
+            [100, 200, 100],
+        )
+        self.assertEqual(
+            self.get_success(self.store.get_federation_out_pos("events")),
+            self.store.get_room_max_stream_ordering(),
+        )
+
+    def test_failed_batch_consumes_next_batch(self) -> None:
+        """If sending out a batch fails, a failure fetching the next batch isn't
+        reported as unhandled.
+        """
+        last_token = self.get_success(self.store.get_federation_out_pos("events"))
+        next_batch: "defer.Deferred[_EventBatch]" = defer.Deferred()
+        batches = {
+            last_token: defer.succeed(
+                _EventBatch(
+                    next_token=last_token + 1,
+                    full=False,
+                    event_to_received_ts={"$event": 0},
+                    event_entries={"$event": Mock()},
+                )
+            ),
+            last_token + 1: next_batch,
+        }
+        self.federation_sender._fetch_event_batch = Mock(  # type: ignore[method-assign]
+            side_effect=lambda last_token, limit: batches.pop(last_token)
+        )
+        self.federation_sender._handle_event_batch = AsyncMock(  # type: ignore[method-assign]
+            side_effect=Exception("send")
+        )
+
+        self.get_failure(self.federation_sender._process_event_queue_loop(), Exception)
+        self.assertEqual(batches, {})
+
+        next_batch.errback(Exception("fetch"))
+        del next_batch
+        gc.collect()
+        self.assertEqual(self.flushLoggedErrors(), [])
+
+    def test_failed_send_consumes_destination_lookups(self) -> None:
+        """If sending out an event fails, failures working out the destinations of
+        the following events aren't reported as unhandled.
+        """
+        events: List[EventBase] = [
+            Mock(event_id=f"$event{i}", room_id="!room") for i in range(3)
+        ]
+        lookups: "List[defer.Deferred[Optional[List[str]]]]" = [
+            defer.Deferred(),
+            defer.Deferred(),
+        ]
+        destinations = {
+            "$event0": defer.succeed(["host2"]),
+            "$event1": lookups[0],
+            "$event2": lookups[1],
+        }
+        self.federation_sender._get_destinations_for_event = Mock(  # type: ignore[method-assign]
+            side_effect=lambda event: destinations.pop(event.event_id)
+        )
+        self.federation_sender._send_pdu = AsyncMock(  # type: ignore[method-assign]
+            side_effect=Exception("send")
+        )
+
+        self.get_failure(
+            self.federation_sender._handle_room_events(
+                events, {event.event_id: 0 for event in events}
+            ),
+            Exception,
+        )
+        self.assertEqual(destinations, {})
+
+        for lookup in lookups:
+            lookup.errback(Exception("lookup"))
+        del lookups, lookup
+        gc.collect()
+        self.assertEqual(self.flushLoggedErrors(), [])
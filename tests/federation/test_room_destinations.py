@@ -0,0 +1,67 @@
+# Copyright 2023 The Matrix.org Foundation C.I.C.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from unittest.mock import Mock
+
+from synapse.federation.sender.room_destinations import RoomDestinationsCache
+
+from tests import unittest
+
+
+class RoomDestinationsCacheTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        # Only handle the destinations starting with "a".
+        self.should_handle = Mock(side_effect=lambda d: d.startswith("a"))
+        self.cache = RoomDestinationsCache("a.ours", self.should_handle)
+
+    def test_filters_hosts(self) -> None:
+        destinations = self.cache.get_destinations(
+            "!room", ["a.ours", "a.one", "a.two", "b.one"]
+        )
+        self.assertEqual(destinations, {"a.one", "a.two"})
+
+    def test_same_hosts_reused(self) -> None:
+        hosts = frozenset(["a.ours", "a.one", "b.one"])
+        destinations = self.cache.get_destinations("!room", hosts)
+        self.should_handle.reset_mock()
+
+        # The same set of hosts, or an equal one, gives the same destinations
+        # without looking at the hosts again.
+        self.assertIs(self.cache.get_destinations("!room", hosts), destinations)
+        self.assertIs(
+            self.cache.get_destinations("!room", frozenset(hosts)), destinations
+        )
+        self.assertIs(self.cache.get_destinations("!room", set(hosts)), destinations)
+        self.should_handle.assert_not_called()
+
+    def test_updated_with_changed_hosts(self) -> None:
+        self.cache.get_destinations("!room", frozenset(["a.one", "a.two", "b.one"]))
+        self.should_handle.reset_mock()
+
+        destinations = self.cache.get_destinations(
+            "!room", frozenset(["a.one", "a.three", "b.one"])
+        )
+        self.assertEqual(destinations, {"a.one", "a.three"})
+
+        # Only the host which joined is checked.
+        self.should_handle.assert_called_once_with("a.three")
+
+    def test_rooms_independent(self) -> None:
+        self.cache.get_destinations("!room1", frozenset(["a.one"]))
+        self.assertEqual(
+            self.cache.get_destinations("!room2", frozenset(["a.two"])), {"a.two"}
+        )
+        self.assertEqual(
+            self.cache.get_destinations("!room1", frozenset(["a.one"])), {"a.one"}
+        )
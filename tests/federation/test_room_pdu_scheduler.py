@@ -0,0 +1,164 @@
+# Copyright 2023 The Matrix.org Foundation C.I.C.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from typing import Dict, List, Optional
+
+from twisted.internet import defer
+
+from synapse.federation.room_pdu_scheduler import PRIORITY_ROOM_TURNS, RoomPduScheduler
+from synapse.logging.context import make_deferred_yieldable
+
+from tests import unittest
+from tests.server import get_clock
+
+
+class RoomPduSchedulerTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.reactor, self.clock = get_clock()
+
+        # The number of events waiting to be handled in each room.
+        self.staged: Dict[str, int] = {}
+
+        # The rooms which have handled an event, in order.
+        self.handled: List[str] = []
+
+        # If set, turns wait for this before handling their event.
+        self.blocker: "Optional[defer.Deferred[None]]" = None
+
+        self.active = 0
+        self.max_active = 0
+
+    def _make_scheduler(self, max_concurrent_rooms: Optional[int]) -> None:
+        self.scheduler = RoomPduScheduler(
+            self.clock, self._handle_next_pdu, max_concurrent_rooms
+        )
+
+    async def _handle_next_pdu(self, room_id: str) -> bool:
+        if not self.staged.get(room_id):
+            return False
+
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            if self.blocker is not None:
+                await make_deferred_yieldable(self.blocker)
+        finally:
+            self.active -= 1
+
+        self.staged[room_id] -= 1
+        self.handled.append(room_id)
+        return self.staged[room_id] > 0
+
+    def _receive(self, room_id: str, num_events: int, priority: bool = True) -> None:
+        self.staged[room_id] = self.staged.get(room_id, 0) + num_events
+        self.scheduler.schedule_room(room_id, priority, num_events)
+
+    def test_rooms_take_turns(self) -> None:
+        """A room with a backlog of events doesn't hold up the others."""
+        self._make_scheduler(1)
+        self.blocker = defer.Deferred()
+
+        self._receive("!busy", 3)
+        self._receive("!quiet", 1)
+        self._receive("!other", 1)
+
+        blocker, self.blocker = self.blocker, None
+        blocker.callback(None)
+
+        self.assertEqual(self.handled, ["!busy", "!quiet", "!other", "!busy", "!busy"])
+        self.assertEqual(self.max_active, 1)
+
+    def test_concurrency_bounded(self) -> None:
+        self._make_scheduler(3)
+        self.blocker = defer.Deferred()
+
+        for i in range(10):
+            self._receive("!room%d" % (i,), 2)
+        self.assertEqual(self.active, 3)
+
+        blocker, self.blocker = self.blocker, None
+        blocker.callback(None)
+
+        self.assertEqual(len(self.handled), 20)
+        self.assertEqual(self.max_active, 3)
+        self.assertEqual(self.active, 0)
+
+    def test_unbounded(self) -> None:
+        self._make_scheduler(None)
+        self.blocker = defer.Deferred()
+
+        for i in range(10):
+            self._receive("!room%d" % (i,), 1)
+        self.assertEqual(self.active, 10)
+
+        self.blocker.callback(None)
+        self.assertEqual(len(self.handled), 10)
+
+    def test_local_rooms_prioritised(self) -> None:
+        """Rooms with local users get most of the turns, without starving the
+        rest.
+        """
+        self._make_scheduler(1)
+        self.blocker = defer.Deferred()
+
+        self._receive("!first", 1)
+        for i in range(PRIORITY_ROOM_TURNS + 2):
+            self._receive("!remote%d" % (i,), 1, priority=False)
+            self._receive("!local%d" % (i,), 1, priority=True)
+
+        blocker, self.blocker = self.blocker, None
+        blocker.callback(None)
+
+        self.assertEqual(
+            self.handled[: PRIORITY_ROOM_TURNS + 1],
+            ["!first"]
+            + ["!local%d" % (i,) for i in range(PRIORITY_ROOM_TURNS - 1)]
+            + ["!remote0"],
+        )
+        self.assertEqual(len(self.handled), 2 * (PRIORITY_ROOM_TURNS + 2) + 1)
+
+    def test_rescheduled_during_turn(self) -> None:
+        """A room which receives an event during its turn gets another turn,
+        even if it thought it had finished.
+        """
+        self._make_scheduler(1)
+        self.blocker = defer.Deferred()
+
+        self._receive("!room", 1)
+        self.assertEqual(self.active, 1)
+
+        # The new event arrives after the room has checked its staging area.
+        self.scheduler.schedule_room("!room", True)
+
+        blocker, self.blocker = self.blocker, None
+        self.staged["!room"] += 1
+        blocker.callback(None)
+
+        self.assertEqual(self.handled, ["!room", "!room"])
+
+    def test_scheduled_once(self) -> None:
+        """Scheduling a room which is already waiting doesn't give it extra
+        turns.
+        """
+        self._make_scheduler(1)
+        self.blocker = defer.Deferred()
+
+        self._receive("!busy", 1)
+        self._receive("!room", 1)
+        self._receive("!room", 1)
+
+        blocker, self.blocker = self.blocker, None
+        blocker.callback(None)
+
+        self.assertEqual(self.handled, ["!busy", "!room", "!room"])
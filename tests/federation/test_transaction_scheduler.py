@@ -0,0 +1,175 @@
+# Copyright 2023 The Matrix.org Foundation C.I.C.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from typing import List, Optional
+
+from twisted.internet import defer
+
+from synapse.api.errors import RequestSendFailed
+from synapse.federation.sender.transaction_scheduler import (
+    UNHEALTHY_LATENCY_SECONDS,
+    TransactionScheduler,
+)
+
+from tests import unittest
+from tests.server import get_clock
+
+
+class TransactionSchedulerTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.reactor, self.clock = get_clock()
+        self.scheduler = TransactionScheduler(self.clock, 4)
+
+        # The destinations of the transactions which have been sent, in order.
+        self.sent: List[str] = []
+
+    def _send(
+        self,
+        destination: str,
+        num_items: int = 1,
+        finish: "Optional[defer.Deferred[None]]" = None,
+    ) -> "defer.Deferred[None]":
+        """Send a transaction to the destination, which completes when `finish`
+        does.
+        """
+
+        async def send() -> None:
+            async with self.scheduler.schedule(destination, num_items):
+                self.sent.append(destination)
+                if finish is not None:
+                    await finish
+
+        return defer.ensureDeferred(send())
+
+    def _make_unhealthy(self, destination: str) -> None:
+        for _ in range(5):
+            self.failureResultOf(
+                defer.ensureDeferred(self._fail(destination)), RequestSendFailed
+            )
+        self.assertFalse(self.scheduler.is_healthy(destination))
+
+    async def _fail(self, destination: str) -> None:
+        async with self.scheduler.schedule(destination, 1):
+            raise RequestSendFailed(Exception(), can_retry=True)
+
+    def test_limits_transactions_in_flight(self) -> None:
+        """Transactions wait for a slot, and those which send the most items
+        for the time taken go first.
+        """
+        finish: "defer.Deferred[None]" = defer.Deferred()
+        for i in range(4):
+            self._send("busy%d" % (i,), finish=finish)
+        self.assertEqual(len(self.sent), 4)
+
+        d1 = self._send("small", num_items=1)
+        d2 = self._send("large", num_items=50)
+        self.assertEqual(len(self.sent), 4)
+
+        finish.callback(None)
+        self.successResultOf(d1)
+        self.successResultOf(d2)
+        self.assertEqual(self.sent[4:], ["large", "small"])
+
+    def test_failures_make_destination_unhealthy(self) -> None:
+        self._make_unhealthy("dead")
+
+        # It recovers after some successful transactions.
+        for _ in range(4):
+            self.successResultOf(self._send("dead"))
+        self.assertTrue(self.scheduler.is_healthy("dead"))
+
+    def test_slow_destination_unhealthy(self) -> None:
+        for _ in range(10):
+            finish: "defer.Deferred[None]" = defer.Deferred()
+            d = self._send("slow", finish=finish)
+            self.reactor.advance(UNHEALTHY_LATENCY_SECONDS * 2)
+            finish.callback(None)
+            self.successResultOf(d)
+
+        self.assertFalse(self.scheduler.is_healthy("slow"))
+        self.assertEqual(
+            self.scheduler.sort_by_priority(["slow", "new"]), ["new", "slow"]
+        )
+
+    def test_unhealthy_destinations_limited(self) -> None:
+        """Unhealthy destinations can only use a share of the slots, leaving the
+        rest for healthy ones.
+        """
+        self._make_unhealthy("dead1")
+        self._make_unhealthy("dead2")
+
+        finish: "defer.Deferred[None]" = defer.Deferred()
+        self._send("dead1", finish=finish)
+        d = self._send("dead2", finish=finish)
+        self.assertEqual(self.sent[-1], "dead1")
+        self.assertNoResult(d)
+
+        # Healthy destinations can still be sent to.
+        self.successResultOf(self._send("alive"))
+        self.assertEqual(self.sent[-1], "alive")
+
+        finish.callback(None)
+        self.successResultOf(d)
+        self.assertEqual(self.sent[-1], "dead2")
+
+    def test_slow_transactions_count_as_unhealthy(self) -> None:
+        """Transactions to destinations we don't know are unhealthy yet stop
+        holding up other transactions once they have been in flight for a while.
+        """
+        self._make_unhealthy("dead")
+
+        finish: "defer.Deferred[None]" = defer.Deferred()
+        for i in range(4):
+            self._send("unresponsive%d" % (i,), finish=finish)
+
+        d1 = self._send("dead")
+        d2 = self._send("alive")
+        self.assertNoResult(d2)
+
+        self.reactor.advance(UNHEALTHY_LATENCY_SECONDS)
+        self.successResultOf(d2)
+        self.assertEqual(self.sent[-1], "alive")
+
+        # The unresponsive destinations still use up the unhealthy share.
+        self.assertNoResult(d1)
+        finish.callback(None)
+        self.successResultOf(d1)
+        self.assertEqual(self.sent[-1], "dead")
+
+    def test_healthy_destinations_first(self) -> None:
+        self._make_unhealthy("dead")
+
+        finish: "defer.Deferred[None]" = defer.Deferred()
+        for i in range(4):
+            self._send("busy%d" % (i,), finish=finish)
+
+        self._send("dead")
+        self._send("alive")
+        finish.callback(None)
+        self.assertEqual(self.sent[-2:], ["alive", "dead"])
+
+    def test_cancelled_while_waiting(self) -> None:
+        """Cancelling a transaction waiting for a slot doesn't take up a slot."""
+        finish: "defer.Deferred[None]" = defer.Deferred()
+        for i in range(4):
+            self._send("busy%d" % (i,), finish=finish)
+
+        d1 = self._send("cancelled")
+        d2 = self._send("other")
+        d1.cancel()
+        self.failureResultOf(d1, defer.CancelledError)
+
+        finish.callback(None)
+        self.successResultOf(d2)
+        self.assertNotIn("cancelled", self.sent)
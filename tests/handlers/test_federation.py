@@ -330,6 +330,50 @@ class FederationTestCase(unittest.FederatingHomeserverTestCase):
             )
         self.get_success(d)
 
+    def test_concurrent_backfills_deduplicated(self) -> None:
+        """
+        Concurrent requests to backfill from the same point share one backfill,
+        and only one backfill is prefetched in a room at a time.
+        """
+        federation_handler = self.hs.get_federation_handler()
+        backfilled: "Deferred[bool]" = Deferred()
+        maybe_backfill_inner_mock = AsyncMock()
+
+        async def maybe_backfill_inner(*args: object, **kwargs: object) -> bool:
+            await maybe_backfill_inner_mock(*args, **kwargs)
+            return await backfilled
+
+        with patch.object(
+            federation_handler, "_maybe_backfill_inner", new=maybe_backfill_inner
+        ):
+            d1 = run_in_background(
+                federation_handler.maybe_backfill, "!room:test", 100, 10
+            )
+            d2 = run_in_background(
+                federation_handler.maybe_backfill, "!room:test", 100, 10
+            )
+            federation_handler.prefetch_backfill("!other:test", 100, 10)
+            federation_handler.prefetch_backfill("!other:test", 90, 10)
+            self.pump()
+
+            self.assertEqual(maybe_backfill_inner_mock.call_count, 2)
+            maybe_backfill_inner_mock.assert_any_call(
+                "!room:test", 100, 10, processing_start_time=self.clock.time_msec()
+            )
+            # Prefetches look further ahead than the client asked for.
+            maybe_backfill_inner_mock.assert_any_call(
+                "!other:test", 100, 50, processing_start_time=0
+            )
+
+            backfilled.callback(True)
+            self.assertTrue(self.get_success(d1))
+            self.assertTrue(self.get_success(d2))
+
+            # Once the prefetch has finished, another can be started.
+            federation_handler.prefetch_backfill("!other:test", 90, 10)
+            self.pump()
+            self.assertEqual(maybe_backfill_inner_mock.call_count, 3)
+
     def test_backfill_ignores_known_events(self) -> None:
         """
         Tests that events that we already know about are ignored when backfilling.
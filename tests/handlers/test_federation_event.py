@@ -11,6 +11,7 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
+import functools
 from typing import Optional
 from unittest import mock
 
@@ -30,7 +31,11 @@ from synapse.rest import admin
 from synapse.rest.client import login, room
 from synapse.server import HomeServer
 from synapse.state import StateResolutionStore
-from synapse.state.v2 import _mainline_sort, _reverse_topological_power_sort
+from synapse.state.v2 import (
+    _mainline_sort,
+    _reverse_topological_power_sort,
+    _run_to_completion,
+)
 from synapse.types import JsonDict
 from synapse.util import Clock
 
@@ -984,17 +989,21 @@ class FederationEventHandlerTests(unittest.FederatingHomeserverTestCase):
                 )["event_id"]
             )
         )
+        power_events = [new_power_levels_event, rejected_power_levels_event]
+        power_event_map = self.get_success(
+            main_store.get_events(
+                [aid for event in power_events for aid in event.auth_event_ids()],
+                allow_rejected=True,
+            )
+        )
+        power_event_map.update((event.event_id, event) for event in power_events)
         self.assertEqual(
-            self.get_success(
-                _reverse_topological_power_sort(
-                    self.clock,
+            _run_to_completion(
+                functools.partial(
+                    _reverse_topological_power_sort,
                     room_id,
-                    event_ids=[
-                        new_power_levels_event.event_id,
-                        rejected_power_levels_event.event_id,
-                    ],
-                    event_map={},
-                    state_res_store=StateResolutionStore(main_store),
+                    event_ids=[event.event_id for event in power_events],
+                    event_map=power_event_map,
                     full_conflicted_set=set(),
                 )
             ),
@@ -279,6 +279,104 @@ class SyncTestCase(tests.unittest.HomeserverTestCase):
         )
         self.assertEqual(eve_initial_sync_after_join.joined, [])
 
+    def test_incremental_sync_only_generates_changed_rooms(self) -> None:
+        """An incremental sync should only do the work of generating room entries
+        for rooms where something has happened.
+        """
+        user = self.register_user("user", "pass")
+        tok = self.login(user, "pass")
+        quiet_room = self.helper.create_room_as(user, tok=tok)
+        busy_room = self.helper.create_room_as(user, tok=tok)
+
+        requester = create_requester(user)
+        initial_result = self.get_success(
+            self.sync_handler.wait_for_sync_for_user(
+                requester, sync_config=generate_sync_config(user)
+            )
+        )
+        self.assertEqual(
+            {r.room_id for r in initial_result.joined}, {quiet_room, busy_room}
+        )
+
+        self.helper.send(busy_room, "hello", tok=tok)
+
+        with patch.object(
+            self.sync_handler,
+            "_generate_room_entry",
+            wraps=self.sync_handler._generate_room_entry,
+        ) as mock_generate_room_entry:
+            result = self.get_success(
+                self.sync_handler.wait_for_sync_for_user(
+                    requester,
+                    sync_config=generate_sync_config(user),
+                    since_token=initial_result.next_batch,
+                )
+            )
+
+        self.assertEqual([r.room_id for r in result.joined], [busy_room])
+        self.assertEqual(
+            [c.args[1].room_id for c in mock_generate_room_entry.call_args_list],
+            [busy_room],
+        )
+
+    def test_incremental_sync_resumes_from_empty_result(self) -> None:
+        """Once an incremental sync request has found nothing to send, retrying
+        it should only consider what has happened since then.
+        """
+        user = self.register_user("user", "pass")
+        tok = self.login(user, "pass")
+        room_id = self.helper.create_room_as(user, tok=tok)
+
+        other_user = self.register_user("other", "pass")
+        other_tok = self.login(other_user, "pass")
+
+        requester = create_requester(user)
+        initial_result = self.get_success(
+            self.sync_handler.wait_for_sync_for_user(
+                requester, sync_config=generate_sync_config(user)
+            )
+        )
+        since_token = initial_result.next_batch
+
+        # Something the user isn't interested in happens, which advances the
+        # stream tokens.
+        self.helper.create_room_as(other_user, tok=other_tok)
+
+        sync_config = generate_sync_config(user)
+        empty_result = self.get_success(
+            self.sync_handler.wait_for_sync_for_user(
+                requester, sync_config=sync_config, since_token=since_token
+            )
+        )
+        self.assertFalse(empty_result)
+        self.assertNotEqual(empty_result.next_batch, since_token)
+
+        # Let the response cache entry expire, then retry the same request after
+        # something the user does care about has happened.
+        self.reactor.advance(180)
+        event_id = self.helper.send(room_id, "hello", tok=tok)["event_id"]
+
+        with patch.object(
+            self.sync_handler,
+            "current_sync_for_user",
+            wraps=self.sync_handler.current_sync_for_user,
+        ) as mock_current_sync_for_user:
+            result = self.get_success(
+                self.sync_handler.wait_for_sync_for_user(
+                    requester, sync_config=sync_config, since_token=since_token
+                )
+            )
+
+        # We should have computed the result from where the empty result left
+        # off, and still get the new event.
+        mock_current_sync_for_user.assert_called_once_with(
+            sync_config, empty_result.next_batch
+        )
+        self.assertEqual(len(result.joined), 1)
+        self.assertEqual(
+            [e.event_id for e in result.joined[0].timeline.events], [event_id]
+        )
+
 
 _request_key = 0
 
@@ -0,0 +1,353 @@
+# Copyright 2023 The Matrix.org Foundation C.I.C.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+from typing import Any, Dict, List, Optional, cast
+from unittest.mock import Mock
+
+from zope.interface import alsoProvides, implementer
+
+from twisted.internet import defer
+from twisted.internet.interfaces import IConsumer, IProtocolFactory, ISSLTransport
+from twisted.internet.task import Clock
+from twisted.test.proto_helpers import StringTransport
+from twisted.web.client import URI, ResponseFailed, readBody
+from twisted.web.http_headers import Headers
+from twisted.web.iweb import IBodyProducer, IResponse
+
+from tests.http import dummy_address
+from tests.unittest import TestCase
+
+try:
+    import h2.config
+    import h2.connection
+    import h2.events
+    import h2.settings
+
+    from synapse.http.federation.http2 import (
+        IDLE_CONNECTION_TIMEOUT_SECONDS,
+        Http2Agent,
+        Http2ClientProtocol,
+    )
+
+    HAS_H2 = True
+except ImportError:
+    HAS_H2 = False
+
+
+@implementer(IBodyProducer)
+class _BytesProducer:
+    def __init__(self, body: bytes):
+        self.body = body
+        self.length = len(body)
+
+    def startProducing(self, consumer: IConsumer) -> "defer.Deferred[None]":
+        consumer.write(self.body)
+        return defer.succeed(None)
+
+    def pauseProducing(self) -> None:
+        pass
+
+    def resumeProducing(self) -> None:
+        pass
+
+    def stopProducing(self) -> None:
+        pass
+
+
+class _TLSTransport(StringTransport):
+    """A transport which pretends to have negotiated the given protocol with ALPN."""
+
+    def __init__(self, negotiated_protocol: bytes):
+        super().__init__()
+        self.negotiatedProtocol = negotiated_protocol
+        alsoProvides(self, ISSLTransport)
+
+
+class _FakeServer:
+    """The server end of an HTTP/2 connection to an `Http2ClientProtocol`."""
+
+    def __init__(self, client: "Http2ClientProtocol", transport: StringTransport):
+        self.client = client
+        self.transport = transport
+        self.conn = h2.connection.H2Connection(
+            h2.config.H2Configuration(client_side=False, header_encoding=None)
+        )
+        self.conn.initiate_connection()
+
+        # The headers and bodies of the requests received, by stream ID.
+        self.requests: Dict[int, Dict[bytes, bytes]] = {}
+        self.bodies: Dict[int, bytes] = {}
+        self.ended: List[int] = []
+        self.reset: List[int] = []
+
+    def pump(self) -> None:
+        """Pass the data sent by each end to the other."""
+        data = self.transport.value()
+        self.transport.clear()
+        for event in self.conn.receive_data(data):
+            if isinstance(event, h2.events.RequestReceived):
+                self.requests[event.stream_id] = dict(event.headers)
+                self.bodies[event.stream_id] = b""
+            elif isinstance(event, h2.events.DataReceived):
+                self.bodies[event.stream_id] += event.data
+                self.conn.acknowledge_received_data(
+                    event.flow_controlled_length, event.stream_id
+                )
+            elif isinstance(event, h2.events.StreamEnded):
+                self.ended.append(event.stream_id)
+            elif isinstance(event, h2.events.StreamReset):
+                self.reset.append(event.stream_id)
+        self.flush()
+
+    def flush(self) -> None:
+        data = self.conn.data_to_send()
+        if data:
+            self.client.dataReceived(data)
+
+    def respond(self, stream_id: int, code: int, body: bytes) -> None:
+        self.conn.send_headers(
+            stream_id,
+            [(b":status", b"%d" % (code,)), (b"content-length", b"%d" % len(body))],
+        )
+        self.conn.send_data(stream_id, body, end_stream=True)
+        self.flush()
+
+
+class _FakeEndpoint:
+    def __init__(self, test: "Http2AgentTestCase"):
+        self._test = test
+
+    def connect(self, factory: IProtocolFactory) -> "defer.Deferred[Any]":
+        self._test.connection_attempts += 1
+        protocol = cast(Http2ClientProtocol, factory.buildProtocol(dummy_address))
+
+        transport: StringTransport
+        if self._test.negotiated_protocol is None:
+            transport = StringTransport()
+        else:
+            transport = _TLSTransport(self._test.negotiated_protocol)
+        protocol.makeConnection(transport)
+        if self._test.negotiated_protocol is not None:
+            protocol.handshakeCompleted()
+
+        self._test.servers.append(_FakeServer(protocol, transport))
+        return defer.succeed(protocol)
+
+
+class Http2AgentTestCase(TestCase):
+    if not HAS_H2:
+        skip = "Requires h2"
+
+    def setUp(self) -> None:
+        self.clock = Clock()
+        self.connection_attempts = 0
+        self.servers: List[_FakeServer] = []
+
+        # None to connect without TLS, in which case HTTP/2 is assumed.
+        self.negotiated_protocol: Optional[bytes] = None
+
+        self.endpoint_factory = Mock()
+        self.endpoint_factory.endpointForURI.side_effect = lambda uri: _FakeEndpoint(
+            self
+        )
+        self.fallback_agent = Mock()
+        self.agent = Http2Agent(self.clock, self.endpoint_factory, self.fallback_agent)
+
+    def _request(
+        self, path: bytes = b"/path", body: Optional[bytes] = None
+    ) -> "defer.Deferred[IResponse]":
+        return self.agent.request(
+            b"PUT" if body is not None else b"GET",
+            b"matrix-federation://remote" + path,
+            Headers({b"Host": [b"remote"], b"Connection": [b"close"]}),
+            _BytesProducer(body) if body is not None else None,
+        )
+
+    def test_requests_multiplexed(self) -> None:
+        """Concurrent requests to a server share a connection."""
+        d1 = self._request(b"/one")
+        d2 = self._request(b"/two", body=b"{}")
+
+        self.assertEqual(self.connection_attempts, 1)
+        (server,) = self.servers
+        server.pump()
+
+        self.assertEqual(len(server.requests), 2)
+        stream1, stream2 = sorted(server.requests)
+        self.assertEqual(server.requests[stream1][b":path"], b"/one")
+        self.assertEqual(server.requests[stream1][b":method"], b"GET")
+        self.assertEqual(server.requests[stream1][b":authority"], b"remote")
+        self.assertEqual(server.requests[stream1][b":scheme"], b"https")
+        self.assertNotIn(b"connection", server.requests[stream1])
+        self.assertNotIn(b"host", server.requests[stream1])
+        self.assertEqual(server.requests[stream2][b":path"], b"/two")
+        self.assertEqual(server.bodies[stream2], b"{}")
+        self.assertEqual(server.ended, [stream1, stream2])
+
+        # The responses can come back in any order.
+        server.respond(stream2, 200, b"two")
+        self.assertNoResult(d1)
+        response2 = self.successResultOf(d2)
+        self.assertEqual(response2.code, 200)
+        self.assertEqual(response2.length, 3)
+        self.assertEqual(self.successResultOf(readBody(response2)), b"two")
+
+        server.respond(stream1, 404, b"one")
+        response1 = self.successResultOf(d1)
+        self.assertEqual(response1.code, 404)
+        self.assertEqual(self.successResultOf(readBody(response1)), b"one")
+
+        # Later requests reuse the connection.
+        d3 = self._request(b"/three")
+        server.pump()
+        self.assertEqual(self.connection_attempts, 1)
+        self.assertEqual(len(server.requests), 3)
+        self.assertNoResult(d3)
+
+    def test_max_concurrent_streams(self) -> None:
+        """Requests wait for a stream if the server limits the number open."""
+        d1 = self._request()
+        (server,) = self.servers
+        server.conn.update_settings(
+            {h2.settings.SettingCodes.MAX_CONCURRENT_STREAMS: 1}
+        )
+        server.pump()
+        (stream1,) = server.requests
+
+        d2 = self._request()
+        server.pump()
+        self.assertEqual(len(server.requests), 1)
+
+        server.respond(stream1, 200, b"")
+        self.successResultOf(d1)
+        server.pump()
+        self.assertEqual(len(server.requests), 2)
+        self.assertNoResult(d2)
+
+    def test_stream_reset(self) -> None:
+        """If the server resets a stream, only that request fails."""
+        d1 = self._request()
+        d2 = self._request()
+        (server,) = self.servers
+        server.pump()
+        stream1, stream2 = sorted(server.requests)
+
+        server.conn.reset_stream(stream1)
+        server.flush()
+        self.failureResultOf(d1, ResponseFailed)
+
+        server.respond(stream2, 200, b"")
+        self.successResultOf(d2)
+
+    def test_cancel(self) -> None:
+        """Cancelling a request resets its stream."""
+        d = self._request()
+        (server,) = self.servers
+        server.pump()
+        (stream,) = server.requests
+
+        d.cancel()
+        self.failureResultOf(d, defer.CancelledError)
+        server.pump()
+        self.assertEqual(server.reset, [stream])
+
+    def test_connection_lost(self) -> None:
+        """Requests fail if the connection is lost, and later requests
+        reconnect.
+        """
+        d = self._request()
+        (server,) = self.servers
+        server.pump()
+
+        server.client.connectionLost()
+        self.failureResultOf(d, ResponseFailed)
+
+        self._request()
+        self.assertEqual(self.connection_attempts, 2)
+
+    def test_idle_connection_closed(self) -> None:
+        d = self._request()
+        (server,) = self.servers
+        server.pump()
+        (stream,) = server.requests
+        server.respond(stream, 200, b"")
+        self.successResultOf(d)
+
+        self.clock.advance(IDLE_CONNECTION_TIMEOUT_SECONDS - 1)
+        self.assertFalse(server.transport.disconnecting)
+        self.clock.advance(1)
+        self.assertTrue(server.transport.disconnecting)
+
+        # The server is told we are going away.
+        events = server.conn.receive_data(server.transport.value())
+        self.assertIsInstance(events[-1], h2.events.ConnectionTerminated)
+
+    def test_negotiated_http2(self) -> None:
+        """HTTP/2 is used if negotiated with ALPN."""
+        self.negotiated_protocol = b"h2"
+        self._request()
+        (server,) = self.servers
+        server.pump()
+        self.assertEqual(len(server.requests), 1)
+        self.fallback_agent.request.assert_not_called()
+
+    def test_fallback_to_http1(self) -> None:
+        """Servers which don't negotiate HTTP/2 are sent requests with the
+        fallback agent.
+        """
+        self.negotiated_protocol = b"http/1.1"
+        response = Mock()
+        self.fallback_agent.request.return_value = defer.succeed(response)
+
+        self.assertIs(self.successResultOf(self._request()), response)
+        self.assertEqual(self.connection_attempts, 1)
+        (server,) = self.servers
+        self.assertTrue(server.transport.disconnecting)
+
+        # We remember that the server doesn't support HTTP/2.
+        self.assertIs(self.successResultOf(self._request()), response)
+        self.assertEqual(self.connection_attempts, 1)
+        self.assertEqual(self.fallback_agent.request.call_count, 2)
+
+
+class Http2ClientProtocolTestCase(TestCase):
+    if not HAS_H2:
+        skip = "Requires h2"
+
+    def test_large_body_flow_controlled(self) -> None:
+        """Request bodies larger than the flow control window are sent as the
+        server opens the window.
+        """
+        client = Http2ClientProtocol(Clock())
+        transport = StringTransport()
+        client.makeConnection(transport)
+        server = _FakeServer(client, transport)
+
+        # The default initial window is 65535 bytes.
+        body = b"x" * 100000
+        d = defer.ensureDeferred(
+            client.request(
+                b"PUT",
+                URI.fromBytes(b"https://remote/path"),
+                Headers(),
+                _BytesProducer(body),
+            )
+        )
+
+        # The server acknowledges the data it receives, which opens the window.
+        for _ in range(10):
+            server.pump()
+        (stream,) = server.requests
+        self.assertEqual(server.bodies[stream], body)
+        self.assertEqual(server.ended, [stream])
+        self.assertNoResult(d)
@@ -44,7 +44,16 @@ from synapse.util import Clock
 from tests.replication._base import BaseMultiWorkerStreamTestCase
 from tests.server import FakeTransport
 from tests.test_utils import FakeResponse
-from tests.unittest import HomeserverTestCase, override_config
+from tests.unittest import HomeserverTestCase, override_config, skip_unless
+
+try:
+    import h2.config
+    import h2.connection
+    import h2.events
+
+    HAS_H2 = True
+except ImportError:
+    HAS_H2 = False
 
 
 def check_logcontext(context: LoggingContextOrSentinel) -> None:
@@ -527,6 +536,127 @@ class FederationClientTests(HomeserverTestCase):
 
         self.assertTrue(conn.disconnecting)
 
+    @override_config(
+        {"federation": {"client_max_concurrent_requests_per_destination": 1}}
+    )
+    def test_concurrent_requests_limited_per_destination(self) -> None:
+        """Requests to a destination wait for earlier ones to get a response if
+        too many are in flight.
+        """
+        self.reactor.lookups["otherserv"] = "1.2.3.5"
+
+        d1 = defer.ensureDeferred(self.cl.get_json("testserv:8008", "foo/bar"))
+        d2 = defer.ensureDeferred(self.cl.get_json("testserv:8008", "foo/baz"))
+        self.pump()
+
+        # Only the first request is sent.
+        clients = self.reactor.tcpClients
+        self.assertEqual(len(clients), 1)
+        client = clients[0][2].buildProtocol(None)
+        conn = StringTransport()
+        client.makeConnection(conn)
+        self.assertRegex(conn.value(), b"^GET /foo/bar")
+        conn.clear()
+
+        # Requests to other destinations aren't held up.
+        defer.ensureDeferred(self.cl.get_json("otherserv:8008", "foo/bar"))
+        self.pump()
+        self.assertEqual(len(clients), 2)
+
+        client.dataReceived(
+            b"HTTP/1.1 200 OK\r\n"
+            b"Content-Type: application/json\r\n"
+            b"Content-Length: 2\r\n"
+            b"\r\n"
+            b"{}"
+        )
+        self.assertEqual(self.successResultOf(d1), {})
+
+        # Now the second request is sent, reusing the connection.
+        self.pump()
+        self.assertEqual(len(clients), 2)
+        self.assertRegex(conn.value(), b"^GET /foo/baz")
+        self.assertNoResult(d2)
+
+    @override_config(
+        {"federation": {"client_max_concurrent_requests_per_destination": 1}}
+    )
+    def test_queued_request_times_out(self) -> None:
+        """Time spent waiting for another request to a destination to finish
+        counts towards the request's timeout.
+        """
+        d1 = defer.ensureDeferred(
+            self.cl.get_json("testserv:8008", "foo/bar", timeout=20000)
+        )
+        d2 = defer.ensureDeferred(
+            self.cl.get_json("testserv:8008", "foo/baz", timeout=10000)
+        )
+        self.pump()
+
+        # Only the first request is sent.
+        self.assertEqual(len(self.reactor.tcpClients), 1)
+
+        self.reactor.advance(10.5)
+        f = self.failureResultOf(d2)
+        self.assertIsInstance(f.value, RequestSendFailed)
+        self.assertIsInstance(f.value.inner_exception, TimeoutError)
+        self.assertNoResult(d1)
+
+    @skip_unless(HAS_H2, "Requires h2")
+    @override_config({"federation": {"client_http2": True}})
+    def test_client_http2(self) -> None:
+        """Requests to a destination are multiplexed over a single HTTP/2
+        connection.
+        """
+        d1 = defer.ensureDeferred(self.cl.get_json("testserv:8008", "foo/bar"))
+        d2 = defer.ensureDeferred(
+            self.cl.post_json("testserv:8008", "foo/baz", data={"a": "b"})
+        )
+        self.pump()
+
+        clients = self.reactor.tcpClients
+        self.assertEqual(len(clients), 1)
+        client = clients[0][2].buildProtocol(None)
+        conn = StringTransport()
+        client.makeConnection(conn)
+        self.pump(0.1)
+
+        server = h2.connection.H2Connection(
+            h2.config.H2Configuration(client_side=False, header_encoding=None)
+        )
+        server.initiate_connection()
+        requests = {}
+        bodies: Dict[int, bytes] = {}
+        for event in server.receive_data(conn.value()):
+            if isinstance(event, h2.events.RequestReceived):
+                requests[event.stream_id] = dict(event.headers)
+            elif isinstance(event, h2.events.DataReceived):
+                bodies[event.stream_id] = event.data
+
+        self.assertEqual(len(requests), 2)
+        stream1, stream2 = sorted(requests)
+        self.assertEqual(requests[stream1][b":path"], b"/foo/bar")
+        self.assertEqual(requests[stream1][b":authority"], b"testserv:8008")
+        self.assertIn(b"authorization", requests[stream1])
+        self.assertEqual(requests[stream2][b":method"], b"POST")
+        self.assertEqual(bodies[stream2], b'{"a":"b"}')
+
+        for stream_id, body in ((stream1, b'{"a":1}'), (stream2, b"{}")):
+            server.send_headers(
+                stream_id,
+                [
+                    (b":status", b"200"),
+                    (b"content-type", b"application/json"),
+                    (b"content-length", b"%d" % (len(body),)),
+                ],
+            )
+            server.send_data(stream_id, body, end_stream=True)
+        client.dataReceived(server.data_to_send())
+        self.pump()
+
+        self.assertEqual(self.successResultOf(d1), {"a": 1})
+        self.assertEqual(self.successResultOf(d2), {})
+
     @parameterized.expand([(b"",), (b"foo",), (b'{"a": Infinity}',)])
     def test_json_error(self, return_value: bytes) -> None:
         """
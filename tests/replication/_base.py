@@ -33,7 +33,8 @@ from synapse.replication.tcp.protocol import (
 )
 from synapse.replication.tcp.resource import ReplicationStreamProtocolFactory
 from synapse.server import HomeServer
-from synapse.util import Clock
+from synapse.types import JsonDict
+from synapse.util import Clock, json_decoder
 
 from tests import unittest
 from tests.server import FakeTransport
@@ -60,6 +61,9 @@ class BaseStreamTestCase(unittest.HomeserverTestCase):
         skip = "Requires Postgres"
 
     def prepare(self, reactor: MemoryReactor, clock: Clock, hs: HomeServer) -> None:
+        # The bodies of the HTTP replication requests made by the worker.
+        self._http_replication_request_bodies: Dict[SynapseRequest, JsonDict] = {}
+
         # build a replication server
         server_factory = ReplicationStreamProtocolFactory(hs)
         self.streamer = hs.get_replication_streamer()
@@ -178,6 +182,19 @@ class BaseStreamTestCase(unittest.HomeserverTestCase):
         def request_factory(*args: Any, **kwargs: Any) -> SynapseRequest:
             request = real_request_factory(*args, **kwargs)
             requests.append(request)
+
+            # Also keep a record of the request body, as it is discarded once
+            # the request has been processed.
+            real_request_received = request.requestReceived
+
+            def request_received(*args: Any, **kwargs: Any) -> None:
+                assert request.content is not None
+                self._http_replication_request_bodies[request] = json_decoder.decode(
+                    request.content.getvalue().decode("utf-8")
+                )
+                real_request_received(*args, **kwargs)
+
+            request.requestReceived = request_received
             return request
 
         channel.requestFactory = request_factory
@@ -193,9 +210,9 @@ class BaseStreamTestCase(unittest.HomeserverTestCase):
         )
         channel.makeConnection(server_to_client_transport)
 
-        # The request will now be processed by `self.site` and the response
-        # streamed back.
-        self.reactor.advance(0)
+        # The request will now be sent, processed by `self.site` and the
+        # response streamed back.
+        self.pump(0.01)
 
         # We tear down the connection so it doesn't get reused without our
         # knowledge.
@@ -209,19 +226,29 @@ class BaseStreamTestCase(unittest.HomeserverTestCase):
 
     def assert_request_is_get_repl_stream_updates(
         self, request: SynapseRequest, stream_name: str
-    ) -> None:
+    ) -> JsonDict:
         """Asserts that the given request is a HTTP replication request for
         fetching updates for given stream.
+
+        Returns:
+            The part of the request for the given stream, with its
+            `from_token` and `upto_token`.
         """
 
         path: bytes = request.path  # type: ignore
-        self.assertRegex(
-            path,
-            rb"^/_synapse/replication/get_repl_stream_updates/%s/[^/]+$"
-            % (stream_name.encode("ascii"),),
-        )
+        self.assertEqual(path, b"/_synapse/replication/get_repl_multi_stream_updates/")
+
+        self.assertEqual(request.method, b"POST")
 
-        self.assertEqual(request.method, b"GET")
+        stream_requests = [
+            stream_request
+            for stream_request in self._http_replication_request_bodies[request][
+                "requests"
+            ]
+            if stream_request["stream_name"] == stream_name
+        ]
+        self.assertEqual(len(stream_requests), 1)
+        return stream_requests[0]
 
 
 class BaseMultiWorkerStreamTestCase(unittest.HomeserverTestCase):
@@ -560,6 +587,8 @@ class FakeRedisPubSubProtocol(Protocol):
             self.send("OK")
         elif command == b"GET":
             self.send(None)
+        elif command == b"MGET":
+            self.send([None] * len(args))
 
         # Connection keep-alives.
         elif command == b"PING":
@@ -0,0 +1,120 @@
+# Copyright 2023 The Matrix.org Foundation C.I.C.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from unittest.mock import AsyncMock
+
+from twisted.internet import defer
+
+from synapse.handlers.typing import RoomMember, TypingWriterHandler
+from synapse.http.server import JsonResource
+from synapse.replication.http import REPLICATION_PREFIX
+from synapse.replication.http.streams import ReplicationGetMultiStreamUpdates
+from synapse.replication.tcp.streams._base import HttpStreamUpdatesFetcher
+
+from tests import unittest
+
+
+class ReplicationGetMultiStreamUpdatesTestCase(unittest.HomeserverTestCase):
+    def create_test_resource(self) -> JsonResource:
+        resource = JsonResource(self.hs)
+        ReplicationGetMultiStreamUpdates(self.hs).register(resource)
+        return resource
+
+    def test_get_updates(self) -> None:
+        """Updates for several ranges are returned in one response, in the order
+        they were requested.
+        """
+        typing = self.hs.get_typing_handler()
+        assert isinstance(typing, TypingWriterHandler)
+
+        for i in range(3):
+            typing._push_update(
+                member=RoomMember("!room%d:test" % (i,), "@user:test"), typing=True
+            )
+        token = typing.get_current_token()
+
+        channel = self.make_request(
+            "POST",
+            f"{REPLICATION_PREFIX}/{ReplicationGetMultiStreamUpdates.NAME}/",
+            content={
+                "requests": [
+                    {"stream_name": "typing", "from_token": 0, "upto_token": token},
+                    {"stream_name": "typing", "from_token": 2, "upto_token": token},
+                ],
+                "limit": 2,
+            },
+        )
+        self.assertEqual(channel.code, 200, channel.json_body)
+
+        first, second = channel.json_body["results"]
+        self.assertEqual(len(first["updates"]), 2)
+        self.assertTrue(first["limited"])
+        self.assertEqual(
+            second,
+            {
+                "updates": [[3, ["!room2:test", ["@user:test"]]]],
+                "upto_token": token,
+                "limited": False,
+            },
+        )
+
+    def test_unknown_stream(self) -> None:
+        channel = self.make_request(
+            "POST",
+            f"{REPLICATION_PREFIX}/{ReplicationGetMultiStreamUpdates.NAME}/",
+            content={
+                "requests": [
+                    {"stream_name": "unknown", "from_token": 0, "upto_token": 1}
+                ],
+                "limit": 100,
+            },
+        )
+        self.assertEqual(channel.code, 400, channel.json_body)
+
+
+class HttpStreamUpdatesFetcherTestCase(unittest.HomeserverTestCase):
+    def test_requests_batched(self) -> None:
+        """Updates requested from a writer at the same time are fetched in one
+        request.
+        """
+        fetcher = HttpStreamUpdatesFetcher(self.hs)
+        client = AsyncMock(
+            return_value={
+                "results": [
+                    {"updates": [[1, ["a"]]], "upto_token": 1, "limited": False},
+                    {"updates": [], "upto_token": 5, "limited": False},
+                ]
+            }
+        )
+        fetcher._client = client
+
+        d = defer.gatherResults(
+            [
+                defer.ensureDeferred(
+                    fetcher.get_updates("master", stream_name, 0, upto, 100)
+                )
+                for stream_name, upto in (("typing", 1), ("presence", 5))
+            ]
+        )
+        self.pump()
+
+        self.assertEqual(
+            self.successResultOf(d),
+            [([[1, ["a"]]], 1, False), ([], 5, False)],
+        )
+        client.assert_called_once_with(
+            instance_name="master",
+            requests=[("typing", 0, 1), ("presence", 0, 5)],
+            limit=100,
+        )
@@ -13,6 +13,7 @@
 # limitations under the License.
 
 from typing import Any, List, Optional
+from unittest.mock import patch
 
 from parameterized import parameterized
 
@@ -113,6 +114,12 @@ class EventsStreamTestCase(BaseStreamTestCase):
     @parameterized.expand(
         [(_STREAM_UPDATE_TARGET_ROW_COUNT, False), (_MAX_STATE_UPDATES_PER_ROOM, True)]
     )
+    # Catch up in small pages, so that `state1` isn't in the same page as the
+    # huge state change and so gets its own state row.
+    @patch(
+        "synapse.replication.tcp.handler.STREAM_CATCH_UP_TARGET_ROW_COUNT",
+        _STREAM_UPDATE_TARGET_ROW_COUNT,
+    )
     def test_update_function_huge_state_change(
         self, num_state_changes: int, collapse_state_changes: bool
     ) -> None:
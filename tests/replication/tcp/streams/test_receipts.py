@@ -14,11 +14,12 @@
 
 # type: ignore
 
-from unittest.mock import Mock
+from unittest.mock import Mock, patch
 
 from synapse.replication.tcp.streams._base import ReceiptsStream
 
 from tests.replication._base import BaseStreamTestCase
+from tests.unittest import override_config
 
 USER_ID = "@feeling:blue"
 
@@ -92,3 +93,43 @@ class ReceiptsStreamTestCase(BaseStreamTestCase):
         self.assertEqual(USER_ID, row.user_id)
         self.assertEqual("$event2:foo", row.event_id)
         self.assertEqual({"a": 2}, row.data)
+
+    @override_config({"batch_replication_rows": True})
+    def test_batched_receipts(self):
+        """Receipts are replicated in RDATA_BATCH commands when rows are batched."""
+        self.reconnect()
+
+        store = self.hs.get_datastores().main
+        command_handler = self.client.command_handler
+        with patch.object(
+            command_handler, "on_RDATA_BATCH", wraps=command_handler.on_RDATA_BATCH
+        ) as on_rdata_batch, patch.object(
+            command_handler, "on_RDATA", wraps=command_handler.on_RDATA
+        ) as on_rdata:
+            for i in range(2):
+                self.get_success(
+                    store.insert_receipt(
+                        "!room%d:blue" % (i,),
+                        "m.read",
+                        USER_ID,
+                        ["$event%d:blue" % (i,)],
+                        thread_id=None,
+                        data={"a": i},
+                    )
+                )
+            self.replicate()
+
+        self.assertTrue(on_rdata_batch.called)
+        on_rdata.assert_not_called()
+
+        # the rows are handled as they would be if sent in RDATA commands
+        self.assertEqual(self.test_handler.on_rdata.call_count, 2)
+        tokens = []
+        for i, call in enumerate(self.test_handler.on_rdata.call_args_list):
+            stream_name, _, token, rdata_rows = call[0]
+            self.assertEqual(stream_name, "receipts")
+            self.assertEqual(1, len(rdata_rows))
+            self.assertEqual("!room%d:blue" % (i,), rdata_rows[0].room_id)
+            self.assertEqual({"a": i}, rdata_rows[0].data)
+            tokens.append(token)
+        self.assertEqual(tokens, sorted(tokens))
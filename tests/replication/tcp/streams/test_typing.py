@@ -71,11 +71,12 @@ class TypingStreamTestCase(BaseStreamTestCase):
 
         # We should now see an attempt to connect to the master
         request = self.handle_http_replication_attempt()
-        self.assert_request_is_get_repl_stream_updates(request, "typing")
+        stream_request = self.assert_request_is_get_repl_stream_updates(
+            request, "typing"
+        )
 
         # The from token should be the token from the last RDATA we got.
-        assert request.args is not None
-        self.assertEqual(int(request.args[b"from_token"][0]), token)
+        self.assertEqual(stream_request["from_token"], token)
 
         self.mock_handler.on_rdata.assert_called_once()
         stream_name, _, token, rdata_rows = self.mock_handler.on_rdata.call_args[0]
@@ -12,19 +12,60 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import gc
+from typing import Tuple
+from unittest.mock import AsyncMock, Mock
+
 from twisted.internet import defer
 
-from synapse.replication.tcp.commands import PositionCommand
+from synapse.replication.tcp.commands import PositionCommand, stream_channel_name
+from synapse.replication.tcp.streams import STREAMS_MAP
 
+from tests import unittest
 from tests.replication._base import BaseMultiWorkerStreamTestCase
 
 
 class ChannelsTestCase(BaseMultiWorkerStreamTestCase):
     def test_subscribed_to_enough_redis_channels(self) -> None:
-        # The default main process is subscribed to the USER_IP channel.
+        # The default main process is subscribed to the USER_IP channel, and the
+        # channels of all the streams.
         self.assertCountEqual(
             self.hs.get_replication_command_handler()._channels_to_subscribe_to,
-            ["USER_IP"],
+            ["USER_IP"] + [stream_channel_name(name) for name in STREAMS_MAP],
+        )
+
+    def test_worker_subscribed_to_configured_streams(self) -> None:
+        worker1 = self.make_worker_hs(
+            "synapse.app.generic_worker",
+            extra_config={
+                "worker_name": "worker1",
+                "worker_replication_streams": ["caches", "events"],
+                "redis": {"enabled": True},
+            },
+        )
+        self.assertCountEqual(
+            worker1.get_replication_command_handler()._channels_to_subscribe_to,
+            ["STREAM/caches", "STREAM/events"],
+        )
+
+        # Advance so the Redis subscription gets processed
+        self.pump(0.1)
+
+        # The main process and the worker are subscribed to the streams the
+        # worker asked for, but only the main process to the rest.
+        self.assertEqual(
+            len(self._redis_server._subscribers_by_channel[b"test/STREAM/events"]), 2
+        )
+        self.assertEqual(
+            len(self._redis_server._subscribers_by_channel[b"test/STREAM/typing"]), 1
+        )
+
+        # The worker doesn't wait for positions in the streams it isn't told
+        # about.
+        self.get_success(
+            worker1.get_replication_data_handler().wait_for_stream_position(
+                "master", "typing", 100
+            )
         )
 
     def test_background_worker_subscribed_to_user_ip(self) -> None:
@@ -202,3 +243,36 @@ class ChannelsTestCase(BaseMultiWorkerStreamTestCase):
         # Master should get told about `next_token2`, so the deferred should
         # resolve.
         self.assertTrue(d.called)
+
+
+class ProcessPositionTestCase(unittest.HomeserverTestCase):
+    def test_next_page_failure_handled(self) -> None:
+        """If handling a page of missed updates fails, a failure fetching the
+        next page isn't reported as unhandled.
+        """
+        handler = self.hs.get_replication_command_handler()
+
+        next_page: "defer.Deferred[Tuple[list, int, bool]]" = defer.Deferred()
+        stream = Mock()
+        stream.can_discard_position.return_value = False
+        stream.current_token.return_value = 0
+        stream.get_updates_since.side_effect = [
+            defer.succeed(([(1, ["row"])], 1, True)),
+            next_page,
+        ]
+        handler._streams["typing"] = stream
+        handler.on_rdata = AsyncMock(side_effect=Exception("on_rdata"))  # type: ignore[method-assign]
+
+        self.get_failure(
+            handler._process_position(
+                "typing", Mock(), PositionCommand("typing", "master", 5, 10)
+            ),
+            Exception,
+        )
+        self.assertEqual(stream.get_updates_since.call_count, 2)
+        stream.get_updates_since.side_effect = None
+
+        next_page.errback(Exception("next page"))
+        del next_page
+        gc.collect()
+        self.assertEqual(self.flushLoggedErrors(), [])
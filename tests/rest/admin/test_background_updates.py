@@ -128,7 +128,8 @@ class BackgroundUpdatesTestCase(unittest.HomeserverTestCase):
 
         # Background updates should be enabled, but none should be running.
         self.assertDictEqual(
-            channel.json_body, {"current_updates": {}, "enabled": True}
+            channel.json_body,
+            {"current_updates": {}, "concurrent_updates": {}, "enabled": True},
         )
 
     def test_status_bg_update(self) -> None:
@@ -160,8 +161,10 @@ class BackgroundUpdatesTestCase(unittest.HomeserverTestCase):
                         "total_item_count": (
                             self.updater.default_background_batch_size
                         ),
+                        "eta_ms": None,
                     }
                 },
+                "concurrent_updates": {},
                 "enabled": True,
             },
         )
@@ -215,8 +218,10 @@ class BackgroundUpdatesTestCase(unittest.HomeserverTestCase):
                         "total_item_count": (
                             self.updater.default_background_batch_size
                         ),
+                        "eta_ms": None,
                     }
                 },
+                "concurrent_updates": {},
                 "enabled": False,
             },
         )
@@ -244,8 +249,10 @@ class BackgroundUpdatesTestCase(unittest.HomeserverTestCase):
                         "total_item_count": (
                             self.updater.default_background_batch_size
                         ),
+                        "eta_ms": None,
                     }
                 },
+                "concurrent_updates": {},
                 "enabled": False,
             },
         )
@@ -281,8 +288,10 @@ class BackgroundUpdatesTestCase(unittest.HomeserverTestCase):
                         "average_items_per_ms": 0.05263157894736842,
                         "total_duration_ms": 2000.0,
                         "total_item_count": (110),
+                        "eta_ms": None,
                     }
                 },
+                "concurrent_updates": {},
                 "enabled": True,
             },
         )
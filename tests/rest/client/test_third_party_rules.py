@@ -106,11 +106,13 @@ class ThirdPartyRulesTestCase(unittest.FederatingHomeserverTestCase):
 
         # Have this homeserver auto-approve all event signature checking.
         async def approve_all_signature_checking(
-            _: RoomVersion, pdu: EventBase
+            room_version: RoomVersion,
+            pdu: EventBase,
+            record_failure_callback: Any = None,
         ) -> EventBase:
             return pdu
 
-        hs.get_federation_server()._check_sigs_and_hash = approve_all_signature_checking  # type: ignore[assignment]
+        hs.get_federation_server()._check_sigs_and_hash = approve_all_signature_checking  # type: ignore[method-assign]
 
         # Have this homeserver skip event auth checks. This is necessary due to
         # event auth checks ensuring that events were signed by the sender's homeserver.
@@ -13,7 +13,10 @@
 # limitations under the License.
 
 import itertools
+import pickle
 from typing import (
+    Any,
+    Callable,
     Collection,
     Dict,
     Iterable,
@@ -24,6 +27,7 @@ from typing import (
     Tuple,
     TypeVar,
 )
+from unittest.mock import patch
 
 import attr
 
@@ -33,7 +37,10 @@ from synapse.api.constants import EventTypes, JoinRules, Membership
 from synapse.api.room_versions import RoomVersions
 from synapse.event_auth import auth_types_for_event
 from synapse.events import EventBase, make_event_from_dict
+from synapse.state import v2
 from synapse.state.v2 import (
+    StateResCache,
+    StateResStats,
     _get_auth_chain_difference,
     lexicographical_topological_sort,
     resolve_events_with_store,
@@ -56,6 +63,8 @@ MEMBERSHIP_CONTENT_BAN = {"membership": Membership.BAN}
 
 ORIGIN_SERVER_TS = 0
 
+T = TypeVar("T")
+
 
 class FakeClock:
     def sleep(self, msec: float) -> "defer.Deferred[None]":
@@ -180,7 +189,21 @@ INITIAL_EVENTS = [
 INITIAL_EDGES = ["START", "IMZ", "IMC", "IMB", "IJR", "IPOWER", "IMA", "CREATE"]
 
 
+class PicklingProcessPool:
+    """A process pool which runs functions in this process, after checking that
+    they and their arguments could be sent to a worker process.
+    """
+
+    async def run(self, f: Callable[..., T], *args: Any) -> T:
+        f, args = pickle.loads(pickle.dumps((f, args)))
+        return f(*args)
+
+
 class StateTestCase(unittest.TestCase):
+    # Overridden by subclasses to test the different ways of running state res.
+    cache: Optional[StateResCache] = None
+    process_pool: Optional[PicklingProcessPool] = None
+
     def test_ban_vs_pl(self) -> None:
         events = [
             FakeEvent(
@@ -508,6 +531,8 @@ class StateTestCase(unittest.TestCase):
                     [state_at_event[n] for n in prev_events],
                     event_map=event_map,
                     state_res_store=TestStateResolutionStore(event_map),
+                    cache=self.cache,
+                    process_pool=self.process_pool,
                 )
 
                 state_before = self.successResultOf(defer.ensureDeferred(state_d))
@@ -558,6 +583,29 @@ class StateTestCase(unittest.TestCase):
         self.assertEqual(expected_state, end_state)
 
 
+class CachedStateTestCase(StateTestCase):
+    """Runs the state res tests with a cache shared between the resolutions."""
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.cache = StateResCache()
+
+
+class OffloadedStateTestCase(StateTestCase):
+    """Runs the state res tests with the sorting and auth checks run through a
+    process pool.
+    """
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.process_pool = PicklingProcessPool()
+
+        # Offload every resolution, however small.
+        patcher = patch.object(v2, "_MIN_EVENTS_TO_OFFLOAD", 0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+
 class LexicographicalTestCase(unittest.TestCase):
     def test_simple(self) -> None:
         graph: Dict[str, Set[str]] = {
@@ -678,6 +726,41 @@ class SimpleParamStateTestCase(unittest.TestCase):
 
         self.assert_dict(self.expected_combined_state, state)
 
+    def test_cache(self) -> None:
+        """Resolving the same state sets again should use the cached results of
+        the first resolution.
+        """
+        cache = StateResCache()
+        store = TestStateResolutionStore(self.event_map)
+
+        def resolve(stats: StateResStats) -> StateMap[str]:
+            state_d = resolve_events_with_store(
+                FakeClock(),
+                ROOM_ID,
+                RoomVersions.V2,
+                [self.state_at_bob, self.state_at_charlie],
+                event_map=None,
+                state_res_store=store,
+                cache=cache,
+                stats=stats,
+            )
+            return self.successResultOf(defer.ensureDeferred(state_d))
+
+        with patch.object(
+            store,
+            "get_auth_chain_difference",
+            wraps=store.get_auth_chain_difference,
+        ) as get_auth_chain_difference:
+            first_stats = StateResStats()
+            self.assert_dict(self.expected_combined_state, resolve(first_stats))
+            self.assertEqual(first_stats.memoised_time, 0)
+
+            second_stats = StateResStats()
+            self.assert_dict(self.expected_combined_state, resolve(second_stats))
+            self.assertGreater(second_stats.memoised_time, 0)
+
+            get_auth_chain_difference.assert_called_once()
+
 
 class AuthChainDifferenceTestCase(unittest.TestCase):
     """We test that `_get_auth_chain_difference` correctly handles unpersisted
@@ -858,9 +941,6 @@ class AuthChainDifferenceTestCase(unittest.TestCase):
         self.assertEqual(difference, {d.event_id, e.event_id})
 
 
-T = TypeVar("T")
-
-
 def pairwise(iterable: Iterable[T]) -> Iterable[Tuple[T, T]]:
     "s -> (s0,s1), (s1,s2), (s2, s3), ..."
     a, b = itertools.tee(iterable)
@@ -14,6 +14,7 @@
 from unittest.mock import Mock, call
 
 from synapse.storage.database import LoggingTransaction
+from synapse.storage.databases.main.cache import BULK_INVALIDATION_MAX_KEYS
 
 from tests.replication._base import BaseMultiWorkerStreamTestCase
 from tests.unittest import HomeserverTestCase
@@ -115,3 +116,46 @@ class CacheInvalidationOverReplicationTestCase(BaseMultiWorkerStreamTestCase):
             [call(key_list) for key_list in keys_to_invalidate],
             any_order=True,
         )
+
+    def test_bulk_invalidation_of_single_keys_replicates(self) -> None:
+        """Single-argument keys are sent over replication in as few rows as
+        possible, and invalidated on the worker.
+        """
+        worker_invalidate = Mock()
+
+        worker = self.make_worker_hs("synapse.app.generic_worker")
+        worker_ds = worker.get_datastores().main
+        worker_ds.get_users_in_room.invalidate = worker_invalidate
+
+        keys_to_invalidate = [
+            ("!room%d:test" % (i,),) for i in range(BULK_INVALIDATION_MAX_KEYS + 1)
+        ]
+
+        def test_txn(txn: LoggingTransaction) -> None:
+            self.store._invalidate_cache_and_stream_bulk(
+                txn,
+                cache_func=self.store.get_users_in_room,
+                key_tuples=keys_to_invalidate,
+            )
+
+        assert self.store._cache_id_gen is not None
+        initial_token = self.store._cache_id_gen.get_current_token()
+        self.get_success(
+            self.database_pool.runInteraction(
+                "test_invalidate_cache_and_stream_bulk", test_txn
+            )
+        )
+        second_token = self.store._cache_id_gen.get_current_token()
+
+        self.assertEqual(second_token, initial_token + 2)
+
+        self.get_success(
+            worker.get_replication_data_handler().wait_for_stream_position(
+                "master", "caches", second_token
+            )
+        )
+
+        worker_invalidate.assert_has_calls(
+            [call(key_list) for key_list in keys_to_invalidate],
+            any_order=True,
+        )
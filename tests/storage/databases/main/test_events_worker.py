@@ -12,6 +12,7 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 import json
+import os
 from contextlib import contextmanager
 from typing import Generator, List, Tuple
 from unittest import mock
@@ -26,11 +27,9 @@ from synapse.logging.context import LoggingContext
 from synapse.rest import admin
 from synapse.rest.client import login, room
 from synapse.server import HomeServer
-from synapse.storage.databases.main.events_worker import (
-    EVENT_QUEUE_THREADS,
-    EventsWorkerStore,
-)
+from synapse.storage.databases.main.events_worker import EventsWorkerStore
 from synapse.storage.types import Connection
+from synapse.types import JsonDict
 from synapse.util import Clock
 from synapse.util.async_helpers import yieldable_gather_results
 
@@ -288,6 +287,338 @@ class EventCacheTestCase(unittest.HomeserverTestCase):
             self.assertEqual(ctx.get_resource_usage().evt_db_fetch_count, 1)
 
 
+class EventFetchBatchingTestCase(unittest.HomeserverTestCase):
+    """Test that concurrent requests for events are fetched together."""
+
+    servlets = [
+        admin.register_servlets,
+        room.register_servlets,
+        login.register_servlets,
+    ]
+
+    def prepare(self, reactor: MemoryReactor, clock: Clock, hs: HomeServer) -> None:
+        self.store: EventsWorkerStore = hs.get_datastores().main
+
+        self.user = self.register_user("user", "pass")
+        self.token = self.login(self.user, "pass")
+
+        self.room = self.helper.create_room_as(self.user, tok=self.token)
+
+        self.event_ids = [
+            self.helper.send(self.room, tok=self.token)["event_id"] for _ in range(5)
+        ]
+
+        self.store._get_event_cache.clear()
+        self.store._event_ref.clear()
+
+    def test_concurrent_requests_batched(self) -> None:
+        with mock.patch.object(
+            self.store, "_fetch_event_list", wraps=self.store._fetch_event_list
+        ) as fetch_event_list:
+            # Kick off a fetch for each event without pumping the reactor.
+            event_deferreds = [
+                ensureDeferred(self.store.get_event(event_id))
+                for event_id in self.event_ids
+            ]
+
+            self.assertEqual(
+                self.store._event_fetch_ongoing, self.store._event_fetch_max_threads
+            )
+
+            self.pump()
+            for event_id, event_deferred in zip(self.event_ids, event_deferreds):
+                self.assertEqual(self.get_success(event_deferred).event_id, event_id)
+
+            # All of the requests were served by a single fetch.
+            fetch_event_list.assert_called_once()
+            self.assertEqual(len(fetch_event_list.call_args[0][1]), 5)
+
+        self.assertEqual(self.store._event_fetch_ongoing, 0)
+
+
+class EventDiskCacheTestCase(unittest.HomeserverTestCase):
+    """Test the on-disk tier of the event cache."""
+
+    servlets = [
+        admin.register_servlets,
+        room.register_servlets,
+        login.register_servlets,
+    ]
+
+    def default_config(self) -> JsonDict:
+        config = super().default_config()
+
+        directory = self.mktemp()
+        os.mkdir(directory)
+        config.setdefault("caches", {})["event_disk_cache"] = {
+            "path": os.path.join(directory, "events.db"),
+        }
+        return config
+
+    def prepare(self, reactor: MemoryReactor, clock: Clock, hs: HomeServer) -> None:
+        self.store: EventsWorkerStore = hs.get_datastores().main
+
+        self.user = self.register_user("user", "pass")
+        self.token = self.login(self.user, "pass")
+
+        self.room = self.helper.create_room_as(self.user, tok=self.token)
+
+        res = self.helper.send(self.room, body="hello", tok=self.token)
+        self.event_id = res["event_id"]
+
+        # Reset the in-memory caches so the tests start with them empty
+        self.store._get_event_cache.clear()
+        self.store._event_ref.clear()
+
+        disk_cache = self.store._event_disk_cache
+        assert disk_cache is not None
+        self.disk_cache = disk_cache
+
+    def _redact_event(self) -> None:
+        channel = self.make_request(
+            "POST",
+            f"/_matrix/client/r0/rooms/{self.room}/redact/{self.event_id}",
+            {},
+            access_token=self.token,
+        )
+        self.assertEqual(channel.code, 200, channel.json_body)
+
+    def test_populated_from_db(self) -> None:
+        """Events pulled from the DB are written to the disk cache, and read from
+        it once they fall out of the in-memory cache."""
+        event = self.get_success(self.store.get_event(self.event_id))
+        self.assertIn(self.event_id, self.disk_cache.get_many([self.event_id]))
+        del event
+
+        self.store._get_event_cache.clear()
+        self.store._event_ref.clear()
+
+        hits = self.disk_cache._metrics.hits
+        event = self.get_success(self.store.get_event(self.event_id))
+        self.assertEqual(event.content, {"body": "hello", "msgtype": "m.text"})
+        self.assertEqual(self.disk_cache._metrics.hits, hits + 1)
+
+    def test_redaction(self) -> None:
+        """Redactions are honoured for events in the disk cache, and redacted
+        events are removed from it."""
+        self.get_success(self.store.get_event(self.event_id))
+        self.assertIn(self.event_id, self.disk_cache.get_many([self.event_id]))
+
+        self._redact_event()
+
+        # Wait for the background invalidation to run.
+        self.reactor.advance(10)
+        self.assertEqual(self.disk_cache.get_many([self.event_id]), {})
+
+        self.store._get_event_cache.clear()
+        self.store._event_ref.clear()
+
+        event = self.get_success(self.store.get_event(self.event_id))
+        self.assertEqual(event.content, {})
+        self.assertEqual(self.disk_cache.get_many([self.event_id]), {})
+
+    def test_stale_entry_is_not_trusted(self) -> None:
+        """The mutable parts of the event rows are always read from the DB, even
+        if we missed an invalidation of the disk cache (e.g. while restarting)."""
+        self.get_success(self.store.get_event(self.event_id))
+
+        self._redact_event()
+
+        # Pretend we never processed the invalidation
+        self.store._event_disk_cache_pending_invalidations.clear()
+        self.store._get_event_cache.clear()
+        self.store._event_ref.clear()
+
+        event = self.get_success(self.store.get_event(self.event_id))
+        self.assertEqual(event.content, {})
+
+    def test_purge(self) -> None:
+        """Purging a room removes its events from the disk cache."""
+        self.get_success(self.store.get_event(self.event_id))
+        self.assertIn(self.event_id, self.disk_cache.get_many([self.event_id]))
+
+        self.get_success(
+            self.hs.get_storage_controllers().purge_events.purge_room(self.room)
+        )
+        self.assertEqual(self.disk_cache.get_many([self.event_id]), {})
+        self.assertEqual(len(self.disk_cache), 0)
+
+
+class ExternalEventCacheTestCase(unittest.HomeserverTestCase):
+    """Test the event cache backed by a cache shared between processes on the
+    same host."""
+
+    servlets = [
+        admin.register_servlets,
+        room.register_servlets,
+        login.register_servlets,
+    ]
+
+    def default_config(self) -> JsonDict:
+        config = super().default_config()
+
+        directory = self.mktemp()
+        os.mkdir(directory)
+        config.setdefault("caches", {}).update(
+            {
+                "host_cache": {"path": os.path.join(directory, "host_cache.db")},
+                "external_event_cache": True,
+            }
+        )
+        return config
+
+    def prepare(self, reactor: MemoryReactor, clock: Clock, hs: HomeServer) -> None:
+        self.store: EventsWorkerStore = hs.get_datastores().main
+
+        self.user = self.register_user("user", "pass")
+        self.token = self.login(self.user, "pass")
+
+        self.room = self.helper.create_room_as(self.user, tok=self.token)
+
+        res = self.helper.send(self.room, body="hello", tok=self.token)
+        self.event_id = res["event_id"]
+
+    def _clear_local_caches(self) -> None:
+        self.store._get_event_cache.clear()
+        self.store._event_ref.clear()
+
+    def test_host_cache_does_not_enable_redis_caches(self) -> None:
+        """Only configuring the host cache doesn't enable the caches which are
+        only used with Redis."""
+        external_cache = self.hs.get_external_cache()
+        self.assertFalse(external_cache.is_enabled())
+        self.assertTrue(external_cache.is_host_cache_enabled())
+
+    def test_shared_cache(self) -> None:
+        """Events are read from the shared cache rather than the DB once they
+        fall out of the in-memory cache."""
+        # Let any invalidations from persisting the event be processed.
+        self.reactor.advance(2)
+
+        self._clear_local_caches()
+        self.get_success(self.store.get_event(self.event_id))
+        self._clear_local_caches()
+
+        with mock.patch.object(
+            self.store, "_enqueue_events", wraps=self.store._enqueue_events
+        ) as enqueue_events:
+            event = self.get_success(self.store.get_event(self.event_id))
+            enqueue_events.assert_not_called()
+
+        self.assertEqual(event.event_id, self.event_id)
+        self.assertEqual(event.content, {"body": "hello", "msgtype": "m.text"})
+        self.assertIsNotNone(event.internal_metadata.stream_ordering)
+
+    def test_shared_cache_bulk_lookup(self) -> None:
+        """Events missing from the in-memory cache are looked up in the shared
+        cache together."""
+        event_ids = [self.event_id]
+        for body in ("one", "two"):
+            res = self.helper.send(self.room, body=body, tok=self.token)
+            event_ids.append(res["event_id"])
+        self.reactor.advance(2)
+
+        self._clear_local_caches()
+        self.get_success(self.store.get_events(event_ids))
+        self._clear_local_caches()
+
+        external_cache = self.hs.get_external_cache()
+        with mock.patch.object(
+            external_cache, "get_many", wraps=external_cache.get_many
+        ) as get_many, mock.patch.object(
+            self.store, "_enqueue_events", wraps=self.store._enqueue_events
+        ) as enqueue_events:
+            events = self.get_success(self.store.get_events(event_ids))
+            enqueue_events.assert_not_called()
+
+        get_many.assert_called_once()
+        self.assertCountEqual(get_many.call_args[0][1], event_ids)
+        self.assertEqual(events.keys(), set(event_ids))
+
+    def test_local_invalidation(self) -> None:
+        """Invalidations received over replication are honoured for the shared
+        cache, both before and after they have been applied to it."""
+        self.reactor.advance(2)
+
+        self._clear_local_caches()
+        self.get_success(self.store.get_event(self.event_id))
+
+        self.reactor.advance(0.1)
+        self.store._invalidate_local_get_event_cache(self.event_id)
+        self._clear_local_caches()
+
+        # The invalidation hasn't been flushed to the shared cache yet, but we
+        # should still ignore the entry.
+        self.assertIsNone(
+            self.get_success(self.store._get_event_cache.get_external((self.event_id,)))
+        )
+
+        # Once flushed, the entry should be gone from the shared cache.
+        self.reactor.advance(2)
+        external_cache = self.hs.get_external_cache()
+        self.assertIsNone(
+            self.get_success(external_cache.get("getEvent", self.event_id))
+        )
+
+    def test_mutable_fields_read_from_db(self) -> None:
+        """The parts of events which can change are read from the DB rather than
+        the shared cache."""
+        self.reactor.advance(2)
+
+        self._clear_local_caches()
+        self.get_success(self.store.get_event(self.event_id))
+        self._clear_local_caches()
+
+        external_cache = self.hs.get_external_cache()
+        value = self.get_success(external_cache.get("getEvent", self.event_id))
+        self.assertNotIn("rejected_reason", value)
+        self.assertNotIn("stream_ordering", value)
+        self.assertNotIn("outlier", value)
+
+        # Change the event behind the cache's back.
+        self.get_success(
+            self.store.db_pool.simple_insert(
+                "rejections",
+                {
+                    "event_id": self.event_id,
+                    "reason": "because",
+                    "last_check": self.clock.time_msec(),
+                },
+            )
+        )
+
+        entry = self.get_success(
+            self.store._get_event_cache.get_external((self.event_id,))
+        )
+        assert entry is not None
+        self.assertEqual(entry.event.rejected_reason, "because")
+        self.assertIsNotNone(entry.event.internal_metadata.stream_ordering)
+
+    def test_purge(self) -> None:
+        """Events which have been purged are not returned from the shared cache,
+        even if they are still in it."""
+        self.reactor.advance(2)
+
+        self._clear_local_caches()
+        self.get_success(self.store.get_event(self.event_id))
+
+        self.get_success(
+            self.hs.get_storage_controllers().purge_events.purge_room(self.room)
+        )
+        self._clear_local_caches()
+
+        external_cache = self.hs.get_external_cache()
+        self.assertIsNotNone(
+            self.get_success(external_cache.get("getEvent", self.event_id))
+        )
+        self.assertIsNone(
+            self.get_success(self.store._get_event_cache.get_external((self.event_id,)))
+        )
+        self.assertIsNone(
+            self.get_success(self.store.get_event(self.event_id, allow_none=True))
+        )
+
+
 class DatabaseOutageTestCase(unittest.HomeserverTestCase):
     """Test event fetching during a database outage."""
 
@@ -402,7 +733,9 @@ class DatabaseOutageTestCase(unittest.HomeserverTestCase):
                 event_deferreds.append(ensureDeferred(self.store.get_event(event_id)))
 
             # We should have maxed out on event fetcher threads
-            self.assertEqual(self.store._event_fetch_ongoing, EVENT_QUEUE_THREADS)
+            self.assertEqual(
+                self.store._event_fetch_ongoing, self.store._event_fetch_max_threads
+            )
 
             # All the event fetchers will fail
             self.pump()
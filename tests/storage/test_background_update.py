@@ -12,8 +12,9 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 import logging
-from typing import List, Tuple, cast
-from unittest.mock import AsyncMock, Mock
+from decimal import Decimal
+from typing import Callable, List, Tuple, TypeVar, cast
+from unittest.mock import AsyncMock, Mock, patch
 
 import yaml
 
@@ -22,6 +23,7 @@ from twisted.test.proto_helpers import MemoryReactor
 
 from synapse.server import HomeServer
 from synapse.storage.background_updates import (
+    BackgroundUpdatePerformance,
     BackgroundUpdater,
     ForeignKeyConstraint,
     NotNullConstraint,
@@ -35,6 +37,8 @@ from synapse.util import Clock
 from tests import unittest
 from tests.unittest import override_config
 
+R = TypeVar("R")
+
 
 class BackgroundUpdateTestCase(unittest.HomeserverTestCase):
     def prepare(self, reactor: MemoryReactor, clock: Clock, hs: HomeServer) -> None:
@@ -353,6 +357,190 @@ class BackgroundUpdateTestCase(unittest.HomeserverTestCase):
 
         self.assertTrue(any(needle in log for log in logs.output), logs.output)
 
+    @override_config(
+        yaml.safe_load(
+            """
+            background_updates:
+                sleep_enabled: false
+                max_concurrent_updates: 2
+            """
+        )
+    )
+    def test_concurrent_updates(self) -> None:
+        """Independent updates are run at the same time, but updates which depend
+        on a pending update, or aren't independent, aren't.
+        """
+        other_update_handler = Mock()
+        ordered_update_handler = Mock()
+        dependent_update_handler = Mock()
+        self.updates.register_background_update_handler(
+            "test_other_update", other_update_handler, independent=True
+        )
+        self.updates.register_background_update_handler(
+            "test_ordered_update", ordered_update_handler
+        )
+        self.updates.register_background_update_handler(
+            "test_dependent_update", dependent_update_handler, independent=True
+        )
+
+        async def update(progress: JsonDict, count: int) -> int:
+            await self.clock.sleep(0.1)
+            return count
+
+        for handler in (self.update_handler, other_update_handler):
+            handler.side_effect = update
+
+        self.get_success(
+            self.store.db_pool.simple_insert_many(
+                "background_updates",
+                keys=("update_name", "progress_json", "depends_on", "ordering"),
+                values=[
+                    ("test_update", "{}", None, 1),
+                    ("test_ordered_update", "{}", None, 2),
+                    ("test_other_update", "{}", None, 3),
+                    ("test_dependent_update", "{}", "test_update", 3),
+                ],
+                desc="insert_background_updates",
+            )
+        )
+
+        self.updates.start_doing_background_updates()
+        self.reactor.pump([0.1] * 5)
+
+        self.update_handler.assert_called()
+        other_update_handler.assert_called()
+        ordered_update_handler.assert_not_called()
+        dependent_update_handler.assert_not_called()
+
+        self.assertEqual(len(self.updates.get_concurrent_updates()), 1)
+        self.assertFalse(
+            self.get_success(self.updates.has_completed_background_updates())
+        )
+
+    def test_end_background_update(self) -> None:
+        """An update is still tracked as running until its row is deleted, so it
+        can't be picked to run again while it is being ended.
+        """
+        running_while_deleting = []
+        simple_delete_one = self.store.db_pool.simple_delete_one
+
+        async def delete_one(*args: object, **kwargs: object) -> None:
+            running_while_deleting.append(self.updates._current_background_update)
+            await simple_delete_one(*args, **kwargs)  # type: ignore[arg-type]
+
+        async def update(progress: JsonDict, count: int) -> int:
+            await self.updates._end_background_update("test_update")
+            return count
+
+        self.update_handler.side_effect = update
+        self.get_success(
+            self.store.db_pool.simple_insert(
+                "background_updates",
+                values={"update_name": "test_update", "progress_json": "{}"},
+            )
+        )
+
+        with patch.object(self.store.db_pool, "simple_delete_one", delete_one):
+            self.get_success(self.updates.do_next_background_update(False))
+
+        self.assertEqual(running_while_deleting, ["test_update"])
+        self.assertIsNone(self.updates._current_background_update)
+        self.assertTrue(
+            self.get_success(
+                self.updates.has_completed_background_update("test_update")
+            )
+        )
+
+    def test_estimate_time_remaining(self) -> None:
+        """The time left is estimated from the update's recent rate and the
+        number of items it has left.
+        """
+
+        async def estimate_remaining_items(progress: JsonDict) -> int:
+            return progress["remaining"]
+
+        self.updates.register_background_update_handler(
+            "test_update", self.update_handler, estimate_remaining_items
+        )
+        self.get_success(
+            self.store.db_pool.simple_insert(
+                "background_updates",
+                values={
+                    "update_name": "test_update",
+                    "progress_json": '{"remaining": 50}',
+                },
+            )
+        )
+
+        # The update hasn't run yet, so we don't know its rate.
+        self.assertIsNone(
+            self.get_success(self.updates.estimate_time_remaining_ms("test_update"))
+        )
+
+        perf = BackgroundUpdatePerformance("test_update")
+        perf.update(100, 1000)
+        self.updates._background_update_performance["test_update"] = perf
+
+        # 50 items at 0.1 items/ms, plus sleeping between the five 100ms batches.
+        self.assertEqual(
+            self.get_success(self.updates.estimate_time_remaining_ms("test_update")),
+            500 + 5 * self.updates.sleep_duration_ms,
+        )
+
+    @override_config(
+        yaml.safe_load(
+            """
+            background_updates:
+                adapt_to_database_load: true
+            """
+        )
+    )
+    def test_database_load_factor(self) -> None:
+        """Batches are shortened while queries are slower than usual."""
+        self.assertEqual(
+            self.get_success(self.updates._get_database_load_factor()), 1.0
+        )
+
+        # Pretend queries have recently been taking much longer.
+        self.updates._min_probe_latency_ms = 0
+        self.updates._avg_probe_latency_ms = 100
+        self.assertEqual(
+            self.get_success(self.updates._get_database_load_factor()), 0.1
+        )
+
+        self.updates._avg_probe_latency_ms = 1
+        self.assertAlmostEqual(
+            self.get_success(self.updates._get_database_load_factor()), 1 / 1.9
+        )
+
+    @override_config(
+        yaml.safe_load(
+            """
+            background_updates:
+                adapt_to_database_load: true
+                max_replication_lag_ms: 10000
+            """
+        )
+    )
+    def test_database_load_factor_replication_lag(self) -> None:
+        """Batches are shortened while the replicas are lagging, even when
+        Postgres gives us the lag as a `Decimal`.
+        """
+        txn = Mock()
+        txn.fetchone.return_value = (Decimal("30.0"),)
+
+        async def run_interaction(
+            desc: str, func: Callable[..., R], *args: object
+        ) -> R:
+            return func(txn, *args)
+
+        self.updates._check_replication_lag = True
+        with patch.object(self.updates.db_pool, "runInteraction", run_interaction):
+            factor = self.get_success(self.updates._get_database_load_factor())
+
+        self.assertIsInstance(factor, float)
+        self.assertAlmostEqual(factor, 1 / 3)
+
 
 class BackgroundUpdateControllerTestCase(unittest.HomeserverTestCase):
     def prepare(self, reactor: MemoryReactor, clock: Clock, hs: HomeServer) -> None:
@@ -12,7 +12,7 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
-from typing import List, Optional, Tuple, cast
+from typing import AbstractSet, List, Optional, Tuple, cast
 
 from twisted.test.proto_helpers import MemoryReactor
 
@@ -109,6 +109,38 @@ class RoomMemberStoreTestCase(unittest.HomeserverTestCase):
         # It now knows about Charlie's server.
         self.assertEqual(self.store._known_servers_count, 2)
 
+    def test_joined_hosts_shared_between_state_groups(self) -> None:
+        """
+        The set of joined hosts is reused for later state groups, until a host
+        joins or leaves the room.
+        """
+        self.room = self.helper.create_room_as(self.u_alice, tok=self.t_alice)
+        hosts = self._get_current_hosts(self.room)
+        self.assertEqual(hosts, {"test"})
+
+        # Another user on our server joining doesn't change the hosts in the room.
+        self.inject_room_member(self.room, self.u_bob, Membership.JOIN)
+        self.assertIs(self._get_current_hosts(self.room), hosts)
+
+        # But a user on another server does.
+        self.inject_room_member(self.room, self.u_charlie.to_string(), Membership.JOIN)
+        hosts = self._get_current_hosts(self.room)
+        self.assertEqual(hosts, {"test", "elsewhere"})
+
+        # As does the last user on that server leaving.
+        self.inject_room_member(self.room, self.u_charlie.to_string(), Membership.LEAVE)
+        self.assertEqual(self._get_current_hosts(self.room), {"test"})
+
+    def _get_current_hosts(self, room_id: str) -> AbstractSet[str]:
+        latest_event_ids = self.get_success(
+            self.store.get_latest_event_ids_in_room(room_id)
+        )
+        return self.get_success(
+            self.hs.get_state_handler().get_hosts_in_room_at_events(
+                room_id, latest_event_ids
+            )
+        )
+
     def test__null_byte_in_display_name_properly_handled(self) -> None:
         room = self.helper.create_room_as(self.u_alice, tok=self.t_alice)
 
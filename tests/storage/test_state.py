@@ -26,8 +26,9 @@ from synapse.server import HomeServer
 from synapse.types import JsonDict, RoomID, StateMap, UserID
 from synapse.types.state import StateFilter
 from synapse.util import Clock
+from synapse.util.caches.state_map import CompactStateMap
 
-from tests.unittest import HomeserverTestCase
+from tests.unittest import HomeserverTestCase, override_config
 
 logger = logging.getLogger(__name__)
 
@@ -360,7 +361,7 @@ class StateStoreTestCase(HomeserverTestCase):
         # deliberately remove e2 (room name) from the _state_group_cache
 
         cache_entry = self.state_datastore._state_group_cache.get(group)
-        state_dict_ids = cache_entry.value
+        state_dict_ids = dict(cache_entry.value)
 
         self.assertEqual(cache_entry.full, True)
         self.assertEqual(cache_entry.known_absent, set())
@@ -383,7 +384,7 @@ class StateStoreTestCase(HomeserverTestCase):
         )
 
         cache_entry = self.state_datastore._state_group_cache.get(group)
-        state_dict_ids = cache_entry.value
+        state_dict_ids = dict(cache_entry.value)
 
         self.assertEqual(cache_entry.full, False)
         self.assertEqual(cache_entry.known_absent, set())
@@ -502,6 +503,58 @@ class StateStoreTestCase(HomeserverTestCase):
         self.assertEqual(is_all, True)
         self.assertDictEqual({(e5.type, e5.state_key): e5.event_id}, state_dict)
 
+    @override_config({"caches": {"compact_state_group_threshold": 1}})
+    def test_delta_group_prefilled_from_cached_prev_group(self) -> None:
+        """Storing a state group as a delta from a group whose state we have
+        cached in compact form should add the new group to the caches, sharing
+        the cached state.
+        """
+        room_id = self.room.to_string()
+        create_key = (EventTypes.Create, "")
+        alice_key = (EventTypes.Member, self.u_alice.to_string())
+        bob_key = (EventTypes.Member, self.u_bob.to_string())
+
+        prev_group = self.get_success(
+            self.state_datastore.store_state_group(
+                "$create",
+                room_id,
+                prev_group=None,
+                delta_ids=None,
+                current_state_ids={create_key: "$create", alice_key: "$alice"},
+            )
+        )
+        state_group = self.get_success(
+            self.state_datastore.store_state_group(
+                "$bob",
+                room_id,
+                prev_group=prev_group,
+                delta_ids={bob_key: "$bob"},
+                current_state_ids=None,
+            )
+        )
+
+        members_entry = self.state_datastore._state_group_members_cache.get(state_group)
+        self.assertTrue(members_entry.full)
+        self.assertIsInstance(members_entry.value, CompactStateMap)
+        self.assertEqual(
+            dict(members_entry.value), {alice_key: "$alice", bob_key: "$bob"}
+        )
+
+        non_members_entry = self.state_datastore._state_group_cache.get(state_group)
+        self.assertTrue(non_members_entry.full)
+        self.assertEqual(dict(non_members_entry.value), {create_key: "$create"})
+
+        # The cached state should match what's in the database.
+        self.state_datastore._state_group_members_cache.invalidate_all()
+        self.state_datastore._state_group_cache.invalidate_all()
+        state = self.get_success(
+            self.state_datastore._get_state_for_groups([state_group])
+        )
+        self.assertEqual(
+            state[state_group],
+            {create_key: "$create", alice_key: "$alice", bob_key: "$bob"},
+        )
+
     def test_batched_state_group_storing(self) -> None:
         creation_event = self.inject_state_event(
             self.room, self.u_alice, EventTypes.Create, "", {}
@@ -0,0 +1,111 @@
+# Copyright 2023 The Matrix.org Foundation C.I.C.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+from typing import List, Tuple
+
+from twisted.internet import defer
+from twisted.test.proto_helpers import MemoryReactor
+
+from synapse.notifier import coalesced_wakeups_counter
+from synapse.server import HomeServer
+from synapse.types import JsonDict, StreamKeyType, StreamToken
+from synapse.util import Clock
+
+from tests import unittest
+
+
+class NotifierCoalescingTestCase(unittest.HomeserverTestCase):
+    def default_config(self) -> JsonDict:
+        config = super().default_config()
+        config["notifier_coalescing_window"] = 100
+        return config
+
+    def prepare(self, reactor: MemoryReactor, clock: Clock, hs: HomeServer) -> None:
+        self.notifier = hs.get_notifier()
+        self.event_sources = hs.get_event_sources()
+
+    def test_wakeups_are_coalesced(self) -> None:
+        """A burst of notifications for a user should wake up their stream once,
+        at the end of the coalescing window.
+        """
+        user_id = "@user:test"
+        calls: List[Tuple[StreamToken, StreamToken]] = []
+
+        async def callback(before: StreamToken, after: StreamToken) -> bool:
+            calls.append((before, after))
+            return before != after
+
+        start_token = self.event_sources.get_current_token()
+        d = defer.ensureDeferred(
+            self.notifier.wait_for_events(
+                user_id, 10000, callback, room_ids=[], from_token=start_token
+            )
+        )
+
+        coalesced_before = coalesced_wakeups_counter.labels(
+            StreamKeyType.TYPING
+        )._value.get()
+
+        for typing_key in range(1, 4):
+            self.notifier.on_new_event(
+                StreamKeyType.TYPING, typing_key, users=[user_id]
+            )
+
+        # Nothing gets woken up until the end of the window.
+        self.reactor.advance(0.05)
+        self.assertEqual(calls, [])
+        self.assertNoResult(d)
+
+        self.reactor.advance(0.05)
+        self.assertTrue(self.successResultOf(d))
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(calls[0][0], start_token)
+        self.assertEqual(calls[0][1].typing_key, 3)
+
+        self.assertEqual(
+            coalesced_wakeups_counter.labels(StreamKeyType.TYPING)._value.get()
+            - coalesced_before,
+            2,
+        )
+
+    def test_notify_wakes_up_pending_stream(self) -> None:
+        """Notifying a user stream directly should also wake it up for anything
+        still waiting for the end of the coalescing window.
+        """
+        user_id = "@user:test"
+        calls: List[Tuple[StreamToken, StreamToken]] = []
+
+        async def callback(before: StreamToken, after: StreamToken) -> bool:
+            calls.append((before, after))
+            return before != after
+
+        start_token = self.event_sources.get_current_token()
+        d = defer.ensureDeferred(
+            self.notifier.wait_for_events(
+                user_id, 10000, callback, room_ids=[], from_token=start_token
+            )
+        )
+
+        self.notifier.on_new_event(StreamKeyType.TYPING, 1, users=[user_id])
+        self.notifier.user_to_user_stream[user_id].notify(
+            StreamKeyType.TO_DEVICE, 1, self.clock.time_msec()
+        )
+
+        self.assertTrue(self.successResultOf(d))
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(calls[0][1].typing_key, 1)
+        self.assertEqual(calls[0][1].to_device_key, 1)
+
+        # The end of the window has nothing left to do.
+        self.reactor.advance(0.1)
+        self.assertEqual(len(calls), 1)
@@ -14,8 +14,13 @@
 
 import re
 from http import HTTPStatus
-from typing import Awaitable, Callable, Dict, NoReturn, Optional, Tuple
+from typing import Awaitable, Callable, Dict, Iterator, NoReturn, Optional, Tuple
+from unittest.mock import Mock, patch
 
+from canonicaljson import encode_canonical_json
+from immutabledict import immutabledict
+
+from twisted.internet import defer
 from twisted.internet.defer import Deferred
 from twisted.web.resource import Resource
 
@@ -26,11 +31,14 @@ from synapse.http.server import (
     DirectServeJsonResource,
     JsonResource,
     OptionsResource,
+    _encode_json_bytes,
+    _iterencode_json,
+    _ThreadedByteProducer,
 )
 from synapse.http.site import SynapseRequest, SynapseSite
 from synapse.logging.context import make_deferred_yieldable
 from synapse.types import JsonDict
-from synapse.util import Clock
+from synapse.util import Clock, PreencodedJsonDict
 from synapse.util.cancellation import cancellable
 
 from tests import unittest
@@ -205,6 +213,156 @@ class JsonResourceTests(unittest.TestCase):
         self.assertEqual(channel.code, 200)
         self.assertNotIn("body", channel.result)
 
+    def test_large_response(self) -> None:
+        """Large responses are written out in full."""
+        response = {
+            "chunk": [
+                {"event_id": "$%d" % (i,), "body": "x" * 100} for i in range(10000)
+            ]
+        }
+
+        def _callback(
+            request: SynapseRequest, **kwargs: object
+        ) -> Tuple[int, JsonDict]:
+            return 200, response
+
+        res = JsonResource(self.homeserver)
+        res.register_paths(
+            "GET", [re.compile("^/_matrix/foo$")], _callback, "test_servlet"
+        )
+
+        channel = make_request(
+            self.reactor, FakeSite(res, self.reactor), b"GET", b"/_matrix/foo"
+        )
+
+        self.assertEqual(channel.code, 200)
+        self.assertEqual(channel.json_body, response)
+
+    def test_unencodable_response(self) -> None:
+        """If the response can't be encoded part way through, the connection is
+        dropped.
+        """
+
+        def _callback(
+            request: SynapseRequest, **kwargs: object
+        ) -> Tuple[int, JsonDict]:
+            return 200, {"chunk": [{"body": "x" * 2000}, object()]}
+
+        res = JsonResource(self.homeserver)
+        res.register_paths(
+            "GET", [re.compile("^/_matrix/foo$")], _callback, "test_servlet"
+        )
+
+        with patch.object(SynapseRequest, "loseConnection") as lose_connection:
+            channel = make_request(
+                self.reactor,
+                FakeSite(res, self.reactor),
+                b"GET",
+                b"/_matrix/foo",
+                await_result=False,
+            )
+            self.reactor.advance(0)
+
+        lose_connection.assert_called_once()
+        self.assertFalse(channel.is_finished())
+
+
+class ThreadedByteProducerTests(unittest.TestCase):
+    def test_waits_while_paused(self) -> None:
+        """No more chunks are produced while the request is paused."""
+        reactor, _ = get_clock()
+        chunk_size = _ThreadedByteProducer.min_chunk_size
+        produced = []
+
+        def produce() -> Iterator[bytes]:
+            for i in range(3):
+                produced.append(i)
+                yield b"x" * chunk_size
+
+        request = Mock(reactor=reactor)
+        producer = _ThreadedByteProducer(request, produce())
+        request.write.side_effect = lambda data: producer.pauseProducing()
+
+        d = defer.ensureDeferred(producer.run(None))
+        reactor.advance(0)
+        self.assertEqual(produced, [0])
+        request.write.assert_called_once_with(b"x" * chunk_size)
+
+        producer.resumeProducing()
+        reactor.advance(0)
+        self.assertEqual(produced, [0, 1])
+        request.finish.assert_not_called()
+
+        request.write.side_effect = None
+        producer.resumeProducing()
+        reactor.advance(0)
+        self.assertEqual(produced, [0, 1, 2])
+        request.finish.assert_called_once()
+        self.successResultOf(d)
+
+
+class IterencodeJsonTests(unittest.TestCase):
+    def test_matches_encoder(self) -> None:
+        """Encoding iteratively gives the same result as encoding in one go."""
+        objects = [
+            {},
+            [],
+            "\N{SNOWMAN}",
+            None,
+            {"b": [1, {"c": []}], "a": {}, "\N{SNOWMAN}": "\N{SNOWMAN}"},
+            [{"z": 1, "y": [2, 3]}, [], "s"],
+            immutabledict({"b": immutabledict({"d": 1, "c": 2}), "a": (1, 2)}),
+            {"rooms": {"join": {"!room:test": {"timeline": {"events": [{}]}}}}},
+            {1: "non-string keys are converted by the encoder"},
+            {"long list": [{"i": i} for i in range(120)]},
+        ]
+
+        for obj in objects:
+            self.assertEqual(
+                b"".join(_iterencode_json(obj, _encode_json_bytes)),
+                _encode_json_bytes(obj),
+            )
+            self.assertEqual(
+                b"".join(_iterencode_json(obj, encode_canonical_json, sort_keys=True)),
+                encode_canonical_json(obj),
+            )
+
+    def test_preencoded(self) -> None:
+        """The encoding of a `PreencodedJsonDict` is used if it is still valid."""
+        preencoded = PreencodedJsonDict({"a": {"b": 1}, "c": [2]})
+        # Replace the encoding, so that we can tell when it has been used.
+        preencoded._encoding = b'{"pre":"encoded"}'
+
+        added = preencoded.copy()
+        added["d"] = {"e": 3}
+
+        replaced = preencoded.copy()
+        replaced["a"] = {"b": 1}
+
+        removed = preencoded.copy()
+        del removed["c"]
+
+        for obj, expected in (
+            (preencoded, b'{"pre":"encoded"}'),
+            (added, b'{"pre":"encoded","d":{"e":3}}'),
+            (replaced, b'{"a":{"b":1},"c":[2]}'),
+            (removed, b'{"a":{"b":1}}'),
+            (
+                {"events": [1, added, added, 2]},
+                b'{"events":[1,{"pre":"encoded","d":{"e":3}},'
+                b'{"pre":"encoded","d":{"e":3}},2]}',
+            ),
+        ):
+            self.assertEqual(
+                b"".join(_iterencode_json(obj, _encode_json_bytes)), expected
+            )
+
+        # The encoding isn't used when the keys must be sorted.
+        self.assertEqual(
+            b"".join(_iterencode_json([added], encode_canonical_json, sort_keys=True)),
+            b'[{"a":{"b":1},"c":[2],"d":{"e":3}}]',
+        )
+
 
 class OptionsResourceTests(unittest.TestCase):
     def setUp(self) -> None:
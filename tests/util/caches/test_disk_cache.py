@@ -0,0 +1,113 @@
+# Copyright 2023 The Matrix.org Foundation C.I.C.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+
+from twisted.internet.testing import MemoryReactorClock
+
+from synapse.util import Clock
+from synapse.util.caches.disk_cache import _ACCESS_UPDATE_INTERVAL_MS, DiskCache
+
+from tests import unittest
+
+
+class DiskCacheTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        directory = self.mktemp()
+        os.mkdir(directory)
+        self.path = os.path.join(directory, "cache.db")
+        self.reactor = MemoryReactorClock()
+        self.clock = Clock(self.reactor)
+        self.cache = DiskCache("test_disk_cache", self.path, 10, self.clock)
+
+    def tearDown(self) -> None:
+        self.cache.close()
+
+    def test_get_set(self) -> None:
+        self.cache.set_many([("one", "1"), ("two", "2")])
+
+        self.assertEqual(len(self.cache), 2)
+        self.assertEqual(
+            self.cache.get_many(["one", "two", "three"]), {"one": "1", "two": "2"}
+        )
+        self.assertEqual(self.cache._metrics.hits, 2)
+        self.assertEqual(self.cache._metrics.misses, 1)
+
+    def test_invalidate(self) -> None:
+        self.cache.set_many([("one", "1"), ("two", "2")])
+
+        self.cache.invalidate("one")
+        self.assertEqual(self.cache.get_many(["one", "two"]), {"two": "2"})
+
+        self.cache.clear()
+        self.assertEqual(self.cache.get_many(["one", "two"]), {})
+        self.assertEqual(len(self.cache), 0)
+
+    def test_eviction(self) -> None:
+        """Least recently used entries are evicted when over the size limit."""
+        for i in range(10):
+            self.cache.set_many([(str(i), str(i))])
+            self.reactor.advance(1)
+
+        # Touch the first entry so that it is not the least recently used. We
+        # only record accesses every so often.
+        self.reactor.advance(_ACCESS_UPDATE_INTERVAL_MS / 1000)
+        self.assertEqual(self.cache.get_many(["0"]), {"0": "0"})
+        self.reactor.advance(1)
+
+        self.cache.set_many([("10", "10")])
+
+        self.assertLessEqual(len(self.cache), 10)
+        self.assertEqual(self.cache.get_many(["0"]), {"0": "0"})
+        self.assertEqual(self.cache.get_many(["1", "2"]), {})
+
+    def test_persistence(self) -> None:
+        """Entries survive reopening the cache."""
+        self.cache.set_many([("one", "1")])
+        self.cache.close()
+
+        self.cache = DiskCache("test_disk_cache", self.path, 10, self.clock)
+        self.assertEqual(len(self.cache), 1)
+        self.assertEqual(self.cache.get_many(["one"]), {"one": "1"})
+
+    def test_expiry(self) -> None:
+        self.cache.set_many([("one", "1")], expiry_ms=1000)
+        self.cache.set_many([("two", "2")])
+
+        self.reactor.advance(0.5)
+        self.assertEqual(self.cache.get_many(["one", "two"]), {"one": "1", "two": "2"})
+
+        self.reactor.advance(1)
+        self.assertEqual(self.cache.get_many(["one", "two"]), {"two": "2"})
+
+    def test_reads_only_write_access_times_occasionally(self) -> None:
+        """Reading an entry only updates its access time if that was a while ago."""
+        self.cache.set_many([("one", "1")])
+
+        def get_last_access() -> int:
+            (last_access,) = self.cache._conn.execute(
+                "SELECT last_access FROM disk_cache WHERE key = 'one'"
+            ).fetchone()
+            return last_access
+
+        set_at = get_last_access()
+
+        self.reactor.advance(1)
+        self.assertEqual(self.cache.get_many(["one"]), {"one": "1"})
+        self.assertEqual(get_last_access(), set_at)
+        self.assertFalse(self.cache._conn.in_transaction)
+
+        self.reactor.advance(_ACCESS_UPDATE_INTERVAL_MS / 1000)
+        self.assertEqual(self.cache.get_many(["one"]), {"one": "1"})
+        self.assertEqual(get_last_access(), self.clock.time_msec())
@@ -0,0 +1,164 @@
+# Copyright 2023 The Matrix.org Foundation C.I.C.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import tracemalloc
+from typing import Callable, Dict
+
+from synapse.types import StateKey
+from synapse.util.caches.state_map import (
+    MAX_DELTA_LAYERS,
+    CompactStateMap,
+    compact_state_map,
+    compact_state_map_from_delta,
+)
+
+from tests import unittest
+
+
+def _member_state(count: int) -> Dict[StateKey, str]:
+    return {
+        ("m.room.member", "@user%d:example.com" % (i,)): "$event%d" % (i,)
+        for i in range(count)
+    }
+
+
+class CompactStateMapTestCase(unittest.TestCase):
+    def test_lookups(self) -> None:
+        state = {
+            ("m.room.create", ""): "$create",
+            ("m.room.member", "@alice:test"): "$alice",
+            ("m.room.member", "@bob:test"): "$bob",
+            ("m.room.name", ""): "$name",
+        }
+        state_map = CompactStateMap(state)
+
+        self.assertEqual(len(state_map), 4)
+        self.assertEqual(dict(state_map), state)
+        self.assertEqual(dict(state_map.items()), state)
+        self.assertCountEqual(state_map.values(), state.values())
+
+        self.assertEqual(state_map[("m.room.member", "@bob:test")], "$bob")
+        self.assertEqual(state_map.get(("m.room.member", "@carol:test")), None)
+        self.assertNotIn(("m.room.topic", ""), state_map)
+        self.assertNotIn(("m.room.name", "x"), state_map)
+        self.assertEqual(state_map, state)
+
+    def test_empty(self) -> None:
+        state_map = CompactStateMap({})
+
+        self.assertEqual(len(state_map), 0)
+        self.assertEqual(dict(state_map), {})
+        self.assertNotIn(("m.room.create", ""), state_map)
+
+    def test_non_ascii(self) -> None:
+        state = {
+            ("m.room.member", "@alice:test"): "$alice",
+            ("m.room.member", "@\N{SNOWMAN}:test"): "$snowman",
+            ("m.room.member", "@zed:test"): "$z\N{SNOWMAN}",
+        }
+        state_map = CompactStateMap(state)
+
+        self.assertEqual(dict(state_map.items()), state)
+        for key, event_id in state.items():
+            self.assertEqual(state_map[key], event_id)
+
+    def test_delta(self) -> None:
+        parent = CompactStateMap(
+            {
+                ("m.room.create", ""): "$create",
+                ("m.room.member", "@alice:test"): "$alice",
+            }
+        )
+        state_map = compact_state_map_from_delta(
+            parent,
+            {
+                ("m.room.member", "@alice:test"): "$alice2",
+                ("m.room.member", "@bob:test"): "$bob",
+            },
+            min_size=1,
+        )
+        assert isinstance(state_map, CompactStateMap)
+        # The map keeps its parent's entries alive, including the replaced one.
+        self.assertEqual(state_map.retained_size(), 4)
+
+        expected = {
+            ("m.room.create", ""): "$create",
+            ("m.room.member", "@alice:test"): "$alice2",
+            ("m.room.member", "@bob:test"): "$bob",
+        }
+        self.assertEqual(len(state_map), 3)
+        self.assertEqual(dict(state_map.items()), expected)
+        self.assertCountEqual(state_map, expected.keys())
+        for key, event_id in expected.items():
+            self.assertEqual(state_map[key], event_id)
+
+        # The parent is unchanged.
+        self.assertEqual(parent[("m.room.member", "@alice:test")], "$alice")
+        self.assertEqual(len(parent), 2)
+
+    def test_delta_flattened(self) -> None:
+        """Deltas on deltas are flattened once there are too many layers."""
+        state_map = CompactStateMap({("m.room.create", ""): "$create"})
+        expected = dict(state_map)
+        for i in range(MAX_DELTA_LAYERS * 2 + 1):
+            delta = {("m.room.member", "@user%d:test" % (i,)): "$event%d" % (i,)}
+            expected.update(delta)
+            new_state_map = compact_state_map_from_delta(state_map, delta, min_size=1)
+            assert isinstance(new_state_map, CompactStateMap)
+            state_map = new_state_map
+
+        self.assertEqual(dict(state_map.items()), expected)
+        self.assertLessEqual(state_map._depth, MAX_DELTA_LAYERS)
+
+    def test_from_delta_on_dict(self) -> None:
+        state_map = compact_state_map_from_delta(
+            {("m.room.create", ""): "$create"}, {("m.room.name", ""): "$name"}, 1
+        )
+
+        self.assertIsInstance(state_map, CompactStateMap)
+        self.assertEqual(
+            dict(state_map.items()),
+            {("m.room.create", ""): "$create", ("m.room.name", ""): "$name"},
+        )
+
+    def test_small_maps_not_compacted(self) -> None:
+        """Maps smaller than the threshold are left as they are."""
+        state = _member_state(10)
+
+        self.assertIs(compact_state_map(state, 11), state)
+        self.assertIs(compact_state_map(state, 0), state)
+        self.assertIsInstance(compact_state_map(state, 10), CompactStateMap)
+
+        # Maps with the separator in them can't be compacted.
+        state[("m.room.member", "@bad\x00:test")] = "$bad"
+        self.assertIs(compact_state_map(state, 1), state)
+
+    def test_memory(self) -> None:
+        """A compact state map should use a fraction of the memory of a dict."""
+
+        def measure(build: Callable[[], object]) -> int:
+            tracemalloc.start()
+            try:
+                before, _ = tracemalloc.get_traced_memory()
+                value = build()
+                after, _ = tracemalloc.get_traced_memory()
+            finally:
+                tracemalloc.stop()
+            del value
+            return after - before
+
+        dict_size = measure(lambda: _member_state(10000))
+        compact_size = measure(lambda: CompactStateMap(_member_state(10000)))
+
+        self.assertLess(compact_size, dict_size / 3)
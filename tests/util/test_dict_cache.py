@@ -13,7 +13,9 @@
 # limitations under the License.
 
 
+from synapse.types import StateKey
 from synapse.util.caches.dictionary_cache import DictionaryCache
+from synapse.util.caches.state_map import CompactStateMap, compact_state_map_from_delta
 
 from tests import unittest
 
@@ -119,3 +121,27 @@ class DictCacheTestCase(unittest.TestCase):
         r = self.cache.get(key, dict_keys=["a"])
         self.assertFalse(r.full)
         self.assertEqual(r.value, {"a": "b"})
+
+    def test_layered_state_map_size(self) -> None:
+        """A layered `CompactStateMap` is charged for the parent maps it keeps
+        in memory, even once they have been evicted.
+        """
+        cache: DictionaryCache[str, StateKey, str] = DictionaryCache(
+            "state_maps", max_entries=10
+        )
+        cache.cache.set_cache_factor(1.0)
+        parent = CompactStateMap(
+            {("m.room.member", str(i)): "$%d" % i for i in range(8)}
+        )
+        child = compact_state_map_from_delta(
+            parent, {("m.room.member", "new"): "$new"}, min_size=1
+        )
+        assert isinstance(child, CompactStateMap)
+
+        cache.update(cache.sequence, "child", child)
+        self.assertEqual(len(cache.cache), 9)
+
+        # Adding another map of the same size evicts the child, even though it
+        # has only one entry of its own.
+        cache.update(cache.sequence, "other", parent)
+        self.assertFalse(cache.get("child").full)
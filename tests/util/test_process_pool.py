@@ -0,0 +1,48 @@
+# Copyright 2023 The Matrix.org Foundation C.I.C.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import operator
+import time
+from typing import Any
+
+from twisted.internet import defer
+
+from synapse.util.process_pool import ProcessPool
+
+from tests import unittest
+from tests.server import ThreadedMemoryReactorClock
+
+
+class ProcessPoolTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.reactor = ThreadedMemoryReactorClock()
+        self.pool = ProcessPool(self.reactor, "test", max_workers=1)
+        self.addCleanup(self.pool.shutdown)
+
+    def _wait_for(self, d: "defer.Deferred[Any]") -> None:
+        """Wait for the worker process to fire the deferred."""
+        deadline = time.monotonic() + 30
+        while not d.called and time.monotonic() < deadline:
+            time.sleep(0.01)
+            self.reactor.advance(0)
+
+    def test_run(self) -> None:
+        d = self.pool.run(operator.add, 1, 2)
+        self._wait_for(d)
+        self.assertEqual(self.successResultOf(d), 3)
+
+    def test_exception(self) -> None:
+        d = self.pool.run(int, "not a number")
+        self._wait_for(d)
+        self.failureResultOf(d, ValueError)